@@ -0,0 +1,219 @@
+import logging
+import os
+import re
+import sqlite3
+import unicodedata
+from datetime import datetime
+
+# Bump when the schema below changes
+SCHEMA_VERSION = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY,
+    jmbg TEXT NOT NULL,
+    full_name TEXT NOT NULL,
+    birth_date TEXT NOT NULL,
+    report_date TEXT NOT NULL,
+    dg TEXT NOT NULL,
+    diagnosis TEXT NOT NULL,
+    pdf_path TEXT,
+    txt_path TEXT,
+    created_at TEXT NOT NULL,
+    record_ref TEXT
+);
+CREATE INDEX IF NOT EXISTS reports_jmbg ON reports (jmbg, report_date);
+CREATE INDEX IF NOT EXISTS reports_name ON reports (full_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS reports_date ON reports (report_date);
+CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5 (
+    full_name, jmbg, dg, diagnosis,
+    content='reports', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='1 2 3'
+);
+CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS patients (
+    jmbg TEXT PRIMARY KEY,
+    full_name TEXT NOT NULL,
+    birth_date TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Stores the name and birth date of a report's patient, the latest report winning even if archived later
+UPSERT_PATIENT = """
+INSERT INTO patients (jmbg, full_name, birth_date, updated_at) VALUES (?, ?, ?, ?)
+ON CONFLICT (jmbg) DO UPDATE SET
+    full_name = excluded.full_name, birth_date = excluded.birth_date, updated_at = excluded.updated_at
+WHERE excluded.updated_at >= patients.updated_at
+"""
+
+# Longer prefixes are expanded through the terms table into at most this many words
+MAX_PREFIX_TERMS = 64
+
+# Filters matching fewer rows than this are applied before the full-text match
+MAX_FILTER_CANDIDATES = 500
+
+# Words of a search query; everything else is ignored so user input can't break the FTS syntax
+_QUERY_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def archive_path():
+    """Location of the archive database, next to the izvestaji/ and records/ folders."""
+    return os.environ.get("DOCTORREPORT_ARCHIVE_DB") or os.path.join(os.getcwd(), 'arhiva.db')
+
+def connect(path=None):
+    """Open the archive database, creating the schema on first use."""
+    connection = sqlite3.connect(path or archive_path(), timeout=10)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    version = connection.execute("PRAGMA user_version").fetchone()[0]
+    if version < SCHEMA_VERSION:
+        connection.executescript(SCHEMA)
+        with connection:
+            if version < 2:
+                # Archives from before version 2 have patients only in their reports
+                connection.execute(
+                    "INSERT OR REPLACE INTO patients (jmbg, full_name, birth_date, updated_at)"
+                    " SELECT jmbg, full_name, birth_date, created_at FROM reports WHERE jmbg != '' ORDER BY id")
+            columns = {row["name"] for row in connection.execute("PRAGMA table_info(reports)")}
+            if "record_ref" not in columns:
+                # Version 3 points each report at its stored record (see report_store)
+                connection.execute("ALTER TABLE reports ADD COLUMN record_ref TEXT")
+            connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+    return connection
+
+def iso_date(date_str):
+    """Convert a 'dd-mm-yyyy' GUI date to 'yyyy-mm-dd' so dates sort and compare as text."""
+    try:
+        return datetime.strptime(date_str, '%d-%m-%Y').strftime('%Y-%m-%d')
+    except ValueError:
+        return date_str
+
+def add_report(connection, record, pdf_path=None, txt_path=None, record_ref=None, created_at=None):
+    """Insert one report record into the table and the full-text index. Returns the new id.
+
+    record_ref is the locator of the report's stored record; txt_path the TXT
+    sidecar of reports from before records were stored. created_at, an ISO
+    datetime, defaults to now; imported reports keep the time they were generated.
+    """
+    dg = "\n\n".join(page["dg"] for page in record["pages"])
+    diagnosis = "\n\n".join(page["diagnosis"] for page in record["pages"])
+    row = (
+        record["jmbg"], record["full_name"], record["birth_date"],
+        iso_date(record["pages"][0]["date"]), dg, diagnosis,
+        pdf_path, txt_path, created_at or datetime.now().isoformat(timespec='seconds'), record_ref,
+    )
+    cursor = connection.execute(
+        "INSERT INTO reports (jmbg, full_name, birth_date, report_date, dg, diagnosis, pdf_path, txt_path, created_at,"
+        " record_ref) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+    report_id = cursor.lastrowid
+    connection.execute(
+        "INSERT INTO reports_fts (rowid, full_name, jmbg, dg, diagnosis) VALUES (?, ?, ?, ?, ?)",
+        (report_id, record["full_name"], record["jmbg"], dg, diagnosis))
+
+    if record["jmbg"]:
+        connection.execute(UPSERT_PATIENT, (record["jmbg"], record["full_name"], record["birth_date"], row[8]))
+
+    # Remember every indexed word so typed prefixes can be expanded without an FTS prefix scan
+    words = {normalize_word(word) for word in set(_QUERY_TOKEN.findall(f"{record['full_name']} {record['jmbg']} {dg} {diagnosis}"))}
+    connection.executemany("INSERT OR IGNORE INTO terms (term) VALUES (?)", [(word,) for word in words])
+    return report_id
+
+def record_report(record, pdf_path=None, txt_path=None, record_ref=None):
+    """Archive a generated report in its own transaction; failures are logged, never raised."""
+    try:
+        connection = connect()
+        try:
+            with connection:
+                report_id = add_report(connection, record, pdf_path, txt_path, record_ref)
+        finally:
+            connection.close()
+        logging.info(f"Report archived with id {report_id}")
+        return report_id
+    except sqlite3.Error as e:
+        logging.error(f"Failed to archive report: {e}")
+        return None
+
+def normalize_word(word):
+    """Lowercase a word and strip its diacritics, like the FTS tokenizer does."""
+    decomposed = unicodedata.normalize('NFKD', word.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+def fts_query(connection, text):
+    """Turn free text into an FTS5 query matching all words, the last one as a prefix (as typed so far).
+
+    Returns "" for an empty query and None when nothing can match.
+    """
+    tokens = [normalize_word(token) for token in _QUERY_TOKEN.findall(text)]
+    if not tokens:
+        return ""
+    parts = [f'"{token}"' for token in tokens[:-1]]
+
+    # FTS5 prefix queries merge the doclists of every matching word up front. Short prefixes
+    # have their own prefix index; longer ones become an OR of the few words they match.
+    prefix = tokens[-1]
+    if len(prefix) <= 3:
+        parts.append(f'"{prefix}"*')
+    else:
+        words = [row[0] for row in connection.execute(
+            "SELECT term FROM terms WHERE term >= ? AND term < ? LIMIT ?",
+            (prefix, prefix + "\U0010ffff", MAX_PREFIX_TERMS + 1))]
+        if not words:
+            return None
+        if len(words) > MAX_PREFIX_TERMS:
+            parts.append(f'"{prefix}"*')
+        else:
+            parts.append("(" + " OR ".join(f'"{word}"' for word in words) + ")")
+    return " AND ".join(parts)
+
+def list_patients(connection):
+    """(jmbg, full_name, birth_date) of every patient with an archived report."""
+    return connection.execute("SELECT jmbg, full_name, birth_date FROM patients").fetchall()
+
+def search(connection, text, jmbg=None, date_from=None, date_to=None, limit=100):
+    """Search the archive, newest reports first.
+
+    text is matched against name, JMBG, DG and diagnosis; jmbg and the
+    'yyyy-mm-dd' date bounds narrow the results further.
+    """
+    conditions = []
+    parameters = []
+    if jmbg:
+        conditions.append("jmbg = ?")
+        parameters.append(jmbg)
+    if date_from:
+        conditions.append("report_date >= ?")
+        parameters.append(date_from)
+    if date_to:
+        conditions.append("report_date <= ?")
+        parameters.append(date_to)
+    where = " AND ".join(conditions)
+
+    query = fts_query(connection, text or "")
+    if query is None:
+        return []
+    if not query:
+        sql = ("SELECT id, jmbg, full_name, report_date, pdf_path, record_ref, substr(dg, 1, 80) AS snippet"
+               f" FROM reports WHERE {where or 1} ORDER BY id DESC LIMIT ?")
+        return connection.execute(sql, parameters + [limit]).fetchall()
+
+    sql = ("SELECT r.id, r.jmbg, r.full_name, r.report_date, r.pdf_path, r.record_ref,"
+           " snippet(reports_fts, -1, '[', ']', '...', 12) AS snippet"
+           " FROM reports_fts JOIN reports r ON r.id = reports_fts.rowid"
+           " WHERE reports_fts MATCH ?")
+    if where:
+        candidates = connection.execute(
+            f"SELECT count(*) FROM (SELECT 1 FROM reports WHERE {where} LIMIT ?)",
+            parameters + [MAX_FILTER_CANDIDATES]).fetchone()[0]
+        if candidates < MAX_FILTER_CANDIDATES:
+            # Few rows pass the filters: let the indexes pick them and FTS check only those
+            sql += f" AND reports_fts.rowid IN (SELECT id FROM reports WHERE {where})"
+        else:
+            # Broad filters: walk FTS matches newest first and stop once `limit` rows pass
+            sql += " AND " + " AND ".join(f"r.{condition}" for condition in conditions)
+
+    # Newest first by rowid lets FTS stop after `limit` matches instead of sorting them all
+    sql += " ORDER BY reports_fts.rowid DESC LIMIT ?"
+    return connection.execute(sql, [query] + parameters + [limit]).fetchall()
@@ -0,0 +1,130 @@
+import logging
+import time
+import sqlite3
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtWidgets import (
+    QMainWindow, QWidget, QVBoxLayout, QLineEdit, QTableWidget, QTableWidgetItem,
+    QHeaderView, QAbstractItemView, QLabel, QHBoxLayout, QPushButton
+)
+import archive
+import pdf_worker
+
+
+# Item data role holding the locator of a result's stored record
+RECORD_ROLE = Qt.UserRole + 1
+
+
+class ArchiveWindow(QMainWindow):
+    """Search panel over the archived reports.
+
+    open_report, if given, is called with the locator of a report's stored
+    record to load it into the form. The archive is open while the window
+    is shown: closing the window closes it, showing the window again reopens
+    it and searches again.
+    """
+
+    def __init__(self, open_report=None):
+        super().__init__()
+        self.open_report = open_report
+
+        self.setWindowTitle("Arhiva izveštaja")
+        self.setMinimumSize(800, 600)
+        self.connection = None
+
+        central_widget = QWidget(self)
+        layout = QVBoxLayout(central_widget)
+
+        # Search box; the query runs once typing pauses
+        self.search_edit = QLineEdit(central_widget)
+        self.search_edit.setPlaceholderText("Ime, JMBG, DG ili tekst nalaza")
+        layout.addWidget(self.search_edit)
+
+        # Results: newest reports first, double click opens the PDF
+        self.results_table = QTableWidget(0, 4, central_widget)
+        self.results_table.setHorizontalHeaderLabels(["Datum", "Ime i prezime", "JMBG", "Izvod"])
+        self.results_table.horizontalHeader().setSectionResizeMode(3, QHeaderView.Stretch)
+        self.results_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.results_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        layout.addWidget(self.results_table)
+
+        # Loads the selected report into a new tab, for reports stored as records
+        status_layout = QHBoxLayout()
+        self.status_label = QLabel(central_widget)
+        status_layout.addWidget(self.status_label, 1)
+        self.load_button = QPushButton("Otvori u formi", central_widget)
+        self.load_button.setEnabled(False)
+        self.load_button.setVisible(open_report is not None)
+        self.load_button.clicked.connect(self.load_selected)
+        status_layout.addWidget(self.load_button)
+        layout.addLayout(status_layout)
+
+        self.setCentralWidget(central_widget)
+
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.run_search)
+        self.search_edit.textChanged.connect(self.search_timer.start)
+        self.results_table.cellDoubleClicked.connect(self.open_result)
+        self.results_table.itemSelectionChanged.connect(self.update_load_button)
+
+    def run_search(self):
+        """Query the archive and show the matching reports."""
+        if self.connection is None:
+            # Typing paused after the window was closed
+            return
+        start_time = time.perf_counter()
+        try:
+            rows = archive.search(self.connection, self.search_edit.text())
+        except sqlite3.Error as e:
+            logging.error(f"Archive search failed: {e}")
+            self.status_label.setText("Greška pri pretrazi arhive.")
+            return
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+
+        self.results_table.setRowCount(len(rows))
+        for row_index, row in enumerate(rows):
+            values = [row["report_date"], row["full_name"], row["jmbg"], (row["snippet"] or "").replace("\n", " ")]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                item.setData(Qt.UserRole, row["pdf_path"])
+                item.setData(RECORD_ROLE, row["record_ref"])
+                self.results_table.setItem(row_index, column, item)
+
+        self.status_label.setText(f"Pronađeno: {len(rows)} ({elapsed_ms:.1f} ms)")
+
+    def open_result(self, row_index, column):
+        pdf_path = self.results_table.item(row_index, column).data(Qt.UserRole)
+        if pdf_path:
+            pdf_worker.open_pdf(pdf_path)
+
+    def selected_record(self):
+        """Locator of the selected report's stored record, or None."""
+        items = self.results_table.selectedItems()
+        return items[0].data(RECORD_ROLE) if items else None
+
+    def update_load_button(self):
+        self.load_button.setEnabled(bool(self.selected_record()))
+
+    def load_selected(self):
+        record_ref = self.selected_record()
+        if record_ref and self.open_report:
+            self.open_report(record_ref)
+
+    def showEvent(self, event):
+        if self.connection is None:
+            try:
+                self.connection = archive.connect()
+            except sqlite3.Error as e:
+                logging.error(f"Cannot open the archive: {e}")
+                self.status_label.setText("Greška pri otvaranju arhive.")
+            else:
+                self.run_search()
+        super().showEvent(event)
+
+    def closeEvent(self, event):
+        self.search_timer.stop()
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+        super().closeEvent(event)
@@ -0,0 +1,187 @@
+"""Render many reports from a JSON or CSV manifest without starting the GUI.
+
+JSON manifests hold a list of report records (or an object with a "reports"
+list), using the same shape as report_engine.normalize_record. CSV manifests
+hold one row per page with the columns full_name, birth_date, jmbg, date, dg
+and diagnosis; rows sharing a report_id column are joined into one report.
+
+Usage: python batch_render.py manifest.json [--output-dir izvestaji] [--workers N]
+"""
+import sys
+import logging
+import os
+import csv
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import report_engine
+import render_cache
+import report_files
+from config_service import ConfigError, get_config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Renderer shared by all reports handled in one worker process, and its render cache (None if off)
+_worker_renderer = None
+_worker_cache = None
+
+
+def load_manifest(manifest_path):
+    """Load report records from a JSON or CSV manifest."""
+    if manifest_path.lower().endswith('.csv'):
+        return load_csv_manifest(manifest_path)
+
+    with open(manifest_path, 'r', encoding='utf-8') as file:
+        data = json.load(file)
+    if isinstance(data, dict):
+        data = data.get("reports", [])
+    if not isinstance(data, list):
+        raise ValueError("JSON manifest must be a list of reports or an object with a 'reports' list")
+    return data
+
+def load_csv_manifest(manifest_path):
+    """Group CSV rows (one per page) into report records."""
+    records = []
+    by_report_id = {}
+    with open(manifest_path, 'r', encoding='utf-8-sig', newline='') as file:
+        for row in csv.DictReader(file):
+            page = {
+                "dg": row.get("dg", ""),
+                "diagnosis": row.get("diagnosis", ""),
+                "date": row.get("date", ""),
+            }
+            report_id = (row.get("report_id") or "").strip()
+            if report_id and report_id in by_report_id:
+                by_report_id[report_id]["pages"].append(page)
+                continue
+
+            record = {
+                "full_name": row.get("full_name", ""),
+                "birth_date": row.get("birth_date", ""),
+                "jmbg": row.get("jmbg", ""),
+                "pages": [page],
+            }
+            if report_id:
+                by_report_id[report_id] = record
+            records.append(record)
+    return records
+
+def output_file_name(output_folder, record):
+    """The PDF path for a record: its "output", or its name in the folder of its month.
+
+    The name may be taken; render_one then publishes the report under the
+    next free name, as the GUI does (see report_engine.publish_file).
+    """
+    if record.get("output"):
+        return os.path.join(output_folder, record["output"])
+
+    try:
+        report_date = datetime.strptime(record["pages"][0]["date"], '%d-%m-%Y').strftime('%Y%m%d')
+    except ValueError:
+        report_date = datetime.now().strftime('%Y%m%d')
+
+    file_name = f"{report_engine.file_stem(record['full_name'])}_{report_date}.pdf"
+    return report_files.shard_path(output_folder, file_name)
+
+def init_worker(config, use_cache=True):
+    """Register fonts and set up the renderer once per worker process."""
+    global _worker_renderer, _worker_cache
+    logging.getLogger().setLevel(logging.WARNING)
+    report_engine.register_fonts()
+    _worker_renderer = report_engine.ReportRenderer(config)
+    _worker_cache = render_cache.shared_cache() if use_cache else None
+
+def warm_up():
+    """Do nothing in a worker, so that submitting one per worker starts them all. Returns the worker's pid."""
+    return os.getpid()
+
+def render_bytes_in_worker(record):
+    """Render a normalized record in a worker, or take it from the render cache. Returns the PDF data."""
+    if _worker_cache is not None:
+        data, _ = _worker_cache.render_bytes(_worker_renderer, record)
+    else:
+        data, _ = _worker_renderer.render_bytes(record)
+    return data
+
+def render_one(index, record, pdf_file_name):
+    """Render a single record in a worker. Returns (index, path written, error).
+
+    A report named by its "output" replaces that file; any other is
+    published under a free name, never over an existing report.
+    """
+    try:
+        data = render_bytes_in_worker(report_engine.normalize_record(record))
+        os.makedirs(os.path.dirname(pdf_file_name), exist_ok=True)
+        if record.get("output"):
+            report_engine.write_file_atomically(pdf_file_name, data)
+        else:
+            pdf_file_name = report_engine.publish_file(pdf_file_name, data)
+        return index, pdf_file_name, None
+    except Exception as e:
+        return index, pdf_file_name, str(e)
+
+def run_batch(records, output_folder, workers=None, config=None, use_cache=True):
+    """Render all records across a process pool. Returns the number of failures."""
+    # Validated once here instead of in every worker
+    config = config if config is not None else get_config()
+    os.makedirs(output_folder, exist_ok=True)
+
+    jobs = []
+    for index, record in enumerate(records):
+        try:
+            normalized = report_engine.normalize_record(record)
+        except ValueError as e:
+            logging.error(f"Report #{index + 1} skipped: {e}")
+            jobs.append(None)
+            continue
+        normalized["output"] = record.get("output") if isinstance(record, dict) else None
+        jobs.append((index, normalized, output_file_name(output_folder, normalized)))
+
+    failures = sum(1 for job in jobs if job is None)
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(config, use_cache)) as executor:
+        futures = [executor.submit(render_one, *job) for job in jobs if job is not None]
+        for future in as_completed(futures):
+            index, pdf_file_name, error = future.result()
+            if error:
+                failures += 1
+                logging.error(f"Report #{index + 1} ({pdf_file_name}) failed: {error}")
+
+    elapsed = time.perf_counter() - start_time
+    rendered = len(records) - failures
+    rate = rendered / elapsed if elapsed > 0 else 0.0
+    logging.info(f"Rendered {rendered}/{len(records)} reports in {elapsed:.2f}s ({rate:.1f} reports/s)")
+    return failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render PDF reports from a JSON or CSV manifest.")
+    parser.add_argument("manifest", help="Path to a .json or .csv manifest")
+    parser.add_argument("--output-dir", default=os.path.join(os.getcwd(), 'izvestaji'),
+                        help="Folder for the generated PDFs (default: ./izvestaji)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of worker processes (default: one per CPU core)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Render every report, even if the render cache has it")
+    args = parser.parse_args(argv)
+
+    try:
+        records = load_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        logging.error(f"Failed to read manifest: {e}")
+        return 2
+
+    try:
+        config = get_config()
+    except ConfigError:
+        # Already logged by the config service
+        return 2
+
+    failures = run_batch(records, args.output_dir, args.workers, config, use_cache=not args.no_cache)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
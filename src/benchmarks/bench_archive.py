@@ -0,0 +1,57 @@
+"""Benchmark archive search latency on a large synthetic archive.
+
+Usage (from src/): python -m benchmarks.bench_archive [--reports 200000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import archive
+
+WORDS = ("akutna infekcija gornjih disajnih puteva hipertenzija dijabetes bol u grudima kontrola "
+         "terapija pregled nalaz uredan povišen pritisak glavobolja kašalj temperatura").split()
+
+QUERIES = ["hipert", "kašalj dijabetes", "Pacijent 42", "0000000000042", "nepostojece", ""]
+
+
+def build_archive(path, reports):
+    random.seed(0)
+    connection = archive.connect(path)
+    with connection:
+        for index in range(reports):
+            archive.add_report(connection, {
+                "full_name": f"Pacijent {index % 5000}",
+                "birth_date": "01-01-1980",
+                "jmbg": f"{index % 5000:013d}",
+                "pages": [{
+                    "dg": " ".join(random.choices(WORDS, k=5)),
+                    "diagnosis": " ".join(random.choices(WORDS, k=60)),
+                    "date": f"{1 + index % 28:02d}-{1 + index % 12:02d}-{2010 + index % 15}",
+                }],
+            })
+    return connection
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark archive search.")
+    parser.add_argument("--reports", type=int, default=200000, help="Reports in the synthetic archive")
+    args = parser.parse_args(argv)
+
+    path = os.path.join(tempfile.mkdtemp(), "arhiva.db")
+    start = time.perf_counter()
+    connection = build_archive(path, args.reports)
+    build_s = time.perf_counter() - start
+    print(f"Archived {args.reports} reports in {build_s:.1f}s ({os.path.getsize(path) / 1e6:.0f} MB)")
+
+    searches = [(query, {}) for query in QUERIES]
+    searches.append(("kontrola", {"jmbg": "0000000000042"}))
+    searches.append(("kontrola", {"date_from": "2020-01-01", "date_to": "2020-12-31"}))
+    for query, filters in searches:
+        start = time.perf_counter()
+        rows = archive.search(connection, query, **filters)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"{query!r:20} {str(filters):60} {len(rows):4} results {elapsed_ms:7.2f} ms")
+
+if __name__ == "__main__":
+    main()
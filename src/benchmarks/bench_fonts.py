@@ -0,0 +1,83 @@
+"""Benchmark font registration cost per report.
+
+Compares the old behaviour (parse both TTFs on every report) with the font
+registry (register once per process) and the on-disk metric cache (cold
+start without TTF parsing).
+
+Usage (from src/): python -m benchmarks.bench_fonts [--reports 50]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+import fonts
+import report_engine
+from resources import resource_path
+
+SAMPLE_RECORD = {
+    "full_name": "Pera Perić",
+    "birth_date": "01-02-1980",
+    "jmbg": "0102980710000",
+    "pages": [{"dg": "J06.9 Akutna infekcija gornjih disajnih puteva", "diagnosis": "Kontrola za 7 dana.\n" * 20, "date": "21-10-2024"}],
+}
+
+
+def legacy_register():
+    """Font registration as PageWindow.generate_pdf used to do it on every click."""
+    for name, path in fonts.PDF_FONT_FACES.items():
+        pdfmetrics.registerFont(TTFont(name, resource_path(path)))
+
+def time_per_call(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1000
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark font registration per report.")
+    parser.add_argument("--reports", type=int, default=50, help="Reports rendered per scenario")
+    args = parser.parse_args(argv)
+
+    config = {"header": ["Ordinacija"], "footer": ["Dr"]}
+    renderer = report_engine.ReportRenderer(config)
+    output = os.path.join(tempfile.mkdtemp(), "bench.pdf")
+    record = report_engine.normalize_record(SAMPLE_RECORD)
+
+    def legacy_report():
+        legacy_register()
+        renderer.render(record, output)
+
+    def registry_report():
+        fonts.register_pdf_fonts()
+        renderer.render(record, output)
+
+    # Warm up imports and the on-disk cache before timing
+    registry_report()
+
+    legacy_ms = time_per_call(legacy_report, args.reports)
+    registry_ms = time_per_call(registry_report, args.reports)
+
+    # Cold start: what a fresh worker process pays to get both faces ready
+    def cold_parse():
+        for name, path in fonts.PDF_FONT_FACES.items():
+            fonts.load_ttfont(name, resource_path(path), use_cache=False)
+
+    def cold_cached():
+        for name, path in fonts.PDF_FONT_FACES.items():
+            fonts.load_ttfont(name, resource_path(path), use_cache=True)
+
+    parse_ms = time_per_call(cold_parse, args.reports)
+    cached_ms = time_per_call(cold_cached, args.reports)
+
+    print(f"Per report, legacy re-registration:   {legacy_ms:8.2f} ms")
+    print(f"Per report, font registry:            {registry_ms:8.2f} ms")
+    print(f"Saved per report:                     {legacy_ms - registry_ms:8.2f} ms")
+    print(f"Cold start, parse TTFs:               {parse_ms:8.2f} ms")
+    print(f"Cold start, cached metrics:           {cached_ms:8.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Compare PDF size and render time with and without header/footer forms.
+
+Usage (from src/): python -m benchmarks.bench_forms [--repeat 20]
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+import report_engine
+
+CONFIG = {
+    "header": [
+        "SPECIJALISTIČKA ORDINACIJA INTERNE MEDICINE",
+        "KARDIOLOGIJA I ENDOKRINOLOGIJA",
+        "Bulevar kralja Aleksandra 1, Beograd",
+        "tel. 011/123-4567",
+    ],
+    "footer": [
+        "Dr Petar Petrović",
+        "specijalista interne medicine",
+        "kardiolog",
+    ],
+}
+
+
+def sample_record(entries, diagnosis_lines):
+    diagnosis = "\n".join(f"Red {index}: pacijent se javlja na kontrolu, terapija bez izmena." for index in range(diagnosis_lines))
+    return report_engine.normalize_record({
+        "full_name": "Pera Perić",
+        "birth_date": "01-02-1980",
+        "jmbg": "0102980710000",
+        "pages": [{"dg": "I10 Hipertenzija", "diagnosis": diagnosis, "date": "21-10-2024"} for _ in range(entries)],
+    })
+
+def measure(renderer, record, output, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        renderer.render(record, output)
+    elapsed_ms = (time.perf_counter() - start) / repeat * 1000
+    return elapsed_ms, os.path.getsize(output)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare header/footer forms with redrawing per page.")
+    parser.add_argument("--repeat", type=int, default=20, help="Renders per measurement")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)
+    report_engine.register_fonts()
+    output = os.path.join(tempfile.mkdtemp(), "bench.pdf")
+    cases = [("1 page", sample_record(1, 10)), ("10 entries", sample_record(10, 10)),
+             ("50 pages", sample_record(1, 2300)), ("50 entries x 2 pages", sample_record(50, 60))]
+
+    print(f"{'report':24} {'redraw ms':>10} {'forms ms':>10} {'redraw KB':>10} {'forms KB':>10}")
+    for label, record in cases:
+        redraw_ms, redraw_size = measure(report_engine.ReportRenderer(CONFIG, use_forms=False), record, output, args.repeat)
+        forms_ms, forms_size = measure(report_engine.ReportRenderer(CONFIG, use_forms=True), record, output, args.repeat)
+        print(f"{label:24} {redraw_ms:10.2f} {forms_ms:10.2f} {redraw_size / 1024:10.1f} {forms_size / 1024:10.1f}")
+
+if __name__ == "__main__":
+    main()
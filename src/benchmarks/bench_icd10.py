@@ -0,0 +1,86 @@
+"""Benchmark ICD-10 lookups on an index the size of the full classification.
+
+Builds an index of synthetic codes and names, opens it, then looks up
+every prefix of a sample of codes and names as they would be typed, some
+names with a typo. The run exits with status 1 if the 99th percentile per
+keystroke exceeds --max-p99-us.
+
+Usage (from src/): python -m benchmarks.bench_icd10 [--entries 14000]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import icd10
+
+PREFIXES = "hyper hypo peri endo poly neuro cardio gastro osteo myo para dys".split()
+SUFFIXES = "itis osis algia pathy oma ectasia plasia rrhoea".split()
+
+
+def build_entries(count):
+    """Synthetic codes named by words of the bundled names and words derived from them, a few
+    of them common and most rare, as in the real classification."""
+    random.seed(0)
+    # The words of the bundled names, most common first
+    words = [word for word, _ in Counter(word.strip(",()").lower() for _, name in icd10.read_source()
+                                         for word in name.split()).most_common()]
+    stems = sorted({word[:-3] for word in words if len(word) > 6})
+    vocabulary = words + sorted({f"{prefix}{stem}{suffix}" for prefix in PREFIXES for stem in stems
+                                 for suffix in random.sample(SUFFIXES, 2)})
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+    entries = {}
+    while len(entries) < count:
+        code = f"{random.choice(string.ascii_uppercase)}{random.randint(0, 99):02d}.{random.randint(0, 9)}"
+        entries[code] = " ".join(random.choices(vocabulary, weights, k=random.randint(2, 9))).capitalize()
+    return list(entries.items())
+
+def with_typo(text):
+    position = random.randrange(1, len(text))
+    return text[:position] + random.choice(string.ascii_lowercase) + text[position + 1:]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ICD-10 lookups.")
+    parser.add_argument("--entries", type=int, default=14000, help="Codes in the synthetic index")
+    parser.add_argument("--typed", type=int, default=500, help="Codes and names typed key by key")
+    parser.add_argument("--max-p99-us", type=float, default=1000.0, help="Allowed 99th percentile per keystroke")
+    args = parser.parse_args(argv)
+
+    entries = build_entries(args.entries)
+    path = os.path.join(tempfile.mkdtemp(), "icd10.idx")
+    start = time.perf_counter()
+    icd10.build_index(entries, path)
+    print(f"Built the index of {len(entries)} codes in {(time.perf_counter() - start) * 1000:.0f} ms "
+          f"({os.path.getsize(path) / 1e6:.2f} MB)")
+
+    start = time.perf_counter()
+    index = icd10.Icd10Index(path)
+    print(f"Opened it in {(time.perf_counter() - start) * 1e6:.0f} us")
+
+    typed = []
+    for code, name in random.sample(entries, min(args.typed, len(entries))):
+        typed.append(code)
+        typed.append(name[:40])
+        typed.append(with_typo(name[:40]))
+
+    for label, texts in (("codes", typed[0::3]), ("names", typed[1::3]), ("names with a typo", typed[2::3])):
+        times = []
+        for text in texts:
+            for end in range(1, len(text) + 1):
+                start = time.perf_counter()
+                index.lookup(text[:end])
+                times.append(time.perf_counter() - start)
+        times.sort()
+        p99_us = times[int(len(times) * 0.99)] * 1e6
+        print(f"{label:18} {len(times):6} keystrokes: p50 {times[len(times) // 2] * 1e6:6.1f} us, "
+              f"p99 {p99_us:6.1f} us, max {times[-1] * 1e6:6.0f} us")
+        if p99_us > args.max_p99_us:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""Benchmark importing a legacy backlog of TXT sidecars and report PDFs.
+
+Writes --files files into a scratch folder: reports from 2023 on,
+each a PDF in izvestaji/ and, for four in five, its sidecar in txt/. The PDFs
+are copies of a few rendered reports, so the backlog is quick to make, and
+of the sample report in the repository, printed by an older version. The
+backlog is then imported once, timed, and imported again, which must find
+nothing left to do. The run exits with status 1 if a report failed or
+went missing, if the sample report did not come back with its texts, or if
+fewer than --min-files-per-s files were read per second.
+
+Usage (from src/): python -m benchmarks.bench_legacy_import [--files 100000] [--workers N]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import archive
+import legacy_import
+import report_engine
+import report_store
+from benchmarks.bench_report_store import synthetic_report
+from config_service import get_config
+
+# Distinct PDFs rendered; the backlog copies them
+TEMPLATES = 20
+
+# A report printed by an older version, with smaller DG lines, and what it was drawn from
+SAMPLE_PDF = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir,
+                          "Patient_Patientich_20241021.pdf")
+SAMPLE_NAME = "Patient Patientich"
+SAMPLE_DG = "Degenerative Disc Disease\nLumbar Region with Spinal Stenosis and Radiculopathy\nCausing Chronic Lower Back Pain"
+SAMPLE_DATES = ["21-10-2024", "01-01-2000"]
+
+
+def write_sidecar(path, report):
+    """A sidecar as older versions wrote it."""
+    with open(path, 'w', encoding='utf-8') as file:
+        for number, page in enumerate(report["pages"], start=1):
+            if number > 1 and not (page["dg"] and page["diagnosis"]):
+                continue
+            file.write(f"Page {number} - DG:\n{page['dg'] or report_engine.EMPTY_DG_TEXT}\n\n")
+            file.write(f"Page {number} - Diagnosis Content:\n{page['diagnosis']}\n\n")
+
+def make_backlog(folder, files):
+    """Write a backlog of at least files files under folder, the sample report among them.
+
+    Returns the number of files and of reports.
+    """
+    report_engine.register_fonts()
+    renderer = report_engine.ReportRenderer(get_config())
+    templates = []
+    for index in range(TEMPLATES):
+        report = synthetic_report(index)
+        templates.append((report, renderer.render_bytes(report)[0]))
+
+    txt_folder = os.path.join(folder, "txt")
+    pdf_folder = os.path.join(folder, "izvestaji")
+    os.makedirs(txt_folder)
+    os.makedirs(pdf_folder)
+    with open(SAMPLE_PDF, 'rb') as source, open(os.path.join(pdf_folder, os.path.basename(SAMPLE_PDF)), 'wb') as file:
+        file.write(source.read())
+    start = datetime(2023, 1, 1, 8, 0, 0)
+    written = reports = 1
+    while written < files:
+        report, data = templates[reports % TEMPLATES]
+        when = start + timedelta(minutes=11 * reports)
+        stem = report_engine.file_stem(report["full_name"])
+        with open(os.path.join(pdf_folder, f"{stem}_{when:%Y%m%d}_{reports}.pdf"), 'wb') as file:
+            file.write(data)
+        written += 1
+        if reports % 5:
+            write_sidecar(os.path.join(txt_folder, f"{stem}_{when:%Y%m%d}_{when:%H%M%S}.txt"), report)
+            written += 1
+        reports += 1
+    return written, reports
+
+def sample_imported(records_folder):
+    """Whether the sample report was stored once, with the DG and dates it was printed with."""
+    samples = [stored["report"] for _, stored in report_store.iter_records(records_folder)
+               if stored["report"]["full_name"] == SAMPLE_NAME]
+    return (len(samples) == 1 and samples[0]["pages"][0]["dg"] == SAMPLE_DG
+            and [page["date"] for page in samples[0]["pages"]] == SAMPLE_DATES)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark importing a legacy backlog.")
+    parser.add_argument("--files", type=int, default=100000, help="Files in the backlog")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU core)")
+    parser.add_argument("--batch", type=int, default=legacy_import.DEFAULT_BATCH, help="Reports per transaction")
+    parser.add_argument("--min-files-per-s", type=float, default=0.0, help="Fail below this many files per second")
+    args = parser.parse_args(argv)
+
+    random.seed(0)
+    folder = tempfile.mkdtemp()
+    start = time.perf_counter()
+    written, reports = make_backlog(folder, args.files)
+    print(f"Wrote {written} files ({reports} reports) in {time.perf_counter() - start:.1f} s")
+
+    os.environ["DOCTORREPORT_ARCHIVE_DB"] = os.path.join(folder, "arhiva.db")
+    paths = {name: os.path.join(folder, name) for name in ("txt", "izvestaji", report_store.RECORDS_FOLDER)}
+    start = time.perf_counter()
+    imported, files, failures = legacy_import.run_import(
+        paths["txt"], paths["izvestaji"], paths[report_store.RECORDS_FOLDER], args.workers, args.batch,
+        os.path.join(folder, "fraze.idx"))
+    elapsed = time.perf_counter() - start
+    rate = files / elapsed
+    print(f"import   {files} files, {imported} reports in {elapsed:.1f} s: {rate:.0f} files/s, "
+          f"{imported / elapsed:.0f} reports/s, {failures} failed")
+
+    start = time.perf_counter()
+    again, _, _ = legacy_import.run_import(
+        paths["txt"], paths["izvestaji"], paths[report_store.RECORDS_FOLDER], args.workers, args.batch,
+        os.path.join(folder, "fraze.idx"))
+    print(f"re-run   {again} reports imported in {time.perf_counter() - start:.1f} s")
+
+    connection = archive.connect()
+    try:
+        archived = connection.execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+    finally:
+        connection.close()
+    stored = sum(1 for _ in report_store.iter_records(paths[report_store.RECORDS_FOLDER]))
+    sample = sample_imported(paths[report_store.RECORDS_FOLDER])
+    print(f"{stored} records stored, {archived} reports archived, sample report {'read' if sample else 'MISSING'}")
+    ok = (not failures and not again and imported == stored == archived == reports and sample
+          and rate >= args.min_files_per_s)
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
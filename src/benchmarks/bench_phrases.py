@@ -0,0 +1,74 @@
+"""Benchmark phrase completion on a large synthetic phrase index.
+
+Builds an index, saves and reloads its snapshot, then completes every prefix
+of a sample of phrases as if they were typed one key at a time. The run
+exits with status 1 if the 99th percentile per keystroke exceeds --max-p99-us.
+
+Usage (from src/): python -m benchmarks.bench_phrases [--phrases 100000]
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import phrases
+
+WORDS = ("akutna infekcija gornjih disajnih puteva hipertenzija dijabetes bol u grudima kontrola "
+         "terapija pregled nalaz uredan povišen pritisak glavobolja kašalj temperatura pacijent "
+         "se javlja zbog srce pluća abdomen").split()
+
+
+def build_counts(count):
+    random.seed(0)
+    counts = Counter()
+    for _ in range(count):
+        phrase = " ".join(random.choices(WORDS, k=random.randint(2, 9))).capitalize()
+        counts[phrase] += random.randint(1, 20)
+    return counts
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark phrase completion.")
+    parser.add_argument("--phrases", type=int, default=100000, help="Phrases written into the synthetic index")
+    parser.add_argument("--typed", type=int, default=2000, help="Phrases typed key by key")
+    parser.add_argument("--max-p99-us", type=float, default=250.0, help="Allowed 99th percentile per keystroke")
+    args = parser.parse_args(argv)
+
+    counts = build_counts(args.phrases)
+    start = time.perf_counter()
+    index = phrases.PhraseIndex()
+    index.add(counts)
+    print(f"Indexed {len(index)} phrases in {(time.perf_counter() - start) * 1000:.0f} ms "
+          f"({len(index.top)} precomputed prefixes)")
+
+    path = os.path.join(tempfile.mkdtemp(), phrases.SNAPSHOT_FILE)
+    index.save(path)
+    start = time.perf_counter()
+    index = phrases.PhraseIndex.load(path)
+    print(f"Loaded the snapshot ({os.path.getsize(path) / 1e6:.1f} MB) in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    typed = random.sample(sorted(counts), min(args.typed, len(counts)))
+    times = []
+    gc.disable()
+    for phrase in typed:
+        for end in range(1, len(phrase) + 1):
+            start = time.perf_counter()
+            index.complete(phrase[:end])
+            times.append(time.perf_counter() - start)
+    gc.enable()
+    times.sort()
+    p50_us = times[len(times) // 2] * 1e6
+    p99_us = times[int(len(times) * 0.99)] * 1e6
+    print(f"{len(times)} keystrokes: p50 {p50_us:.1f} us, p99 {p99_us:.1f} us, max {times[-1] * 1e6:.0f} us "
+          f"(allowed p99 {args.max_p99_us:.0f} us)")
+
+    start = time.perf_counter()
+    index.add(Counter({"Pacijent se javlja zbog kašlja.": 1, "Bol u grudima ne postoji.": 1}))
+    print(f"Added a report in {(time.perf_counter() - start) * 1000:.2f} ms")
+    return 0 if p99_us <= args.max_p99_us else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
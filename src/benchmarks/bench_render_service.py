@@ -0,0 +1,132 @@
+"""Load-test the render service: requests per second and latency under concurrent keep-alive clients.
+
+Starts render_service.py on a free port (or uses a running one given by
+--port), then has --clients connections each POST a sample report, wait for
+the PDF and send the next, for --seconds. A 429 is counted and retried after
+its Retry-After. The started service renders every request unless --cached
+is given, in which case all but the first are answered from a scratch render
+cache. The run exits with status 1 if any request failed otherwise,
+or if fewer than --min-rps reports were rendered per second.
+
+Usage (from src/): python -m benchmarks.bench_render_service [--clients 16] [--seconds 10] [--size medium]
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import render_service
+from benchmarks.suite import SIZES, sample_record
+
+
+async def send(reader, writer, body):
+    """POST body to /render on a kept-alive connection. Returns (status, headers, response body)."""
+    writer.write((f"POST /render HTTP/1.1\r\nHost: {render_service.HOST}\r\nContent-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\n\r\n").encode('latin-1') + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode('latin-1').partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return status, headers, await reader.readexactly(int(headers["content-length"]))
+
+async def client(port, body, deadline, results):
+    reader, writer = await asyncio.open_connection(render_service.HOST, port)
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status, headers, data = await send(reader, writer, body)
+            if status == 200 and data.startswith(b"%PDF"):
+                results["latencies"].append(time.perf_counter() - start)
+            elif status == 429:
+                results["rejected"] += 1
+                await asyncio.sleep(float(headers.get("retry-after", 1)))
+            else:
+                results["errors"] += 1
+                print(f"HTTP {status}: {data[:200]!r}")
+            if headers.get("connection") == "close":
+                writer.close()
+                reader, writer = await asyncio.open_connection(render_service.HOST, port)
+    finally:
+        writer.close()
+
+async def load(port, clients, seconds, body):
+    results = {"latencies": [], "rejected": 0, "errors": 0}
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, body, start + seconds, results) for _ in range(clients)))
+    return results, time.perf_counter() - start
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind((render_service.HOST, 0))
+        return sock.getsockname()[1]
+
+def wait_for_service(port, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError("the render service exited")
+        try:
+            socket.create_connection((render_service.HOST, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("the render service did not start")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the render service.")
+    parser.add_argument("--port", type=int, default=None, help="Port of a running service (default: start one)")
+    parser.add_argument("--workers", type=int, default=None, help="Workers of the started service")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent keep-alive connections")
+    parser.add_argument("--seconds", type=float, default=10.0, help="How long to keep sending")
+    parser.add_argument("--size", choices=sorted(SIZES), default="medium", help="Sample report size")
+    parser.add_argument("--cached", action="store_true", help="Let the started service answer from its render cache")
+    parser.add_argument("--min-rps", type=float, default=0.0, help="Fail below this many reports per second")
+    args = parser.parse_args(argv)
+
+    body = json.dumps(sample_record(args.size)).encode('utf-8')
+    process = None
+    port = args.port
+    if port is None:
+        port = free_port()
+        command = [sys.executable, "render_service.py", "--port", str(port)]
+        if args.workers:
+            command += ["--workers", str(args.workers)]
+        environment = dict(os.environ)
+        if args.cached:
+            environment["DOCTORREPORT_RENDER_CACHE"] = tempfile.mkdtemp()
+        else:
+            command.append("--no-cache")
+        process = subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(render_service.__file__)),
+                                   env=environment)
+    try:
+        wait_for_service(port, process)
+        results, elapsed = asyncio.run(load(port, args.clients, args.seconds, body))
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    latencies = sorted(results["latencies"])
+    rps = len(latencies) / elapsed
+    print(f"{len(latencies)} {args.size} reports in {elapsed:.1f} s from {args.clients} clients: {rps:.1f} reports/s")
+    if latencies:
+        print(f"latency p50 {latencies[len(latencies) // 2] * 1000:.0f} ms, "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.0f} ms, max {latencies[-1] * 1000:.0f} ms")
+    print(f"{results['rejected']} answered 429, {results['errors']} failed")
+    return 1 if results["errors"] or rps < args.min_rps else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""Benchmark the report folder: compacting past months into bundles and finding a report by patient and day.
+
+Writes --reports report PDFs, copies of a few rendered reports, straight
+into a scratch izvestaji/ as older versions did, spread over --months months
+up to now. The folder is compacted once, timed, leaving the last few months
+as files, then random reports are looked up by patient and day and read,
+first with every bundle index still to load and then with them loaded. The
+run exits with status 1 if a report went missing or read back wrong, or if
+the 99th percentile of a lookup exceeds --max-lookup-p99-ms.
+
+Usage (from src/): python -m benchmarks.bench_report_files [--reports 50000] [--months 36]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import report_engine
+import report_files
+from benchmarks.bench_report_store import percentiles, synthetic_report
+from config_service import get_config
+
+# Distinct PDFs rendered; the folder holds copies of them
+TEMPLATES = 20
+
+
+def make_folder(folder, reports, months):
+    """Write reports PDFs into folder, oldest first. Returns (full name, day, file name) of each."""
+    report_engine.register_fonts()
+    renderer = report_engine.ReportRenderer(get_config())
+    templates = [renderer.render_bytes(synthetic_report(index))[0] for index in range(TEMPLATES)]
+
+    os.makedirs(folder)
+    first = date.today().replace(day=1) - timedelta(days=30 * (months - 1))
+    step = (date.today() - first).total_seconds() / reports
+    written = []
+    names = set()
+    for index in range(reports):
+        day = (datetime.combine(first, datetime.min.time()) + timedelta(seconds=step * index)).date()
+        full_name = synthetic_report(index)["full_name"]
+        name = f"{report_engine.file_stem(full_name)}_{day:%Y%m%d}.pdf"
+        if name in names:
+            name = f"{name[:-4]}_{index}.pdf"
+        names.add(name)
+        with open(os.path.join(folder, name), 'wb') as file:
+            file.write(templates[index % TEMPLATES])
+        written.append((full_name, day, name))
+    return written, templates
+
+def time_lookups(folder, sample, templates):
+    """Look up and read each (full name, day, file name) of sample. Returns (times, reports not found as written)."""
+    times = []
+    missing = 0
+    for full_name, day, name in sample:
+        start = time.perf_counter()
+        paths = report_files.find_reports(folder, day, day, full_name)
+        found = [path for path in paths if os.path.basename(path) == name]
+        data = report_files.read_report(found[0]) if found else None
+        times.append(time.perf_counter() - start)
+        if data not in templates:
+            missing += 1
+    return times, missing
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark compacting the report folder and finding reports in it.")
+    parser.add_argument("--reports", type=int, default=50000, help="Report PDFs in the folder")
+    parser.add_argument("--months", type=int, default=36, help="Months the reports are spread over")
+    parser.add_argument("--lookups", type=int, default=1000, help="Reports looked up by patient and day")
+    parser.add_argument("--max-lookup-p99-ms", type=float, default=5.0, help="Allowed 99th percentile per lookup")
+    args = parser.parse_args(argv)
+
+    random.seed(0)
+    folder = os.path.join(tempfile.mkdtemp(), report_files.REPORTS_FOLDER)
+    start = time.perf_counter()
+    written, templates = make_folder(folder, args.reports, args.months)
+    size = sum(entry.stat().st_size for entry in os.scandir(folder))
+    print(f"Wrote {len(written)} reports in {time.perf_counter() - start:.1f} s ({size / 1e6:.1f} MB)")
+
+    start = time.perf_counter()
+    moved, packed = report_files.compact(folder)
+    elapsed = time.perf_counter() - start
+    bundles = [bundle for _, _, _, bundle in report_files._months(folder) if bundle]
+    bundled = sum(os.path.getsize(bundle) for bundle in bundles)
+    print(f"compact  {moved} moved, {packed} packed into {len(bundles)} bundles in {elapsed:.1f} s "
+          f"({packed / elapsed:.0f} reports/s, bundles {bundled / 1e6:.1f} MB)")
+
+    sample = random.sample(written, min(args.lookups, len(written)))
+    report_files._indexes.clear()
+    report_files._listings.clear()
+    cold_times, cold_missing = time_lookups(folder, sample, templates)
+    p50, p99 = percentiles(cold_times)
+    print(f"lookup   {len(cold_times):6} reports, indexes loading: p50 {p50:6.2f} ms, p99 {p99:6.2f} ms")
+    times, missing = time_lookups(folder, sample, templates)
+    p50, p99 = percentiles(times)
+    print(f"lookup   {len(times):6} reports, indexes loaded:  p50 {p50:6.2f} ms, p99 {p99:6.2f} ms")
+
+    found = len(report_files.find_reports(folder))
+    print(f"{found} reports found in the folder, {cold_missing + missing} lookups missed")
+    return 1 if cold_missing or missing or found != len(written) or p99 > args.max_lookup_p99_ms else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""Benchmark the stored report records: appending, reading one back by its locator, and scanning them all.
+
+Stores --reports synthetic reports over twelve monthly segments, timing the
+last --timed appends (each one fsynced, as after a generated report), then
+reads random reports back by locator and finally scans every record, as
+the phrase index does when it is rebuilt. The run exits with status 1 if
+the 99th percentile of a read by locator exceeds --max-read-p99-ms.
+
+Usage (from src/): python -m benchmarks.bench_report_store [--reports 50000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import report_store
+from benchmarks.bench_archive import WORDS
+
+
+def synthetic_report(index):
+    return {
+        "full_name": f"Pacijent {index % 5000}",
+        "birth_date": "01-01-1980",
+        "jmbg": f"{index % 5000:013d}",
+        "pages": [{
+            "dg": " ".join(random.choices(WORDS, k=5)),
+            "diagnosis": " ".join(random.choices(WORDS, k=random.randint(20, 200))),
+            "date": f"{1 + index % 28:02d}-{1 + index % 12:02d}-2024",
+        } for _ in range(random.choice((1, 1, 1, 2, 3)))],
+    }
+
+def percentiles(times):
+    times = sorted(times)
+    return times[len(times) // 2] * 1000, times[int(len(times) * 0.99)] * 1000
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the stored report records.")
+    parser.add_argument("--reports", type=int, default=50000, help="Reports stored")
+    parser.add_argument("--timed", type=int, default=200, help="Appends timed one by one, with fsync")
+    parser.add_argument("--reads", type=int, default=2000, help="Reports read back by locator")
+    parser.add_argument("--max-read-p99-ms", type=float, default=2.0, help="Allowed 99th percentile per read")
+    args = parser.parse_args(argv)
+
+    random.seed(0)
+    folder = os.path.join(tempfile.mkdtemp(), report_store.RECORDS_FOLDER)
+    bulk = max(0, args.reports - args.timed)
+
+    # The bulk of the reports is written frame by frame without fsync, month by month
+    start = time.perf_counter()
+    locators = []
+    os.makedirs(folder)
+    for month in range(12):
+        when = datetime(2024, month + 1, 1)
+        name = report_store.segment_name(when)
+        with open(os.path.join(folder, name), 'ab') as file:
+            for index in range(month * bulk // 12, (month + 1) * bulk // 12):
+                locators.append(report_store.format_locator(name, file.tell()))
+                file.write(report_store.encode_frame({
+                    "v": report_store.FORMAT_VERSION, "created_at": when.isoformat(), "pdf_path": None,
+                    "report": synthetic_report(index),
+                }))
+    size = sum(entry.stat().st_size for entry in os.scandir(folder))
+    print(f"Stored {bulk} reports in {time.perf_counter() - start:.1f} s ({size / 1e6:.1f} MB, "
+          f"{size / max(bulk, 1):.0f} bytes per report)")
+
+    times = []
+    for index in range(bulk, args.reports):
+        report = synthetic_report(index)
+        start = time.perf_counter()
+        locators.append(report_store.append_record(report, folder=folder))
+        times.append(time.perf_counter() - start)
+    if times:
+        p50, p99 = percentiles(times)
+        print(f"append   {len(times):6} reports: p50 {p50:6.2f} ms, p99 {p99:6.2f} ms")
+
+    times = []
+    for locator in random.sample(locators, min(args.reads, len(locators))):
+        start = time.perf_counter()
+        report_store.read_record(locator, folder)
+        times.append(time.perf_counter() - start)
+    read_p50, read_p99 = percentiles(times)
+    print(f"read     {len(times):6} reports: p50 {read_p50:6.2f} ms, p99 {read_p99:6.2f} ms")
+
+    start = time.perf_counter()
+    count = sum(1 for _ in report_store.iter_records(folder))
+    elapsed = time.perf_counter() - start
+    print(f"scan     {count:6} reports in {elapsed:.2f} s ({count / elapsed:.0f} reports/s)")
+    return 1 if read_p99 > args.max_read_p99_ms or count != len(locators) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
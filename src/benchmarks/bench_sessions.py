@@ -0,0 +1,150 @@
+"""Memory regression check for opening and closing patient sessions, and for keeping many open.
+
+Opens a page window in the session window, types into it, lets the preview
+draw, then closes the tab, many times over. The resident set size after a
+warm-up is compared with the one at the end. Then --open tabs are opened and
+kept, and each is shown in turn: only the last sessions.LIVE_SESSIONS used
+may keep a page window, and every tab must show its text again when it is
+built again. The run exits with status 1 if the RSS grew by more than
+--max-growth-mb over the cycles, if Qt's font database grew at all, or if
+the kept tabs hold more page windows or lost text. Runs on the offscreen Qt
+platform.
+
+Usage (from src/): python -m benchmarks.bench_sessions [--cycles 500] [--warmup 50] [--open 40]
+"""
+import argparse
+import ctypes
+import gc
+import logging
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import QCoreApplication, QEvent
+from PyQt5.QtGui import QFontDatabase
+from PyQt5.QtWidgets import QApplication
+
+import drafts
+import main as app_main
+import sessions
+
+
+def rss_bytes():
+    """Resident set size of this process."""
+    if sys.platform == "win32":
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in (
+                    "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                    "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        ctypes.windll.psapi.GetProcessMemoryInfo(
+            ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb)
+        return counters.WorkingSetSize
+    with open("/proc/self/statm") as file:
+        return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+def settle(app):
+    """Run pending events, deferred deletes and the garbage collector, and hand freed heap back to the system."""
+    app.processEvents()
+    QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+    app.processEvents()
+    gc.collect()
+    if sys.platform.startswith("linux"):
+        # glibc keeps freed memory in the process; without this, RSS shows the high-water mark
+        try:
+            ctypes.CDLL("libc.so.6").malloc_trim(0)
+        except (OSError, AttributeError):
+            pass
+
+def diagnosis_text(cycle):
+    return "\n".join(f"{cycle} {line:03d} Pacijent se javlja na kontrolu, TA 130/85 mmHg." for line in range(40))
+
+def open_session(app, window, cycle):
+    window.name_edit.setPlainText(f"Pacijent {cycle}")
+    page_window = window.open_page_window()
+    page_window.text_inputs[0].setPlainText("I10 Hipertenzija arterialis essentialis")
+    page_window.diagnosis_inputs[0].setPlainText(diagnosis_text(cycle))
+    page_window.preview.refresh()
+    app.processEvents()
+    return page_window
+
+def run_cycle(app, window, cycle):
+    page_window = open_session(app, window, cycle)
+    session_window = window.session_window
+    session_window.close_session(session_window.index_of(page_window))
+    settle(app)
+
+def keep_open(app, window, count):
+    """Open count tabs and show each in turn. Returns (RSS per tab in bytes, most page windows built, tabs that lost text)."""
+    start_rss = rss_bytes()
+    for cycle in range(count):
+        open_session(app, window, cycle)
+    settle(app)
+    session_window = window.session_window
+    most_built = lost = 0
+    for index in range(count):
+        session_window.tabs.setCurrentIndex(index)
+        settle(app)
+        most_built = max(most_built, sum(session.page_window is not None for session in session_window.sessions()))
+        if session_window.tabs.widget(index).page_window.diagnosis_inputs[0].toPlainText() != diagnosis_text(index):
+            lost += 1
+    rss_per_tab = (rss_bytes() - start_rss) / count
+    while session_window.tabs.count():
+        session_window.close_session(0)
+    settle(app)
+    return rss_per_tab, most_built, lost
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that opening and closing sessions does not leak memory.")
+    parser.add_argument("--cycles", type=int, default=500, help="Sessions opened and closed after the warm-up")
+    parser.add_argument("--warmup", type=int, default=50, help="Cycles run before the first measurement")
+    parser.add_argument("--max-growth-mb", type=float, default=8.0, help="Allowed RSS growth over all cycles")
+    parser.add_argument("--open", type=int, default=40, help="Tabs kept open at once after the cycles")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)
+    app = QApplication.instance() or QApplication([])
+
+    # The closed sessions leave their journals in a scratch folder
+    drafts.DRAFTS_FOLDER = tempfile.mkdtemp()
+
+    window = app_main.MainWindow()
+    for cycle in range(args.warmup):
+        run_cycle(app, window, cycle)
+    drafts.wait_for_writes()
+    settle(app)
+    start_rss = rss_bytes()
+    start_families = len(QFontDatabase().families())
+
+    start_time = time.perf_counter()
+    for cycle in range(args.cycles):
+        run_cycle(app, window, args.warmup + cycle)
+        if cycle % 100 == 99:
+            print(f"{cycle + 1:5d} cycles  RSS {rss_bytes() / 2**20:8.1f} MB")
+    drafts.wait_for_writes()
+    settle(app)
+    elapsed_s = time.perf_counter() - start_time
+
+    growth_mb = (rss_bytes() - start_rss) / 2**20
+    font_families = len(QFontDatabase().families()) - start_families
+    print(f"{args.cycles} open/close cycles in {elapsed_s:.1f} s ({elapsed_s / args.cycles * 1000:.1f} ms each)")
+    print(f"RSS growth: {growth_mb:+.1f} MB (allowed {args.max_growth_mb} MB)")
+    print(f"Font families added: {font_families}")
+
+    rss_per_tab, most_built, lost = keep_open(app, window, args.open)
+    drafts.wait_for_writes()
+    print(f"{args.open} tabs kept open: {rss_per_tab / 2**10:.0f} KB each, at most {most_built} page windows built "
+          f"(allowed {sessions.LIVE_SESSIONS}), {lost} lost their text")
+    ok = most_built <= sessions.LIVE_SESSIONS and not lost
+    return 0 if ok and growth_mb <= args.max_growth_mb and font_families == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
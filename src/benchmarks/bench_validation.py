@@ -0,0 +1,82 @@
+"""Benchmark word-split validation while typing into a long document.
+
+Compares a full-document check (toPlainText and every line measured on every
+textChanged) with the incremental WordSplitValidator on a 10k-line input.
+Runs on the offscreen Qt platform.
+
+Usage (from src/): python -m benchmarks.bench_validation [--lines 10000] [--keystrokes 200]
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication, QTextEdit
+
+import text_layout
+from line_validator import WordSplitValidator
+from report_engine import DEFAULT_TEXT_FONT, DIAGNOSIS_FONT_SIZE, diagnosis_text_width
+
+
+def full_check(text_edit):
+    """Check the whole document, as PageWindow did on every textChanged signal before the validator."""
+    return text_layout.splits_words(text_edit.toPlainText(), DEFAULT_TEXT_FONT, DIAGNOSIS_FONT_SIZE,
+                                    diagnosis_text_width())
+
+def sample_text(lines):
+    line = "Pacijent se javlja zbog bolova u grudima, upucen na dalju dijagnostiku."
+    return '\n'.join(f"{index:05d} {line}" for index in range(lines))
+
+def time_keystrokes(text_edit, keystrokes):
+    """Type characters in the middle of the document; returns mean ms per keystroke."""
+    cursor = text_edit.textCursor()
+    cursor.setPosition(len(text_edit.toPlainText()) // 2)
+    start = time.perf_counter()
+    for _ in range(keystrokes):
+        cursor.insertText("a")
+        cursor.deletePreviousChar()
+    return (time.perf_counter() - start) / (keystrokes * 2) * 1000
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark word-split validation.")
+    parser.add_argument("--lines", type=int, default=10000, help="Lines in the test document")
+    parser.add_argument("--keystrokes", type=int, default=200, help="Keystrokes to time")
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication([])
+    text = sample_text(args.lines)
+
+    # Qt's own cost of the edit, without any validation
+    plain_edit = QTextEdit()
+    plain_edit.setPlainText(text)
+    baseline_ms = time_keystrokes(plain_edit, args.keystrokes)
+
+    legacy_edit = QTextEdit()
+    legacy_edit.setPlainText(text)
+    legacy_edit.textChanged.connect(lambda: full_check(legacy_edit))
+    legacy_ms = time_keystrokes(legacy_edit, args.keystrokes)
+
+    incremental_edit = QTextEdit()
+    incremental_edit.setPlainText(text)
+    start = time.perf_counter()
+    validator = WordSplitValidator(incremental_edit, DEFAULT_TEXT_FONT, DIAGNOSIS_FONT_SIZE, diagnosis_text_width())
+    initial_ms = (time.perf_counter() - start) * 1000
+    incremental_ms = time_keystrokes(incremental_edit, args.keystrokes)
+
+    start = time.perf_counter()
+    for _ in range(10000):
+        validator.has_error
+    query_us = (time.perf_counter() - start) / 10000 * 1e6
+
+    print(f"Document: {args.lines} lines, {len(text)} characters")
+    print(f"Qt edit alone:                {baseline_ms:8.3f} ms/keystroke")
+    print(f"Full check per keystroke:     {legacy_ms:8.3f} ms/keystroke")
+    print(f"Incremental validator:        {incremental_ms:8.3f} ms/keystroke")
+    print(f"Validation overhead:          {legacy_ms - baseline_ms:8.3f} -> {incremental_ms - baseline_ms:.3f} ms")
+    print(f"Validator initial scan:       {initial_ms:8.3f} ms")
+    print(f"Error state query:            {query_us:8.3f} us")
+    app.processEvents()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""Benchmark suite for the rendering and validation hot paths, with a stored baseline.
+
+Each benchmark runs on short, medium and long (multi-page) reports on the
+offscreen Qt platform. The best time of every benchmark is compared with
+benchmarks/baseline.json; a result slower than the baseline by more than its
+threshold is reported as a regression and makes the run exit with status 1.
+The best of several runs is far less affected by other load on the machine
+than the mean or median.
+
+Usage (from src/):
+    python -m benchmarks.suite                    # compare with the baseline
+    python -m benchmarks.suite --save-baseline    # record a new baseline on this machine
+    python -m benchmarks.suite --filter draw_ --repeat 30
+"""
+import argparse
+import io
+import itertools
+import json
+import logging
+import math
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication, QTextEdit
+
+import report_engine
+import preview
+from line_validator import WordSplitValidator
+from pdf_worker import PdfJob
+from benchmarks.bench_forms import CONFIG
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Allowed slowdown against the baseline best time before a result counts as a regression
+DEFAULT_THRESHOLD = 0.25
+
+# Differences below this are timer noise, whatever the ratio
+MIN_REGRESSION_MS = 0.05
+
+# Fast benchmarks are run this many milliseconds per sample, so timer resolution and
+# scheduling jitter don't dominate
+MIN_SAMPLE_MS = 5.0
+
+# Times a suspected regression is measured again before it is reported
+CONFIRM_RUNS = 2
+
+# Stop repeating a benchmark once it has run this long (but at least MIN_RUNS times)
+TIME_BUDGET_S = 3.0
+MIN_RUNS = 3
+
+# Report sizes: entries, DG lines and diagnosis lines per entry
+SIZES = {
+    "short": (1, 1, 5),
+    "medium": (3, 3, 60),
+    "long": (10, 6, 400),
+}
+
+DG_LINE = "I10 Hipertenzija arterialis essentialis, E11.9 Diabetes mellitus tip 2 bez komplikacija"
+DIAGNOSIS_LINE = "Pacijent se javlja na kontrolu, TA 130/85 mmHg, puls 72/min, terapija bez izmena."
+
+
+def sample_record(size):
+    entries, dg_lines, diagnosis_lines = SIZES[size]
+    return report_engine.normalize_record({
+        "full_name": "Pera Perić",
+        "birth_date": "01-02-1980",
+        "jmbg": "0102980710000",
+        "pages": [{
+            "dg": "\n".join(DG_LINE[:40 + 10 * line] for line in range(dg_lines)),
+            "diagnosis": "\n".join(f"{line:03d}\t{DIAGNOSIS_LINE}" for line in range(diagnosis_lines)),
+            "date": "21-10-2024",
+        } for _ in range(entries)],
+    })
+
+def new_flow(renderer, record, start=True):
+    """A flow on a canvas writing to memory, with its first sheet started."""
+    from reportlab.pdfgen import canvas
+    pdf_canvas = canvas.Canvas(io.BytesIO(), pagesize=report_engine.A4)
+    flow = report_engine.PageFlow(renderer, pdf_canvas, record)
+    if start:
+        flow.start_page()
+    return flow
+
+def page_count(renderer, record):
+    flow = new_flow(renderer, record, start=False)
+    for page in record["pages"]:
+        renderer.draw_entry(flow, page)
+    return flow.page_count
+
+
+def bench_draw_dg_table(renderer, record):
+    def setup():
+        return new_flow(renderer, record)
+    def run(flow):
+        for page in record["pages"]:
+            renderer.draw_dg_table(flow, page["dg"])
+    return setup, run
+
+def bench_draw_diagnosis_content(renderer, record):
+    def setup():
+        return new_flow(renderer, record)
+    def run(flow):
+        for page in record["pages"]:
+            renderer.draw_diagnosis_content(flow, page["diagnosis"])
+    return setup, run
+
+def bench_draw_header_footer(renderer, record):
+    # As many sheets as the rendered report has
+    sheets = page_count(renderer, record)
+
+    def setup():
+        return new_flow(renderer, record)
+    def run(flow):
+        for _ in range(sheets):
+            flow.pdf_canvas.showPage()
+            renderer.draw_header(flow.pdf_canvas, report_engine.A4[1] - 30)
+            flow.y_position = 300
+            renderer.draw_footer(flow, record["pages"][0]["date"])
+    return setup, run
+
+def bench_validate_input(record):
+    """Initial scan of a pasted diagnosis plus a keystroke in its middle, as PageWindow validates it."""
+    text = "\n".join(page["diagnosis"] for page in record["pages"])
+
+    def setup():
+        text_edit = QTextEdit()
+        text_edit.setPlainText(text)
+        return text_edit
+    def run(text_edit):
+        validator = WordSplitValidator(text_edit, report_engine.DEFAULT_TEXT_FONT, report_engine.DIAGNOSIS_FONT_SIZE,
+                                       report_engine.diagnosis_text_width())
+        cursor = text_edit.textCursor()
+        cursor.setPosition(len(text) // 2)
+        cursor.insertText("a")
+        cursor.deletePreviousChar()
+        validator.deleteLater()
+    return setup, run
+
+def bench_preview_edit(record):
+    """Preview redraw after a keystroke at the end of the first entry: layout and the one sheet that changed."""
+    renderer = report_engine.ReportRenderer(CONFIG, use_forms=False)
+    page = record["pages"][0]
+    keystrokes = itertools.count()
+
+    def setup():
+        edited_page = dict(page, diagnosis=f"{page['diagnosis']} {next(keystrokes)}")
+        return dict(record, pages=[edited_page])
+    def run(entry_record):
+        sheets = preview.layout_entry(renderer, entry_record)
+        preview.paint_sheet(sheets[-1])
+    return setup, run
+
+def bench_generate_pdf(record, output_folder):
+    """What generate_pdf hands to the worker: fonts, PDF, stored record and archive entry."""
+    pdf_file_name = os.path.join(output_folder, "bench.pdf")
+
+    def setup():
+        return PdfJob(record, CONFIG, pdf_file_name, open_when_done=False, use_cache=False)
+    def run(job):
+        job.run()
+        # Publishing never overwrites; free the name so every run saves under the same one
+        os.remove(job.pdf_file_name)
+    return setup, run
+
+def bench_generate_pdf_cached(record, output_folder):
+    """generate_pdf clicked again for the same report: the PDF comes from the render cache."""
+    pdf_file_name = os.path.join(output_folder, "bench.pdf")
+
+    def setup():
+        return PdfJob(record, CONFIG, pdf_file_name, open_when_done=False)
+    def run(job):
+        job.run()
+        os.remove(job.pdf_file_name)
+    return setup, run
+
+
+def measure(setup, run, repeat):
+    """Median and minimum milliseconds of run(setup()), timing only run."""
+    # The warm-up run also decides how many calls make up one sample
+    state = setup()
+    start = time.perf_counter()
+    run(state)
+    number = max(1, math.ceil(MIN_SAMPLE_MS / max((time.perf_counter() - start) * 1000, 1e-3)))
+
+    times = []
+    deadline = time.perf_counter() + TIME_BUDGET_S
+    while len(times) < repeat and (len(times) < MIN_RUNS or time.perf_counter() < deadline):
+        states = [setup() for _ in range(number)]
+        start = time.perf_counter()
+        for state in states:
+            run(state)
+        times.append((time.perf_counter() - start) * 1000 / number)
+    return {"median_ms": statistics.median(times), "min_ms": min(times), "runs": len(times), "number": number}
+
+def benchmarks(output_folder):
+    """(name, setup, run) for every benchmark of the suite."""
+    renderer = report_engine.ReportRenderer(CONFIG)
+    for size in SIZES:
+        record = sample_record(size)
+        yield f"draw_dg_table/{size}", *bench_draw_dg_table(renderer, record)
+        yield f"draw_diagnosis_content/{size}", *bench_draw_diagnosis_content(renderer, record)
+        yield f"draw_header_footer/{size}", *bench_draw_header_footer(renderer, record)
+        yield f"validate_input/{size}", *bench_validate_input(record)
+        yield f"preview_edit/{size}", *bench_preview_edit(record)
+        yield f"generate_pdf/{size}", *bench_generate_pdf(record, output_folder)
+        yield f"generate_pdf_cached/{size}", *bench_generate_pdf_cached(record, output_folder)
+
+def compare(results, baseline, threshold):
+    """Compare results with a baseline. Returns (name, status, ratio) per benchmark."""
+    rows = []
+    for name, result in results.items():
+        reference = baseline.get("results", {}).get(name)
+        if reference is None:
+            rows.append((name, "new", None))
+            continue
+        allowed = baseline.get("thresholds", {}).get(name, threshold)
+        ratio = result["min_ms"] / reference["min_ms"]
+        slower_ms = result["min_ms"] - reference["min_ms"]
+        if ratio > 1 + allowed and slower_ms > MIN_REGRESSION_MS:
+            rows.append((name, "REGRESSION", ratio))
+        elif ratio < 1 - allowed:
+            rows.append((name, "faster", ratio))
+        else:
+            rows.append((name, "ok", ratio))
+    return rows
+
+def machine_info():
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "python": platform.python_version(),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the benchmark suite and compare it with the baseline.")
+    parser.add_argument("--repeat", type=int, default=15, help="Timed runs per benchmark")
+    parser.add_argument("--filter", default="", help="Only run benchmarks whose name contains this text")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown as a fraction of the baseline (default: 0.25)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)
+    app = QApplication.instance() or QApplication([])
+    report_engine.register_fonts()
+    # The preview loads its Qt fonts relative to the working directory, which changes below
+    for font_name in ("NotoSansMono", "NotoSansMono-Bold"):
+        preview.qt_family(font_name)
+
+    # The stored records, the archive and the render cache go to a scratch folder
+    output_folder = tempfile.mkdtemp()
+    os.environ["DOCTORREPORT_ARCHIVE_DB"] = os.path.join(output_folder, "arhiva.db")
+    os.chdir(output_folder)
+
+    suite = {name: (setup, run) for name, setup, run in benchmarks(output_folder) if args.filter in name}
+    results = {}
+    for name, (setup, run) in suite.items():
+        results[name] = measure(setup, run, args.repeat)
+        app.processEvents()
+
+    if args.save_baseline:
+        thresholds = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as file:
+                thresholds = json.load(file).get("thresholds", {})
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            json.dump({"machine": machine_info(), "thresholds": thresholds, "results": results}, file, indent=4)
+            file.write("\n")
+        for name, result in results.items():
+            print(f"{name:34} {result['min_ms']:10.3f} ms (median {result['median_ms']:.3f})")
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)
+        if baseline.get("machine") != machine_info():
+            print("Note: the baseline was recorded on a different machine or Python version.")
+
+    # A burst of load elsewhere on the machine can slow a whole measurement down;
+    # a regression counts only if measuring again confirms it
+    for _ in range(CONFIRM_RUNS):
+        suspects = [name for name, status, _ in compare(results, baseline, args.threshold) if status == "REGRESSION"]
+        for name in suspects:
+            setup, run = suite[name]
+            result = measure(setup, run, args.repeat)
+            if result["min_ms"] < results[name]["min_ms"]:
+                results[name] = result
+
+    rows = compare(results, baseline, args.threshold)
+    print(f"{'benchmark':34} {'best ms':>10} {'baseline':>10} {'ratio':>7}  status")
+    for name, status, ratio in rows:
+        reference = baseline.get("results", {}).get(name, {}).get("min_ms")
+        reference_text = f"{reference:10.3f}" if reference is not None else f"{'-':>10}"
+        ratio_text = f"{ratio:7.2f}" if ratio is not None else f"{'-':>7}"
+        print(f"{name:34} {results[name]['min_ms']:10.3f} {reference_text} {ratio_text}  {status}")
+
+    regressions = [name for name, status, _ in rows if status == "REGRESSION"]
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
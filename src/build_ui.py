@@ -0,0 +1,55 @@
+"""Compile the Qt Designer .ui files into Python modules.
+
+The windows import the generated ui_*.py modules instead of parsing the .ui
+files with uic.loadUi at startup. Run this after editing a .ui file:
+
+    cd src
+    python build_ui.py
+"""
+import os
+import sys
+from PyQt5 import uic
+
+# .ui file -> generated module
+UI_MODULES = {
+    'main_window.ui': 'ui_main_window.py',
+    'page_window.ui': 'ui_page_window.py',
+}
+
+
+def build(source_dir):
+    """Regenerate every module in UI_MODULES from its .ui file."""
+    # Compile from inside source_dir so the generated headers name the .ui file, not a local path
+    cwd = os.getcwd()
+    os.chdir(source_dir)
+    try:
+        for ui_file, module_file in UI_MODULES.items():
+            with open(module_file, 'w', encoding='utf-8') as module:
+                uic.compileUi(ui_file, module)
+            print(f"{ui_file} -> {module_file}")
+    finally:
+        os.chdir(cwd)
+
+def stale_modules(source_dir):
+    """Generated modules that are missing or older than their .ui file."""
+    stale = []
+    for ui_file, module_file in UI_MODULES.items():
+        module_path = os.path.join(source_dir, module_file)
+        if not os.path.exists(module_path) or \
+                os.path.getmtime(module_path) < os.path.getmtime(os.path.join(source_dir, ui_file)):
+            stale.append(module_file)
+    return stale
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    source_dir = os.path.dirname(os.path.abspath(__file__))
+    if "--check" in argv:
+        stale = stale_modules(source_dir)
+        for module_file in stale:
+            print(f"{module_file} is out of date, run build_ui.py")
+        return 1 if stale else 0
+    build(source_dir)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+import logging
+import os
+import json
+import threading
+from resources import resource_path
+
+# Keys config.json must have; each holds a non-empty list of lines of this type
+CONFIG_SCHEMA = {
+    "header": str,
+    "footer": str,
+}
+
+# Optional "text_font": font family of the DG and diagnosis text, one of these
+TEXT_FONTS = ("NotoSansMono", "NotoSans")
+DEFAULT_TEXT_FONT = "NotoSansMono"
+
+# File stamp before the first load, so that a missing file is also "unchanged" after one attempt
+_NOT_LOADED = object()
+
+# Service for the bundled config.json, created on first use
+_default_service = None
+
+
+class ConfigError(ValueError):
+    """The configuration file is missing, unreadable or does not match CONFIG_SCHEMA."""
+
+
+def validate_config(data):
+    """Check parsed config.json data against CONFIG_SCHEMA. Returns the data, raises ConfigError."""
+    if not isinstance(data, dict):
+        raise ConfigError("Configuration must be a JSON object")
+
+    for key, item_type in CONFIG_SCHEMA.items():
+        lines = data.get(key)
+        if not isinstance(lines, list) or not lines:
+            raise ConfigError(f'"{key}" must be a non-empty list of lines')
+        for number, line in enumerate(lines, start=1):
+            if not isinstance(line, item_type):
+                raise ConfigError(f'"{key}" line {number} must be a string')
+
+    if data.get("text_font", DEFAULT_TEXT_FONT) not in TEXT_FONTS:
+        raise ConfigError(f'"text_font" must be one of: {", ".join(TEXT_FONTS)}')
+
+    unknown_keys = sorted(set(data) - set(CONFIG_SCHEMA) - {"text_font"})
+    if unknown_keys:
+        logging.warning(f"Unknown configuration keys ignored: {', '.join(unknown_keys)}")
+    return data
+
+def read_config(config_path):
+    """Parse and validate a configuration file. Raises ConfigError."""
+    try:
+        with open(config_path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+    except FileNotFoundError:
+        raise ConfigError(f"Configuration file not found: {config_path}")
+    except json.JSONDecodeError as e:
+        raise ConfigError(f"Error decoding {config_path}: {e}")
+    except (OSError, UnicodeDecodeError) as e:
+        raise ConfigError(f"Cannot read {config_path}: {e}")
+    return validate_config(data)
+
+
+class ConfigService:
+    """The parsed configuration file, cached on its modification time and size.
+
+    get() re-reads the file only after it changed on disk. When the new
+    content is invalid the last valid config stays in use and the problem is
+    kept in `error`. The returned dict is shared and must not be modified.
+    """
+
+    def __init__(self, config_path=None):
+        self.config_path = config_path or resource_path('config.json')
+        self.error = None
+        self._config = None
+        self._stamp = _NOT_LOADED
+        self._lock = threading.Lock()
+
+    def file_stamp(self):
+        try:
+            stat = os.stat(self.config_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self):
+        """The current config. Raises ConfigError if no valid config could be loaded yet."""
+        with self._lock:
+            stamp = self.file_stamp()
+            if stamp != self._stamp:
+                self._load(stamp)
+            if self._config is None:
+                raise ConfigError(self.error)
+            return self._config
+
+    def reload(self):
+        """Re-read the file if it changed on disk. Returns True when a different valid config was loaded."""
+        with self._lock:
+            stamp = self.file_stamp()
+            if stamp == self._stamp:
+                return False
+            return self._load(stamp)
+
+    def _load(self, stamp):
+        self._stamp = stamp
+        try:
+            config = read_config(self.config_path)
+        except ConfigError as e:
+            self.error = str(e)
+            if self._config is None:
+                logging.error(self.error)
+            else:
+                logging.error(f"{self.error}; keeping the previous configuration")
+            return False
+
+        self.error = None
+        changed = config != self._config
+        if changed:
+            logging.info(f"Configuration loaded from {self.config_path}")
+            self._config = config
+        return changed
+
+
+def default_service():
+    """The shared service for config.json next to the application."""
+    global _default_service
+    if _default_service is None:
+        _default_service = ConfigService()
+    return _default_service
+
+def get_config():
+    """The current config.json contents. Raises ConfigError if there is no valid config."""
+    return default_service().get()
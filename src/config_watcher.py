@@ -0,0 +1,43 @@
+import os
+from PyQt5.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+import report_engine
+
+
+class ConfigWatcher(QObject):
+    """Reloads the configuration file when it changes on disk, without restarting the app."""
+
+    configChanged = pyqtSignal(dict)  # the newly loaded config
+    configError = pyqtSignal(str)  # why the changed file was rejected
+
+    def __init__(self, service, parent=None, reload_delay_ms=200):
+        super().__init__(parent)
+        self.service = service
+
+        # Editors often save by replacing the file, which drops the watch on it;
+        # watching the folder as well notices the new file
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.addPath(os.path.dirname(os.path.abspath(service.config_path)))
+        self.watch_file()
+
+        # Saving may touch the file several times; reload once it settles
+        self.reload_timer = QTimer(self)
+        self.reload_timer.setSingleShot(True)
+        self.reload_timer.setInterval(reload_delay_ms)
+        self.reload_timer.timeout.connect(self.reload)
+        self.watcher.fileChanged.connect(self.reload_timer.start)
+        self.watcher.directoryChanged.connect(self.reload_timer.start)
+
+    def watch_file(self):
+        config_path = os.path.abspath(self.service.config_path)
+        if os.path.exists(config_path) and config_path not in self.watcher.files():
+            self.watcher.addPath(config_path)
+
+    def reload(self):
+        """Load the changed file and drop the header/footer layouts drawn from the old one."""
+        self.watch_file()
+        previous_error = self.service.error
+        if self.service.reload():
+            report_engine.clear_static_layouts()
+            self.configChanged.emit(self.service.get())
+        elif self.service.error and self.service.error != previous_error:
+            self.configError.emit(self.service.error)
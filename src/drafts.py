@@ -0,0 +1,230 @@
+"""Crash-safe journal of the reports being typed, so an unfinished report survives a crash or reboot.
+
+Each open page window appends to its own journal in drafts/. The first
+record holds the patient data and the text of every field; each later one
+is an edit of one field (position, number of characters removed, text
+inserted). Edits are collected while the user types and written in one
+batch when typing pauses, then fsynced, on a background thread. Generating
+the report compacts the journal into a single start record.
+A journal whose last line was cut short by a crash is read up to that line.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from PyQt5.QtCore import QObject, QTimer
+
+# Folder holding the journals, relative to the working directory like records/ and izvestaji/
+DRAFTS_FOLDER = "drafts"
+
+# Write pending edits once typing pauses this long, but never hold them longer than the maximum
+WRITE_DELAY_MS = 500
+MAX_WRITE_DELAY_MS = 3000
+
+# Journals are written in order on one background thread
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _writer():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="drafts")
+        return _executor
+
+def wait_for_writes():
+    """Block until every journal write queued so far is on disk."""
+    _writer().submit(lambda: None).result()
+
+
+def text_delta(old_text, new_text):
+    """The single edit turning old_text into new_text: (position, characters removed, text inserted)."""
+    prefix = len(os.path.commonprefix([old_text, new_text]))
+    # The common suffix may not overlap the common prefix
+    limit = min(len(old_text), len(new_text)) - prefix
+    suffix = len(os.path.commonprefix([old_text[::-1][:limit], new_text[::-1][:limit]]))
+    return prefix, len(old_text) - prefix - suffix, new_text[prefix:len(new_text) - suffix]
+
+def apply_record(state, record):
+    """Apply one journal record to a draft state (see read_journal) in place."""
+    record_type = record.get("type")
+    if record_type == "start":
+        state.update({key: value for key, value in record.items() if key != "type"})
+        state["fields"] = dict(record.get("fields", {}))
+    elif record_type == "edit":
+        text = state["fields"].get(record["field"], "")
+        position = record["pos"]
+        state["fields"][record["field"]] = text[:position] + record["text"] + text[position + record["removed"]:]
+        state["generated"] = None
+    else:
+        raise ValueError(f"Unknown journal record type: {record_type!r}")
+
+def read_journal(path):
+    """Replay a journal. Returns the draft state, or None if the journal holds no usable draft.
+
+    The state is a dict with the patient data ('full_name', 'birth_date',
+    'jmbg'), 'num_pages', 'created', 'generated' (when the report was last
+    generated with no edits since, else None) and 'fields', the text of
+    each form field keyed by its object name.
+    """
+    state = None
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            for line_number, line in enumerate(file, start=1):
+                try:
+                    record = json.loads(line)
+                    if state is None:
+                        if record.get("type") != "start":
+                            raise ValueError("journal does not begin with a start record")
+                        state = {"generated": None}
+                    apply_record(state, record)
+                except (ValueError, KeyError, TypeError) as e:
+                    # A crash while appending leaves a partial last line; keep what came before it
+                    logging.warning(f"Draft journal {path} is damaged at line {line_number}: {e}")
+                    break
+    except OSError as e:
+        logging.error(f"Cannot read draft journal {path}: {e}")
+        return None
+    return state
+
+def has_text(fields):
+    """Whether anything was typed into the fields; the date pickers always hold a value and don't count."""
+    return any(text.strip() for name, text in fields.items() if not name.startswith("dateEdit"))
+
+def list_drafts(folder=DRAFTS_FOLDER):
+    """(path, state) of every journal in folder holding an unfinished report, oldest first."""
+    try:
+        paths = sorted(entry.path for entry in os.scandir(folder) if entry.name.endswith(".jsonl"))
+    except FileNotFoundError:
+        return []
+
+    drafts = []
+    for path in paths:
+        state = read_journal(path)
+        if state is None or state["generated"] or not has_text(state["fields"]):
+            # Nothing typed, or nothing since the report was generated: nothing to restore
+            discard_journal(path)
+        else:
+            drafts.append((path, state))
+    return drafts
+
+def discard_journal(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logging.error(f"Cannot remove draft journal {path}: {e}")
+
+def close_journal(path, state):
+    """Drop the journal of a draft state if nothing was typed, or nothing since the report was generated."""
+    if state["generated"] or not has_text(state["fields"]):
+        _writer().submit(discard_journal, path)
+
+def _append(path, lines):
+    try:
+        with open(path, 'a', encoding='utf-8') as file:
+            file.write("".join(lines))
+            file.flush()
+            os.fsync(file.fileno())
+    except OSError as e:
+        logging.error(f"Failed to write draft journal {path}: {e}")
+
+def _replace(path, lines):
+    """Write a journal to a temporary file and move it over the old one, so a crash keeps one of the two."""
+    temporary_path = f"{path}.tmp"
+    try:
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            file.write("".join(lines))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, path)
+    except OSError as e:
+        logging.error(f"Failed to compact draft journal {path}: {e}")
+
+def _line(record):
+    return json.dumps(record, ensure_ascii=False) + "\n"
+
+
+class DraftRecorder(QObject):
+    """Journals the DG, diagnosis and date fields of a page window as they are edited.
+
+    fields maps the object name of each field to a function returning its
+    current text and to the signal emitted when it changes. generated marks
+    a restored journal whose report was generated with no edits since.
+    """
+
+    def __init__(self, patient, fields, parent=None, path=None, created=None, generated=None):
+        super().__init__(parent)
+        self.patient = patient
+        self.fields = fields
+        self.created = created or datetime.now().isoformat(timespec="seconds")
+        self.path = path or os.path.join(
+            DRAFTS_FOLDER, f"draft-{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}-{id(self):x}.jsonl")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        # Text of each field as last written to the journal, and the fields changed since
+        self.written = {name: text() for name, (text, _) in fields.items()}
+        self.dirty = set()
+        self.first_dirty_time = None
+        self.generated = None
+
+        self.write_timer = QTimer(self)
+        self.write_timer.setSingleShot(True)
+        self.write_timer.setInterval(WRITE_DELAY_MS)
+        self.write_timer.timeout.connect(self.flush)
+        for name, (_, changed) in fields.items():
+            changed.connect(lambda *_, field=name: self.mark_dirty(field))
+
+        # A restored journal is compacted at once; a new one starts with the patient data
+        self.compact(generated=bool(generated))
+
+    def mark_dirty(self, field):
+        self.dirty.add(field)
+        now = time.monotonic()
+        if self.first_dirty_time is None:
+            self.first_dirty_time = now
+        if (now - self.first_dirty_time) * 1000 >= MAX_WRITE_DELAY_MS:
+            self.flush()
+        else:
+            self.write_timer.start()
+
+    def flush(self):
+        """Queue the edits made since the last write as one batch."""
+        self.write_timer.stop()
+        self.first_dirty_time = None
+        lines = []
+        for field in sorted(self.dirty):
+            text = self.fields[field][0]()
+            position, removed, inserted = text_delta(self.written[field], text)
+            if removed or inserted:
+                lines.append(_line({"type": "edit", "field": field, "pos": position,
+                                    "removed": removed, "text": inserted}))
+            self.written[field] = text
+        self.dirty.clear()
+        if lines:
+            self.generated = None
+            _writer().submit(_append, self.path, lines)
+
+    def snapshot(self):
+        return {
+            **self.patient,
+            "created": self.created,
+            "generated": self.generated,
+            "fields": dict(self.written),
+        }
+
+    def compact(self, generated=False):
+        """Replace the journal with one snapshot of the fields; generated marks the report as written."""
+        self.flush()
+        self.generated = datetime.now().isoformat(timespec="seconds") if generated else None
+        _writer().submit(_replace, self.path, [_line({"type": "start", **self.snapshot()})])
+
+    def close(self):
+        """Write pending edits; drop the journal if nothing was typed, or nothing since the report was generated."""
+        self.flush()
+        close_journal(self.path, self.snapshot())
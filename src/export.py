@@ -0,0 +1,343 @@
+"""Export the reports in izvestaji/ as one printable PDF or as a zip, e.g. at the end of the day.
+
+Reports are picked by the date in their file name (the day they were
+generated) and optionally by patient, in the month folders and in the
+bundles of older months (see report_files). Nothing is read whole: zip
+entries are copied from disk in chunks, and the merged PDF is written one
+object at a time from memory-mapped source files, with only a report from a
+bundle held in memory at a time, so memory use stays flat however many
+reports are exported. The output appears under its name only when complete.
+
+Usage: python export.py output.pdf|output.zip [--from yyyy-mm-dd] [--to yyyy-mm-dd]
+                        [--patient "Ime Prezime"] [--folder izvestaji]
+"""
+import sys
+import logging
+import os
+import re
+import time
+import zipfile
+import argparse
+from array import array
+from contextlib import contextmanager
+from datetime import datetime
+
+import report_files
+from report_files import find_reports
+
+# Object numbers of the page tree and catalog of a merged PDF; copied objects follow
+PAGES_ID = 1
+CATALOG_ID = 2
+
+# Page references written to the page tree per write call
+KIDS_CHUNK = 1024
+
+_STARTXREF = re.compile(rb"startxref\s+(\d+)")
+_OBJECT_HEADER = re.compile(rb"\s*(\d+)\s+(\d+)\s+obj\b")
+_XREF_SUBSECTION = re.compile(rb"\s*(\d+)\s+(\d+)[ \t]*\r?\n")
+
+# What matters while copying an object: strings and comments (skipped, they may hold anything),
+# indirect references (renumbered) and the start of stream data (copied as it is)
+_SCAN = re.compile(rb"[(%]|(?<![\w.#/+-])(\d+)\s+\d+\s+R(?!\w)|(?<![\w/])stream(?:\r\n|\r|\n)")
+
+
+def _reference(key):
+    return re.compile(rb"/" + key + rb"\s+(\d+)\s+\d+\s+R")
+
+_ROOT = _reference(rb"Root")
+_INFO = _reference(rb"Info")
+_PAGES = _reference(rb"Pages")
+_KIDS = re.compile(rb"/Kids\s*\[([^\]]*)\]")
+_REFERENCES = re.compile(rb"(\d+)\s+\d+\s+R")
+_PAGE_TREE_NODE = re.compile(rb"/Type\s*/Pages(?!\w)")
+_INHERITED_ATTRIBUTES = re.compile(rb"/(?:Resources|MediaBox|CropBox|Rotate)(?!\w)")
+
+
+@contextmanager
+def _output_file(path):
+    """Open a temporary file next to path for writing; it replaces path once the block succeeds."""
+    temporary_path = f"{path}.part"
+    try:
+        with open(temporary_path, 'wb') as file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+
+def write_zip(paths, output, folder, progress=None):
+    """Pack the PDFs at paths into a zip at output, named relative to folder. Returns the number packed.
+
+    The PDFs are compressed already, so they are stored as they are. Reports
+    inside a month's bundle are named as if they were in its month folder.
+    """
+    packed = 0
+    with _output_file(output) as file, zipfile.ZipFile(file, 'w', zipfile.ZIP_STORED, allowZip64=True) as bundle:
+        for index, path in enumerate(paths):
+            try:
+                if report_files.split_bundled(path):
+                    name = report_files.shard_path(folder, os.path.basename(path))
+                    bundle.writestr(os.path.relpath(name, folder), report_files.read_report(path))
+                else:
+                    bundle.write(path, os.path.relpath(path, folder))
+                packed += 1
+            except (OSError, KeyError, ValueError) as e:
+                logging.error(f"Cannot add {path} to the export: {e}")
+            if progress:
+                progress(index + 1, len(paths))
+    return packed
+
+
+class SourcePdf:
+    """The objects of one PDF with a classic cross-reference table, as written by ReportLab."""
+
+    def __init__(self, data):
+        self.data = data
+        tail_start = max(0, len(data) - 1024)
+        matches = list(_STARTXREF.finditer(data, tail_start))
+        if not matches:
+            raise ValueError("no startxref")
+        xref_offset = int(matches[-1].group(1))
+        if data[xref_offset:xref_offset + 4] != b"xref":
+            raise ValueError("cross-reference streams are not supported")
+
+        # Offsets of the objects in use, from every subsection of the table
+        self.offsets = {}
+        position = xref_offset + 4
+        while True:
+            match = _XREF_SUBSECTION.match(data, position)
+            if match is None:
+                break
+            first, count = int(match.group(1)), int(match.group(2))
+            position = match.end()
+            for number in range(first, first + count):
+                entry = data[position:position + 20]
+                if entry[17:18] == b"n":
+                    self.offsets[number] = int(entry[0:10])
+                position += 20
+
+        trailer_start = data.find(b"trailer", position)
+        if trailer_start == -1:
+            raise ValueError("no trailer")
+        trailer = data[trailer_start:matches[-1].start()]
+        if b"/Prev" in trailer or b"/Encrypt" in trailer:
+            raise ValueError("updated or encrypted PDFs are not supported")
+        self.root = int(_ROOT.search(trailer).group(1))
+        info = _INFO.search(trailer)
+        self.info = int(info.group(1)) if info else None
+
+        # Each object runs up to the next one, or to the table
+        ends = sorted(self.offsets.values()) + [xref_offset]
+        self.ends = {offset: ends[index + 1] for index, offset in enumerate(ends[:-1])}
+
+    def body(self, number):
+        """The bytes between "N G obj" and "endobj" of an object."""
+        offset = self.offsets[number]
+        header = _OBJECT_HEADER.match(self.data, offset)
+        if header is None or int(header.group(1)) != number:
+            raise ValueError(f"object {number} is not at its offset")
+        end = self.data.rfind(b"endobj", header.end(), self.ends[offset])
+        if end == -1:
+            raise ValueError(f"object {number} has no end")
+        return self.data[header.end():end].strip(b"\r\n")
+
+    def head(self, number):
+        """The dictionary of an object, without its stream data."""
+        body = self.body(number)
+        end = body.find(b"stream")
+        return body if end == -1 else body[:end]
+
+    def page_tree(self):
+        """Object numbers of the page tree nodes, and of the pages in reading order."""
+        nodes = []
+        pages = []
+
+        def visit(number):
+            head = self.head(number)
+            if not _PAGE_TREE_NODE.search(head):
+                pages.append(number)
+                return
+            if _INHERITED_ATTRIBUTES.search(head):
+                raise ValueError("page attributes inherited from the page tree are not supported")
+            nodes.append(number)
+            kids = _KIDS.search(head)
+            for kid in _REFERENCES.findall(kids.group(1) if kids else b""):
+                visit(int(kid))
+
+        visit(int(_PAGES.search(self.head(self.root)).group(1)))
+        return nodes, pages
+
+
+def _string_end(data, position):
+    """Position just past the literal string whose "(" ends right before position."""
+    depth = 1
+    while depth:
+        char = data[position:position + 1]
+        if not char:
+            raise ValueError("unterminated string")
+        if char == b"\\":
+            position += 1
+        elif char == b"(":
+            depth += 1
+        elif char == b")":
+            depth -= 1
+        position += 1
+    return position
+
+def renumber(body, numbers):
+    """Rewrite the indirect references in an object body through numbers; stream data is left alone.
+
+    References to objects that are not copied become null.
+    """
+    parts = []
+    position = 0
+    while True:
+        match = _SCAN.search(body, position)
+        if match is None:
+            parts.append(body[position:])
+            break
+        token = match.group()
+        if token == b"(":
+            end = _string_end(body, match.end())
+        elif token == b"%":
+            end = match.end()
+            while end < len(body) and body[end:end + 1] not in b"\r\n":
+                end += 1
+        elif match.group(1) is not None:
+            parts.append(body[position:match.start()])
+            number = numbers.get(int(match.group(1)))
+            parts.append(b"%d 0 R" % number if number else b"null")
+            position = match.end()
+            continue
+        else:
+            end = len(body)
+        parts.append(body[position:end])
+        position = end
+    return b"".join(parts)
+
+
+class PdfMerger:
+    """Appends the pages of PDF files to one PDF written to file as it goes.
+
+    Objects are copied one at a time and renumbered; only their offsets and
+    the page numbers are kept until close() writes the page tree and the
+    cross-reference table.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.position = 0
+        # Offset of each object by number - 1; 0 for objects never written
+        self.offsets = array('q', [0, 0])
+        self.page_ids = array('q')
+        self.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def write(self, data):
+        self.file.write(data)
+        self.position += len(data)
+
+    def write_object(self, number, body):
+        self.offsets[number - 1] = self.position
+        self.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+
+    def add(self, path):
+        """Append every page of the PDF at path, a file or a report in a bundle. Returns the number of pages added."""
+        with report_files.open_report(path) as data:
+            source = SourcePdf(data)
+            nodes, pages = source.page_tree()
+
+            # The page tree nodes become the merged page tree; catalog and document info are left out
+            numbers = dict.fromkeys(nodes, PAGES_ID)
+            for number in sorted(source.offsets):
+                if number not in numbers and number not in (source.root, source.info):
+                    numbers[number] = len(self.offsets) + 1
+                    self.offsets.append(0)
+
+            for number, new_number in numbers.items():
+                if new_number != PAGES_ID:
+                    self.write_object(new_number, renumber(source.body(number), numbers))
+
+        # Pages join the tree only once all their objects are written
+        self.page_ids.extend(numbers[number] for number in pages)
+        return len(pages)
+
+    def close(self):
+        """Write the page tree, catalog and cross-reference table."""
+        self.offsets[PAGES_ID - 1] = self.position
+        self.write(b"%d 0 obj\n<< /Type /Pages /Count %d /Kids [" % (PAGES_ID, len(self.page_ids)))
+        for start in range(0, len(self.page_ids), KIDS_CHUNK):
+            self.write(b"".join(b" %d 0 R" % number for number in self.page_ids[start:start + KIDS_CHUNK]))
+        self.write(b" ] >>\nendobj\n")
+        self.write_object(CATALOG_ID, b"<< /Type /Catalog /Pages %d 0 R >>" % PAGES_ID)
+
+        xref_offset = self.position
+        self.write(b"xref\n0 %d\n0000000000 65535 f\r\n" % (len(self.offsets) + 1))
+        for start in range(0, len(self.offsets), KIDS_CHUNK):
+            self.write(b"".join(b"%010d 00000 n\r\n" % offset if offset else b"0000000000 65535 f\r\n"
+                                for offset in self.offsets[start:start + KIDS_CHUNK]))
+        self.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                   % (len(self.offsets) + 1, CATALOG_ID, xref_offset))
+
+
+def merge_pdfs(paths, output, progress=None):
+    """Merge the PDFs at paths into one PDF at output. Returns the number of PDFs merged."""
+    merged = 0
+    with _output_file(output) as file:
+        merger = PdfMerger(file)
+        for index, path in enumerate(paths):
+            try:
+                merger.add(path)
+                merged += 1
+            except (OSError, ValueError, KeyError, AttributeError) as e:
+                # Objects already copied stay unreferenced; the pages of this file are left out
+                logging.error(f"Cannot merge {path}: {e}")
+            if progress:
+                progress(index + 1, len(paths))
+        merger.close()
+    return merged
+
+def export_reports(paths, output, folder, progress=None):
+    """Merge the reports into a PDF, or pack them into a zip, depending on the extension of output.
+
+    Returns the number of reports exported; progress is called with the
+    number of reports handled so far and the total.
+    """
+    if output.lower().endswith('.zip'):
+        return write_zip(paths, output, folder, progress)
+    return merge_pdfs(paths, output, progress)
+
+def parse_date(text):
+    return datetime.strptime(text, '%Y-%m-%d').date()
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Merge reports into one PDF or pack them into a zip.")
+    parser.add_argument("output", help="Path of the .pdf or .zip to write")
+    parser.add_argument("--from", dest="date_from", type=parse_date, help="First day, yyyy-mm-dd")
+    parser.add_argument("--to", dest="date_to", type=parse_date, help="Last day, yyyy-mm-dd")
+    parser.add_argument("--patient", help="Only the reports of this patient (full name)")
+    parser.add_argument("--folder", default=os.path.join(os.getcwd(), 'izvestaji'),
+                        help="Folder holding the reports (default: ./izvestaji)")
+    args = parser.parse_args(argv)
+
+    start_time = time.perf_counter()
+    paths = find_reports(args.folder, args.date_from, args.date_to, args.patient)
+    if not paths:
+        logging.error("No reports match.")
+        return 1
+    try:
+        exported = export_reports(paths, args.output, args.folder)
+    except OSError as e:
+        logging.error(f"Failed to write {args.output}: {e}")
+        return 2
+
+    elapsed = time.perf_counter() - start_time
+    logging.info(f"Exported {exported}/{len(paths)} reports to {args.output} in {elapsed:.2f}s")
+    return 0 if exported == len(paths) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
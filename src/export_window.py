@@ -0,0 +1,132 @@
+import logging
+import os
+from PyQt5.QtCore import QDate, QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt5.QtWidgets import (
+    QDialog, QFormLayout, QDateEdit, QLineEdit, QComboBox, QPushButton, QProgressBar, QLabel, QFileDialog
+)
+import export
+import report_files
+
+# Output formats offered in the window: label, file extension
+FORMATS = [
+    ("Jedan PDF za štampu", ".pdf"),
+    ("ZIP arhiva", ".zip"),
+]
+
+
+class ExportJobSignals(QObject):
+    """Signals emitted by an ExportJob; delivered on the GUI thread."""
+
+    progress = pyqtSignal(int, int)  # reports handled, total
+    finished = pyqtSignal(int, int)  # reports exported, reports found
+    failed = pyqtSignal(str)  # error message
+
+
+class ExportJob(QRunnable):
+    """Finds the matching reports and streams them into the output file."""
+
+    def __init__(self, folder, output, date_from, date_to, patient):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.signals = ExportJobSignals()
+        self.folder = folder
+        self.output = output
+        self.date_from = date_from
+        self.date_to = date_to
+        self.patient = patient
+
+    def run(self):
+        try:
+            paths = export.find_reports(self.folder, self.date_from, self.date_to, self.patient)
+            if not paths:
+                self.signals.finished.emit(0, 0)
+                return
+            exported = export.export_reports(paths, self.output, self.folder, progress=self.signals.progress.emit)
+            self.signals.finished.emit(exported, len(paths))
+        except Exception as e:
+            logging.error(f"Export to {self.output} failed: {e}")
+            self.signals.failed.emit(str(e))
+
+
+class ExportWindow(QDialog):
+    """Exports the reports of a date range, optionally of one patient, as one PDF or a zip."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        self.setWindowTitle("Izvoz izveštaja")
+        self.setMinimumWidth(480)
+        self.folder = os.path.join(os.getcwd(), report_files.REPORTS_FOLDER)
+        self.job = None
+
+        layout = QFormLayout(self)
+        today = QDate.currentDate()
+        self.from_edit = QDateEdit(today, self)
+        self.to_edit = QDateEdit(today, self)
+        for date_edit in (self.from_edit, self.to_edit):
+            date_edit.setDisplayFormat("dd-MM-yyyy")
+            date_edit.setCalendarPopup(True)
+        layout.addRow("Od:", self.from_edit)
+        layout.addRow("Do:", self.to_edit)
+
+        self.patient_edit = QLineEdit(self)
+        self.patient_edit.setPlaceholderText("Svi pacijenti")
+        layout.addRow("Pacijent:", self.patient_edit)
+
+        self.format_box = QComboBox(self)
+        for label, _ in FORMATS:
+            self.format_box.addItem(label)
+        layout.addRow("Format:", self.format_box)
+
+        self.export_button = QPushButton("IZVEZI", self)
+        self.export_button.clicked.connect(self.start_export)
+        layout.addRow(self.export_button)
+
+        self.progress_bar = QProgressBar(self)
+        self.progress_bar.hide()
+        layout.addRow(self.progress_bar)
+        self.status_label = QLabel(self)
+        self.status_label.setWordWrap(True)
+        layout.addRow(self.status_label)
+
+    def start_export(self):
+        """Ask where to save, then export on a background thread."""
+        date_from = self.from_edit.date().toPyDate()
+        date_to = self.to_edit.date().toPyDate()
+        extension = FORMATS[self.format_box.currentIndex()][1]
+        default_name = f"izvestaji_{date_from:%Y%m%d}" + (f"-{date_to:%Y%m%d}" if date_to != date_from else "")
+        output, _ = QFileDialog.getSaveFileName(
+            self, "Sačuvaj izvoz", os.path.join(os.getcwd(), default_name + extension), f"*{extension}")
+        if not output:
+            return
+        if not output.lower().endswith(extension):
+            output += extension
+
+        self.job = ExportJob(self.folder, output, date_from, date_to, self.patient_edit.text())
+        self.job.signals.progress.connect(self.on_progress)
+        self.job.signals.finished.connect(self.on_finished)
+        self.job.signals.failed.connect(self.on_failed)
+        self.export_button.setEnabled(False)
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.status_label.setText("Izvoz u toku...")
+        QThreadPool.globalInstance().start(self.job)
+
+    def on_progress(self, done, total):
+        self.progress_bar.setValue(100 * done // total)
+
+    def on_finished(self, exported, found):
+        self.export_button.setEnabled(True)
+        self.progress_bar.hide()
+        if not found:
+            self.status_label.setText("Nema izveštaja za izabrane datume i pacijenta.")
+        elif exported < found:
+            self.status_label.setText(f"Izvezeno {exported} od {found} izveštaja u {self.job.output}; "
+                                      "ostali nisu mogli da se pročitaju.")
+        else:
+            self.status_label.setText(f"Izvezeno {exported} izveštaja u {self.job.output}")
+
+    def on_failed(self, error):
+        self.export_button.setEnabled(True)
+        self.progress_bar.hide()
+        self.status_label.setText(f"Izvoz nije uspeo: {error}")
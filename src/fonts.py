@@ -0,0 +1,149 @@
+import logging
+import marshal
+import os
+import hashlib
+import threading
+from fnmatch import fnmatch
+from weakref import WeakKeyDictionary
+from reportlab import rl_config
+from reportlab.pdfbase import pdfmetrics, ttfonts
+from reportlab.pdfbase.ttfonts import TTFont, TTFontFace, TTEncoding, TTFNameBytes
+from resources import app_path, resource_path
+
+# Font faces used by the PDF renderer, keyed by their ReportLab name
+PDF_FONT_FACES = {
+    'NotoSansMono': 'fonts/NotoSansMono-Regular.ttf',
+    'NotoSansMono-Bold': 'fonts/NotoSansMono-Bold.ttf',
+    'NotoSans': 'fonts/NotoSans-Regular.ttf',
+    'NotoSans-Bold': 'fonts/NotoSans-Bold.ttf',
+}
+
+# Bump when the layout of the cached face data changes
+CACHE_FORMAT_VERSION = 2
+
+# Attributes every cached face must have
+REQUIRED_FACE_FIELDS = ('name', 'unitsPerEm', 'charWidths', 'charToGlyph', 'defaultWidth', 'hmetrics')
+
+# Lists the attributes of a cached face that were TTFNameBytes, which marshal stores as plain bytes
+_NAME_FIELDS = '__name_fields__'
+
+# Faces already registered with ReportLab in this process
+_registered = {}
+_lock = threading.Lock()
+
+
+def font_cache_dir():
+    """Folder holding the parsed font metric cache, next to the application whatever the working directory."""
+    return os.environ.get("DOCTORREPORT_FONT_CACHE") or app_path(os.path.join('.cache', 'fonts'))
+
+def _cache_file(name, digest):
+    # marshal's format may change between Python versions
+    return os.path.join(font_cache_dir(), f"{name}-{digest[:16]}-v{CACHE_FORMAT_VERSION}-m{marshal.version}.marshal")
+
+def _scale_for(units_per_em):
+    """Rebuild the glyph-unit scaling function ReportLab keeps on a parsed face."""
+    if units_per_em == 1000:
+        return lambda x: x
+    multiplier = 1000.0 / units_per_em
+    return lambda x: x * multiplier
+
+def _load_cached_face(cache_file, font_data):
+    """Restore a parsed TTFontFace from the cache, or None if unavailable.
+
+    The cache holds plain data in marshal format, which unlike pickle cannot
+    run code while it is read.
+    """
+    try:
+        with open(cache_file, 'rb') as file:
+            state = marshal.load(file)
+        if not isinstance(state, dict) or not all(field in state for field in REQUIRED_FACE_FIELDS):
+            raise ValueError("not the metrics of a font face")
+        for field in state.pop(_NAME_FIELDS, ()):
+            state[field] = TTFNameBytes(state[field])
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logging.warning(f"Ignoring unreadable font cache {cache_file}: {e}")
+        return None
+
+    face = TTFontFace.__new__(TTFontFace)
+    face.__dict__.update(state)
+    face._ttf_data = font_data
+    face._pdfScale = _scale_for(face.unitsPerEm)
+    return face
+
+def _store_cached_face(cache_file, face):
+    """Write the parsed metric tables of a face to the cache."""
+    state = {key: value for key, value in face.__dict__.items() if key not in ('_ttf_data', '_pdfScale')}
+    name_fields = [key for key, value in state.items() if isinstance(value, TTFNameBytes)]
+    for key in name_fields:
+        state[key] = bytes(state[key])
+    state[_NAME_FIELDS] = name_fields
+    try:
+        data = marshal.dumps(state)
+    except ValueError as e:
+        logging.warning(f"Cannot write font cache {cache_file}: {e}")
+        return
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        temp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(temp_file, 'wb') as file:
+            file.write(data)
+        os.replace(temp_file, cache_file)
+    except OSError as e:
+        logging.warning(f"Failed to write font cache {cache_file}: {e}")
+
+def load_ttfont(name, font_path, use_cache=True):
+    """Build a TTFont, taking the parsed tables from the on-disk cache when the file hash matches."""
+    with open(font_path, 'rb') as file:
+        font_data = file.read()
+    digest = hashlib.sha256(font_data).hexdigest()
+    cache_file = _cache_file(name, digest)
+
+    face = _load_cached_face(cache_file, font_data) if use_cache else None
+    if face is None:
+        font = TTFont(name, font_path)
+        if use_cache:
+            _store_cached_face(cache_file, font.face)
+        return font
+
+    # Assemble the TTFont the way TTFont.__init__ does, minus the parsing
+    font = TTFont.__new__(TTFont)
+    font.fontName = name
+    font.face = face
+    font.encoding = TTEncoding()
+    font.state = WeakKeyDictionary()
+    font._asciiReadable = rl_config.ttfAsciiReadable
+    if hasattr(TTFont, 'shapable'):
+        font.shapable = not any(fnmatch(name, pattern) for pattern in getattr(ttfonts, 'unShapedFontGlob', []))
+    return font
+
+def register_pdf_font(name, relative_path):
+    """Register one font face with ReportLab, at most once per process."""
+    with _lock:
+        if name in _registered:
+            return True
+
+        font_path = resource_path(relative_path)
+        if not os.path.exists(font_path):
+            logging.error(f"Font file not found: {font_path}")
+            return False
+
+        try:
+            pdfmetrics.registerFont(load_ttfont(name, font_path))
+        except Exception as e:
+            logging.error(f"Failed to register font {name}: {e}")
+            return False
+
+        _registered[name] = font_path
+        logging.info(f"Font {name} registered.")
+        return True
+
+def register_pdf_fonts():
+    """Register all faces used by the PDF renderer. Returns True on success."""
+    return all([register_pdf_font(name, path) for name, path in PDF_FONT_FACES.items()])
+
+def registered_fonts():
+    """Paths of the font files registered so far, by ReportLab font name."""
+    with _lock:
+        return dict(_registered)
@@ -0,0 +1,354 @@
+"""Offline ICD-10 lookup for the DG lines, from an index file that is memory-mapped rather than loaded.
+
+data/icd10.csv lists the codes and their names: a starter set of common WHO
+ICD-10 titles, which a full national list with the same two columns can
+replace. It is compiled into data/icd10.idx on first use, laid out as
+
+    header    magic, number of entries and trigrams, offset of each section, size and mtime of the CSV
+    entries   per entry, sorted by code: offset of its text, code length, name length
+    text      code and name of every entry, UTF-8
+    trigrams  per trigram of the normalized names, sorted: trigram, first posting, number of postings
+    postings  numbers of the entries whose name has each trigram
+
+Codes are found by binary search over the entries; names by the trigrams
+the typed text shares with them, so typos still match. The postings of its
+rarest trigrams give a few candidates, and only those are decoded and ranked,
+so common words like "unspecified" cost no more than rare ones. The index is
+rebuilt whenever the size or modification time of the CSV differs from the
+ones it was built from, so a list copied in with an older date is picked up too.
+
+Usage: python icd10.py [data/icd10.csv] [data/icd10.idx]
+"""
+import sys
+import csv
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+from array import array
+from collections import Counter
+from heapq import nsmallest
+
+from phrases import phrase_key
+from resources import resource_path
+
+SOURCE_FILE = os.path.join("data", "icd10.csv")
+INDEX_FILE = os.path.join("data", "icd10.idx")
+
+MAGIC = b"ICD10IX2"
+# magic, entries, trigrams, offsets of entries, text, trigrams, postings, size and mtime (ns) of the source
+HEADER = struct.Struct("<8sIIIIIIQq")
+ENTRY = struct.Struct("<IHH")  # text offset, code length, name length
+TRIGRAM = struct.Struct("<QII")  # trigram, first posting, number of postings
+POSTING_SIZE = 4
+
+# Postings read for one name search, unless its rarest trigram alone has more
+COUNT_BUDGET = 800
+
+# Names ranked by the trigrams they share with the typed text, out of those sharing most of its rarest ones
+MAX_CANDIDATES = 32
+
+# Trigrams and names whose lookups are kept, each
+CACHE_SIZE = 20000
+
+# Typed text shorter than this is not looked up
+MIN_QUERY = 2
+
+# A name must share this fraction of the typed text's trigrams to match
+MIN_SHARED_TRIGRAMS = 0.6
+
+# Separates code and name in the inserted DG line
+ENTRY_SEPARATOR = " – "
+
+_CODE_QUERY = re.compile(r"^[A-Za-z]\d")
+_CODE = re.compile(r"^[A-Z]\d\d(?:\.\d{1,2})?$")
+_WORD = re.compile(r"\w+")
+
+# The shared index, opened on first use
+_index = None
+_index_failed = False
+_index_lock = threading.Lock()
+
+
+def search_text(text):
+    """Lowercase words of text without diacritics or punctuation, as names are indexed."""
+    return " ".join(_WORD.findall(phrase_key(text)))
+
+def trigrams(text):
+    """The runs of three characters of text, as tuples."""
+    return set(zip(text, text[1:], text[2:]))
+
+def trigram_key(trigram):
+    """A trigram packed into an integer, as the index stores it."""
+    first, second, third = trigram
+    return (ord(first) << 42) | (ord(second) << 21) | ord(third)
+
+def name_trigrams(name):
+    return trigrams(f" {search_text(name)} ")
+
+def format_entry(code, name):
+    """The DG line inserted for an entry."""
+    return f"{code}{ENTRY_SEPARATOR}{name}"
+
+def normalize_code(text):
+    """Uppercase a typed code and add the dot after its category, so "j069" finds "J06.9"."""
+    code = "".join(text.split()).upper()
+    if len(code) > 3 and code[3] != ".":
+        code = f"{code[:3]}.{code[3:]}"
+    return code
+
+
+def read_source(path=SOURCE_FILE):
+    """(code, name) of each row of a CSV with "code" and "name" columns; malformed rows are skipped."""
+    entries = []
+    with open(path, 'r', encoding='utf-8-sig', newline='') as file:
+        for line_number, row in enumerate(csv.DictReader(file), start=2):
+            code = normalize_code(row.get("code") or "")
+            name = " ".join((row.get("name") or "").split())
+            if not _CODE.match(code) or not name:
+                logging.warning(f"{path}:{line_number}: skipped, not a code and a name")
+                continue
+            entries.append((code, name))
+    return entries
+
+def source_stamp(path):
+    """(size, mtime in ns) of a source list, as its index records them."""
+    status = os.stat(path)
+    return status.st_size, status.st_mtime_ns
+
+def build_index(entries, path=INDEX_FILE, stamp=(0, 0)):
+    """Write the index of (code, name) entries to path, replacing it atomically. Returns the number of entries.
+
+    stamp is the source_stamp of the list the entries were read from.
+    """
+    entries = sorted(dict(entries).items())
+
+    entry_table = bytearray()
+    text = bytearray()
+    postings_by_trigram = {}
+    for number, (code, name) in enumerate(entries):
+        code_bytes = code.encode('utf-8')
+        name_bytes = name.encode('utf-8')
+        entry_table += ENTRY.pack(len(text), len(code_bytes), len(name_bytes))
+        text += code_bytes + name_bytes
+        for trigram in name_trigrams(name):
+            postings_by_trigram.setdefault(trigram_key(trigram), []).append(number)
+
+    trigram_table = bytearray()
+    postings = array('I')
+    for trigram in sorted(postings_by_trigram):
+        numbers = postings_by_trigram[trigram]
+        trigram_table += TRIGRAM.pack(trigram, len(postings), len(numbers))
+        postings.extend(numbers)
+    if sys.byteorder != "little":
+        postings.byteswap()
+
+    entries_offset = HEADER.size
+    text_offset = entries_offset + len(entry_table)
+    trigrams_offset = text_offset + len(text)
+    postings_offset = trigrams_offset + len(trigram_table)
+    header = HEADER.pack(MAGIC, len(entries), len(postings_by_trigram),
+                         entries_offset, text_offset, trigrams_offset, postings_offset, *stamp)
+
+    # Per process, as two starting instances may both find the index stale
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, 'wb') as file:
+        for section in (header, entry_table, text, trigram_table, postings.tobytes()):
+            file.write(section)
+    os.replace(temporary_path, path)
+    return len(entries)
+
+
+class Icd10Index:
+    """Lookups in a memory-mapped index file written by build_index."""
+
+    def __init__(self, path=INDEX_FILE):
+        with open(path, 'rb') as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            (magic, self.entry_count, self.trigram_count, self.entries_offset, self.text_offset,
+             self.trigrams_offset, self.postings_offset, *stamp) = HEADER.unpack_from(self.data)
+        except struct.error:
+            magic = None
+        if magic != MAGIC:
+            self.data.close()
+            raise ValueError(f"{path} is not an ICD-10 index")
+        self.stamp = tuple(stamp)
+        # Postings run of each trigram and trigrams of each name met so far: successive
+        # keystrokes look up nearly the same ones
+        self.run_cache = {}
+        self.name_cache = {}
+
+    def close(self):
+        self.data.close()
+
+    def __len__(self):
+        return self.entry_count
+
+    def code_bytes(self, number):
+        text_offset, code_length, _ = ENTRY.unpack_from(self.data, self.entries_offset + number * ENTRY.size)
+        start = self.text_offset + text_offset
+        return self.data[start:start + code_length]
+
+    def entry(self, number):
+        """(code, name) of the entry with this number."""
+        text_offset, code_length, name_length = ENTRY.unpack_from(
+            self.data, self.entries_offset + number * ENTRY.size)
+        start = self.text_offset + text_offset
+        text = self.data[start:start + code_length + name_length].decode('utf-8')
+        return text[:code_length], text[code_length:]
+
+    def by_code(self, text, limit):
+        """Entries whose code starts with text, in code order."""
+        prefix = normalize_code(text).encode('ascii', 'replace')
+        low, high = 0, self.entry_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.code_bytes(middle) < prefix:
+                low = middle + 1
+            else:
+                high = middle
+        results = []
+        for number in range(low, min(low + limit, self.entry_count)):
+            if not self.code_bytes(number).startswith(prefix):
+                break
+            results.append(self.entry(number))
+        return results
+
+    def find_trigram(self, trigram):
+        """(first posting, number of postings) of trigram; no postings if no name has it."""
+        low, high = 0, self.trigram_count
+        while low < high:
+            middle = (low + high) // 2
+            key, first, count = TRIGRAM.unpack_from(self.data, self.trigrams_offset + middle * TRIGRAM.size)
+            if key < trigram:
+                low = middle + 1
+            elif key > trigram:
+                high = middle
+            else:
+                return first, count
+        return 0, 0
+
+    def trigram_run(self, trigram):
+        """(first posting, number of postings) of a trigram tuple."""
+        run = self.run_cache.get(trigram)
+        if run is None:
+            if len(self.run_cache) >= CACHE_SIZE:
+                self.run_cache.clear()
+            run = self.run_cache[trigram] = self.find_trigram(trigram_key(trigram))
+        return run
+
+    def entry_trigrams(self, number):
+        """(code, name, trigrams of the name) of the entry with this number."""
+        cached = self.name_cache.get(number)
+        if cached is None:
+            if len(self.name_cache) >= CACHE_SIZE:
+                self.name_cache.clear()
+            code, name = self.entry(number)
+            cached = self.name_cache[number] = code, name, name_trigrams(name)
+        return cached
+
+    def postings(self, first, count):
+        """Numbers, in ascending order, of the entries in a run of postings."""
+        start = self.postings_offset + first * POSTING_SIZE
+        numbers = array('I', self.data[start:start + count * POSTING_SIZE])
+        if sys.byteorder != "little":
+            numbers.byteswap()
+        return numbers
+
+    def search(self, text, limit):
+        """Entries whose name is most like text, best first. The last word may be typed only in part."""
+        query = search_text(text)
+        # Without a trailing space the last word is still being typed, so its end is not a word end
+        query_trigrams = trigrams(f" {query} " if text[-1:].isspace() else f" {query}")
+        if not query_trigrams:
+            return []
+        needed = math.ceil(len(query_trigrams) * MIN_SHARED_TRIGRAMS)
+
+        # A match shares `needed` trigrams, so it has one of the rarest len - needed + 1 of them.
+        # The names having most of those (counted within COUNT_BUDGET postings) are the candidates,
+        # then ranked by the trigrams they share with the whole text.
+        runs = sorted(map(self.trigram_run, query_trigrams), key=lambda run: run[1])
+        first, count = runs[0]
+        if count > COUNT_BUDGET:
+            # Even the rarest trigram is in too many names to tell them apart
+            candidates = self.postings(first, MAX_CANDIDATES)
+        else:
+            shared_rare = Counter()
+            counted = 0
+            for first, count in runs[:len(runs) - needed + 1]:
+                if counted + count > COUNT_BUDGET:
+                    break
+                shared_rare.update(self.postings(first, count))
+                counted += count
+            candidates = [number for number, _ in shared_rare.most_common(MAX_CANDIDATES)]
+
+        matches = []
+        for number in candidates:
+            code, name, trigrams_of_name = self.entry_trigrams(number)
+            shared = len(query_trigrams & trigrams_of_name)
+            if shared >= needed:
+                matches.append((-shared, len(name), number, code, name))
+        return [(code, name) for *_, code, name in nsmallest(limit, matches)]
+
+    def lookup(self, text, limit=5):
+        """Entries for typed text: by code if it starts like a code ("J06"), else by name."""
+        text = text.lstrip()
+        if len(text.strip()) < MIN_QUERY:
+            return []
+        if _CODE_QUERY.match(text):
+            return self.by_code(text, limit)
+        return self.search(text, limit)
+
+
+def index_is_stale(source_path, index_path):
+    """Whether the index is missing, unreadable or built from another version of its source list."""
+    try:
+        with open(index_path, 'rb') as file:
+            magic, *fields = HEADER.unpack(file.read(HEADER.size))
+    except (OSError, struct.error):
+        return True
+    if magic != MAGIC:
+        return True
+    try:
+        return tuple(fields[-2:]) != source_stamp(source_path)
+    except OSError:
+        # Without its source the index is the best there is
+        return False
+
+def shared_index():
+    """The bundled index, opened on first use (and rebuilt if its source changed), or None if unavailable."""
+    global _index, _index_failed
+    with _index_lock:
+        if _index is None and not _index_failed:
+            source_path = resource_path(SOURCE_FILE)
+            index_path = resource_path(INDEX_FILE)
+            try:
+                if index_is_stale(source_path, index_path):
+                    stamp = source_stamp(source_path)
+                    count = build_index(read_source(source_path), index_path, stamp)
+                    logging.info(f"ICD-10 index rebuilt from {source_path}: {count} codes")
+                _index = Icd10Index(index_path)
+            except (OSError, ValueError) as e:
+                logging.error(f"ICD-10 lookup is unavailable: {e}")
+                _index_failed = True
+        return _index
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    argv = sys.argv[1:] if argv is None else argv
+    source_path = argv[0] if argv else SOURCE_FILE
+    index_path = argv[1] if len(argv) > 1 else INDEX_FILE
+    try:
+        count = build_index(read_source(source_path), index_path, source_stamp(source_path))
+    except OSError as e:
+        logging.error(f"Failed to build the ICD-10 index: {e}")
+        return 1
+    logging.info(f"{index_path}: {count} codes, {os.path.getsize(index_path)} bytes")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
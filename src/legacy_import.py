@@ -0,0 +1,566 @@
+"""Import the reports older versions left as files into the record store and the archive.
+
+Before reports were stored as records (see report_store), each one left a
+PDF in izvestaji/, named <name>_<yyyymmdd>.pdf (_2, _3, ... for more reports
+of the same day), and a TXT sidecar in txt/, named <name>_<yyyymmdd>_<hhmmss>.txt,
+holding the DG and diagnosis of its pages as typed. Each sidecar is paired
+with the first PDF of the same patient and day that printed its first page,
+the files of a day taken in the order they were written. A sidecar gives
+the texts; the PDF gives the patient's birth date and JMBG, the date
+of every page and the texts of the pages the sidecar left out. PDFs without
+a sidecar are read on their own, their texts as the lines they were printed
+in, and sidecars without a PDF give the name and date from the file name.
+PDFs moved into month folders or bundles since (see report_files) are found
+there, and known by their name wherever they are.
+
+Files are read in a process pool. The records are appended and archived in
+batches: one transaction, and one fsync per segment, for each. Reports the
+archive already holds from before records were stored get their record_ref
+set instead of a second row. Every imported record names its files in
+"source", so an interrupted or repeated run skips what was imported; it
+first archives the records whose batch was cut short before its commit.
+
+Run it while the program is closed: the phrase snapshot is removed before
+the first import, so the program rebuilds it with the imported reports.
+
+Usage: python legacy_import.py [--txt-folder txt] [--pdf-folder izvestaji] [--workers N] [--batch 500]
+"""
+import sys
+import logging
+import os
+import re
+import time
+import zlib
+import struct
+import argparse
+import sqlite3
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+
+import archive
+import export
+import phrases
+import report_engine
+import report_files
+import report_store
+
+# Sidecars are named <name>_<yyyymmdd>_<hhmmss>.txt, PDFs <name>_<yyyymmdd>.pdf with _2, _3, ... for more of one day
+TXT_FILE = re.compile(r"^(?P<stem>.+)_(?P<date>\d{8})_(?P<time>\d{6})\.txt$", re.IGNORECASE)
+PDF_FILE = re.compile(r"^(?P<stem>.+)_(?P<date>\d{8})(?:_(?P<number>\d+))?\.pdf$", re.IGNORECASE)
+
+# Records appended and archived per transaction
+DEFAULT_BATCH = 500
+
+# Files handed to a worker at a time, and chunks in flight per worker
+CHUNK_SIZE = 64
+CHUNKS_PER_WORKER = 2
+
+# Lines of a report PDF (see ReportRenderer) the importer reads
+NAME_PREFIX = "Ime i prezime pacijenta: "
+BIRTH_DATE_PREFIX = "Datum rođenja: "
+JMBG_PREFIX = "JMBG: "
+DG_LABEL = "DG:"
+DG_LINE_HEIGHT = 15
+# The first DG line is printed this far right of the label, on its line; older versions printed both smaller
+DG_TEXT_OFFSET = 30
+_FOOTER_DATE = re.compile(r"^(\d{2})\.(\d{2})\.(\d{4})\. Beograd$")
+
+_SIDECAR_HEADER = re.compile(r"^Page (\d+) - (DG|Diagnosis Content):\n", re.MULTILINE)
+
+# Content stream tokens: a literal string without nested parentheses, the start of any other, a name,
+# a hex string, a number, an operator or a comment
+_CONTENT_TOKEN = re.compile(
+    rb"\(((?:[^()\\]|\\.)*)\)|(\()|/([^\s/\[\]()<>{}%]*)|<([0-9A-Fa-f\s]*)>|([-+]?(?:\d+\.?\d*|\.\d+))"
+    rb"|([A-Za-z'\"*]+)|[\[\]]|%[^\r\n]*", re.DOTALL)
+_STRING_ESCAPE = re.compile(rb"\\(?:([0-7]{1,3})|(\r\n|.))", re.DOTALL)
+_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f", b"\r\n": b"", b"\r": b"", b"\n": b""}
+_WHITESPACE = re.compile(rb"\s+")
+
+# Byte value - 33 of each ASCII85 digit
+_A85_DIGITS = bytes((value - 33) % 256 for value in range(256))
+
+_LENGTH = re.compile(rb"/Length\s+(\d+)")
+_FILTERS = re.compile(rb"/Filter\s*(?:\[([^\]]*)\]|(/\w+))")
+_CONTENTS = re.compile(rb"/Contents\s+(\d+)\s+\d+\s+R")
+_FONT_RESOURCES = re.compile(rb"/Font\s*(?:(\d+)\s+\d+\s+R|<<(.*?)>>)", re.DOTALL)
+_FONT_ENTRY = re.compile(rb"/([^\s/\[\]()<>{}%]+)\s+(\d+)\s+\d+\s+R")
+_TO_UNICODE = re.compile(rb"/ToUnicode\s+(\d+)\s+\d+\s+R")
+_BFCHAR = re.compile(rb"beginbfchar(.*?)endbfchar", re.DOTALL)
+_BFRANGE = re.compile(rb"beginbfrange(.*?)endbfrange", re.DOTALL)
+_HEX = re.compile(rb"<([0-9A-Fa-f]+)>")
+
+
+def same_path(path):
+    """A path in the form imported files are compared in."""
+    return os.path.normcase(os.path.abspath(path))
+
+def file_key(path):
+    """What imported files are compared by: a sidecar by its path, a PDF by its name, which it keeps in a month folder or bundle."""
+    if path.lower().endswith(".pdf"):
+        return os.path.normcase(os.path.basename(path))
+    return same_path(path)
+
+def stem_name(stem):
+    """The patient name of a file name stem; hyphens became underscores too, and stay spaces."""
+    return " ".join(stem.split("_"))
+
+
+def find_legacy_files(txt_folder, pdf_folder, skip=frozenset()):
+    """The legacy files as groups of one patient and day, oldest first, leaving out those in skip (see file_key).
+
+    PDFs are found in the month folders and bundles too (see report_files). A group is (stem, yyyymmdd, [(hhmmss, sidecar path)], [(number, PDF path)]), both lists in the order written.
+    """
+    sidecars = (os.path.join(directory, file_name)
+                for directory, _, file_names in os.walk(txt_folder) for file_name in file_names)
+    groups = {}
+    for paths, pattern in ((sidecars, TXT_FILE), (report_files.iter_reports(pdf_folder), PDF_FILE)):
+        for path in paths:
+            match = pattern.match(os.path.basename(path))
+            if match is None or file_key(path) in skip:
+                continue
+            group = groups.setdefault((match["date"], match["stem"].casefold()), (match["stem"], [], []))
+            if pattern is TXT_FILE:
+                group[1].append((match["time"], path))
+            else:
+                group[2].append((int(match["number"] or 1), path))
+    return [(stem, date, sorted(sidecars), sorted(pdfs))
+            for (date, _), (stem, sidecars, pdfs) in sorted(groups.items())]
+
+
+def parse_sidecar(text):
+    """The DG and diagnosis of each page of a TXT sidecar, by page number."""
+    parts = _SIDECAR_HEADER.split(text)
+    pages = {}
+    for number, kind, content in zip(parts[1::3], parts[2::3], parts[3::3]):
+        # Each text was followed by one empty line
+        content = content[:-2] if content.endswith("\n\n") else content.rstrip("\n")
+        page = pages.setdefault(int(number), {"dg": "", "diagnosis": ""})
+        if kind == "DG":
+            page["dg"] = "" if content == report_engine.EMPTY_DG_TEXT else content
+        else:
+            page["diagnosis"] = content
+    return pages
+
+
+def _unescape(data):
+    if b"\\" not in data:
+        return data
+    return _STRING_ESCAPE.sub(lambda match: bytes([int(match.group(1), 8) & 0xFF]) if match.group(1)
+                              else _ESCAPES.get(match.group(2), match.group(2)), data)
+
+def _literal_string(data, position):
+    """The bytes of the literal string whose "(" ends right before position, and the position after it."""
+    start = position
+    depth = 1
+    while depth:
+        char = data[position:position + 1]
+        if not char:
+            raise ValueError("unterminated string")
+        if char == b"\\":
+            position += 1
+        elif char == b"(":
+            depth += 1
+        elif char == b")":
+            depth -= 1
+        position += 1
+    return _unescape(data[start:position - 1]), position
+
+def a85decode(data):
+    """Decode ASCII85 data without its "<~" and "~>" frame, several times faster than base64.a85decode."""
+    data = _WHITESPACE.sub(b"", data).replace(b"z", b"!!!!!")
+    padding = -len(data) % 5
+    digits = (data + b"u" * padding).translate(_A85_DIGITS)
+    words = [(((a * 85 + b) * 85 + c) * 85 + d) * 85 + e
+             for a, b, c, d, e in zip(digits[0::5], digits[1::5], digits[2::5], digits[3::5], digits[4::5])]
+    try:
+        decoded = struct.pack(f">{len(words)}I", *words)
+    except struct.error:
+        raise ValueError("invalid ASCII85 data")
+    return decoded[:len(decoded) - padding]
+
+def stream_data(source, number):
+    """The decoded data of a stream object, for the filters ReportLab writes."""
+    body = source.body(number)
+    start = body.index(b"stream") + len(b"stream")
+    head = body[:start]
+    start += 2 if body[start:start + 2] == b"\r\n" else 1
+    data = body[start:start + int(_LENGTH.search(head).group(1))]
+    filters = _FILTERS.search(head)
+    for name in re.findall(rb"/(\w+)", filters.group(1) or filters.group(2)) if filters else ():
+        if name == b"ASCII85Decode":
+            data = data.strip()
+            data = data[2:] if data.startswith(b"<~") else data
+            data = a85decode(data[:-2] if data.endswith(b"~>") else data)
+        elif name == b"FlateDecode":
+            data = zlib.decompress(data)
+        else:
+            raise ValueError(f"unsupported stream filter {name.decode('latin-1')}")
+    return data
+
+@lru_cache(maxsize=256)
+def _cmap_table(cmap):
+    """str.translate table of a ToUnicode map; reports of the same characters share their maps."""
+    table = {}
+    for block in _BFCHAR.findall(cmap):
+        codes = _HEX.findall(block)
+        for code, text in zip(codes[0::2], codes[1::2]):
+            table[int(code, 16)] = bytes.fromhex(text.decode('ascii')).decode('utf-16-be', errors='replace')
+    for block in _BFRANGE.findall(cmap):
+        codes = _HEX.findall(block)
+        for low, high, text in zip(codes[0::3], codes[1::3], codes[2::3]):
+            first = int(text, 16)
+            for offset in range(int(high, 16) - int(low, 16) + 1):
+                table[int(low, 16) + offset] = chr(first + offset)
+    # Unused codes map to U+0000
+    return {code: "" if text == "\x00" else text for code, text in table.items()}
+
+def _to_unicode(source, font_number):
+    """Decoder of the strings of a font: its ToUnicode map, or WinAnsi for the standard fonts."""
+    match = _TO_UNICODE.search(source.head(font_number))
+    if match is None:
+        return lambda data: data.decode('cp1252', errors='replace')
+    table = _cmap_table(stream_data(source, int(match.group(1))))
+    return lambda data: data.decode('latin-1').translate(table)
+
+def _page_fonts(source, page_number, decoders):
+    """The string decoder of each font resource name of a page."""
+    match = _FONT_RESOURCES.search(source.head(page_number))
+    if match is None:
+        return {}
+    entries = source.head(int(match.group(1))) if match.group(1) else match.group(2)
+    fonts = {}
+    for name, number in _FONT_ENTRY.findall(entries):
+        number = int(number)
+        if number not in decoders:
+            decoders[number] = _to_unicode(source, number)
+        fonts[name.decode('latin-1')] = decoders[number]
+    return fonts
+
+def text_lines(content, fonts):
+    """(x, y, font size, text) of each text object of a content stream, in drawing order.
+
+    ReportLab writes one text object for each drawString, so each is one line.
+    """
+    lines = []
+    operands = []
+    in_text = False
+    decode = None
+    size = 0.0
+    x = y = 0.0
+    parts = []
+    position = 0
+    while True:
+        match = _CONTENT_TOKEN.search(content, position)
+        if match is None:
+            break
+        position = match.end()
+        string, nested_string, name, hex_string, number, operator = match.groups()
+        if string is not None:
+            operands.append(_unescape(string))
+        elif nested_string is not None:
+            value, position = _literal_string(content, position)
+            operands.append(value)
+        elif name is not None:
+            operands.append(name.decode('latin-1'))
+        elif hex_string is not None:
+            digits = re.sub(rb"\s", b"", hex_string).decode('ascii')
+            operands.append(bytes.fromhex(digits + "0" * (len(digits) % 2)))
+        elif number is not None:
+            operands.append(float(number))
+        elif operator is not None:
+            if operator == b"BT":
+                in_text, parts, x, y = True, [], 0.0, 0.0
+            elif operator == b"ET" and in_text:
+                lines.append((x, y, size, "".join(parts)))
+                in_text = False
+            elif operator == b"Tm" and len(operands) >= 6:
+                x, y = operands[-2], operands[-1]
+            elif operator == b"Td" and len(operands) >= 2:
+                x, y = x + operands[-2], y + operands[-1]
+            elif operator == b"Tf" and len(operands) >= 2:
+                decode, size = fonts.get(operands[-2]), operands[-1]
+            elif operator in (b"Tj", b"'", b'"', b"TJ") and in_text:
+                for operand in operands:
+                    if isinstance(operand, bytes):
+                        parts.append(decode(operand) if decode else operand.decode('latin-1'))
+            operands = []
+    return lines
+
+def _pdf_date(text):
+    """A 'dd.mm.yyyy.' date as printed in a report, as 'dd-mm-yyyy'; other text as it is."""
+    try:
+        return datetime.strptime(text.strip(), '%d.%m.%Y.').strftime('%d-%m-%Y')
+    except ValueError:
+        return text.strip()
+
+def _is_dg_label(lines, index):
+    """Whether the line at index is the DG label: "DG:" with the first DG line beside it, at any font size."""
+    x, y, _, text = lines[index]
+    if text != DG_LABEL or index + 1 == len(lines):
+        return False
+    next_x, next_y, _, _ = lines[index + 1]
+    return abs(next_y - y) <= 1 and abs(next_x - x - DG_TEXT_OFFSET) <= 1
+
+def parse_report_pdf(data):
+    """The report record a PDF rendered by ReportRenderer was drawn from, as far as it can be read back.
+
+    Each page of the record starts a sheet with the DG label; lines wrapped
+    when printing come back as separate lines. Raises ValueError for PDFs
+    drawn some other way.
+    """
+    source = export.SourcePdf(data)
+    _, page_numbers = source.page_tree()
+    decoders = {}
+    record = {"full_name": "", "birth_date": "", "jmbg": "", "pages": []}
+    entry = None
+    for page_number in page_numbers:
+        contents = _CONTENTS.search(source.head(page_number))
+        if contents is None:
+            continue
+        lines = text_lines(stream_data(source, int(contents.group(1))), _page_fonts(source, page_number, decoders))
+
+        # Everything down to the patient's JMBG is the header and patient info every sheet opens with
+        top = next((index for index, line in enumerate(lines) if line[3].startswith(JMBG_PREFIX)), None)
+        if top is None:
+            raise ValueError("no patient info on a sheet; not a report PDF")
+        if not record["pages"] and entry is None:
+            for _, _, _, text in lines[:top + 1]:
+                if text.startswith(NAME_PREFIX):
+                    record["full_name"] = text[len(NAME_PREFIX):].strip()
+                elif text.startswith(BIRTH_DATE_PREFIX):
+                    record["birth_date"] = _pdf_date(text[len(BIRTH_DATE_PREFIX):])
+            record["jmbg"] = lines[top][3][len(JMBG_PREFIX):].strip()
+        if entry is not None:
+            # DG lines continued on a new sheet leave no gap to read
+            entry["last_dg_y"] = None
+
+        for index in range(top + 1, len(lines)):
+            x, y, _, text = lines[index]
+            if _is_dg_label(lines, index):
+                entry = {"label_x": x, "dg": [], "last_dg_y": None, "lines": []}
+                record["pages"].append(entry)
+            elif entry is None:
+                continue
+            elif x > entry["label_x"] + 1 and not entry["lines"]:
+                # Empty DG paragraphs only left a gap
+                if entry["last_dg_y"] is not None:
+                    entry["dg"].extend([""] * max(0, round((entry["last_dg_y"] - y) / DG_LINE_HEIGHT) - 1))
+                entry["dg"].append(text)
+                entry["last_dg_y"] = y
+            elif abs(x - entry["label_x"]) <= 1:
+                entry["lines"].append(text)
+
+    if not record["pages"]:
+        raise ValueError("no report pages found")
+    for index, entry in enumerate(record["pages"]):
+        # The diagnosis ends at the last date line of the page; the doctor's lines may follow it
+        footer = next((position for position in range(len(entry["lines"]) - 1, -1, -1)
+                       if _FOOTER_DATE.match(entry["lines"][position])), None)
+        if footer is None:
+            raise ValueError(f"page {index + 1} has no date")
+        day, month, year = _FOOTER_DATE.match(entry["lines"][footer]).groups()
+        dg = "\n".join(entry["dg"])
+        record["pages"][index] = {
+            "dg": "" if dg == report_engine.EMPTY_DG_TEXT else dg,
+            "diagnosis": "\n".join(entry["lines"][:footer]),
+            "date": f"{day}-{month}-{year}",
+        }
+    return record
+
+
+def _first_page_text(page):
+    # Wrapping and tabs only change the whitespace of a printed text
+    return " ".join(f"{page['dg']} {page['diagnosis']}".split())
+
+def read_group(group):
+    """Read the files of one patient and day into the records to store. Raises nothing.
+
+    Returns (paths, stored record or None, error or None) for each report.
+    Each sidecar goes with the first PDF left whose first page has its text.
+    """
+    stem, date, sidecars, pdfs = group
+    results = []
+    reports = []
+    for number, path in pdfs:
+        try:
+            reports.append((path, parse_report_pdf(report_files.read_report(path))))
+        except (OSError, ValueError, KeyError, AttributeError, IndexError, zlib.error) as e:
+            results.append(([path], None, f"cannot read the PDF: {e}"))
+
+    pairs = []
+    for time_text, path in sidecars:
+        generated_at = datetime.strptime(date + time_text, '%Y%m%d%H%M%S')
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as file:
+                sidecar = parse_sidecar(file.read())
+        except OSError as e:
+            results.append(([path], None, str(e)))
+            continue
+        if not sidecar:
+            results.append(([path], None, "the sidecar holds no pages"))
+            continue
+        text = _first_page_text(sidecar[1]) if 1 in sidecar else None
+        match = next((index for index, (_, report) in enumerate(reports)
+                      if text is not None and _first_page_text(report["pages"][0]) == text), None)
+        if match is None:
+            pairs.append((path, sidecar, None, None, generated_at))
+        else:
+            pdf_path, report = reports.pop(match)
+            pairs.append((path, sidecar, pdf_path, report, generated_at))
+    midnight = datetime.strptime(date, '%Y%m%d')
+    pairs.extend((None, None, pdf_path, report, midnight) for pdf_path, report in reports)
+
+    for sidecar_path, sidecar, pdf_path, report, generated_at in pairs:
+        paths = [path for path in (sidecar_path, pdf_path) if path]
+        if report is None:
+            day = generated_at.strftime('%d-%m-%Y')
+            report = {"full_name": stem_name(stem), "birth_date": "", "jmbg": "",
+                      "pages": [dict(page, date=day) for _, page in sorted(sidecar.items())]}
+        elif sidecar:
+            # The sidecar has the texts as typed, of the pages it kept
+            for number, page in sidecar.items():
+                if number <= len(report["pages"]):
+                    report["pages"][number - 1].update(page)
+        try:
+            stored = report_store.stored_record(report, same_path(pdf_path) if pdf_path else None, generated_at,
+                                                [same_path(path) for path in paths])
+        except report_store.RecordError as e:
+            results.append((paths, None, str(e)))
+            continue
+        results.append((paths, stored, None))
+    return results
+
+def read_chunk(groups):
+    """Read a chunk of groups in a worker; see read_group."""
+    return [result for group in groups for result in read_group(group)]
+
+def init_worker():
+    logging.getLogger().setLevel(logging.WARNING)
+
+
+def legacy_rows(connection):
+    """Ids of the archived reports from before records were stored, by the path of their PDF and sidecar."""
+    rows = {}
+    for row in connection.execute("SELECT id, pdf_path, txt_path FROM reports WHERE record_ref IS NULL"):
+        for path in (row["pdf_path"], row["txt_path"]):
+            if path:
+                rows[file_key(path)] = row["id"]
+    return rows
+
+def archive_record(connection, locator, stored, rows):
+    """Archive an imported record, or point the report archived before records were stored at it."""
+    report_ids = {rows.pop(file_key(path)) for path in stored["source"] if file_key(path) in rows}
+    if report_ids:
+        connection.executemany("UPDATE reports SET record_ref = ? WHERE id = ?",
+                               [(locator, report_id) for report_id in report_ids])
+        return
+    sidecar = next((path for path in stored["source"] if path.endswith(".txt")), None)
+    archive.add_report(connection, stored["report"], stored["pdf_path"], sidecar, locator, stored["created_at"])
+
+def store_batch(connection, batch, rows, records_folder):
+    """Append a batch of imported records and archive them in one transaction."""
+    locators = report_store.append_records(batch, records_folder)
+    with connection:
+        for locator, stored in zip(locators, batch):
+            archive_record(connection, locator, stored, rows)
+
+def resume(connection, rows, records_folder):
+    """Note the files every stored record came from, and archive imported records whose batch was cut short.
+
+    Returns the set of files to skip, by file_key.
+    """
+    archived = {row[0] for row in connection.execute("SELECT record_ref FROM reports WHERE record_ref IS NOT NULL")}
+    done = set()
+    unarchived = []
+    for locator, stored in report_store.iter_records(records_folder):
+        if stored["pdf_path"]:
+            done.add(file_key(stored["pdf_path"]))
+        done.update(file_key(path) for path in stored.get("source", ()))
+        if stored.get("source") and locator not in archived:
+            unarchived.append((locator, stored))
+    if unarchived:
+        with connection:
+            for locator, stored in unarchived:
+                archive_record(connection, locator, stored, rows)
+        logging.info(f"Archived {len(unarchived)} records of an interrupted import")
+    return done
+
+def _read_in_pool(executor, groups, workers):
+    """The results of read_group for each group, in order, with a bounded number of chunks in flight."""
+    pending = deque()
+    for start in range(0, len(groups), CHUNK_SIZE):
+        pending.append(executor.submit(read_chunk, groups[start:start + CHUNK_SIZE]))
+        if len(pending) >= workers * CHUNKS_PER_WORKER:
+            yield from pending.popleft().result()
+    while pending:
+        yield from pending.popleft().result()
+
+def run_import(txt_folder=phrases.TXT_FOLDER, pdf_folder=report_files.REPORTS_FOLDER, records_folder=report_store.RECORDS_FOLDER,
+               workers=None, batch_size=DEFAULT_BATCH, snapshot_path=phrases.SNAPSHOT_FILE):
+    """Import every legacy report not imported yet. Returns (reports imported, files read, failures)."""
+    start_time = time.perf_counter()
+    connection = archive.connect()
+    try:
+        rows = legacy_rows(connection)
+        done = resume(connection, rows, records_folder)
+        groups = find_legacy_files(txt_folder, pdf_folder, done)
+        total = sum(len(sidecars) + len(pdfs) for _, _, sidecars, pdfs in groups)
+        logging.info(f"{total} legacy files to import ({time.perf_counter() - start_time:.1f} s to find them)")
+        if not groups:
+            return 0, 0, 0
+
+        # The snapshot has no place for reports stored out of order; the program rebuilds it
+        if os.path.exists(snapshot_path):
+            os.remove(snapshot_path)
+            logging.info(f"Removed {snapshot_path}; phrases are counted again at the next start")
+
+        workers = workers or os.cpu_count() or 1
+        imported = files = failures = 0
+        batch = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+            for paths, stored, error in _read_in_pool(executor, groups, workers):
+                files += len(paths)
+                if error:
+                    failures += 1
+                    logging.error(f"Cannot import {paths[0]}: {error}")
+                    continue
+                batch.append(stored)
+                if len(batch) >= batch_size:
+                    store_batch(connection, batch, rows, records_folder)
+                    imported += len(batch)
+                    batch = []
+                    elapsed = time.perf_counter() - start_time
+                    logging.info(f"Imported {imported} reports, {files}/{total} files ({files / elapsed:.0f} files/s)")
+            if batch:
+                store_batch(connection, batch, rows, records_folder)
+                imported += len(batch)
+    finally:
+        connection.close()
+
+    elapsed = time.perf_counter() - start_time
+    logging.info(f"Imported {imported} reports from {files} files in {elapsed:.1f} s "
+                 f"({files / elapsed:.0f} files/s), {failures} failed")
+    return imported, files, failures
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Import the reports left in txt/ and izvestaji/ by older versions.")
+    parser.add_argument("--txt-folder", default=phrases.TXT_FOLDER, help="Folder of the TXT sidecars (default: txt)")
+    parser.add_argument("--pdf-folder", default="izvestaji", help="Folder of the report PDFs (default: izvestaji)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of worker processes (default: one per CPU core)")
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH, help="Reports stored per transaction")
+    args = parser.parse_args(argv)
+
+    try:
+        _, _, failures = run_import(args.txt_folder, args.pdf_folder, workers=args.workers,
+                                    batch_size=max(1, args.batch))
+    except (OSError, report_store.RecordError, sqlite3.Error) as e:
+        logging.error(f"Import stopped: {e}")
+        return 2
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from PyQt5.QtGui import QColor, QTextCursor, QTextFormat
+from PyQt5.QtWidgets import QTextEdit
+import text_layout
+
+# Background used to mark lines holding a word too wide to print
+OVER_LENGTH_COLOR = QColor("#FFCDD2")
+
+
+class WordSplitValidator(QObject):
+    """Marks blocks of a QTextEdit holding a word too wide for a printed line, which would be split mid-word.
+
+    Other long lines are fine: the editor and the PDF wrap them at the same
+    word boundaries. Only the blocks touched by each edit are re-checked, and
+    the numbers of the offending blocks are kept in a set, so the error state
+    is a constant-time query. Marking the lines in the widget is debounced.
+    """
+
+    errorStateChanged = pyqtSignal(bool)
+
+    def __init__(self, text_edit, font_name, font_size, max_width, mark_delay_ms=150):
+        super().__init__(text_edit)
+        self.text_edit = text_edit
+        self.document = text_edit.document()
+        self.font_name = font_name
+        self.font_size = font_size
+        self.max_width = max_width
+
+        # Block numbers of offending lines and the block count they refer to
+        self.over_length = set()
+        self.block_count = self.document.blockCount()
+        self.has_error = False
+
+        # Re-mark the offending lines only once typing pauses
+        self.mark_timer = QTimer(self)
+        self.mark_timer.setSingleShot(True)
+        self.mark_timer.setInterval(mark_delay_ms)
+        self.mark_timer.timeout.connect(self.mark_lines)
+
+        self.document.contentsChange.connect(self.on_contents_change)
+        self.recheck_all()
+
+    def check_block(self, block):
+        return text_layout.splits_words(block.text(), self.font_name, self.font_size, self.max_width)
+
+    def recheck_all(self):
+        """Check every block of the document from scratch."""
+        self.over_length = set()
+        block = self.document.firstBlock()
+        while block.isValid():
+            if self.check_block(block):
+                self.over_length.add(block.blockNumber())
+            block = block.next()
+        self.block_count = self.document.blockCount()
+        self.update_state()
+
+    def on_contents_change(self, position, chars_removed, chars_added):
+        """Re-check the blocks covered by an edit and shift the numbers of the blocks after it."""
+        block_count = self.document.blockCount()
+        delta = block_count - self.block_count
+        self.block_count = block_count
+
+        first_block = self.document.findBlock(position)
+        last_block = self.document.findBlock(position + chars_added)
+        if not first_block.isValid():
+            first_block = self.document.lastBlock()
+        if not last_block.isValid():
+            last_block = self.document.lastBlock()
+        first = first_block.blockNumber()
+        last_new = max(first, last_block.blockNumber())
+        last_old = last_new - delta
+
+        # Blocks before the edit keep their numbers, blocks after it move by delta
+        over_length = {number for number in self.over_length if number < first}
+        over_length.update(number + delta for number in self.over_length if number > last_old)
+
+        block = first_block
+        while block.isValid() and block.blockNumber() <= last_new:
+            if self.check_block(block):
+                over_length.add(block.blockNumber())
+            block = block.next()
+
+        self.over_length = over_length
+        self.update_state()
+
+    def update_state(self):
+        has_error = bool(self.over_length)
+        if has_error != self.has_error:
+            self.has_error = has_error
+            self.errorStateChanged.emit(has_error)
+        self.mark_timer.start()
+
+    def mark_lines(self):
+        """Highlight exactly the offending lines in the widget."""
+        selections = []
+        for number in sorted(self.over_length):
+            block = self.document.findBlockByNumber(number)
+            if not block.isValid():
+                continue
+            selection = QTextEdit.ExtraSelection()
+            selection.cursor = QTextCursor(block)
+            selection.format.setBackground(OVER_LENGTH_COLOR)
+            selection.format.setProperty(QTextFormat.FullWidthSelection, True)
+            selections.append(selection)
+        self.text_edit.setExtraSelections(selections)
+
@@ -1,147 +1,168 @@
+import time
+
+# Taken before anything else is imported, for --profile-startup
+STARTUP_START_TIME = time.perf_counter()
+
 import sys
 import logging
+import math
 import os
-import subprocess
-import json
-from PyQt5 import uic
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QPushButton, QStackedWidget, QSpinBox, QTextEdit,
-    QDateEdit, QScrollArea, QSizePolicy, QLabel, QMessageBox
+    QDateEdit, QScrollArea, QSizePolicy, QLabel, QMessageBox, QWidget, QVBoxLayout, QHBoxLayout,
+    QProgressBar, QDockWidget
 )
-from PyQt5.QtCore import Qt, QDate
-from PyQt5.QtGui import QFont, QTextOption, QFontDatabase, QFontMetrics
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfbase import pdfmetrics
+from PyQt5.QtCore import Qt, QDate, QTimer, QObject, QEvent, pyqtSignal
+from PyQt5.QtGui import QFont, QTextOption, QFontMetricsF, QTextLayout
 from datetime import datetime
+import config_service
+from config_service import ConfigError, DEFAULT_TEXT_FONT
+from config_watcher import ConfigWatcher
+import tracing
+from tracing import traced
+from qt_fonts import application_font_family
+from line_validator import WordSplitValidator
+import text_layout
+import report_engine
+import pdf_worker
+from pdf_worker import PdfJob
+from preview import PreviewPane
+from phrase_completer import DiagnosisCodeCompleter, PatientCompleter, PhraseCompleter
+import patients
+import phrases
+import report_store
+import report_files
+from sessions import SessionWindow
+import drafts
+from drafts import DraftRecorder
+from ui_main_window import Ui_MainWindow
+from ui_page_window import Ui_PageWindow
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-def resource_path(relative_path):
-    """Get the absolute path to a resource, works for both development and PyInstaller."""
-    try:
-        # PyInstaller creates a temp folder and stores path in _MEIPASS
-        base_path = sys._MEIPASS
-    except Exception:
-        base_path = os.path.abspath(".")
-
-    return os.path.join(base_path, relative_path)
-
-def load_config():
-    """Load configuration from a JSON file."""
-    config_path = resource_path('config.json')
-    try:
-        with open(config_path, 'r', encoding='utf-8') as file:
-            config = json.load(file)
-            return config
-    except FileNotFoundError:
-        logging.error(f"Configuration file not found: {config_path}")
-        return {}
-    except json.JSONDecodeError as e:
-        logging.error(f"Error decoding JSON: {e}")
-        return {}
-
-class PageWindow(QMainWindow):
-    def __init__(self, num_pages, full_name, birth_date, jmbg):
-        super().__init__()
+# Time-to-first-window budget checked by --profile-startup, in milliseconds
+STARTUP_TARGET_MS = 500
 
-        self.errors = {}
+# Reports of past months are packed into bundles this long after startup, in milliseconds
+COMPACTION_DELAY_MS = 60 * 1000
 
-        # Load the page_window.ui file
-        uic.loadUi(resource_path("page_window.ui"), self)
+# Typical report text, measured in the editor and in the PDF to scale the printed line width
+SCALE_SAMPLE_TEXT = "Pacijent se javlja na kontrolu, TA 130/85 mmHg, puls 72/min. Terapija: šćđžč ŠĆĐŽČ"
 
-        # Load the configuration data
-        self.config = load_config()
 
-        # Access text input fields for both pages
-        self.textInputPage1 = self.findChild(QTextEdit, "textInputPage1")
-        self.diagnosisInputPage1 = self.findChild(QTextEdit, "diagnosisInputPage1")
-        self.textInputPage2 = self.findChild(QTextEdit, "textInputPage2") if num_pages > 1 else None
-        self.diagnosisInputPage2 = self.findChild(QTextEdit, "diagnosisInputPage2") if num_pages > 1 else None
+class StartupProfiler(QObject):
+    """Records how long each startup phase takes and prints the breakdown."""
 
-        # Load the monospaced fonts
-        monospaced_font_path = resource_path('fonts/NotoSansMono-Regular.ttf')
-        monospaced_bold_font_path = resource_path('fonts/NotoSansMono-Bold.ttf')
+    # Emitted once, after the first widget has been painted
+    firstPaint = pyqtSignal()
 
-        # Load the regular font
-        font_id_regular = QFontDatabase.addApplicationFont(monospaced_font_path)
-        if font_id_regular == -1:
-            logging.error("Failed to load Noto Sans Mono Regular font.")
-        else:
-            logging.info("Noto Sans Mono Regular font loaded successfully.")
+    def __init__(self, start_time):
+        super().__init__()
+        self.start_time = start_time
+        self.last_time = start_time
+        self.phases = []
+
+    def mark(self, phase):
+        """End the current phase, naming it phase."""
+        now = time.perf_counter()
+        self.phases.append((phase, (now - self.last_time) * 1000))
+        self.last_time = now
+
+    def watch_first_paint(self, app):
+        """Mark the "first paint" phase when any widget of app is painted for the first time."""
+        app.installEventFilter(self)
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Paint:
+            QApplication.instance().removeEventFilter(self)
+            self.mark("first paint")
+            # Let the paint finish before reporting
+            QTimer.singleShot(0, self.firstPaint.emit)
+        return False
+
+    def total_ms(self):
+        return (self.last_time - self.start_time) * 1000
+
+    def report(self):
+        """Print the phases and the total against STARTUP_TARGET_MS. Returns True if within the target."""
+        total_ms = self.total_ms()
+        for phase, elapsed_ms in self.phases:
+            print(f"{phase:<16}{elapsed_ms:8.1f} ms")
+        print(f"{'first window':<16}{total_ms:8.1f} ms (target {STARTUP_TARGET_MS} ms)")
+        return total_ms <= STARTUP_TARGET_MS
+
+class PageWindow(QMainWindow, Ui_PageWindow):
+    @traced("PageWindow.__init__")
+    def __init__(self, num_pages, full_name, birth_date, jmbg, draft=None, report=None):
+        super().__init__()
 
-        # Load the bold font
-        font_id_bold = QFontDatabase.addApplicationFont(monospaced_bold_font_path)
-        if font_id_bold == -1:
-            logging.error("Failed to load Noto Sans Mono Bold font.")
-        else:
-            logging.info("Noto Sans Mono Bold font loaded successfully.")
+        self.errors = {}
 
-        # Retrieve the font family names
-        font_family_regular = QFontDatabase.applicationFontFamilies(font_id_regular)[0]
-        font_family_bold = QFontDatabase.applicationFontFamilies(font_id_bold)[0]
+        # Widgets from page_window.ui, precompiled by build_ui.py
+        self.setupUi(self)
 
-        # Create QFont objects
+        # The .ui file defines two pages; build widgets for any further ones
+        self.stacked_widget = self.findChild(QStackedWidget, "stackedWidget")
+        for page_number in range(3, num_pages + 1):
+            self.add_page_widgets(page_number)
+
+        # Access text input fields for all pages
+        self.text_inputs = [self.findChild(QTextEdit, f"textInputPage{i}") for i in range(1, num_pages + 1)]
+        self.diagnosis_inputs = [self.findChild(QTextEdit, f"diagnosisInputPage{i}") for i in range(1, num_pages + 1)]
+        self.textInputPage1 = self.text_inputs[0]
+        self.diagnosisInputPage1 = self.diagnosis_inputs[0]
+        self.textInputPage2 = self.text_inputs[1] if num_pages > 1 else None
+        self.diagnosisInputPage2 = self.diagnosis_inputs[1] if num_pages > 1 else None
+
+        # The DG and diagnosis text use the font family the PDF prints them in
+        try:
+            self.text_font = config_service.get_config().get("text_font", DEFAULT_TEXT_FONT)
+        except ConfigError:
+            self.text_font = DEFAULT_TEXT_FONT
+
+        # Load the fonts; they are added to Qt once and shared by every page window
+        font_family_regular = application_font_family(f'fonts/{self.text_font}-Regular.ttf', f"{self.text_font} Regular")
+        font_family_bold = application_font_family(f'fonts/{self.text_font}-Bold.ttf', f"{self.text_font} Bold")
+
+        # Create QFont objects, sized in whole pixels so they scale exactly to the PDF font sizes
         fixed_font_size = 12  # Fixed font size
-        font_regular = QFont(font_family_regular, fixed_font_size)
-        font_bold = QFont(font_family_bold, fixed_font_size)
+        font_regular = QFont(font_family_regular)
+        font_bold = QFont(font_family_bold)
+        font_bold.setBold(True)
+
+        # Lay text out with the font's own advances and no kerning, as the PDF does
+        for font in (font_regular, font_bold):
+            font.setPixelSize(round(fixed_font_size * self.logicalDpiY() / 72))
+            font.setHintingPreference(QFont.PreferNoHinting)
+            font.setKerning(False)
 
         # Store fonts for later use
         self.font_regular = font_regular
         self.font_bold = font_bold
 
-        # Set the fonts to your QTextEdit widgets
-        self.textInputPage1.setFont(font_regular)
-        self.diagnosisInputPage1.setFont(font_regular)
-        if self.textInputPage2:
-            self.textInputPage2.setFont(font_regular)
-        if self.diagnosisInputPage2:
-            self.diagnosisInputPage2.setFont(font_regular)
-
-        # Set tab stop distance (for handling tabs)
-        tab_stop_distance = 40  # Adjust as needed
-        self.diagnosisInputPage1.setTabStopDistance(tab_stop_distance)
-        if self.diagnosisInputPage2:
-            self.diagnosisInputPage2.setTabStopDistance(tab_stop_distance)
+        # The DG table is printed in bold, the diagnosis in the regular face
+        for text_edit in self.text_inputs:
+            text_edit.setFont(font_bold)
+        for text_edit in self.diagnosis_inputs:
+            text_edit.setFont(font_regular)
 
-        # Set word wrap mode to allow wrapping at word boundaries
-        self.diagnosisInputPage1.setWordWrapMode(QTextOption.WrapAtWordBoundaryOrAnywhere)
-        if self.diagnosisInputPage2:
-            self.diagnosisInputPage2.setWordWrapMode(QTextOption.WrapAtWordBoundaryOrAnywhere)
-        self.textInputPage1.setWordWrapMode(QTextOption.WrapAtWordBoundaryOrAnywhere)
-        if self.textInputPage2:
-            self.textInputPage2.setWordWrapMode(QTextOption.WrapAtWordBoundaryOrAnywhere)
-
-        # Register fonts in ReportLab
-        if os.path.exists(monospaced_font_path) and os.path.exists(monospaced_bold_font_path):
-            try:
-                pdfmetrics.registerFont(TTFont('NotoSansMono', monospaced_font_path))
-                pdfmetrics.registerFont(TTFont('NotoSansMono-Bold', monospaced_bold_font_path))
-                logging.info("Monospaced fonts registered successfully.")
-            except Exception as e:
-                logging.error(f"Failed to register monospaced fonts: {e}")
-        else:
-            logging.error("Monospaced font files not found.")
-
-        # Set maximum characters per line
-        self.max_chars_per_line_dg_table = 71
-        self.max_chars_per_line_diagnosis = 89
+        # Tabs are printed as spaces up to the next multiple of four
+        tab_stop_distance = QFontMetricsF(font_regular).horizontalAdvance(' ') * text_layout.TAB_SIZE
+        for text_edit in self.diagnosis_inputs:
+            text_edit.setTabStopDistance(tab_stop_distance)
 
-        # Calculate the character width in the GUI (font size 12)
-        font_metrics = QFontMetrics(font_regular)
-        char_width_gui = font_metrics.horizontalAdvance('A')
-
-        # Set the fixed width of the DG table input boxes
-        self.textInputPage1.setFixedWidth(self.max_chars_per_line_dg_table * char_width_gui + char_width_gui + char_width_gui + char_width_gui)
-        if self.textInputPage2:
-            self.textInputPage2.setFixedWidth(self.max_chars_per_line_dg_table * char_width_gui + char_width_gui + char_width_gui + char_width_gui)
+        # Set word wrap mode to allow wrapping at word boundaries
+        for text_edit in self.text_inputs + self.diagnosis_inputs:
+            text_edit.setWordWrapMode(QTextOption.WrapAtWordBoundaryOrAnywhere)
 
-        # Set the fixed width of the diagnosis content input boxes
-        self.diagnosisInputPage1.setFixedWidth(self.max_chars_per_line_diagnosis * char_width_gui + char_width_gui + char_width_gui + char_width_gui)
-        if self.diagnosisInputPage2:
-            self.diagnosisInputPage2.setFixedWidth(self.max_chars_per_line_diagnosis * char_width_gui + char_width_gui + char_width_gui + char_width_gui)
+        # Wrap the input boxes at the printed line width, so lines break where they break in the PDF
+        for text_edit in self.text_inputs:
+            self.set_print_width(text_edit, f"{self.text_font}-Bold", report_engine.DG_FONT_SIZE,
+                                 report_engine.dg_text_width())
+        for text_edit in self.diagnosis_inputs:
+            self.set_print_width(text_edit, self.text_font, report_engine.DIAGNOSIS_FONT_SIZE,
+                                 report_engine.diagnosis_text_width())
 
         # Add scrollable area and set resizable behavior
         self.scroll_area = QScrollArea(self)
@@ -153,43 +174,58 @@ class PageWindow(QMainWindow):
         self.setMinimumSize(800, 600)
         self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
 
+        # Progress of background PDF generation, shown in the status bar
+        self.progress_bar = QProgressBar(self)
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setMaximumWidth(200)
+        self.progress_bar.hide()
+        self.statusBar().addPermanentWidget(self.progress_bar)
+
         # Keep track of the number of pages and patient information
+        self.pdf_job_running = False
         self.num_pages = num_pages
         self.full_name = full_name
         self.birth_date = birth_date
         self.jmbg = jmbg
 
-        # Define margins
-        self.base_x = 25  # Left margin
-        self.right_margin = 25  # Right margin
-
-        # Access page buttons and stacked widget from the .ui file
+        # Access page buttons from the .ui file
         self.page_buttons = [self.findChild(QPushButton, f"pageButton{i+1}") for i in range(num_pages)]
-        self.stacked_widget = self.findChild(QStackedWidget, "stackedWidget")
 
-        # Access date picker (QDateEdit) for both pages
-        self.dateEditPage1 = self.findChild(QDateEdit, "dateEditPage1")
-        self.dateEditPage2 = self.findChild(QDateEdit, "dateEditPage2") if num_pages > 1 else None
+        # Access date pickers (QDateEdit) for all pages
+        self.date_edits = [self.findChild(QDateEdit, f"dateEditPage{i}") for i in range(1, num_pages + 1)]
+        self.dateEditPage1 = self.date_edits[0]
+        self.dateEditPage2 = self.date_edits[1] if num_pages > 1 else None
 
         # Set date pickers to current date
         current_date = QDate.currentDate()
-        self.dateEditPage1.setDate(current_date)
-        if self.dateEditPage2:
-            self.dateEditPage2.setDate(current_date)
+        for date_edit in self.date_edits:
+            date_edit.setDate(current_date)
 
         # Access submit buttons from UI
-        self.log_button_page1 = self.findChild(QPushButton, "log_button_page1")
-        self.log_button_page2 = self.findChild(QPushButton, "log_button_page2") if num_pages > 1 else None
-
-        # Hide the submit buttons initially
-        self.log_button_page1.hide()
-        if self.log_button_page2:
-            self.log_button_page2.hide()
-
-        # Connect submit buttons to the PDF generation function
-        self.log_button_page1.clicked.connect(self.generate_pdf)
-        if self.log_button_page2:
-            self.log_button_page2.clicked.connect(self.generate_pdf)
+        self.log_buttons = [self.findChild(QPushButton, f"log_button_page{i}") for i in range(1, num_pages + 1)]
+        self.log_button_page1 = self.log_buttons[0]
+        self.log_button_page2 = self.log_buttons[1] if num_pages > 1 else None
+
+        # Hide the submit buttons initially and connect them to the PDF generation function
+        for log_button in self.log_buttons:
+            log_button.hide()
+            log_button.clicked.connect(self.generate_pdf)
+
+        # Live preview of the current page's sheets, redrawn as the page is edited
+        self.preview = PreviewPane(self.preview_record, self.text_font, self)
+        preview_dock = QDockWidget("Pregled", self)
+        preview_dock.setObjectName("previewDock")
+        preview_dock.setFeatures(QDockWidget.DockWidgetMovable | QDockWidget.DockWidgetFloatable)
+        preview_dock.setWidget(self.preview)
+        self.addDockWidget(Qt.RightDockWidgetArea, preview_dock)
+        for index in range(num_pages):
+            for changed in (self.text_inputs[index].textChanged, self.diagnosis_inputs[index].textChanged,
+                            self.date_edits[index].dateChanged):
+                changed.connect(lambda *_, i=index: self.preview.schedule(i))
+
+        # The .ui file defines a second page button; hide it if there is only one page
+        if num_pages == 1:
+            self.findChild(QPushButton, "pageButton2").hide()
 
         # Initially set to Page 1 and set default selections
         self.current_page = 1
@@ -200,13 +236,132 @@ class PageWindow(QMainWindow):
             if button:
                 button.clicked.connect(lambda _, x=i: self.switch_page(x + 1))
 
-        # Connect textChanged signals to the check methods
-        self.textInputPage1.textChanged.connect(self.check_textInputPage1)
-        self.diagnosisInputPage1.textChanged.connect(self.check_diagnosisInputPage1)
-        if self.num_pages > 1 and self.textInputPage2:
-            self.textInputPage2.textChanged.connect(self.check_textInputPage2)
-        if self.num_pages > 1 and self.diagnosisInputPage2:
-            self.diagnosisInputPage2.textChanged.connect(self.check_diagnosisInputPage2)
+        # Mark words too long for a printed line incrementally as the user types
+        self.validators = {}
+        for i in range(num_pages):
+            self.add_validator(self.text_inputs[i], f"{self.text_font}-Bold", report_engine.DG_FONT_SIZE,
+                               report_engine.dg_text_width(), f"textInputPage{i+1}")
+            self.add_validator(self.diagnosis_inputs[i], self.text_font, report_engine.DIAGNOSIS_FONT_SIZE,
+                               report_engine.diagnosis_text_width(), f"diagnosisInputPage{i+1}")
+
+        # Offer ICD-10 codes and phrases of past reports while the DG and diagnosis are typed
+        self.completers = ([DiagnosisCodeCompleter(text_edit) for text_edit in self.text_inputs] +
+                           [PhraseCompleter(text_edit) for text_edit in self.diagnosis_inputs])
+
+        # Fill in an unfinished report restored from its journal, or a stored report loaded from the archive
+        if draft:
+            self.restore_fields(draft[1]["fields"])
+        elif report:
+            self.fill_report(report)
+
+        # Journal every edit, so the report survives a crash before it is generated
+        journal_fields = {}
+        for i in range(num_pages):
+            for text_edit in (self.text_inputs[i], self.diagnosis_inputs[i]):
+                journal_fields[text_edit.objectName()] = (text_edit.toPlainText, text_edit.textChanged)
+            date_edit = self.date_edits[i]
+            journal_fields[date_edit.objectName()] = (
+                lambda e=date_edit: e.date().toString('dd-MM-yyyy'), date_edit.dateChanged)
+        patient = {"full_name": full_name, "birth_date": birth_date, "jmbg": jmbg, "num_pages": num_pages}
+        self.draft = DraftRecorder(patient, journal_fields, self, path=draft[0] if draft else None,
+                                   created=draft[1].get("created") if draft else None,
+                                   generated=draft[1].get("generated") if draft else None)
+        if report:
+            # A loaded report was generated already; its journal is only kept once it is edited
+            self.draft.compact(generated=True)
+
+    def restore_fields(self, fields):
+        """Set the DG, diagnosis and date fields from their journaled text, keyed by object name."""
+        for name, value in fields.items():
+            date_edit = self.findChild(QDateEdit, name)
+            if date_edit:
+                date_edit.setDate(QDate.fromString(value, 'dd-MM-yyyy'))
+                continue
+            text_edit = self.findChild(QTextEdit, name)
+            if text_edit:
+                text_edit.setPlainText(value)
+
+    def fill_report(self, report):
+        """Set the DG, diagnosis and date fields from a report record, one page per entry."""
+        for index, page in enumerate(report["pages"]):
+            self.text_inputs[index].setPlainText(page["dg"])
+            self.diagnosis_inputs[index].setPlainText(page["diagnosis"])
+            self.date_edits[index].setDate(QDate.fromString(page["date"], 'dd-MM-yyyy'))
+
+    def closeEvent(self, event):
+        self.draft.close()
+        super().closeEvent(event)
+
+    def set_active(self, active):
+        """Called by the session window when this report's tab is shown or hidden."""
+        self.preview.set_active(active)
+
+    def suspend(self):
+        """The state to build this window again from, its fields journaled first; None while its PDF is written."""
+        if self.pdf_job_running:
+            return None
+        self.draft.flush()
+        return self.draft.path, dict(self.draft.snapshot(), current_page=self.current_page)
+
+    @classmethod
+    def resume(cls, state):
+        """Build a suspended page window again from its state."""
+        path, draft = state
+        page_window = cls(draft["num_pages"], draft["full_name"], draft["birth_date"], draft["jmbg"], draft=state)
+        page_window.switch_page(draft["current_page"])
+        return page_window
+
+    @staticmethod
+    def close_suspended(state):
+        """Close the journal of a suspended page window, as closing the window would have."""
+        drafts.close_journal(*state)
+
+    def add_page_widgets(self, page_number):
+        """Create the button and input widgets for a page beyond the two defined in page_window.ui."""
+        template_text_input = self.findChild(QTextEdit, "textInputPage2")
+        template_diagnosis_input = self.findChild(QTextEdit, "diagnosisInputPage2")
+        template_button = self.findChild(QPushButton, "pageButton2")
+
+        # Page button next to the existing ones
+        page_button = QPushButton(template_button.text(), self)
+        page_button.setObjectName(f"pageButton{page_number}")
+        page_button.setMinimumHeight(template_button.minimumHeight())
+        self.findChild(QHBoxLayout, "horizontalLayoutButtons").addWidget(page_button)
+
+        page = QWidget()
+        page.setObjectName(f"page{page_number}")
+        page_layout = QVBoxLayout(page)
+
+        # DG input and diagnosis input, sized like the ones on page 2
+        text_input = QTextEdit(page)
+        text_input.setObjectName(f"textInputPage{page_number}")
+        text_input.setPlaceholderText(template_text_input.placeholderText())
+        text_input.setSizePolicy(template_text_input.sizePolicy())
+        page_layout.addWidget(text_input)
+
+        diagnosis_input = QTextEdit(page)
+        diagnosis_input.setObjectName(f"diagnosisInputPage{page_number}")
+        diagnosis_input.setPlaceholderText(template_diagnosis_input.placeholderText())
+        diagnosis_input.setSizePolicy(template_diagnosis_input.sizePolicy())
+        page_layout.addWidget(diagnosis_input)
+
+        # Bottom controls: date picker and submit button
+        bottom_layout = QHBoxLayout()
+        template_date_edit = self.findChild(QDateEdit, "dateEditPage2")
+        date_edit = QDateEdit(page)
+        date_edit.setObjectName(f"dateEditPage{page_number}")
+        date_edit.setFont(template_date_edit.font())
+        date_edit.setDisplayFormat(template_date_edit.displayFormat())
+        date_edit.setCalendarPopup(True)
+        bottom_layout.addWidget(date_edit)
+        bottom_layout.addStretch()
+        log_button = QPushButton(self.findChild(QPushButton, "log_button_page2").text(), page)
+        log_button.setObjectName(f"log_button_page{page_number}")
+        log_button.setMinimumHeight(40)
+        bottom_layout.addWidget(log_button)
+        page_layout.addLayout(bottom_layout)
+
+        self.stacked_widget.addWidget(page)
 
     def switch_page(self, page_number):
         """Switch to the selected page and update the button styles."""
@@ -215,20 +370,11 @@ class PageWindow(QMainWindow):
             self.current_page = page_number
             self.stacked_widget.setCurrentIndex(page_number - 1)
 
-            if page_number == 1:
-                if self.num_pages == 1:
-                    self.log_button_page1.show()
-                else:
-                    self.log_button_page1.hide()
-                if self.log_button_page2:
-                    self.log_button_page2.hide()
-            elif page_number == 2:
-                if self.log_button_page2:
-                    self.log_button_page2.show()
-                self.log_button_page1.hide()
+            # Only the last page carries the submit button
+            for number, log_button in enumerate(self.log_buttons, start=1):
+                log_button.setVisible(number == page_number == self.num_pages)
 
-            if self.num_pages == 1:
-                self.log_button_page1.show()
+            self.preview.show_entry(page_number - 1)
 
             self.update_button_styles()
 
@@ -256,188 +402,46 @@ class PageWindow(QMainWindow):
                         }
                     """)
 
-    def format_date(self, date_str):
-        """Format date to 'dd.mm.yyyy.' format with leading zeros."""
-        try:
-            date_obj = datetime.strptime(date_str, '%d-%m-%Y')
-            return date_obj.strftime('%d.%m.%Y.')
-        except ValueError:
-            logging.error(f"Invalid date format: {date_str}")
-            return date_str
-
-    def draw_header(self, pdf_canvas, y_position):
-        """Draw the header with centered alignment using data from the JSON file."""
-        # Load header text from the config
-        header_text = self.config.get("header", ["Default Header"])
-
-        pdf_canvas.setFont("NotoSansMono-Bold", 12)
-        max_line_width = max(pdf_canvas.stringWidth(line, "NotoSansMono-Bold", 12) for line in header_text)
-
-        for line in header_text:
-            line_width = pdf_canvas.stringWidth(line, "NotoSansMono-Bold", 12)
-            offset = (max_line_width - line_width) / 2
-            pdf_canvas.drawString(self.base_x + offset, y_position, line)
-            y_position -= 20
-
-        return y_position
-
-    def draw_patient_info(self, pdf_canvas, y_position):
-        """Draw the patient information block."""
-        pdf_canvas.setFont("NotoSansMono-Bold", 12)
-
-        # Define patient information text
-        patient_info = [
-            f"Ime i prezime pacijenta: {self.full_name}",
-            f"Datum rođenja: {self.format_date(self.birth_date)}",
-            f"JMBG: {self.jmbg}"
-        ]
-
-        # Draw each line of the patient information text
-        y_position -= 20  # Move the patient info a couple of rows down
-        for line in patient_info:
-            pdf_canvas.drawString(self.base_x + 10, y_position, line)
-            y_position -= 15  # Move to the next line
-
-        return y_position
-
-    def draw_dg_table(self, pdf_canvas, y_position, dg_text):
-        """Draw the DG table with two columns and respect original line breaks."""
-        pdf_canvas.setFont("NotoSansMono-Bold", 12)
-
-        # Get page width from the canvas
-        width, height = pdf_canvas._pagesize
-
-        # Set the starting x-position for DG
-        dg_x = self.base_x
-
-        # Set the initial y-position to align DG with text
-        y_position -= 15  # Move down slightly to align vertically
-
-        # Draw the "DG:" label
-        pdf_canvas.drawString(dg_x, y_position, "DG:")
-
-        # Set the starting x-position for the DG text (aligned with "DG:")
-        text_x = self.base_x + 30  # Adjust this to align DG with the text
-
-        # Define the maximum width for text wrapping
-        max_line_width = width - self.base_x - self.right_margin - (text_x - self.base_x)
-
-        # Split the DG text by line breaks
-        lines = dg_text.split('\n')
-
-        for line in lines:
-            if line.strip() == "":
-                # Add space for empty lines in the input
-                y_position -= 15
-                continue
-
-            # Wrap the line manually based on character limit
-            while len(line) > self.max_chars_per_line_dg_table:
-                to_draw = line[:self.max_chars_per_line_dg_table]
-                pdf_canvas.drawString(text_x, y_position, to_draw)
-                y_position -= 15  # Move down for the next line
-                line = line[self.max_chars_per_line_dg_table:]
-            # Draw the remaining part
-            pdf_canvas.drawString(text_x, y_position, line)
-            y_position -= 15  # Move down for the next line
-
-        return y_position
-
-    def draw_diagnosis_content(self, pdf_canvas, y_position, text_edit):
-        """Draw the 'Content of Diagnosis' text, matching QTextEdit's displayed lines."""
-        # Set font
-        font_size = 10  # The font size used in the PDF
-        pdf_canvas.setFont("NotoSansMono", font_size)
-
-        # Define a custom line spacing factor for the PDF
-        line_spacing_factor = 1.5  # Adjust this value as needed
-
-        # Calculate line height based on font size and line spacing factor
-        line_height = font_size * line_spacing_factor
-
-        # Add initial empty line
-        y_position -= 1 * line_height
-
-        # Retrieve text from QTextEdit and expand tabs
-        text_content = text_edit.toPlainText().expandtabs(tabsize=4)  # You can adjust tabsize as needed
-        displayed_lines = text_content.split('\n')
-
-        # Draw each line
-        for line in displayed_lines:
-            # Wrap the line manually based on character limit
-            while len(line) > self.max_chars_per_line_diagnosis:
-                to_draw = line[:self.max_chars_per_line_diagnosis]
-                pdf_canvas.drawString(self.base_x, y_position, to_draw)
-                y_position -= line_height
-                line = line[self.max_chars_per_line_diagnosis:]
-            # Draw the remaining part
-            pdf_canvas.drawString(self.base_x, y_position, line)
-            y_position -= line_height
-
-        return y_position
-
-    def draw_footer(self, pdf_canvas, y_position, page_date):
-        """Draw the date and doctor's information at the bottom of the page using data from the JSON file."""
-        pdf_canvas.setFont("NotoSansMono-Bold", 10)
-
-        # Draw the date text on the left side
-        footer_left_x = self.base_x
-        footer_left_y = y_position - 20  # Move it 4-5 lines down
-        pdf_canvas.drawString(footer_left_x, footer_left_y, f"{self.format_date(page_date)} Beograd")
-
-        # Load the footer information from the configuration file
-        footer_info = self.config.get("footer", ["Default Doctor Info"])
-        max_line_width = max(pdf_canvas.stringWidth(line, "NotoSansMono-Bold", 10) for line in footer_info)
-
-        # Align the footer info to the right side
-        footer_right_x = A4[0] - self.base_x - max_line_width
-        footer_right_y = footer_left_y
-
-        # Draw each line of the footer information
-        for line in footer_info:
-            line_width = pdf_canvas.stringWidth(line, "NotoSansMono-Bold", 10)
-            offset = (max_line_width - line_width) / 2  # Center horizontally
-            pdf_canvas.drawString(footer_right_x + offset, footer_right_y, line)
-            footer_right_y -= 15  # Move down for the next line
-
-        return y_position - 100  # Adjust the y-position to account for the footer height
-
-    def check_textInputPage1(self):
-        self.check_input_length(self.textInputPage1, self.max_chars_per_line_dg_table, 'textInputPage1')
-
-    def check_diagnosisInputPage1(self):
-        self.check_input_length(self.diagnosisInputPage1, self.max_chars_per_line_diagnosis, 'diagnosisInputPage1')
-
-    def check_textInputPage2(self):
-        if self.textInputPage2:
-            self.check_input_length(self.textInputPage2, self.max_chars_per_line_dg_table, 'textInputPage2')
-
-    def check_diagnosisInputPage2(self):
-        if self.diagnosisInputPage2:
-            self.check_input_length(self.diagnosisInputPage2, self.max_chars_per_line_diagnosis, 'diagnosisInputPage2')
-
-    def check_input_length(self, text_edit, max_chars_per_line, key):
-        """Check the length of each line in the text_edit and update error state."""
-        # Expand tabs in the text
-        text = text_edit.toPlainText().expandtabs(tabsize=4)
-        lines = text.split('\n')
-        error = False
-        for line in lines:
-            if len(line) > max_chars_per_line:
-                error = True
-                break
-        if error:
-            # Set the border of text_edit to red and display a message
-            text_edit.setStyleSheet("border: 2px solid red;")
-            text_edit.setToolTip("Line exceeds maximum length; please continue on the next line.")
-            self.errors[key] = True  # Set error state for this field
+    def set_print_width(self, text_edit, pdf_font, pdf_font_size, pdf_text_width):
+        """Wrap text_edit at the width its text has in the PDF, scaled from the PDF font to the editor's."""
+        # Qt rounds every glyph advance down to 1/64 pixel; scale by measured widths to account for it
+        layout = QTextLayout(SCALE_SAMPLE_TEXT, text_edit.font())
+        option = QTextOption()
+        option.setUseDesignMetrics(True)
+        layout.setTextOption(option)
+        layout.beginLayout()
+        line = layout.createLine()
+        layout.endLayout()
+        scale = line.naturalTextWidth() / text_layout.text_width(SCALE_SAMPLE_TEXT, pdf_font, pdf_font_size)
+        text_width = pdf_text_width * scale
+
+        # The wrap width includes the document margins on both sides, and a pixel for the ink of
+        # the last glyph, which Qt keeps inside the line even where it overhangs the glyph's advance
+        wrap_width = math.ceil(text_width + 2 * text_edit.document().documentMargin() + 1)
+        text_edit.document().setUseDesignMetrics(True)
+        text_edit.setLineWrapMode(QTextEdit.FixedPixelWidth)
+        text_edit.setLineWrapColumnOrWidth(wrap_width)
+
+        # Room for the frame and the vertical scroll bar
+        text_edit.setFixedWidth(wrap_width + 2 * text_edit.frameWidth() + text_edit.verticalScrollBar().sizeHint().width())
+
+    def add_validator(self, text_edit, font_name, font_size, max_width, key):
+        """Attach an incremental validator to text_edit and track its error state."""
+        validator = WordSplitValidator(text_edit, font_name, font_size, max_width)
+        validator.errorStateChanged.connect(
+            lambda has_error, e=text_edit, k=key: self.update_error_state(e, k, has_error))
+        self.validators[key] = validator
+        self.errors[key] = validator.has_error
+
+    def update_error_state(self, text_edit, key, has_error):
+        """Update the tooltip and error state of a field; the offending lines are marked by its validator."""
+        if has_error:
+            text_edit.setToolTip("A word is too long to fit on a printed line; please shorten or split it.")
         else:
-            # Reset the border
-            text_edit.setStyleSheet("")
             text_edit.setToolTip("")
-            self.errors[key] = False  # Clear error state for this field
-
+        self.errors[key] = has_error
 
+    @traced("generate_pdf")
     def generate_pdf(self):
         """Generate a PDF report based on the input data."""
         if any(self.errors.values()):
@@ -446,140 +450,97 @@ class PageWindow(QMainWindow):
             QMessageBox.warning(
                 self,
                 "Greška",
-                "Nije moguće generisati izveštaj, neka od linija u crvenom polju je duža nego što bi smelo."
+                "Nije moguće generisati izveštaj, neka od reči u crvenom polju je duža od jednog reda."
             )
             return
 
-        # Create the /izvestaji/ folder if it doesn't exist
-        pdf_output_folder = os.path.join(os.getcwd(), 'izvestaji')
-        if not os.path.exists(pdf_output_folder):
-            os.makedirs(pdf_output_folder)
-
-        # Generate the PDF file name with the /izvestaji/ directory
-        pdf_file_name = os.path.join(pdf_output_folder, f"{self.full_name.replace(' ', '_').replace('-', '_')}_{datetime.now().strftime('%Y%m%d')}.pdf")
-
-        # Generate the TXT file name in the current working directory
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        txt_file_name = f"{self.full_name.replace(' ', '_').replace('-', '_')}_{timestamp}.txt"
-
-        # Register fonts in ReportLab
-        monospaced_font_path = resource_path('fonts/NotoSansMono-Regular.ttf')
-        monospaced_bold_font_path = resource_path('fonts/NotoSansMono-Bold.ttf')
-
-        if os.path.exists(monospaced_font_path) and os.path.exists(monospaced_bold_font_path):
-            try:
-                pdfmetrics.registerFont(TTFont('NotoSansMono', monospaced_font_path))
-                pdfmetrics.registerFont(TTFont('NotoSansMono-Bold', monospaced_bold_font_path))
-                logging.info("Monospaced fonts registered successfully.")
-            except Exception as e:
-                logging.error(f"Failed to register monospaced fonts: {e}")
-                return
-        else:
-            logging.error("Monospaced font files not found.")
+        # Header and footer come from the config as it is now, so edits apply without a restart
+        try:
+            config = config_service.get_config()
+        except ConfigError as e:
+            QMessageBox.warning(self, "Greška", f"Podešavanja (config.json) nisu ispravna: {e}")
             return
 
-        pdf_canvas = canvas.Canvas(pdf_file_name, pagesize=A4)
-        width, height = A4
-
-        # Draw the header, patient info, and DG table on Page 1
-        y_position = height - 30  # Adjust top margin
-        y_position = self.draw_header(pdf_canvas, y_position)
-        y_position = self.draw_patient_info(pdf_canvas, y_position - 10)
-        dg_text_page1 = self.textInputPage1.toPlainText() or "IDEM"
-        y_position = self.draw_dg_table(pdf_canvas, y_position - 20, dg_text_page1)
-        # Draw diagnosis content for Page 1
-        y_position = self.draw_diagnosis_content(pdf_canvas, y_position, self.diagnosisInputPage1)
-        # Draw footer on Page 1
-        page_date_page1 = self.dateEditPage1.date().toString('dd-MM-yyyy')
-        y_position = self.draw_footer(pdf_canvas, y_position, page_date_page1)
-
-        # Initialize variables for Page 2 content
-        dg_text_page2 = None
-        diagnosis_content_page2 = None
-
-        # Add content for Page 2 if applicable
-        if self.num_pages > 1:
-            pdf_canvas.showPage()
-
-            # Draw the header, patient info, and DG table on Page 2
-            y_position = height - 30  # Adjust top margin
-            y_position = self.draw_header(pdf_canvas, y_position)
-            y_position = self.draw_patient_info(pdf_canvas, y_position - 10)
-            dg_text_page2 = self.textInputPage2.toPlainText() or "IDEM"
-            y_position = self.draw_dg_table(pdf_canvas, y_position - 20, dg_text_page2)
-            # Draw diagnosis content for Page 2
-            y_position = self.draw_diagnosis_content(pdf_canvas, y_position, self.diagnosisInputPage2)
-            # Draw footer on Page 2
-            page_date_page2 = self.dateEditPage2.date().toString('dd-MM-yyyy')
-            y_position = self.draw_footer(pdf_canvas, y_position, page_date_page2)
-
-        pdf_canvas.save()
-        logging.info(f"PDF report saved as {pdf_file_name}")
-
-        # Save content to a .txt file in the current working directory
-        diagnosis_content_page1 = self.diagnosisInputPage1.toPlainText()
-        if self.num_pages > 1:
-            diagnosis_content_page2 = self.diagnosisInputPage2.toPlainText()
-        self.save_content_to_txt(txt_file_name, dg_text_page1, diagnosis_content_page1, dg_text_page2, diagnosis_content_page2)
-
-        # Open the generated PDF automatically
-        self.open_pdf(pdf_file_name)
-
-    def save_content_to_txt(self, txt_file_name, dg_text_page1, diagnosis_content_page1, dg_text_page2=None, diagnosis_content_page2=None):
-        """Save the DG and diagnosis content to a .txt file in the /txt/ subfolder."""
-        txt_folder = "txt"
-        os.makedirs(txt_folder, exist_ok=True)
-        txt_file_path = os.path.join(txt_folder, txt_file_name)
-
-        try:
-            with open(txt_file_path, 'w', encoding='utf-8') as txt_file:
-                txt_file.write("Page 1 - DG:\n")
-                txt_file.write(dg_text_page1 + "\n\n")
-                txt_file.write("Page 1 - Diagnosis Content:\n")
-                txt_file.write(diagnosis_content_page1 + "\n\n")
-
-                if dg_text_page2 and diagnosis_content_page2:
-                    txt_file.write("Page 2 - DG:\n")
-                    txt_file.write(dg_text_page2 + "\n\n")
-                    txt_file.write("Page 2 - Diagnosis Content:\n")
-                    txt_file.write(diagnosis_content_page2 + "\n\n")
-
-            logging.info(f"Content saved to {txt_file_path}")
-        except Exception as e:
-            logging.error(f"Failed to save content to .txt file: {e}")
-
-    def open_pdf(self, file_name):
-        """Open the generated PDF file automatically."""
-        try:
-            if sys.platform == "win32":
-                os.startfile(file_name)
-            elif sys.platform == "darwin":
-                subprocess.run(["open", file_name])
-            else:
-                subprocess.run(["xdg-open", file_name])
-        except Exception as e:
-            logging.error(f"Failed to open PDF: {e}")
-
-class MainWindow(QMainWindow):
+        # The PDF goes to the folder of this month, /izvestaji/YYYY/MM/
+        pdf_output_folder = os.path.join(os.getcwd(), report_files.REPORTS_FOLDER)
+        pdf_file_name = report_files.report_path(pdf_output_folder, self.full_name, datetime.now())
+        os.makedirs(os.path.dirname(pdf_file_name), exist_ok=True)
+
+        # Render and save in the background from a snapshot of the form data
+        # Print in the font the input boxes were laid out with
+        config = dict(config, text_font=self.text_font)
+        job = PdfJob(self.collect_record(), config, pdf_file_name)
+        job.signals.progress.connect(self.on_pdf_progress)
+        job.signals.finished.connect(self.on_pdf_finished)
+        job.signals.failed.connect(self.on_pdf_failed)
+        for log_button in self.log_buttons:
+            log_button.setEnabled(False)
+        self.pdf_job_running = True
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        pdf_worker.start_job(job)
+
+        # The journal now only needs what was just generated; it is dropped when the window closes
+        self.draft.compact(generated=True)
+
+    def on_pdf_progress(self, percent, message):
+        self.progress_bar.setValue(percent)
+        self.statusBar().showMessage(message)
+
+    def on_pdf_finished(self, pdf_file_name):
+        """Re-enable the form once the report is written; the viewer is opened by the worker."""
+        self.pdf_job_running = False
+        self.progress_bar.hide()
+        self.statusBar().showMessage(f"Izveštaj sačuvan: {pdf_file_name}", 10000)
+        for log_button in self.log_buttons:
+            log_button.setEnabled(True)
+
+    def on_pdf_failed(self, error):
+        # Keep the journal of the report that could not be written
+        self.draft.compact()
+        self.pdf_job_running = False
+        self.progress_bar.hide()
+        self.statusBar().clearMessage()
+        for log_button in self.log_buttons:
+            log_button.setEnabled(True)
+        QMessageBox.warning(self, "Greška", f"Nije moguće generisati izveštaj: {error}")
+
+    def collect_page(self, index):
+        """The DG, diagnosis and date of one page of the form."""
+        return {
+            "dg": self.text_inputs[index].toPlainText(),
+            "diagnosis": self.diagnosis_inputs[index].toPlainText(),
+            "date": self.date_edits[index].date().toString('dd-MM-yyyy'),
+        }
+
+    def collect_record(self):
+        """Build a plain report record from the current form contents."""
+        return report_engine.normalize_record({
+            "full_name": self.full_name,
+            "birth_date": self.birth_date,
+            "jmbg": self.jmbg,
+            "pages": [self.collect_page(index) for index in range(self.num_pages)],
+        })
+
+    def preview_record(self, index):
+        """A record holding the patient data and only the page with this index, for the preview."""
+        return report_engine.normalize_record({
+            "full_name": self.full_name,
+            "birth_date": self.birth_date,
+            "jmbg": self.jmbg,
+            "pages": [self.collect_page(index)],
+        })
+
+class MainWindow(QMainWindow, Ui_MainWindow):
+    @traced("MainWindow.__init__")
     def __init__(self):
         super().__init__()
 
-        # Load the main_window.ui file
-        uic.loadUi(resource_path("main_window.ui"), self)
+        # Widgets from main_window.ui, precompiled by build_ui.py
+        self.setupUi(self)
 
-        # Load the monospaced fonts
-        monospaced_font_path = resource_path('fonts/NotoSansMono-Regular.ttf')
-        monospaced_bold_font_path = resource_path('fonts/NotoSansMono-Bold.ttf')
-
-        # Load the regular font
-        font_id_regular = QFontDatabase.addApplicationFont(monospaced_font_path)
-        if font_id_regular == -1:
-            logging.error("Failed to load Noto Sans Mono Regular font.")
-        else:
-            logging.info("Noto Sans Mono Regular font loaded successfully.")
-
-        # Retrieve the font family names
-        font_family_regular = QFontDatabase.applicationFontFamilies(font_id_regular)[0]
+        # Load the monospaced font
+        font_family_regular = application_font_family('fonts/NotoSansMono-Regular.ttf', "Noto Sans Mono Regular")
 
         # Create QFont objects
         fixed_font_size = 12  # Fixed font size
@@ -616,6 +577,99 @@ class MainWindow(QMainWindow):
 
         self.start_button.clicked.connect(self.open_page_window)
 
+        # A known patient's name and birth date are filled in from their JMBG
+        self.jmbg_edit.textChanged.connect(self.prefill_patient)
+        self.prefilled_name = None
+        self.jmbg_completer = PatientCompleter(self.jmbg_edit)
+
+        # Tabs of the patients whose reports are being written, created with the first one
+        self.session_window = None
+
+        # Pick up edits to config.json while the app is running
+        self.config_watcher = ConfigWatcher(config_service.default_service(), self)
+        self.config_watcher.configChanged.connect(
+            lambda config: self.statusBar().showMessage("Podešavanja su učitana.", 5000))
+        self.config_watcher.configError.connect(self.show_config_error)
+        try:
+            config_service.get_config()
+        except ConfigError as e:
+            self.show_config_error(str(e))
+
+        # Search panel over archived reports
+        self.archive_button = self.findChild(QPushButton, "archiveButton")
+        if self.archive_button:
+            self.archive_button.clicked.connect(self.open_archive_window)
+
+        # Merges or zips the reports of a day for printing or the insurer
+        self.export_button = self.findChild(QPushButton, "exportButton")
+        if self.export_button:
+            self.export_button.clicked.connect(self.open_export_window)
+
+    def show_config_error(self, error):
+        """Tell the user config.json was rejected; the last valid settings stay in use."""
+        self.statusBar().showMessage(f"Podešavanja (config.json) nisu ispravna: {error}")
+
+    def offer_drafts(self):
+        """Offer to reopen the reports that were still being typed when the app last stopped."""
+        for path, state in drafts.list_drafts():
+            try:
+                created = datetime.fromisoformat(state["created"]).strftime('%d.%m.%Y. u %H:%M')
+            except (KeyError, TypeError, ValueError):
+                created = "ranije"
+            answer = QMessageBox.question(
+                self,
+                "Nezavršen izveštaj",
+                f"Pronađen je nezavršen izveštaj za pacijenta {state.get('full_name') or '(bez imena)'}, "
+                f"započet {created}.\nDa li želite da ga nastavite?",
+                QMessageBox.Yes | QMessageBox.No,
+                QMessageBox.Yes,
+            )
+            if answer != QMessageBox.Yes:
+                drafts.discard_journal(path)
+                continue
+
+            try:
+                self.open_session(int(state["num_pages"]), state["full_name"], state["birth_date"], state["jmbg"],
+                                  draft=(path, state))
+            except (KeyError, TypeError, ValueError) as e:
+                logging.error(f"Cannot restore draft {path}: {e}")
+
+    def prefill_patient(self):
+        """Fill in the name and birth date of a known patient, or the birth date encoded in a new patient's JMBG."""
+        jmbg = self.jmbg_edit.toPlainText().strip()
+        if len(jmbg) != patients.JMBG_LENGTH:
+            return
+        index = patients.shared_index()
+        patient = index.get(jmbg) if index is not None else None
+        if patient:
+            full_name, birth_date = patient
+            self.name_edit.setPlainText(full_name)
+            self.date_edit.setDate(QDate.fromString(birth_date, 'dd-MM-yyyy'))
+            self.prefilled_name = full_name
+            return
+
+        # A name filled in for another JMBG is not this patient's
+        if self.prefilled_name is not None and self.name_edit.toPlainText() == self.prefilled_name:
+            self.name_edit.clear()
+        self.prefilled_name = None
+        if patients.validate_jmbg(jmbg) is None:
+            birth_date = patients.jmbg_birth_date(jmbg)
+            self.date_edit.setDate(QDate(birth_date.year, birth_date.month, birth_date.day))
+
+    def confirm_jmbg(self, jmbg):
+        """Check the JMBG against its check digit and the birth date; if it fails, ask whether to go on anyway."""
+        problem = patients.validate_jmbg(jmbg, self.date_edit.date().toPyDate())
+        if problem is None:
+            return True
+        answer = QMessageBox.question(
+            self,
+            "Neispravan JMBG",
+            f"{problem}\nDa li ipak želite da nastavite?",
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.No,
+        )
+        return answer == QMessageBox.Yes
+
     def open_page_window(self):
         """Open the page window based on the number of pages."""
         num_pages = self.page_count_box.value()
@@ -624,30 +678,97 @@ class MainWindow(QMainWindow):
         full_name = self.name_edit.toPlainText().strip()
         birth_date = self.date_edit.date().toString('dd-MM-yyyy')
         jmbg = self.jmbg_edit.toPlainText().strip()
+        if jmbg and not self.confirm_jmbg(jmbg):
+            return None
 
         logging.info(f"Number of Pages: {num_pages}, Name: {full_name}, Birth Date: {birth_date}, JMBG: {jmbg}")
 
         # Open the page window with the specified number of pages and patient information
-        self.page_window = PageWindow(num_pages, full_name, birth_date, jmbg)
-
-        # Hide the second page button if only one page is selected
-        if num_pages == 1:
-            # Hide the "pageButton2"
-            page_button_2 = self.page_window.findChild(QPushButton, "pageButton2")
-            if page_button_2:
-                page_button_2.hide()
-
-        self.page_window.show()
+        return self.open_session(num_pages, full_name, birth_date, jmbg)
+
+    def open_session(self, num_pages, full_name, birth_date, jmbg, draft=None, report=None):
+        """Open a page window for a patient in a new tab of the session window."""
+        page_window = PageWindow(num_pages, full_name, birth_date, jmbg, draft=draft, report=report)
+        if self.session_window is None:
+            self.session_window = SessionWindow()
+        self.session_window.add_session(page_window, full_name)
+        return page_window
+
+    def open_stored_report(self, record_ref):
+        """Open the report stored at the locator record_ref in a new tab, to edit it or generate it again."""
+        try:
+            report = report_store.read_record(record_ref)["report"]
+        except (OSError, report_store.RecordError) as e:
+            logging.error(f"Cannot load the report record {record_ref}: {e}")
+            QMessageBox.warning(self, "Greška", f"Nije moguće učitati izveštaj: {e}")
+            return None
+        return self.open_session(len(report["pages"]), report["full_name"], report["birth_date"], report["jmbg"],
+                                 report=report)
+
+    def open_archive_window(self):
+        """Open the archive search panel, reusing it if it is already open."""
+        if getattr(self, "archive_window", None) is None:
+            # Imported on first use to keep it out of startup
+            from archive_window import ArchiveWindow
+            self.archive_window = ArchiveWindow(open_report=self.open_stored_report)
+        self.archive_window.show()
+        self.archive_window.raise_()
+
+    def open_export_window(self):
+        """Open the export window, reusing it if it is already open."""
+        if getattr(self, "export_window", None) is None:
+            # Imported on first use to keep it out of startup
+            from export_window import ExportWindow
+            self.export_window = ExportWindow(self)
+        self.export_window.show()
+        self.export_window.raise_()
 
 def main():
+    # --profile-startup prints how long each phase took to get the first window up, then quits
+    profiler = None
+    if "--profile-startup" in sys.argv:
+        sys.argv.remove("--profile-startup")
+        profiler = StartupProfiler(STARTUP_START_TIME)
+        profiler.mark("imports")
+
+    # --trace records timing spans (like DOCTORREPORT_TRACE=1), see tracing.py
+    if "--trace" in sys.argv:
+        sys.argv.remove("--trace")
+        tracing.enable()
+
     # Set application attributes before creating QApplication
     QApplication.setAttribute(Qt.AA_EnableHighDpiScaling, False)
     QApplication.setAttribute(Qt.AA_Use96Dpi, True)
 
     app = QApplication(sys.argv)
+    if profiler:
+        profiler.mark("QApplication")
     window = MainWindow()
+    if profiler:
+        profiler.mark("MainWindow")
+        profiler.firstPaint.connect(lambda: app.exit(0 if profiler.report() else 1))
+        profiler.watch_first_paint(app)
     window.show()
-    sys.exit(app.exec_())
+
+    if not profiler:
+        # Load ReportLab and the PDF fonts while the user fills in the form
+        QTimer.singleShot(0, pdf_worker.preload)
+
+        # Load the phrases offered while typing, and the patients filled in from their JMBG
+        QTimer.singleShot(0, phrases.preload)
+        QTimer.singleShot(0, patients.preload)
+
+        # Offer to continue reports interrupted by a crash or shutdown
+        QTimer.singleShot(0, window.offer_drafts)
+
+        # Pack the reports of past months into bundles once the program has settled
+        QTimer.singleShot(COMPACTION_DELAY_MS, report_files.start_compaction)
+    exit_code = app.exec_()
+
+    # Let reports that are still being written finish before quitting; a compaction resumes at the next start
+    report_files.stop_compaction()
+    pdf_worker.wait_for_jobs()
+    sys.exit(exit_code)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,153 @@
+"""Patient master index: the name and birth date of every patient, by JMBG, for prefilling the start screen.
+
+Patients are stored in the patients table of the archive database as their
+reports are archived. At startup the table is read on a background thread
+into a dict, for lookups by the full JMBG, and a sorted list of the JMBGs,
+whose prefixes form one range found by bisection.
+
+A JMBG is DDMMYYYRRBBBK: the birth date with the last three digits of the
+year, a region, a serial number and a check digit (see validate_jmbg).
+"""
+import logging
+import sqlite3
+import threading
+from bisect import bisect_left, insort
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import archive
+
+JMBG_LENGTH = 13
+
+# Typed JMBG prefixes shorter than this get no suggestions
+MIN_PREFIX = 4
+
+# Patients suggested at most for a prefix
+MAX_SUGGESTIONS = 8
+
+# Weights of the first twelve digits in the check digit
+_CHECK_WEIGHTS = (7, 6, 5, 4, 3, 2, 7, 6, 5, 4, 3, 2)
+
+# The shared index, once loaded, and the thread loading it
+_index = None
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def jmbg_birth_date(jmbg):
+    """The birth date encoded in the first seven digits of jmbg, or None if they are not a date."""
+    if len(jmbg) < 7 or not jmbg[:7].isdigit():
+        return None
+    year = int(jmbg[4:7])
+    # 985 is 1985 and 005 is 2005
+    year += 1000 if year >= 800 else 2000
+    try:
+        return date(year, int(jmbg[2:4]), int(jmbg[:2]))
+    except ValueError:
+        return None
+
+def jmbg_check_digit(jmbg):
+    """The check digit for the first twelve digits of jmbg."""
+    remainder = 11 - sum(weight * int(digit) for weight, digit in zip(_CHECK_WEIGHTS, jmbg)) % 11
+    # 10 and 11 both give 0
+    return 0 if remainder > 9 else remainder
+
+def validate_jmbg(jmbg, birth_date=None):
+    """Why jmbg is not valid for a patient born on birth_date (a date), in Serbian for the user; None if it is."""
+    if len(jmbg) != JMBG_LENGTH or not jmbg.isdigit():
+        return f"JMBG mora imati {JMBG_LENGTH} cifara."
+    encoded_date = jmbg_birth_date(jmbg)
+    if encoded_date is None:
+        return "Prvih sedam cifara JMBG-a nisu ispravan datum rođenja."
+    if jmbg_check_digit(jmbg) != int(jmbg[-1]):
+        return "Kontrolna cifra JMBG-a nije ispravna."
+    if birth_date is not None and encoded_date != birth_date:
+        return (f"JMBG odgovara datumu rođenja {encoded_date:%d.%m.%Y.}, "
+                f"a upisan je {birth_date:%d.%m.%Y.}")
+    return None
+
+
+class PatientIndex:
+    """Patients by JMBG, searchable by JMBG prefix.
+
+    Safe to query from the GUI thread while another thread adds patients.
+    """
+
+    def __init__(self, patients=None):
+        # (full_name, birth_date) by JMBG, and the JMBGs in sorted order
+        self.patients = patients or {}
+        self.jmbgs = sorted(self.patients)
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.jmbgs)
+
+    def get(self, jmbg):
+        """(full_name, birth_date as 'dd-mm-yyyy') of the patient with this JMBG, or None."""
+        return self.patients.get(jmbg)
+
+    def search(self, prefix, limit=MAX_SUGGESTIONS):
+        """JMBGs starting with prefix, in order; prefix itself, if it is a JMBG, is left out."""
+        if len(prefix) < MIN_PREFIX:
+            return []
+        with self.lock:
+            low = bisect_left(self.jmbgs, prefix)
+            matches = []
+            for jmbg in self.jmbgs[low:low + limit + 1]:
+                if not jmbg.startswith(prefix):
+                    break
+                if jmbg != prefix:
+                    matches.append(jmbg)
+            return matches[:limit]
+
+    def add(self, jmbg, full_name, birth_date):
+        """Add a patient, or update the name and birth date stored for the JMBG."""
+        with self.lock:
+            if jmbg not in self.patients:
+                insort(self.jmbgs, jmbg)
+            self.patients[jmbg] = (full_name, birth_date)
+
+    @classmethod
+    def load(cls, connection):
+        """Read the patients table of the archive."""
+        return cls({row["jmbg"]: (row["full_name"], row["birth_date"]) for row in archive.list_patients(connection)})
+
+
+def _worker():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="patients")
+        return _executor
+
+def shared_index():
+    """The loaded index, or None while it is still loading."""
+    return _index
+
+def _load(path):
+    global _index
+    try:
+        connection = archive.connect(path)
+        try:
+            index = PatientIndex.load(connection)
+        finally:
+            connection.close()
+    except sqlite3.Error as e:
+        logging.error(f"Failed to load patients from the archive: {e}")
+        index = PatientIndex()
+    _index = index
+    logging.info(f"Patient index loaded: {len(index)} patients")
+
+def preload(path=None):
+    """Load the shared index on the background thread."""
+    return _worker().submit(_load, path)
+
+def _add_patient(jmbg, full_name, birth_date):
+    if _index is not None:
+        _index.add(jmbg, full_name, birth_date)
+
+def add_patient(record):
+    """Add the patient of an archived report record to the shared index, on the background thread."""
+    if record["jmbg"]:
+        return _worker().submit(_add_patient, record["jmbg"], record["full_name"], record["birth_date"])
+    return None
@@ -0,0 +1,134 @@
+import sys
+import logging
+import os
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+import report_engine
+import render_cache
+import report_store
+import report_files
+import archive
+import patients
+import phrases
+from tracing import span, traced
+
+# Reports are written one after another on a single background thread
+_thread_pool = None
+
+# Jobs that were started but have not reported back yet
+_active_jobs = set()
+
+
+class PdfJobSignals(QObject):
+    """Signals emitted by a PdfJob; delivered on the GUI thread."""
+
+    progress = pyqtSignal(int, str)  # percent done, description of the current step
+    finished = pyqtSignal(str)  # path of the generated PDF
+    failed = pyqtSignal(str)  # error message
+
+
+class PdfJob(QRunnable):
+    """Renders a report and stores its record (see report_store) from a snapshot of the form data.
+
+    pdf_file_name is the preferred name of the PDF; once the job has run it
+    holds the name the report was actually saved under.
+    """
+
+    def __init__(self, record, config, pdf_file_name, open_when_done=True, use_cache=True):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.signals = PdfJobSignals()
+        self.record = record
+        self.config = config
+        self.pdf_file_name = pdf_file_name
+        self.open_when_done = open_when_done
+        # A report rendered before with the same content and config is taken from the render cache
+        self.use_cache = use_cache
+
+    @traced("pdf_job")
+    def run(self):
+        try:
+            self.signals.progress.emit(0, "Učitavanje fontova...")
+            if not report_engine.register_fonts():
+                self.signals.failed.emit("Fontovi nisu pronađeni.")
+                return
+
+            # Rendering takes most of the time; report it per entry
+            total = len(self.record["pages"])
+            renderer = report_engine.ReportRenderer(self.config)
+            progress = lambda done: self.signals.progress.emit(5 + 80 * done // total, f"Strana {done}/{total}...")
+            if self.use_cache:
+                data, page_count = render_cache.shared_cache().render_bytes(renderer, self.record, progress)
+            else:
+                data, page_count = renderer.render_bytes(self.record, progress)
+
+            # An earlier report of the same patient and day keeps its file; this one gets the next free name
+            self.signals.progress.emit(85, "Čuvanje PDF-a...")
+            with span("publish", bytes=len(data)):
+                self.pdf_file_name = report_engine.publish_file(self.pdf_file_name, data)
+            logging.info(f"PDF report saved as {self.pdf_file_name} ({page_count} pages, {len(data)} bytes)")
+
+            self.signals.progress.emit(90, "Čuvanje zapisa...")
+            with span("save_record"):
+                record_ref = report_store.save_report(self.record, self.pdf_file_name)
+
+            self.signals.progress.emit(95, "Arhiviranje...")
+            with span("archive"):
+                archive.record_report(self.record, self.pdf_file_name, record_ref=record_ref)
+            patients.add_patient(self.record)
+
+            # Offer this report's phrases from now on
+            phrases.add_report([text for page in self.record["pages"] for text in (page["dg"], page["diagnosis"])],
+                               record_ref)
+
+            self.signals.progress.emit(100, "Izveštaj je napravljen.")
+            self.signals.finished.emit(self.pdf_file_name)
+        except Exception as e:
+            logging.error(f"Failed to generate PDF {self.pdf_file_name}: {e}")
+            self.signals.failed.emit(str(e))
+
+
+def thread_pool():
+    """The single-thread pool report jobs run on."""
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = QThreadPool()
+        _thread_pool.setMaxThreadCount(1)
+    return _thread_pool
+
+def start_job(job):
+    """Queue a job. It is kept alive, and the viewer opened, even if its window closes meanwhile."""
+    _active_jobs.add(job)
+    job.signals.finished.connect(lambda pdf_file_name: _job_done(job, pdf_file_name))
+    job.signals.failed.connect(lambda error: _job_done(job, None))
+    thread_pool().start(job)
+
+def _job_done(job, pdf_file_name):
+    _active_jobs.discard(job)
+    if pdf_file_name and job.open_when_done:
+        open_pdf(pdf_file_name)
+
+def preload():
+    """Import ReportLab and register the PDF fonts on the worker thread, ahead of the first report."""
+    thread_pool().start(report_engine.register_fonts)
+
+def wait_for_jobs(timeout_ms=-1):
+    """Block until all queued jobs are written, e.g. before the application quits."""
+    return thread_pool().waitForDone(timeout_ms)
+
+@traced("open_pdf")
+def open_pdf(file_name):
+    """Open the generated PDF file in the system viewer without waiting for it.
+
+    A report moved into its month folder or packed into a bundle since is found there.
+    """
+    import subprocess
+    try:
+        file_name = report_files.viewable_path(file_name)
+        if sys.platform == "win32":
+            os.startfile(file_name)
+        else:
+            viewer = "open" if sys.platform == "darwin" else "xdg-open"
+            subprocess.Popen([viewer, file_name], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                             stderr=subprocess.DEVNULL, start_new_session=True)
+    except Exception as e:
+        logging.error(f"Failed to open PDF: {e}")
@@ -0,0 +1,172 @@
+from PyQt5.QtCore import QEvent, QObject, Qt
+from PyQt5.QtGui import QTextCursor
+from PyQt5.QtWidgets import QAbstractItemView, QListWidget, QListWidgetItem
+import icd10
+import patients
+import phrases
+
+
+class PhraseCompleter(QObject):
+    """Offers phrases of past reports for the sentence being typed at the end of a line of a QTextEdit.
+
+    The popup never takes the focus: Down and Up pick a phrase, Enter inserts
+    the picked one, Tab the picked or the first one, and Escape closes it.
+    Suggestions only follow typing, not text set by the program.
+    """
+
+    def __init__(self, text_edit, index_source=phrases.shared_index):
+        super().__init__(text_edit)
+        self.text_edit = text_edit
+        self.index_source = index_source
+
+        # Set by a key press, so the text change it causes updates the suggestions
+        self.typing = False
+        # Document position of the line the suggestions are for
+        self.block_position = 0
+
+        self.popup = QListWidget(text_edit)
+        self.popup.setWindowFlags(Qt.ToolTip)
+        self.popup.setFocusPolicy(Qt.NoFocus)
+        self.popup.setUniformItemSizes(True)
+        self.popup.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.popup.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.popup.itemClicked.connect(self.insert_phrase)
+
+        text_edit.installEventFilter(self)
+        text_edit.textChanged.connect(self.on_text_changed)
+        text_edit.cursorPositionChanged.connect(self.on_cursor_moved)
+
+    def eventFilter(self, watched, event):
+        event_type = event.type()
+        if event_type == QEvent.KeyPress:
+            if self.popup.isVisible() and self.handle_popup_key(event.key()):
+                return True
+            self.typing = True
+        elif event_type == QEvent.InputMethod:
+            self.typing = True
+        elif event_type == QEvent.KeyRelease:
+            self.typing = False
+        elif event_type in (QEvent.FocusOut, QEvent.Hide):
+            self.popup.hide()
+        return False
+
+    def handle_popup_key(self, key):
+        """Navigate or accept the suggestions. Returns True if the key was used."""
+        if key in (Qt.Key_Down, Qt.Key_Up):
+            step = 1 if key == Qt.Key_Down else -1
+            self.popup.setCurrentRow(max(0, min(self.popup.currentRow() + step, self.popup.count() - 1)))
+            return True
+        if key in (Qt.Key_Return, Qt.Key_Enter) and self.popup.currentRow() >= 0:
+            self.insert_phrase(self.popup.currentItem())
+            return True
+        if key == Qt.Key_Tab:
+            self.insert_phrase(self.popup.currentItem() or self.popup.item(0))
+            return True
+        if key == Qt.Key_Escape:
+            self.popup.hide()
+            return True
+        return False
+
+    def on_text_changed(self):
+        if self.typing:
+            self.update_suggestions()
+
+    def on_cursor_moved(self):
+        # Moving the cursor without typing leaves the sentence
+        if not self.typing:
+            self.popup.hide()
+
+    def update_suggestions(self):
+        """Show the suggestions for the line before the cursor, if it is at the end of its line."""
+        cursor = self.text_edit.textCursor()
+        block = cursor.block()
+        if cursor.hasSelection() or cursor.positionInBlock() != block.length() - 1:
+            self.popup.hide()
+            return
+        suggestions = self.suggestions(block.text())
+        if not suggestions:
+            self.popup.hide()
+            return
+
+        self.block_position = block.position()
+        self.popup.clear()
+        for start, text in suggestions:
+            item = QListWidgetItem(self.item_label(text))
+            item.setData(Qt.UserRole, (start, text))
+            self.popup.addItem(item)
+        self.show_popup(len(suggestions))
+
+    def suggestions(self, line):
+        """(position in line from which it replaces the text, text) of each suggestion for line."""
+        index = self.index_source()
+        if index is None:
+            return []
+        start = phrases.sentence_start(line)
+        start += len(line) - start - len(line[start:].lstrip())
+        return [(start, phrase) for phrase in index.complete(line[start:])]
+
+    def item_label(self, text):
+        """What the popup shows for a suggestion inserting text."""
+        return text
+
+    def show_popup(self, rows):
+        """Place the popup under the cursor, sized to its suggestions."""
+        frame = 2 * self.popup.frameWidth()
+        width = max(self.popup.sizeHintForColumn(0) + frame + 8, self.text_edit.width() // 2)
+        self.popup.resize(min(width, self.text_edit.width()), rows * self.popup.sizeHintForRow(0) + frame)
+        position = self.text_edit.cursorRect().bottomLeft()
+        self.popup.move(self.text_edit.viewport().mapToGlobal(position))
+        self.popup.show()
+
+    def insert_phrase(self, item):
+        """Replace the text typed so far with the chosen suggestion."""
+        self.popup.hide()
+        if item is None:
+            return
+        start, text = item.data(Qt.UserRole)
+        cursor = self.text_edit.textCursor()
+        cursor.setPosition(self.block_position + start, QTextCursor.KeepAnchor)
+        cursor.insertText(text)
+        self.text_edit.setTextCursor(cursor)
+
+
+class DiagnosisCodeCompleter(PhraseCompleter):
+    """A PhraseCompleter for the DG lines that first offers ICD-10 codes for the line typed so far.
+
+    Typing a code ("j06") or words of its name ("upper resp") offers entries
+    like "J06.9 – Acute upper respiratory infection, unspecified", which
+    replace the whole line. Lines already holding an entry get phrases only.
+    """
+
+    def __init__(self, text_edit, index_source=phrases.shared_index, codes_source=icd10.shared_index):
+        super().__init__(text_edit, index_source)
+        self.codes_source = codes_source
+
+    def suggestions(self, line):
+        found = super().suggestions(line)
+        codes = self.codes_source() if icd10.ENTRY_SEPARATOR not in line else None
+        if codes is None:
+            return found
+        start = len(line) - len(line.lstrip())
+        entries = [(start, icd10.format_entry(code, name)) for code, name in codes.lookup(line)]
+        offered = {text for _, text in entries}
+        return entries + [(position, text) for position, text in found if text not in offered]
+
+
+class PatientCompleter(PhraseCompleter):
+    """Offers the known patients whose JMBG starts with the digits typed, showing their name and birth date."""
+
+    def __init__(self, text_edit, index_source=patients.shared_index):
+        super().__init__(text_edit, index_source)
+
+    def suggestions(self, line):
+        index = self.index_source()
+        prefix = line.strip()
+        if index is None or not prefix.isdigit():
+            return []
+        start = len(line) - len(line.lstrip())
+        return [(start, jmbg) for jmbg in index.search(prefix)]
+
+    def item_label(self, text):
+        full_name, birth_date = self.index_source().get(text)
+        return f"{text}   {full_name}, {birth_date}"
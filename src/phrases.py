@@ -0,0 +1,346 @@
+"""Prefix index of the DG and diagnosis phrases of past reports, for completion while typing.
+
+Every sentence of the DG and diagnosis of the stored report records (see
+report_store), and of the TXT sidecars older reports left in txt/, is a
+phrase, counted as often as it was written. Phrases are kept in an array sorted by their normalized text
+(see phrase_key), so the phrases starting with a typed prefix form one range
+found by bisection. Ranges too large to rank on every keystroke have their
+best phrases precomputed, and those lists are kept up to date as reports are
+added.
+
+The index is saved as a compressed snapshot in fraze.idx, with the last
+record counted. At startup the snapshot is loaded on a background thread,
+then the records stored since are added. After each report, its phrases are added on the same thread.
+"""
+import logging
+import os
+import re
+import threading
+import unicodedata
+import zlib
+from collections import Counter
+from bisect import bisect_left, insort
+from concurrent.futures import ThreadPoolExecutor
+from heapq import nsmallest
+
+import report_store
+
+# Snapshot file, next to arhiva.db and the records/ folder; txt/ holds the sidecars of older reports
+SNAPSHOT_FILE = "fraze.idx"
+TXT_FOLDER = "txt"
+
+# Bump when the snapshot format changes; older snapshots are rebuilt from the records and txt/
+SNAPSHOT_VERSION = 2
+
+# Typed text shorter than this gets no suggestions
+MIN_PREFIX = 2
+
+# Suggestions offered at most; precomputed lists keep one more, as the typed phrase itself is left out
+MAX_SUGGESTIONS = 8
+TOP_SIZE = MAX_SUGGESTIONS + 1
+
+# Prefixes matching more phrases than this have their best phrases precomputed
+SCAN_LIMIT = 64
+
+# Only sentences within these lengths are indexed
+MIN_PHRASE_LENGTH = 4
+MAX_PHRASE_LENGTH = 200
+
+# Adding more new phrases than this at once re-sorts and re-ranks the whole index
+REBUILD_LIMIT = 1000
+
+# Save the snapshot again after this many reports were added
+SNAPSHOT_EVERY = 10
+
+_SENTENCE_END = re.compile(r"(?<=[.!?;])\s+")
+_TXT_HEADER = re.compile(r"^Page \d+ - (?:DG|Diagnosis Content):$")
+_UPPER_BOUND = "\U0010ffff"
+
+# The shared index, once loaded, and the thread loading and updating it
+_index = None
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class _FoldTable(dict):
+    """str.translate table stripping the diacritics of each character, filled in as characters are met."""
+
+    def __missing__(self, ordinal):
+        decomposed = unicodedata.normalize('NFKD', chr(ordinal))
+        folded = "".join(char for char in decomposed if not unicodedata.combining(char))
+        self[ordinal] = folded
+        return folded
+
+_fold_table = _FoldTable()
+
+def phrase_key(text):
+    """Lowercase text, strip its diacritics and collapse its whitespace, so "Kašalj" matches "kasa"."""
+    text = " ".join(text.split()).casefold()
+    return text if text.isascii() else text.translate(_fold_table)
+
+def split_phrases(text):
+    """The sentences of each line of text that are worth suggesting."""
+    for line in text.splitlines():
+        for sentence in _SENTENCE_END.split(line.strip()):
+            sentence = " ".join(sentence.split())
+            if MIN_PHRASE_LENGTH <= len(sentence) <= MAX_PHRASE_LENGTH:
+                yield sentence
+
+def sentence_start(line):
+    """Where the last sentence of line starts: the one being typed when line ends at the cursor."""
+    start = 0
+    for match in _SENTENCE_END.finditer(line):
+        start = match.end()
+    return start
+
+def read_txt_phrases(path):
+    """The phrases of one TXT sidecar, as reports were saved before they were stored as records."""
+    from report_engine import EMPTY_DG_TEXT
+    with open(path, 'r', encoding='utf-8', errors='replace') as file:
+        lines = [line for line in file.read().splitlines()
+                 if not _TXT_HEADER.match(line) and line.strip() != EMPTY_DG_TEXT]
+    return split_phrases("\n".join(lines))
+
+
+class PhraseIndex:
+    """Phrases with their counts, searchable by prefix and ranked by how often they were written.
+
+    Safe to query from the GUI thread while another thread adds phrases.
+    """
+
+    def __init__(self, entries=None, watermark=0, last_record=None):
+        # [phrase, count] by key (see phrase_key), and the keys in sorted order
+        self.entries = entries or {}
+        self.keys = sorted(self.entries)
+        # Best keys, in rank order, of every prefix matching more than SCAN_LIMIT phrases
+        self.top = {}
+        # Modification time (ns) of the newest TXT file counted, locator of the last record counted,
+        # and reports added since the last save
+        self.watermark = watermark
+        self.last_record = last_record
+        self.unsaved = 0
+        self.lock = threading.Lock()
+        self.build_top()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def rank(self, key):
+        """Sort key of a phrase: most often written first, then shortest, then alphabetical."""
+        return -self.entries[key][1], len(key), key
+
+    def build_top(self):
+        """Precompute the best keys of every large prefix range, walking the sorted keys once."""
+        self.top = {}
+        keys = self.keys
+
+        def visit(low, high, depth):
+            prefix = keys[low][:depth]
+            best = []
+            index = low
+            if len(keys[index]) == depth:
+                # The key equal to the prefix sorts first
+                best.append(keys[index])
+                index += 1
+            while index < high:
+                char = keys[index][depth]
+                end = bisect_left(keys, prefix + chr(ord(char) + 1), index, high)
+                if end - index > SCAN_LIMIT:
+                    best.extend(visit(index, end, depth + 1))
+                else:
+                    best.extend(nsmallest(TOP_SIZE, keys[index:end], key=self.rank))
+                index = end
+            best = nsmallest(TOP_SIZE, best, key=self.rank)
+            if depth >= MIN_PREFIX:
+                self.top[prefix] = best
+            return best
+
+        if len(keys) > SCAN_LIMIT:
+            visit(0, len(keys), 0)
+
+    def add(self, counts):
+        """Add the counts of phrases, given as a mapping from phrase to count."""
+        with self.lock:
+            new_keys = []
+            changed_keys = []
+            for phrase, count in counts.items():
+                key = phrase_key(phrase)
+                entry = self.entries.get(key)
+                if entry is None:
+                    self.entries[key] = [phrase, count]
+                    new_keys.append(key)
+                else:
+                    entry[1] += count
+                changed_keys.append(key)
+
+            if len(new_keys) > REBUILD_LIMIT:
+                self.keys = sorted(self.keys + new_keys)
+                self.build_top()
+                return
+            for key in new_keys:
+                insort(self.keys, key)
+            for key in changed_keys:
+                self.update_top(key)
+
+    def update_top(self, key):
+        """Re-rank key in the precomputed lists of its prefixes after its count grew."""
+        # Large ranges nest, so the precomputed prefixes of a key are its shortest ones
+        for depth in range(MIN_PREFIX, len(key) + 1):
+            best = self.top.get(key[:depth])
+            if best is None:
+                break
+            if key not in best:
+                best.append(key)
+            best.sort(key=self.rank)
+            del best[TOP_SIZE:]
+
+    def complete(self, text, limit=MAX_SUGGESTIONS):
+        """Phrases continuing text, best first; text itself, if it is a phrase, is left out."""
+        prefix = phrase_key(text)
+        if text[-1:].isspace() and prefix:
+            # After "bol " offer "bol u grudima", not "bolovi"
+            prefix += " "
+        if len(prefix) < MIN_PREFIX:
+            return []
+        with self.lock:
+            best = self.top.get(prefix)
+            if best is None:
+                low = bisect_left(self.keys, prefix)
+                high = bisect_left(self.keys, prefix + _UPPER_BOUND, low)
+                best = nsmallest(limit + 1, self.keys[low:high], key=self.rank)
+            return [self.entries[key][0] for key in best if key != prefix][:limit]
+
+    def add_txt_files(self, folder=TXT_FOLDER):
+        """Add the phrases of the TXT files changed since the newest one counted. Returns how many were read."""
+        try:
+            files = [(entry.path, entry.stat().st_mtime_ns) for entry in os.scandir(folder)
+                     if entry.name.endswith(".txt")]
+        except FileNotFoundError:
+            return 0
+        files = [(path, mtime) for path, mtime in files if mtime > self.watermark]
+
+        counts = Counter()
+        for path, _ in files:
+            try:
+                counts.update(read_txt_phrases(path))
+            except OSError as e:
+                logging.error(f"Cannot read {path} for phrase completion: {e}")
+        self.add(counts)
+        if files:
+            self.watermark = max(self.watermark, max(mtime for _, mtime in files))
+        return len(files)
+
+    def add_records(self, folder=report_store.RECORDS_FOLDER):
+        """Add the phrases of the records stored after the last one counted. Returns how many were read."""
+        counts = Counter()
+        added = 0
+        try:
+            for locator, stored in report_store.iter_records(folder, after=self.last_record):
+                self.last_record = locator
+                # Reports imported from a TXT sidecar are counted from txt/
+                if any(path.endswith(".txt") for path in stored.get("source", ())):
+                    continue
+                for page in stored["report"]["pages"]:
+                    counts.update(split_phrases(page["dg"]))
+                    counts.update(split_phrases(page["diagnosis"]))
+                added += 1
+        except OSError as e:
+            logging.error(f"Cannot read the records in {folder} for phrase completion: {e}")
+        self.add(counts)
+        return added
+
+    def record_added(self, locator):
+        """Note that the phrases of the record at locator were added."""
+        if self.last_record is None or (report_store.parse_locator(locator) >
+                                        report_store.parse_locator(self.last_record)):
+            self.last_record = locator
+
+    def save(self, path=SNAPSHOT_FILE):
+        """Write the phrases and counts as a compressed snapshot, replacing the old one atomically."""
+        with self.lock:
+            lines = [f"phrases {SNAPSHOT_VERSION} {self.watermark} {self.last_record or '-'}"]
+            for key in self.keys:
+                phrase, count = self.entries[key]
+                # Most keys are just the lowercased phrase; only the others are stored
+                lines.append(f"{count}\t{phrase}" if key == phrase.casefold() else f"{count}\t{phrase}\t{key}")
+        data = zlib.compress("\n".join(lines).encode('utf-8'), 6)
+
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path=SNAPSHOT_FILE):
+        """Read a snapshot written by save(). Raises OSError or ValueError if it is missing or unusable."""
+        with open(path, 'rb') as file:
+            try:
+                lines = zlib.decompress(file.read()).decode('utf-8').split("\n")
+            except zlib.error as e:
+                raise ValueError(f"damaged snapshot: {e}")
+        header = lines[0].split()
+        if len(header) != 4 or header[0] != "phrases" or header[1] != str(SNAPSHOT_VERSION):
+            raise ValueError("unknown snapshot format")
+
+        entries = {}
+        for line in lines[1:]:
+            fields = line.split("\t")
+            phrase = fields[1]
+            entries[fields[2] if len(fields) > 2 else phrase.casefold()] = [phrase, int(fields[0])]
+        return cls(entries, watermark=int(header[2]), last_record=None if header[3] == "-" else header[3])
+
+
+def _worker():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="phrases")
+        return _executor
+
+def shared_index():
+    """The loaded index, or None while it is still loading."""
+    return _index
+
+def _load(snapshot_path, txt_folder, records_folder):
+    global _index
+    try:
+        index = PhraseIndex.load(snapshot_path)
+    except FileNotFoundError:
+        index = PhraseIndex()
+    except (OSError, ValueError) as e:
+        logging.warning(f"Phrase snapshot {snapshot_path} is unusable, rebuilding it from the reports: {e}")
+        index = PhraseIndex()
+
+    added = index.add_txt_files(txt_folder) + index.add_records(records_folder)
+    if added:
+        _save(index, snapshot_path)
+    _index = index
+    logging.info(f"Phrase index loaded: {len(index)} phrases, {added} new reports")
+
+def _save(index, snapshot_path):
+    try:
+        index.save(snapshot_path)
+    except OSError as e:
+        logging.error(f"Failed to save phrase snapshot {snapshot_path}: {e}")
+
+def preload(snapshot_path=SNAPSHOT_FILE, txt_folder=TXT_FOLDER, records_folder=report_store.RECORDS_FOLDER):
+    """Load the shared index on the background thread."""
+    return _worker().submit(_load, snapshot_path, txt_folder, records_folder)
+
+def _add_report(texts, record_ref, snapshot_path):
+    index = _index
+    if index is None:
+        return
+    index.add(Counter(phrase for text in texts for phrase in split_phrases(text)))
+    if record_ref:
+        index.record_added(record_ref)
+    index.unsaved += 1
+    if index.unsaved >= SNAPSHOT_EVERY:
+        index.unsaved = 0
+        _save(index, snapshot_path)
+
+def add_report(texts, record_ref=None, snapshot_path=SNAPSHOT_FILE):
+    """Add the DG and diagnosis texts of a generated report, stored at the locator record_ref, on the background thread."""
+    return _worker().submit(_add_report, list(texts), record_ref, snapshot_path)
@@ -0,0 +1,220 @@
+"""Live preview of a report entry, drawn with Qt while the user types.
+
+The report renderer lays the entry out on a SheetRecorder instead of a PDF
+canvas, so the preview has exactly the lines, positions and page breaks of
+the PDF. Wrapped paragraphs come from text_layout's cache, so an edit only
+re-wraps the paragraph it touched, and sheets whose content is unchanged
+keep their pixmaps.
+"""
+import time
+from collections import OrderedDict
+from PyQt5.QtCore import Qt, QTimer, QPointF
+from PyQt5.QtGui import QFont, QPainter, QPixmap
+from PyQt5.QtWidgets import QLabel, QScrollArea, QVBoxLayout, QWidget
+import config_service
+from config_service import ConfigError
+import report_engine
+from qt_fonts import application_font_family
+from tracing import span
+
+# Width of a previewed sheet in pixels, and the gap between sheets
+SHEET_WIDTH = 420
+SHEET_SPACING = 12
+
+# Redraw once typing pauses for this long
+UPDATE_DELAY_MS = 150
+
+# Sheet pixmaps kept for reuse; the least recently shown are dropped first
+MAX_CACHED_SHEETS = 32
+
+# Qt font per PDF font name and size
+_qt_fonts = {}
+
+
+def qt_family(pdf_font_name):
+    """Load the face of a PDF font into Qt. Returns its family name, or "" if it could not be loaded."""
+    from fonts import PDF_FONT_FACES
+    return application_font_family(PDF_FONT_FACES[pdf_font_name], pdf_font_name)
+
+def qt_font(pdf_font_name, font_size):
+    """The Qt font drawing text like the PDF font pdf_font_name, font_size pixels high."""
+    font = _qt_fonts.get((pdf_font_name, font_size))
+    if font is None:
+        font = QFont(qt_family(pdf_font_name))
+        font.setPixelSize(round(font_size))
+        font.setBold(pdf_font_name.endswith("-Bold"))
+        font.setHintingPreference(QFont.PreferNoHinting)
+        font.setKerning(False)
+        _qt_fonts[(pdf_font_name, font_size)] = font
+    return font
+
+
+class SheetRecorder:
+    """Stands in for a ReportLab canvas and records the text drawn on each sheet."""
+
+    def __init__(self):
+        self.sheets = [[]]
+        self.font = None
+
+    def setFont(self, font_name, font_size):
+        self.font = (font_name, font_size)
+
+    def drawString(self, x, y, text):
+        self.sheets[-1].append((self.font, x, y, text))
+
+    def showPage(self):
+        # Like a canvas, a new sheet starts without a font
+        self.sheets.append([])
+        self.font = None
+
+
+def layout_entry(renderer, record):
+    """Lay out the first entry of record as the PDF would. Returns the text of each sheet, as tuples."""
+    recorder = SheetRecorder()
+    flow = report_engine.PageFlow(renderer, recorder, record)
+    renderer.draw_entry(flow, record["pages"][0])
+    return [tuple(sheet) for sheet in recorder.sheets]
+
+def paint_sheet(sheet, width=SHEET_WIDTH):
+    """Draw the recorded text of one sheet onto a white pixmap width pixels wide."""
+    page_width, page_height = report_engine.A4
+    scale = width / page_width
+    pixmap = QPixmap(width, round(page_height * scale))
+    pixmap.fill(Qt.white)
+
+    painter = QPainter(pixmap)
+    painter.setRenderHint(QPainter.TextAntialiasing)
+    painter.scale(scale, scale)
+    current_font = None
+    for font, x, y, text in sheet:
+        if font != current_font:
+            painter.setFont(qt_font(*font))
+            current_font = font
+        painter.drawText(QPointF(x, page_height - y), text)
+    painter.end()
+    return pixmap
+
+
+class PreviewPane(QScrollArea):
+    """Shows the sheets of one report entry and redraws them shortly after it changes.
+
+    entry_source(index) returns a normalized record holding the patient data
+    and the entry with that index as its only page.
+    """
+
+    def __init__(self, entry_source, text_font, parent=None):
+        super().__init__(parent)
+        self.entry_source = entry_source
+        self.text_font = text_font
+        self.entry_index = 0
+        self.active = True
+        self.last_update_ms = None
+
+        # Renderer for the current config, without forms: the recorder has no use for them
+        self.config = None
+        self.renderer = None
+
+        # Layout of each entry as last shown, and pixmaps of recently shown sheets
+        self.entry_layouts = {}
+        self.sheet_pixmaps = OrderedDict()
+
+        self.sheets_widget = QWidget(self)
+        self.sheets_layout = QVBoxLayout(self.sheets_widget)
+        self.sheets_layout.setSpacing(SHEET_SPACING)
+        self.sheets_layout.addStretch()
+        self.sheet_labels = []
+        self.setWidget(self.sheets_widget)
+        self.setWidgetResizable(True)
+        self.setMinimumWidth(SHEET_WIDTH + 2 * SHEET_SPACING + self.verticalScrollBar().sizeHint().width())
+        self.setStyleSheet("QScrollArea { background-color: #9E9E9E; }")
+        self.sheets_widget.setStyleSheet("background-color: #9E9E9E;")
+
+        self.update_timer = QTimer(self)
+        self.update_timer.setSingleShot(True)
+        self.update_timer.timeout.connect(self.refresh)
+
+    def show_entry(self, index):
+        """Switch to the entry with this index; it is drawn once control returns to the event loop."""
+        self.entry_index = index
+        if self.active:
+            self.update_timer.start(0)
+
+    def schedule(self, index):
+        """The entry with this index changed; redraw it once typing pauses if it is shown."""
+        if index == self.entry_index and self.active:
+            self.update_timer.start(UPDATE_DELAY_MS)
+
+    def set_active(self, active):
+        """Draw the preview while active; otherwise free its pixmaps until it is shown again."""
+        if active == self.active:
+            return
+        self.active = active
+        if active:
+            self.update_timer.start(0)
+            return
+        self.update_timer.stop()
+        self.entry_layouts.clear()
+        self.sheet_pixmaps.clear()
+        for label in self.sheet_labels:
+            label.deleteLater()
+        self.sheet_labels = []
+
+    def current_renderer(self):
+        """A renderer for the current config, or the previous one while the config is invalid."""
+        try:
+            config = config_service.get_config()
+        except ConfigError:
+            return self.renderer
+        if config is not self.config:
+            self.config = config
+            self.renderer = report_engine.ReportRenderer(dict(config, text_font=self.text_font), use_forms=False)
+        return self.renderer
+
+    def refresh(self):
+        """Lay out and draw the shown entry, reusing the pixmaps of unchanged sheets."""
+        self.update_timer.stop()
+        start_time = time.perf_counter()
+        with span("preview", entry=self.entry_index + 1):
+            renderer = self.current_renderer()
+            if renderer is None or not report_engine.register_fonts():
+                return
+            record = self.entry_source(self.entry_index)
+            page = record["pages"][0]
+            key = (renderer, record["full_name"], record["birth_date"], record["jmbg"],
+                   page["dg"], page["diagnosis"], page["date"])
+
+            cached = self.entry_layouts.get(self.entry_index)
+            if cached is not None and cached[0] == key:
+                sheets = cached[1]
+            else:
+                sheets = layout_entry(renderer, record)
+                self.entry_layouts[self.entry_index] = (key, sheets)
+
+            self.show_pixmaps([self.sheet_pixmap(sheet) for sheet in sheets])
+        self.last_update_ms = (time.perf_counter() - start_time) * 1000
+
+    def sheet_pixmap(self, sheet):
+        pixmap = self.sheet_pixmaps.pop(sheet, None)
+        if pixmap is None:
+            pixmap = paint_sheet(sheet)
+        self.sheet_pixmaps[sheet] = pixmap
+        while len(self.sheet_pixmaps) > MAX_CACHED_SHEETS:
+            self.sheet_pixmaps.popitem(last=False)
+        return pixmap
+
+    def show_pixmaps(self, pixmaps):
+        """Show one label per sheet, touching only the labels whose pixmap changed."""
+        while len(self.sheet_labels) < len(pixmaps):
+            label = QLabel(self.sheets_widget)
+            label.setAlignment(Qt.AlignHCenter)
+            self.sheets_layout.insertWidget(len(self.sheet_labels), label)
+            self.sheet_labels.append(label)
+
+        for index, label in enumerate(self.sheet_labels):
+            if index < len(pixmaps):
+                if label.property("sheetKey") != pixmaps[index].cacheKey():
+                    label.setPixmap(pixmaps[index])
+                    label.setProperty("sheetKey", pixmaps[index].cacheKey())
+                label.show()
+            else:
+                label.hide()
@@ -0,0 +1,32 @@
+import logging
+import threading
+from PyQt5.QtGui import QFontDatabase
+from resources import resource_path
+
+# Family name of every font file already added to Qt, keyed by its relative path
+_families = {}
+_lock = threading.Lock()
+
+
+def application_font_family(relative_path, description=None):
+    """Add a bundled font file to Qt's font database once per process. Returns its family name.
+
+    Every window shares the loaded fonts; adding the same file again would
+    register another copy of it. Returns "" if the file could not be loaded.
+    """
+    with _lock:
+        family = _families.get(relative_path)
+        if family is not None:
+            return family
+
+        description = description or relative_path
+        font_id = QFontDatabase.addApplicationFont(resource_path(relative_path))
+        families = QFontDatabase.applicationFontFamilies(font_id) if font_id != -1 else []
+        if families:
+            family = families[0]
+            logging.info(f"{description} font loaded successfully.")
+        else:
+            family = ""
+            logging.error(f"Failed to load {description} font.")
+        _families[relative_path] = family
+        return family
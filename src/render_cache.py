@@ -0,0 +1,198 @@
+"""Rendered PDFs kept on disk by a hash of everything that decides their bytes, so a repeat render is a file read.
+
+Rendering is deterministic (see ReportRenderer.render_bytes): the same
+record, config, fonts and ReportLab version always give the same PDF. The
+key hashes all of these, so an entry never needs invalidating; a changed
+input simply misses. Entries are files named by their key. A hit touches
+the file, and when the folder grows past its size limit the least recently
+used entries are removed, down to LOW_WATER of the limit. Several processes
+may share the folder: every entry is written under a temporary name, synced
+and renamed into place. An entry is served only if it ends with a
+cross-reference table where its startxref says; one cut short by a crash is
+removed and rendered again.
+"""
+import logging
+import os
+import re
+import json
+import hashlib
+import threading
+import uuid
+
+from resources import app_path
+
+# Bump when a change to the drawing code changes the PDFs rendered from the same inputs
+RENDER_FORMAT_VERSION = 1
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Eviction removes entries until the folder is this fraction of its limit, so it does not run on every store
+LOW_WATER = 0.8
+
+# Number of sheets in the page tree ReportLab writes
+_PAGE_COUNT = re.compile(rb"/Count (\d+) /Kids")
+
+# The end of a complete PDF: the offset of its cross-reference table, then the end-of-file marker
+_PDF_END = re.compile(rb"startxref\s+(\d+)\s+%%EOF\s*$")
+
+# The shared cache, created on first use
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def render_cache_dir():
+    """Folder holding the cached PDFs, next to the application whatever the working directory."""
+    return os.environ.get("DOCTORREPORT_RENDER_CACHE") or app_path(os.path.join('.cache', 'renders'))
+
+def font_stamps():
+    """Size and modification time of each registered font file, which identify the font versions."""
+    import fonts
+    stamps = {}
+    for name, path in fonts.registered_fonts().items():
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            logging.warning(f"Cannot read the font file {path}: {e}")
+            continue
+        stamps[name] = [stat.st_size, stat.st_mtime_ns]
+    return stamps
+
+def is_complete(data):
+    """Whether PDF data ends with its end-of-file marker after a startxref pointing at the cross-reference table."""
+    match = _PDF_END.search(data, max(0, len(data) - 64))
+    if match is None:
+        return False
+    offset = int(match.group(1))
+    return data[offset:offset + 4] == b"xref"
+
+def page_count(data):
+    """Number of sheets of a PDF rendered by ReportRenderer, or None if it cannot be read from the data."""
+    match = _PAGE_COUNT.search(data)
+    return int(match.group(1)) if match else None
+
+
+class RenderCache:
+    """PDFs by render key in a folder, at most max_bytes of them."""
+
+    def __init__(self, folder=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.folder = folder or render_cache_dir()
+        self.max_bytes = max_bytes
+        # Bytes in the folder as far as this process knows; None until the folder was scanned
+        self.size = None
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self._fixed_inputs = None
+
+    def fixed_inputs(self):
+        """What every key of this process shares: the format, ReportLab and font versions.
+
+        Read on the first lookup, after the renderer registered its fonts.
+        """
+        if self._fixed_inputs is None:
+            import reportlab
+            self._fixed_inputs = [RENDER_FORMAT_VERSION, reportlab.Version, font_stamps()]
+        return self._fixed_inputs
+
+    def key(self, record, config):
+        """Hash of a normalized record and the config it is rendered with."""
+        data = json.dumps([self.fixed_inputs(), config, record], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.folder, f"{key}.pdf")
+
+    def get(self, key):
+        """The cached PDF data for key, or None; an entry that is not a complete PDF is removed."""
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+            if not is_complete(data):
+                logging.warning(f"Removing {path} from the render cache: the PDF is cut short")
+                os.remove(path)
+                data = None
+            else:
+                # Mark the entry as recently used
+                os.utime(path)
+        except OSError:
+            data = None
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def put(self, key, data):
+        """Store the PDF data for key, then evict old entries if the folder is over its limit."""
+        temporary_path = os.path.join(self.folder, f".{os.getpid()}-{uuid.uuid4().hex}.tmp")
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            with open(temporary_path, 'wb') as file:
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary_path, self.path(key))
+        except OSError as e:
+            logging.warning(f"Failed to cache a rendered PDF in {self.folder}: {e}")
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            return
+        with self.lock:
+            if self.size is not None:
+                self.size += len(data)
+            if self.size is None or self.size > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the folder is under LOW_WATER of its limit."""
+        entries = []
+        try:
+            for entry in os.scandir(self.folder):
+                if entry.name.endswith('.pdf'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        except OSError as e:
+            logging.warning(f"Cannot read the render cache {self.folder}: {e}")
+            return
+        self.size = sum(size for _, size, _ in entries)
+        if self.size <= self.max_bytes:
+            return
+        entries.sort()
+        removed = 0
+        for _, size, path in entries:
+            if self.size <= self.max_bytes * LOW_WATER:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Another process evicted it first
+                pass
+            except OSError as e:
+                logging.warning(f"Failed to remove {path} from the render cache: {e}")
+                continue
+            self.size -= size
+            removed += 1
+        logging.info(f"Render cache: removed {removed} old PDFs, {self.size} bytes left")
+
+    def render_bytes(self, renderer, record, progress=None):
+        """renderer.render_bytes(record, progress), from the cache when the same report was rendered before."""
+        key = self.key(record, renderer.config)
+        data = self.get(key)
+        count = page_count(data) if data is not None else None
+        if count is not None:
+            if progress:
+                progress(len(record["pages"]))
+            return data, count
+        data, count = renderer.render_bytes(record, progress)
+        self.put(key, data)
+        return data, count
+
+
+def shared_cache():
+    """The cache in render_cache_dir(), created on first use."""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = RenderCache()
+        return _shared_cache
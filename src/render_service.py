@@ -0,0 +1,358 @@
+"""Local HTTP service rendering reports with the letterhead of config.json, for other programs at the clinic.
+
+    POST /render   body: a report record as JSON, the shape of batch manifests
+                   (see report_engine.normalize_record); answer: the PDF
+    GET /health    workers, requests in flight and counters, as JSON
+
+The server runs on asyncio and listens on localhost only. Reports are
+rendered by a pool of worker processes that register the fonts and set up a
+renderer with the config once, when they start (the config is read when the
+service starts). At most workers * QUEUE_PER_WORKER requests are rendering or
+waiting at a time; further ones get 429 Too Many Requests with Retry-After,
+so callers back off instead of piling up. Connections are kept alive
+(HTTP/1.1) until the client sends "Connection: close" or stays idle for
+KEEP_ALIVE_SECONDS. Request bodies need a Content-Length. A report rendered
+before with the same content is answered from the render cache (see
+render_cache.py) unless the service runs with --no-cache.
+
+Usage: python render_service.py [--port 8765] [--workers N] [--no-cache]
+"""
+import sys
+import logging
+import os
+import json
+import asyncio
+import argparse
+import signal
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+from urllib.parse import quote
+
+import report_engine
+import batch_render
+from config_service import ConfigError, get_config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Requests admitted per worker process, rendering or waiting for a worker
+QUEUE_PER_WORKER = 2
+
+# Idle connections are closed after this many seconds
+KEEP_ALIVE_SECONDS = 15
+
+# Larger request bodies get 413
+MAX_BODY_BYTES = 1024 * 1024
+
+# Requests with more header lines get 431
+MAX_HEADERS = 100
+
+# Seconds a caller told to back off should wait
+RETRY_AFTER_SECONDS = 1
+
+
+class HttpError(Exception):
+    """A request answered with an error status; the connection is closed after it unless keep_alive."""
+
+    def __init__(self, status, message, keep_alive=False, headers=()):
+        super().__init__(message)
+        self.status = status
+        self.keep_alive = keep_alive
+        self.headers = list(headers)
+
+
+class Request:
+    """The request line and headers of an HTTP request; the body is read by its handler."""
+
+    def __init__(self, method, path, version, headers):
+        self.method = method
+        self.path = path
+        self.version = version
+        self.headers = headers
+
+    @property
+    def keep_alive(self):
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.1":
+            return connection != "close"
+        return connection == "keep-alive"
+
+    @property
+    def has_body(self):
+        return "transfer-encoding" in self.headers or self.headers.get("content-length", "0").strip() != "0"
+
+    @property
+    def expects_continue(self):
+        return self.headers.get("expect", "").lower() == "100-continue"
+
+
+async def read_request(reader):
+    """Read the request line and headers. Returns None if the client closed the connection first."""
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    try:
+        method, target, version = request_line.decode('latin-1').split()
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+    if version not in ("HTTP/1.0", "HTTP/1.1"):
+        raise HttpError(HTTPStatus.HTTP_VERSION_NOT_SUPPORTED, f"{version} is not supported")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        if len(headers) >= MAX_HEADERS:
+            raise HttpError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Too many headers")
+        name, _, value = line.decode('latin-1').partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return Request(method, target.split("?", 1)[0], version, headers)
+
+def response_head(status, content_type, length, keep_alive, headers=()):
+    status = HTTPStatus(status)
+    lines = [
+        f"HTTP/1.1 {status.value} {status.phrase}",
+        f"Content-Type: {content_type}",
+        f"Content-Length: {length}",
+        "Connection: keep-alive" if keep_alive else "Connection: close",
+    ]
+    if keep_alive:
+        lines.append(f"Keep-Alive: timeout={KEEP_ALIVE_SECONDS}")
+    lines.extend(f"{name}: {value}" for name, value in headers)
+    return ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1')
+
+def json_body(data):
+    return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+class RenderService:
+    """Answers HTTP requests on asyncio, rendering on a pool of warm worker processes."""
+
+    def __init__(self, config, workers=None, max_pending=None, use_cache=True):
+        self.config = config
+        self.use_cache = use_cache
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * QUEUE_PER_WORKER
+        self.executor = None
+        self.server = None
+        # Handlers of the open connections, and the writers of those waiting for a request
+        self.connections = set()
+        self.idle = set()
+        self.closing = False
+        # Requests admitted and not yet answered, and counters for /health
+        self.pending = 0
+        self.rendered = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def start_pool(self):
+        # A pool started again after a worker died would be forked while the threads of the old one
+        # hold their locks, and could hang; a fork server starts each worker from a clean process
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+        else:
+            context = None
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                            initializer=batch_render.init_worker,
+                                            initargs=(self.config, self.use_cache))
+
+    async def start(self, host=HOST, port=DEFAULT_PORT):
+        """Start the workers, wait until each has loaded the fonts, then listen."""
+        self.start_pool()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, batch_render.warm_up)
+                               for _ in range(self.workers)))
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        logging.info(f"Render service listening on http://{host}:{port} with {self.workers} workers, "
+                     f"at most {self.max_pending} requests at a time")
+
+    async def close(self):
+        """Stop listening, let the requests being rendered finish, then stop the workers."""
+        self.closing = True
+        if self.server is not None:
+            self.server.close()
+        for writer in list(self.idle):
+            writer.close()
+        await asyncio.gather(*self.connections, return_exceptions=True)
+        if self.server is not None:
+            await self.server.wait_closed()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+    async def handle_connection(self, reader, writer):
+        """Answer the requests of one connection in turn until it is closed."""
+        self.connections.add(asyncio.current_task())
+        try:
+            while not self.closing:
+                try:
+                    self.idle.add(writer)
+                    try:
+                        request = await asyncio.wait_for(read_request(reader), KEEP_ALIVE_SECONDS)
+                    finally:
+                        self.idle.discard(writer)
+                    if request is None:
+                        break
+                    status, content_type, body, keep_alive, headers = await self.handle_request(
+                        request, reader, writer)
+                except asyncio.TimeoutError:
+                    break
+                except HttpError as e:
+                    status, content_type, body = e.status, "application/json", json_body({"error": str(e)})
+                    keep_alive, headers = e.keep_alive, e.headers
+                keep_alive = keep_alive and not self.closing
+                writer.write(response_head(status, content_type, len(body), keep_alive, headers))
+                writer.write(body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            # The client went away, or sent a line longer than the stream limit
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+            self.connections.discard(asyncio.current_task())
+
+    async def handle_request(self, request, reader, writer):
+        """Route a request. Returns (status, content type, body, keep alive, extra headers)."""
+        # A body left unread would be taken for the next request
+        keep_alive = request.keep_alive and not request.has_body
+        if request.path == "/health":
+            if request.method != "GET":
+                raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, "Use GET", keep_alive, [("Allow", "GET")])
+            return HTTPStatus.OK, "application/json", json_body(self.health()), keep_alive, []
+        if request.path == "/render":
+            if request.method != "POST":
+                raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, "Use POST", keep_alive, [("Allow", "POST")])
+            return await self.handle_render(request, reader, writer)
+        raise HttpError(HTTPStatus.NOT_FOUND, f"No such path: {request.path}", keep_alive)
+
+    async def read_body(self, request, reader, writer):
+        """Check the declared length, then read the body, first telling a client that expects it to continue."""
+        if "transfer-encoding" in request.headers:
+            raise HttpError(HTTPStatus.NOT_IMPLEMENTED, "Chunked bodies are not supported; send Content-Length")
+        try:
+            length = int(request.headers["content-length"])
+        except (KeyError, ValueError):
+            raise HttpError(HTTPStatus.LENGTH_REQUIRED, "Content-Length is required")
+        if length < 0 or length > MAX_BODY_BYTES:
+            raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"The body may have at most {MAX_BODY_BYTES} bytes")
+        if request.expects_continue:
+            writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+            await writer.drain()
+        return await reader.readexactly(length)
+
+    async def handle_render(self, request, reader, writer):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            keep_alive = False
+            if not request.expects_continue:
+                # The body is on its way anyway; drop it so the connection can carry the retry
+                await self.read_body(request, reader, writer)
+                keep_alive = request.keep_alive
+            raise HttpError(HTTPStatus.TOO_MANY_REQUESTS, "All workers are busy; retry later", keep_alive,
+                            [("Retry-After", RETRY_AFTER_SECONDS)])
+
+        self.pending += 1
+        try:
+            body = await self.read_body(request, reader, writer)
+            try:
+                record = report_engine.normalize_record(json.loads(body))
+            except (UnicodeDecodeError, ValueError) as e:
+                raise HttpError(HTTPStatus.BAD_REQUEST, f"Invalid report: {e}", keep_alive=request.keep_alive)
+
+            executor = self.executor
+            try:
+                data = await asyncio.get_running_loop().run_in_executor(
+                    executor, batch_render.render_bytes_in_worker, record)
+            except BrokenProcessPool:
+                # A worker died (killed, or out of memory); start a new pool for the next requests.
+                # Every request waiting on the broken pool ends up here, but only the first restarts
+                # it: the check and the restart run on the event loop with nothing awaited between.
+                self.failed += 1
+                if self.executor is executor:
+                    logging.error("A render worker stopped unexpectedly; restarting the workers")
+                    executor.shutdown(wait=False)
+                    self.start_pool()
+                raise HttpError(HTTPStatus.SERVICE_UNAVAILABLE, "The renderer restarted; retry",
+                                keep_alive=request.keep_alive, headers=[("Retry-After", RETRY_AFTER_SECONDS)])
+            except Exception as e:
+                self.failed += 1
+                logging.error(f"Failed to render a report for {record['full_name']}: {e}")
+                raise HttpError(HTTPStatus.INTERNAL_SERVER_ERROR, f"Rendering failed: {e}",
+                                keep_alive=request.keep_alive)
+        finally:
+            self.pending -= 1
+
+        self.rendered += 1
+        file_name = os.path.basename(batch_render.output_file_name("", record))
+        headers = [("Content-Disposition", f"inline; filename*=UTF-8''{quote(file_name)}")]
+        return HTTPStatus.OK, "application/pdf", data, request.keep_alive, headers
+
+    def health(self):
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "rendered": self.rendered,
+            "rejected": self.rejected,
+            "failed": self.failed,
+        }
+
+
+async def serve(config, port, workers, max_pending, use_cache=True):
+    """Run the service until SIGTERM or Ctrl+C, then stop the workers."""
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signal_number, stopped.set)
+        except NotImplementedError:
+            # Windows: Ctrl+C still stops asyncio.run with KeyboardInterrupt
+            pass
+
+    service = RenderService(config, workers, max_pending, use_cache)
+    try:
+        await service.start(port=port)
+        await stopped.wait()
+    finally:
+        await service.close()
+    logging.info(f"Render service stopped after {service.rendered} reports")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve report rendering over HTTP on localhost.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of worker processes (default: one per CPU core)")
+    parser.add_argument("--max-pending", type=int, default=None,
+                        help=f"Requests admitted at a time (default: {QUEUE_PER_WORKER} per worker)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Render every request, even if the render cache has the report")
+    args = parser.parse_args(argv)
+
+    try:
+        config = get_config()
+    except ConfigError:
+        # Already logged by the config service
+        return 2
+
+    try:
+        asyncio.run(serve(config, args.port, args.workers, args.max_pending, not args.no_cache))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        logging.error(f"Render service failed: {e}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
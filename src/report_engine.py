@@ -0,0 +1,492 @@
+import logging
+import io
+import os
+import json
+import hashlib
+import uuid
+from datetime import datetime
+from functools import lru_cache
+from config_service import get_config, DEFAULT_TEXT_FONT
+from tracing import span, traced
+import text_layout
+
+# ReportLab (and fonts, which builds on it) is imported on first use, so that starting
+# the GUI does not pay for it; only rendering a PDF needs it.
+
+# A4 page size in points, as in reportlab.lib.pagesizes
+A4 = (595.2755905511812, 841.8897637795277)
+
+# Maximum characters per line for the monospaced PDF output
+MAX_CHARS_PER_LINE_DG_TABLE = 71
+MAX_CHARS_PER_LINE_DIAGNOSIS = 89
+
+# Font sizes of the DG table and the diagnosis text
+DG_FONT_SIZE = 12
+DIAGNOSIS_FONT_SIZE = 10
+
+# Face the characters per line above are counted in; all its glyphs are as wide as "M"
+MONOSPACE_FONT = "NotoSansMono"
+
+# Placeholder printed when the DG block of a page is left empty
+EMPTY_DG_TEXT = "IDEM"
+
+# Lowest baseline content may use before it continues on a new sheet
+BOTTOM_MARGIN = 30
+
+# Document metadata of the PDFs
+PDF_TITLE = "Izveštaj"
+PDF_CREATOR = "DoctorReport"
+
+# Size budget of a compressed report: the embedded font subsets and forms, plus a share per page
+PDF_FIXED_BYTE_BUDGET = 40 * 1024
+PDF_PAGE_BYTE_BUDGET = 4 * 1024
+
+
+# Header/footer line positions, keyed by config version
+_static_layouts = {}
+
+
+@lru_cache(maxsize=None)
+def dg_text_width():
+    """Width the DG text wraps at, in points: MAX_CHARS_PER_LINE_DG_TABLE monospaced characters."""
+    return text_layout.text_width("M", f"{MONOSPACE_FONT}-Bold", DG_FONT_SIZE) * MAX_CHARS_PER_LINE_DG_TABLE
+
+@lru_cache(maxsize=None)
+def diagnosis_text_width():
+    """Width the diagnosis text wraps at, in points: MAX_CHARS_PER_LINE_DIAGNOSIS monospaced characters."""
+    return text_layout.text_width("M", MONOSPACE_FONT, DIAGNOSIS_FONT_SIZE) * MAX_CHARS_PER_LINE_DIAGNOSIS
+
+def config_version(config):
+    """Short hash identifying the header and footer content of a config."""
+    data = json.dumps({"header": config.get("header"), "footer": config.get("footer")}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()[:12]
+
+def clear_static_layouts():
+    """Drop cached header/footer layouts, e.g. after the config changed."""
+    _static_layouts.clear()
+
+@traced("register_fonts")
+def register_fonts():
+    """Register the monospaced fonts in ReportLab. Returns True on success."""
+    import fonts
+    return fonts.register_pdf_fonts()
+
+def format_date(date_str):
+    """Format date to 'dd.mm.yyyy.' format with leading zeros."""
+    try:
+        date_obj = datetime.strptime(date_str, '%d-%m-%Y')
+        return date_obj.strftime('%d.%m.%Y.')
+    except ValueError:
+        logging.error(f"Invalid date format: {date_str}")
+        return date_str
+
+def file_stem(full_name):
+    """Turn a patient name into the stem used for report file names."""
+    return full_name.replace(' ', '_').replace('-', '_')
+
+def normalize_record(data):
+    """Validate a plain report record and fill in defaults.
+
+    A record is a dict with 'full_name', 'birth_date' and 'jmbg' plus a list
+    of 'pages', each holding 'dg', 'diagnosis' and 'date'. Dates use the
+    'dd-mm-yyyy' format produced by the GUI date pickers.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Report record must be an object")
+
+    pages = data.get("pages")
+    if not isinstance(pages, list) or not pages:
+        raise ValueError("Report record needs at least one page")
+
+    today = datetime.now().strftime('%d-%m-%Y')
+    record = {
+        "full_name": str(data.get("full_name", "")).strip(),
+        "birth_date": str(data.get("birth_date", "")).strip(),
+        "jmbg": str(data.get("jmbg", "")).strip(),
+        "pages": [],
+    }
+    for page in pages:
+        if not isinstance(page, dict):
+            raise ValueError("Report page must be an object")
+        record["pages"].append({
+            "dg": str(page.get("dg") or ""),
+            "diagnosis": str(page.get("diagnosis") or ""),
+            "date": str(page.get("date") or today).strip(),
+        })
+    return record
+
+
+class ReportRenderer:
+    """Draws report pages onto a ReportLab canvas from a plain report record."""
+
+    def __init__(self, config=None, use_forms=True):
+        self.config = config if config is not None else get_config()
+        self.config_version = config_version(self.config)
+
+        # Stamp the static header and footer as reusable forms instead of redrawing them
+        self.use_forms = use_forms
+
+        # Faces for the DG and diagnosis text; header, footer and patient info stay monospaced
+        self.text_font = self.config.get("text_font", DEFAULT_TEXT_FONT)
+        self.dg_font = f"{self.text_font}-Bold"
+
+        # Define margins
+        self.base_x = 25  # Left margin
+        self.right_margin = 25  # Right margin
+
+    def static_layout(self):
+        """Positions of the header and footer lines, computed once per config version."""
+        layout = _static_layouts.get(self.config_version)
+        if layout is not None:
+            return layout
+        from reportlab.pdfbase import pdfmetrics
+
+        # Header lines are centered on the widest one
+        header_text = self.config.get("header", ["Default Header"])
+        header_widths = [pdfmetrics.stringWidth(line, "NotoSansMono-Bold", 12) for line in header_text]
+        max_header_width = max(header_widths)
+        header = [(self.base_x + (max_header_width - width) / 2, line) for line, width in zip(header_text, header_widths)]
+
+        # Footer lines are centered in a block aligned to the right margin
+        footer_info = self.config.get("footer", ["Default Doctor Info"])
+        footer_widths = [pdfmetrics.stringWidth(line, "NotoSansMono-Bold", 10) for line in footer_info]
+        max_footer_width = max(footer_widths)
+        footer_right_x = A4[0] - self.base_x - max_footer_width
+        footer = [(footer_right_x + (max_footer_width - width) / 2, line) for line, width in zip(footer_info, footer_widths)]
+
+        layout = {"header": header, "footer": footer}
+        _static_layouts[self.config_version] = layout
+        return layout
+
+    @traced("draw_header")
+    def draw_header(self, pdf_canvas, y_position):
+        """Draw the header with centered alignment using data from the JSON file.
+
+        The header is drawn into a form once per document and stamped onto each page.
+        """
+        header_lines = self.static_layout()["header"]
+
+        if self.use_forms:
+            form_name = f"header-{self.config_version}-{y_position:g}"
+            if not pdf_canvas.hasForm(form_name):
+                pdf_canvas.beginForm(form_name)
+                self.draw_header_lines(pdf_canvas, y_position, header_lines)
+                pdf_canvas.endForm()
+            pdf_canvas.doForm(form_name)
+        else:
+            self.draw_header_lines(pdf_canvas, y_position, header_lines)
+
+        return y_position - 20 * len(header_lines)
+
+    def draw_header_lines(self, pdf_canvas, y_position, header_lines):
+        pdf_canvas.setFont("NotoSansMono-Bold", 12)
+        for x_position, line in header_lines:
+            pdf_canvas.drawString(x_position, y_position, line)
+            y_position -= 20
+
+    @traced("draw_patient_info")
+    def draw_patient_info(self, pdf_canvas, y_position, record):
+        """Draw the patient information block."""
+        pdf_canvas.setFont("NotoSansMono-Bold", 12)
+
+        # Define patient information text
+        patient_info = [
+            f"Ime i prezime pacijenta: {record['full_name']}",
+            f"Datum rođenja: {format_date(record['birth_date'])}",
+            f"JMBG: {record['jmbg']}"
+        ]
+
+        # Draw each line of the patient information text
+        y_position -= 20  # Move the patient info a couple of rows down
+        for line in patient_info:
+            pdf_canvas.drawString(self.base_x + 10, y_position, line)
+            y_position -= 15  # Move to the next line
+
+        return y_position
+
+    @traced("draw_page_top")
+    def draw_page_top(self, pdf_canvas, record):
+        """Draw the header and patient info that open every page. Returns the y-position below them."""
+        width, height = A4
+
+        y_position = height - 30  # Adjust top margin
+        y_position = self.draw_header(pdf_canvas, y_position)
+        y_position = self.draw_patient_info(pdf_canvas, y_position - 10, record)
+        return y_position - 20
+
+    @traced("draw_dg_table")
+    def draw_dg_table(self, flow, dg_text):
+        """Draw the DG table with two columns and respect original line breaks."""
+        flow.set_font(self.dg_font, DG_FONT_SIZE)
+
+        # Set the starting x-position for DG
+        dg_x = self.base_x
+
+        # Set the initial y-position to align DG with text
+        flow.skip(15)  # Move down slightly to align vertically
+
+        # Set the starting x-position for the DG text (aligned with "DG:")
+        text_x = self.base_x + 30  # Adjust this to align DG with the text
+
+        # Split the DG text by line breaks
+        label_drawn = False
+
+        for paragraph in text_layout.paragraphs(dg_text):
+            if paragraph.strip() == "":
+                # Add space for empty lines in the input
+                flow.skip(15)
+                continue
+
+            # Wrap the line at word boundaries to the width of the DG column
+            for to_draw in text_layout.wrap_paragraph(paragraph, self.dg_font, DG_FONT_SIZE, dg_text_width()):
+                y_position = flow.line(15)
+                if not label_drawn:
+                    # Draw the "DG:" label next to the first line
+                    flow.pdf_canvas.drawString(dg_x, y_position, "DG:")
+                    label_drawn = True
+                flow.pdf_canvas.drawString(text_x, y_position, to_draw)
+
+        return flow.y_position
+
+    @traced("draw_diagnosis_content")
+    def draw_diagnosis_content(self, flow, diagnosis_text):
+        """Draw the 'Content of Diagnosis' text, matching QTextEdit's displayed lines."""
+        # Set font
+        font_size = DIAGNOSIS_FONT_SIZE  # The font size used in the PDF
+        flow.set_font(self.text_font, font_size)
+
+        # Define a custom line spacing factor for the PDF
+        line_spacing_factor = 1.5  # Adjust this value as needed
+
+        # Calculate line height based on font size and line spacing factor
+        line_height = font_size * line_spacing_factor
+
+        # Add initial empty line
+        flow.skip(1 * line_height)
+
+        # Draw each line, wrapped at word boundaries like the editor wraps it,
+        # breaking to a new page whenever the bottom margin is reached
+        for paragraph in text_layout.paragraphs(diagnosis_text):
+            for to_draw in text_layout.wrap_paragraph(paragraph, self.text_font, font_size, diagnosis_text_width()):
+                flow.pdf_canvas.drawString(self.base_x, flow.line(line_height), to_draw)
+
+        return flow.y_position
+
+    @traced("draw_footer")
+    def draw_footer(self, flow, page_date):
+        """Draw the date and doctor's information at the bottom of the page using data from the JSON file.
+
+        The doctor's block is drawn into a form once per document and stamped at the footer position.
+        """
+        footer_lines = self.static_layout()["footer"]
+
+        # Keep the whole footer block on one page
+        flow.reserve(20 + 15 * (len(footer_lines) - 1))
+        pdf_canvas = flow.pdf_canvas
+        flow.set_font("NotoSansMono-Bold", 10)
+
+        # Draw the date text on the left side
+        footer_left_x = self.base_x
+        footer_left_y = flow.y_position - 20  # Move it 4-5 lines down
+        pdf_canvas.drawString(footer_left_x, footer_left_y, f"{format_date(page_date)} Beograd")
+
+        # Draw the doctor's information on the right side, starting level with the date
+        if self.use_forms:
+            form_name = f"footer-{self.config_version}"
+            if not pdf_canvas.hasForm(form_name):
+                pdf_canvas.beginForm(form_name, lowerx=0, lowery=-15 * len(footer_lines) - 10, upperx=A4[0], uppery=20)
+                self.draw_footer_lines(pdf_canvas, 0, footer_lines)
+                pdf_canvas.endForm()
+            pdf_canvas.saveState()
+            pdf_canvas.translate(0, footer_left_y)
+            pdf_canvas.doForm(form_name)
+            pdf_canvas.restoreState()
+        else:
+            self.draw_footer_lines(pdf_canvas, footer_left_y, footer_lines)
+
+        flow.skip(100)  # Adjust the y-position to account for the footer height
+        return flow.y_position
+
+    def draw_footer_lines(self, pdf_canvas, y_position, footer_lines):
+        pdf_canvas.setFont("NotoSansMono-Bold", 10)
+        for x_position, line in footer_lines:
+            pdf_canvas.drawString(x_position, y_position, line)
+            y_position -= 15  # Move down for the next line
+
+    def draw_entry(self, flow, page):
+        """Draw one report entry (DG table, diagnosis and footer), starting on a fresh page."""
+        flow.start_page()
+        dg_text = page["dg"] or EMPTY_DG_TEXT
+        self.draw_dg_table(flow, dg_text)
+        self.draw_diagnosis_content(flow, page["diagnosis"])
+        self.draw_footer(flow, page["date"])
+
+    def set_metadata(self, pdf_canvas, record):
+        """Title, author and creation date of the document, all taken from the record."""
+        pdf_canvas.setTitle(f"{PDF_TITLE} – {record['full_name']}" if record["full_name"] else PDF_TITLE)
+        pdf_canvas.setAuthor(PDF_CREATOR)
+        pdf_canvas.setCreator(PDF_CREATOR)
+        pdf_canvas.setSubject("")
+        try:
+            report_date = datetime.strptime(record["pages"][0]["date"], '%d-%m-%Y')
+        except ValueError:
+            # Invariant mode's fixed date stays
+            return
+        pdf_canvas.setDateFormatter(lambda *_: report_date.strftime("D:%Y%m%d000000"))
+
+    @traced("render")
+    def render_bytes(self, record, progress=None):
+        """Render a normalized report record into memory. Returns the PDF data and its number of sheets.
+
+        Each entry of record["pages"] starts on a new sheet and flows onto as
+        many further sheets as its content needs. Sheets are finished and
+        handed to the canvas one at a time as the content flows. Page content
+        is compressed; ReportLab embeds only the glyphs used of each font. If
+        given, progress is called with the number of entries drawn so far.
+
+        The output depends only on the record and the config: the canvas runs
+        in invariant mode, which derives the document ID from the content, and
+        the metadata are set from the record, with the report date as the
+        creation date. The same report renders to the same bytes every time.
+        """
+        from reportlab.pdfgen import canvas
+        buffer = io.BytesIO()
+        pdf_canvas = canvas.Canvas(buffer, pagesize=A4, pageCompression=1, invariant=1)
+        self.set_metadata(pdf_canvas, record)
+        flow = PageFlow(self, pdf_canvas, record)
+
+        for index, page in enumerate(record["pages"]):
+            self.draw_entry(flow, page)
+            if progress:
+                progress(index + 1)
+
+        with span("canvas.save", pages=flow.page_count):
+            pdf_canvas.save()
+        data = buffer.getvalue()
+        check_size_budget(len(data), flow.page_count)
+        return data, flow.page_count
+
+    def render(self, record, pdf_file_name, progress=None):
+        """Render a normalized report record into pdf_file_name, replacing it atomically."""
+        data, page_count = self.render_bytes(record, progress)
+        write_file_atomically(pdf_file_name, data)
+        logging.info(f"PDF report saved as {pdf_file_name} ({page_count} pages, {len(data)} bytes)")
+        return pdf_file_name
+
+
+class PageFlow:
+    """Tracks the write position on the current sheet and starts a new one when it runs out of room."""
+
+    def __init__(self, renderer, pdf_canvas, record):
+        self.renderer = renderer
+        self.pdf_canvas = pdf_canvas
+        self.record = record
+        self.font = None
+        self.page_count = 0
+        self.y_position = 0
+
+    def start_page(self):
+        """Finish the current sheet (if any) and open a new one with header and patient info."""
+        if self.page_count > 0:
+            self.pdf_canvas.showPage()
+        self.page_count += 1
+        self.y_position = self.renderer.draw_page_top(self.pdf_canvas, self.record)
+
+        # showPage() resets the canvas state, so restore the active content font
+        if self.font:
+            self.pdf_canvas.setFont(*self.font)
+
+    def set_font(self, font_name, font_size):
+        self.font = (font_name, font_size)
+        self.pdf_canvas.setFont(font_name, font_size)
+
+    def skip(self, height):
+        """Leave height points of vertical space."""
+        self.y_position -= height
+
+    def line(self, height):
+        """Return the baseline for the next line of the given height, breaking the page when needed."""
+        if self.y_position < BOTTOM_MARGIN:
+            self.start_page()
+        y_position = self.y_position
+        self.y_position -= height
+        return y_position
+
+    def reserve(self, height):
+        """Start a new sheet unless a block of the given height still fits on this one."""
+        if self.y_position - height < BOTTOM_MARGIN:
+            self.start_page()
+
+
+def size_budget(page_count):
+    """Largest expected size in bytes of a compressed report with page_count sheets."""
+    return PDF_FIXED_BYTE_BUDGET + PDF_PAGE_BYTE_BUDGET * page_count
+
+def check_size_budget(size, page_count):
+    """Warn when a report is larger than its budget. Returns True if it is within."""
+    budget = size_budget(page_count)
+    if size > budget:
+        logging.warning(f"PDF report is {size} bytes for {page_count} pages, over its budget of {budget} bytes")
+        return False
+    return True
+
+def _write_temporary(folder, data):
+    """Write data to a new temporary file in folder and flush it to disk. Returns its path."""
+    # Unlike mkstemp, which makes the file private, the umask decides who may read the report
+    temporary_path = os.path.join(folder, f".{os.getpid()}-{uuid.uuid4().hex}.tmp")
+    descriptor = os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o666)
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+    return temporary_path
+
+def write_file_atomically(path, data):
+    """Replace path with data; readers see either the old file or the complete new one."""
+    temporary_path = _write_temporary(os.path.dirname(os.path.abspath(path)), data)
+    try:
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+def publish_file(path, data):
+    """Write data under path, or under path with a _2, _3, ... suffix if that name is taken.
+
+    The file appears complete under its final name in one step, and an
+    existing file is never overwritten, even by another process publishing
+    at the same moment. Returns the path used.
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    base_name, extension = os.path.splitext(path)
+    temporary_path = _write_temporary(folder, data)
+    try:
+        suffix = 1
+        while True:
+            candidate = path if suffix == 1 else f"{base_name}_{suffix}{extension}"
+            try:
+                # A hard link fails if the name exists, unlike a rename
+                os.link(temporary_path, candidate)
+                return candidate
+            except FileExistsError:
+                suffix += 1
+            except OSError:
+                # No hard links on this file system: claim the name, then move the data over it
+                try:
+                    os.close(os.open(candidate, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                except FileExistsError:
+                    suffix += 1
+                    continue
+                os.replace(temporary_path, candidate)
+                return candidate
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+def render_report(record, pdf_file_name, config=None):
+    """Render a report record into pdf_file_name without any GUI."""
+    return ReportRenderer(config).render(normalize_record(record), pdf_file_name)
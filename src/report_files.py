@@ -0,0 +1,598 @@
+"""Where report PDFs live: a folder per month for recent reports, an indexed bundle per month for older ones.
+
+A report PDF is named <name>_<yyyymmdd>.pdf (_2, _3, ... for more reports of
+the same patient and day) and lives in the folder of the month in its name,
+izvestaji/YYYY/MM/. Older versions put every PDF straight into izvestaji/.
+
+Months before the last HOT_MONTHS are compacted into one bundle each,
+izvestaji/YYYY/YYYY-MM.zip, a deflated zip that any zip tool opens. Next to
+it, YYYY-MM.idx lists its entries sorted by name, with the offset, sizes and
+CRC of each, so one report is read from a bundle with a single seek instead
+of reading the zip's central directory. An index names the size and
+modification time of its bundle, and is rebuilt from the zip when they no
+longer match.
+
+compact() moves the PDFs of older versions into their month folders, then
+packs each cold month: the bundle, with the reports of an earlier bundle of
+the month, is written under a temporary name and renamed into place, then
+every report packed is read back from it before its file is removed. A crash
+at any point leaves every report readable, as a file or from the bundle, and
+the next run finishes the job. One process compacts at a time.
+
+Paths of reports kept in the archive and in the records stay valid: locate()
+finds a report by its file name wherever it is now. A report inside a bundle
+has the path <bundle>/<name>, which read_report() and open_report() accept.
+
+Usage: python report_files.py compact [--hot-months N] | find "Ime Prezime" [yyyy-mm-dd] | get PATH OUTPUT
+"""
+import sys
+import logging
+import os
+import re
+import mmap
+import struct
+import threading
+import time
+import zipfile
+import zlib
+import argparse
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime
+
+import report_engine
+
+# Folder of the report PDFs, relative to the working directory like records/
+REPORTS_FOLDER = "izvestaji"
+
+# Report files are named <name>_<yyyymmdd>.pdf, with _2, _3, ... for more reports of the same day
+REPORT_FILE = re.compile(r"^(?P<stem>.+)_(?P<date>\d{8})(?:_\d+)?\.pdf$", re.IGNORECASE)
+_BUNDLE_FILE = re.compile(r"^(?P<year>\d{4})-(?P<month>\d{2})\.zip$", re.IGNORECASE)
+_YEAR_FOLDER = re.compile(r"^\d{4}$")
+_MONTH_FOLDER = re.compile(r"^\d{2}$")
+
+# The current month and the ones before it that stay as files
+HOT_MONTHS = 3
+
+BUNDLE_EXTENSION = ".zip"
+INDEX_EXTENSION = ".idx"
+INDEX_VERSION = 1
+
+# Listings of folders modified more recently than this are not kept, in nanoseconds
+RECENT_CHANGE_NS = 2 * 10**9
+
+# Held by the compacting process, which touches it after each month; a lock older than this was left by a crash
+LOCK_FILE = ".compact.lock"
+STALE_LOCK_SECONDS = 60 * 60
+
+# Extracted reports opened from bundles, next to the render cache
+VIEW_CACHE_FOLDER = os.path.join(".cache", "izvestaji")
+
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+_LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+
+# Loaded bundle indexes by path, and the report files of folders by path with the folder's modification time
+_indexes = {}
+_listings = {}
+_indexes_lock = threading.Lock()
+
+# Background thread running compactions, created on first use, and the request to stop at the next month
+_executor = None
+_executor_lock = threading.Lock()
+_stop = threading.Event()
+
+
+def report_date(name):
+    """The day in a report file name, or None if it is not a report file name."""
+    match = REPORT_FILE.match(name)
+    if match is None:
+        return None
+    try:
+        return datetime.strptime(match["date"], '%Y%m%d').date()
+    except ValueError:
+        return None
+
+def month_folder(folder, day):
+    return os.path.join(folder, f"{day:%Y}", f"{day:%m}")
+
+def shard_path(folder, name):
+    """Path of the report file name in the folder of its month."""
+    return os.path.join(month_folder(folder, report_date(name)), name)
+
+def report_path(folder, full_name, when):
+    """Path for a new report of the patient full_name generated at when."""
+    return shard_path(folder, f"{report_engine.file_stem(full_name)}_{when:%Y%m%d}.pdf")
+
+def bundle_path(folder, year, month):
+    return os.path.join(folder, f"{year:04d}", f"{year:04d}-{month:02d}{BUNDLE_EXTENSION}")
+
+def split_bundled(path):
+    """(bundle, name) of the path of a report inside a bundle, or None for any other path."""
+    bundle, name = os.path.split(path)
+    if bundle.lower().endswith(BUNDLE_EXTENSION) and not os.path.isdir(bundle):
+        return bundle, name
+    return None
+
+
+class BundleIndex:
+    """The entries of one bundle, sorted by name: (casefolded name, name, offset, compressed size, size, CRC, method)."""
+
+    def __init__(self, bundle, entries, stamp):
+        self.bundle = bundle
+        self.entries = sorted(entries)
+        self.keys = [entry[0] for entry in self.entries]
+        self.stamp = stamp
+
+    @staticmethod
+    def index_path(bundle):
+        return os.path.splitext(bundle)[0] + INDEX_EXTENSION
+
+    @classmethod
+    def from_zip(cls, bundle, stamp):
+        """Read the entries from the zip's central directory."""
+        try:
+            with zipfile.ZipFile(bundle) as archive:
+                entries = [(info.filename.casefold(), info.filename, info.header_offset, info.compress_size,
+                            info.file_size, info.CRC, info.compress_type) for info in archive.infolist()]
+        except zipfile.BadZipFile as e:
+            raise ValueError(f"{bundle} is not a zip: {e}")
+        return cls(bundle, entries, stamp)
+
+    @classmethod
+    def load(cls, bundle):
+        """The index of a bundle, from its index file if that matches the bundle. Raises OSError or ValueError."""
+        stat = os.stat(bundle)
+        stamp = (stat.st_size, stat.st_mtime_ns)
+        try:
+            with open(cls.index_path(bundle), 'r', encoding='utf-8') as file:
+                lines = file.read().split("\n")
+            header = lines[0].split()
+            if header == ["bundle", str(INDEX_VERSION), str(stamp[0]), str(stamp[1])]:
+                entries = []
+                for line in lines[1:]:
+                    if line:
+                        name, *numbers = line.split("\t")
+                        entries.append((name.casefold(), name, *map(int, numbers)))
+                return cls(bundle, entries, stamp)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logging.warning(f"Index of {bundle} is unusable, reading the bundle: {e}")
+
+        index = cls.from_zip(bundle, stamp)
+        try:
+            index.save()
+        except OSError as e:
+            logging.warning(f"Cannot save the index of {bundle}: {e}")
+        return index
+
+    def save(self, path=None):
+        lines = [f"bundle {INDEX_VERSION} {self.stamp[0]} {self.stamp[1]}"]
+        lines.extend("\t".join(map(str, entry[1:])) for entry in self.entries)
+        report_engine.write_file_atomically(path or self.index_path(self.bundle), "\n".join(lines).encode('utf-8'))
+
+    def get(self, name):
+        """The entry named name, or None."""
+        key = name.casefold()
+        position = bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position] == key:
+            return self.entries[position]
+        return None
+
+    def with_prefix(self, prefix):
+        """The entries whose name starts with prefix, ignoring case."""
+        key = prefix.casefold()
+        position = bisect_left(self.keys, key)
+        found = []
+        while position < len(self.keys) and self.keys[position].startswith(key):
+            found.append(self.entries[position])
+            position += 1
+        return found
+
+    def read(self, name):
+        """The data of the entry named name. Raises KeyError, OSError, or ValueError if it is damaged."""
+        entry = self.get(name)
+        if entry is None:
+            raise KeyError(name)
+        _, _, offset, compressed_size, size, crc, method = entry
+        with open(self.bundle, 'rb') as file:
+            file.seek(offset)
+            header = file.read(_LOCAL_HEADER.size)
+            if len(header) < _LOCAL_HEADER.size or header[:4] != _LOCAL_HEADER_SIGNATURE:
+                raise ValueError(f"{self.bundle}: no entry at offset {offset}")
+            fields = _LOCAL_HEADER.unpack(header)
+            file.seek(fields[-2] + fields[-1], os.SEEK_CUR)
+            data = file.read(compressed_size)
+        if method == zipfile.ZIP_DEFLATED:
+            data = zlib.decompress(data, -15)
+        elif method != zipfile.ZIP_STORED:
+            raise ValueError(f"{self.bundle}: {name} is compressed with an unsupported method")
+        if len(data) != size or zlib.crc32(data) != crc:
+            raise ValueError(f"{self.bundle}: {name} is damaged")
+        return data
+
+
+def bundle_index(bundle):
+    """The index of a bundle, loaded once per process and again only after the bundle changed."""
+    stat = os.stat(bundle)
+    with _indexes_lock:
+        index = _indexes.get(bundle)
+    if index is None or index.stamp != (stat.st_size, stat.st_mtime_ns):
+        index = BundleIndex.load(bundle)
+        with _indexes_lock:
+            _indexes[bundle] = index
+    return index
+
+def locate(path):
+    """Where the report once written to path is now: path itself, its month folder, or its bundle. None if gone."""
+    if os.path.isfile(path):
+        return path
+    bundled = split_bundled(path)
+    directory, name = bundled if bundled else os.path.split(path)
+    day = report_date(name)
+    if day is None:
+        return None
+
+    # The report folder is above the bundle's year, or above the report's month and year, or holds the report
+    folder = os.path.dirname(directory) if bundled else directory
+    parent, month = os.path.split(folder)
+    if _MONTH_FOLDER.match(month) and _YEAR_FOLDER.match(os.path.basename(parent)):
+        folder = os.path.dirname(parent)
+
+    candidate = shard_path(folder, name)
+    if os.path.isfile(candidate):
+        return candidate
+    bundle = bundle_path(folder, day.year, day.month)
+    try:
+        entry = bundle_index(bundle).get(name)
+    except (OSError, ValueError):
+        return None
+    return os.path.join(bundle, entry[1]) if entry else None
+
+def read_report(path):
+    """The data of a report file, or of a report inside a bundle. Raises OSError, KeyError or ValueError."""
+    bundled = split_bundled(path)
+    if bundled:
+        bundle, name = bundled
+        return bundle_index(bundle).read(name)
+    with open(path, 'rb') as file:
+        return file.read()
+
+@contextmanager
+def open_report(path):
+    """The data of a report, memory-mapped if it is a file of its own."""
+    if split_bundled(path):
+        yield read_report(path)
+        return
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        yield data
+
+def viewable_path(path):
+    """A file a PDF viewer can open for the report once written to path; reports in bundles are extracted."""
+    located = locate(path)
+    if located is None or not split_bundled(located):
+        return located or path
+    target = os.path.join(os.getcwd(), VIEW_CACHE_FOLDER, os.path.basename(located))
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    report_engine.write_file_atomically(target, read_report(located))
+    return target
+
+
+def _months(folder, first_year=0, last_year=9999):
+    """(year, month, month folder or None, bundle or None) of every month under folder in the years given, oldest first."""
+    months = {}
+    try:
+        years = [entry for entry in os.scandir(folder)
+                 if entry.is_dir() and _YEAR_FOLDER.match(entry.name) and first_year <= int(entry.name) <= last_year]
+    except FileNotFoundError:
+        return []
+    for year in years:
+        for entry in os.scandir(year.path):
+            if entry.is_dir() and _MONTH_FOLDER.match(entry.name):
+                months.setdefault((int(year.name), int(entry.name)), [None, None])[0] = entry.path
+            elif _BUNDLE_FILE.match(entry.name) and entry.name[:4] == year.name:
+                months.setdefault((int(year.name), int(entry.name[5:7])), [None, None])[1] = entry.path
+    return [(year, month, paths[0], paths[1]) for (year, month), paths in sorted(months.items())]
+
+def _listing(directory):
+    """The report file names in a folder as (casefolded name, name), sorted; kept until the folder changes."""
+    try:
+        modified = os.stat(directory).st_mtime_ns
+    except FileNotFoundError:
+        return []
+    with _indexes_lock:
+        cached = _listings.get(directory)
+    if cached and cached[0] == modified:
+        return cached[1]
+    listing = sorted((entry.name.casefold(), entry.name) for entry in os.scandir(directory)
+                     if entry.is_file() and report_date(entry.name))
+    # A folder changed within the timestamp resolution may change again unnoticed
+    if time.time_ns() - modified > RECENT_CHANGE_NS:
+        with _indexes_lock:
+            _listings[directory] = (modified, listing)
+    return listing
+
+def _with_prefix(listing, prefix):
+    position = bisect_left(listing, (prefix,))
+    while position < len(listing) and listing[position][0].startswith(prefix):
+        yield listing[position][1]
+        position += 1
+
+def iter_reports(folder=REPORTS_FOLDER, date_from=None, date_to=None, stem=None):
+    """Paths of the reports under folder: files, in month folders or not, and reports inside bundles.
+
+    date_from and date_to are inclusive datetime.date bounds on the day in
+    the name; stem a file name stem (see report_engine.file_stem).
+    """
+    first = date_from or date.min
+    last = date_to or date.max
+    prefix = f"{stem}_".casefold() if stem else ""
+
+    def wanted(name):
+        day = report_date(name)
+        return day is not None and first <= day <= last and (
+            not stem or REPORT_FILE.match(name)["stem"].casefold() == stem.casefold())
+
+    for name in _with_prefix(_listing(folder), prefix):
+        if wanted(name):
+            yield os.path.join(folder, name)
+    for year, month, directory, bundle in _months(folder, first.year, last.year):
+        if not (first.year, first.month) <= (year, month) <= (last.year, last.month):
+            continue
+        loose = set()
+        if directory:
+            for name in _with_prefix(_listing(directory), prefix):
+                loose.add(name.casefold())
+                if wanted(name):
+                    yield os.path.join(directory, name)
+        if bundle:
+            try:
+                index = bundle_index(bundle)
+            except (OSError, ValueError) as e:
+                logging.error(f"Cannot read the bundle {bundle}: {e}")
+                continue
+            # A report written again after its month was packed is the file
+            for key, name, *_ in index.with_prefix(prefix):
+                if key not in loose and wanted(name):
+                    yield os.path.join(bundle, name)
+
+def find_reports(folder=REPORTS_FOLDER, date_from=None, date_to=None, patient=None):
+    """Paths of the reports under folder, oldest first, optionally narrowed to days and a patient.
+
+    date_from and date_to are inclusive datetime.date bounds on the day a
+    report was generated; patient is a full name as typed in the form.
+    """
+    stem = report_engine.file_stem(patient.strip()) if patient and patient.strip() else None
+    reports = [(report_date(os.path.basename(path)), os.path.basename(path).casefold(), path)
+               for path in iter_reports(folder, date_from, date_to, stem)]
+    reports.sort()
+    return [path for _, _, path in reports]
+
+
+@contextmanager
+def _compaction_lock(folder):
+    """Yields whether this process may compact folder; another one may be at it."""
+    path = os.path.join(folder, LOCK_FILE)
+    for _ in range(2):
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) < STALE_LOCK_SECONDS:
+                    yield False
+                    return
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    else:
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def _refresh_compaction_lock(folder):
+    """Show a compaction is still going, so the lock is not taken for one left by a crash."""
+    try:
+        os.utime(os.path.join(folder, LOCK_FILE))
+    except OSError:
+        pass
+
+def move_loose_reports(folder):
+    """Move the reports directly in folder, as older versions left them, into their month folders.
+
+    A report whose name is already taken in its month folder stays where it is. Returns the number moved.
+    """
+    moved = 0
+    try:
+        names = [entry.name for entry in os.scandir(folder) if entry.is_file() and report_date(entry.name)]
+    except FileNotFoundError:
+        return 0
+    for name in names:
+        if _stop.is_set():
+            break
+        source = os.path.join(folder, name)
+        target = shard_path(folder, name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            # A hard link fails if the name is taken, unlike a rename
+            os.link(source, target)
+        except FileExistsError:
+            logging.warning(f"{source} stays: {target} exists")
+            continue
+        except OSError:
+            if os.path.exists(target):
+                logging.warning(f"{source} stays: {target} exists")
+                continue
+            os.replace(source, target)
+            moved += 1
+            continue
+        os.remove(source)
+        moved += 1
+    return moved
+
+def _size_and_crc(path):
+    with open(path, 'rb') as file:
+        data = file.read()
+    return len(data), zlib.crc32(data)
+
+def pack_month(folder, year, month):
+    """Pack the reports in the folder of a month into its bundle. Returns the number packed.
+
+    A report written again after its month was packed, e.g. by batch_render,
+    stays a file next to the bundle, where lookups find it first; the report
+    of that name in the bundle is kept as it was.
+    """
+    directory = os.path.join(folder, f"{year:04d}", f"{month:02d}")
+    bundle = bundle_path(folder, year, month)
+    names = sorted(entry.name for entry in os.scandir(directory) if entry.is_file() and report_date(entry.name))
+    old_index = bundle_index(bundle) if os.path.exists(bundle) else None
+
+    # Reports the bundle holds as they are were left by a compaction cut short
+    packed, new_names = [], []
+    for name in names:
+        entry = old_index.get(name) if old_index else None
+        if entry is None:
+            new_names.append(name)
+        elif (entry[4], entry[5]) == _size_and_crc(os.path.join(directory, name)):
+            packed.append(name)
+        else:
+            logging.warning(f"{os.path.join(directory, name)} stays a file: {bundle} holds another report of that name")
+
+    index = old_index
+    if new_names:
+        temporary_path = f"{bundle}.{os.getpid()}.part"
+        try:
+            with zipfile.ZipFile(temporary_path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+                if old_index:
+                    with zipfile.ZipFile(bundle) as old_archive:
+                        for info in old_archive.infolist():
+                            archive.writestr(info, old_archive.read(info))
+                for name in new_names:
+                    archive.write(os.path.join(directory, name), name)
+            with open(temporary_path, 'rb+') as file:
+                os.fsync(file.fileno())
+            stat = os.stat(temporary_path)
+            index = BundleIndex(bundle, BundleIndex.from_zip(temporary_path, None).entries,
+                                (stat.st_size, stat.st_mtime_ns))
+            os.replace(temporary_path, bundle)
+            index.save()
+        finally:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+        packed.extend(new_names)
+
+    # A report leaves its folder only once it reads back from the bundle
+    removed = 0
+    for name in packed:
+        try:
+            index.read(name)
+        except (KeyError, OSError, ValueError) as e:
+            logging.error(f"{name} stays a file: it does not read back from {bundle}: {e}")
+            continue
+        os.remove(os.path.join(directory, name))
+        removed += 1
+    try:
+        os.rmdir(directory)
+    except OSError:
+        # Reports left as files, or a new one
+        pass
+    return removed
+
+def compact(folder=REPORTS_FOLDER, hot_months=HOT_MONTHS, today=None):
+    """Move old-style reports into month folders and pack the months before the last hot_months into bundles.
+
+    Returns (reports moved, reports packed); (0, 0) if another process is compacting.
+    """
+    today = today or date.today()
+    first_hot = today.year * 12 + today.month - 1 - (hot_months - 1)
+    with _compaction_lock(folder) as locked:
+        if not locked:
+            logging.info(f"{folder} is being compacted by another process")
+            return 0, 0
+        moved = move_loose_reports(folder)
+        _refresh_compaction_lock(folder)
+        packed = 0
+        for year, month, directory, _ in _months(folder):
+            if _stop.is_set():
+                break
+            if directory and year * 12 + month - 1 < first_hot:
+                start_time = time.perf_counter()
+                count = pack_month(folder, year, month)
+                _refresh_compaction_lock(folder)
+                packed += count
+                if count:
+                    logging.info(f"Packed {count} reports of {year:04d}-{month:02d} in "
+                                 f"{time.perf_counter() - start_time:.1f} s")
+    if moved or packed:
+        logging.info(f"Compacted {folder}: {moved} reports moved into month folders, {packed} packed")
+    return moved, packed
+
+def _compact(folder, hot_months):
+    try:
+        compact(folder, hot_months)
+    except (OSError, ValueError) as e:
+        logging.error(f"Compacting {folder} failed: {e}")
+
+def _worker():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="compaction")
+        return _executor
+
+def start_compaction(folder=None, hot_months=HOT_MONTHS):
+    """Compact the report folder on a background thread."""
+    _stop.clear()
+    return _worker().submit(_compact, folder or os.path.join(os.getcwd(), REPORTS_FOLDER), hot_months)
+
+def stop_compaction():
+    """Make a background compaction stop after the month it is packing, e.g. before the application quits."""
+    _stop.set()
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Compact the report folder and find reports in it.")
+    parser.add_argument("--folder", default=REPORTS_FOLDER, help="Folder of the reports (default: izvestaji)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compact_parser = commands.add_parser("compact", help="Pack the months before the last few into bundles")
+    compact_parser.add_argument("--hot-months", type=int, default=HOT_MONTHS,
+                                help=f"Months, the current one included, that stay as files (default: {HOT_MONTHS})")
+    find_parser = commands.add_parser("find", help="List the reports of a patient, on one day or on any")
+    find_parser.add_argument("patient", help="Full name as typed in the form")
+    find_parser.add_argument("day", nargs="?", help="yyyy-mm-dd")
+    get_parser = commands.add_parser("get", help="Copy a report, wherever it is now, to a file")
+    get_parser.add_argument("path", help="Path of the report, as the archive has it")
+    get_parser.add_argument("output", help="File to write")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "compact":
+            compact(args.folder, max(1, args.hot_months))
+        elif args.command == "find":
+            day = datetime.strptime(args.day, '%Y-%m-%d').date() if args.day else None
+            start_time = time.perf_counter()
+            paths = find_reports(args.folder, day, day, args.patient)
+            for path in paths:
+                print(path)
+            logging.info(f"{len(paths)} reports found in {(time.perf_counter() - start_time) * 1000:.1f} ms")
+        else:
+            located = locate(args.path)
+            if located is None:
+                logging.error(f"{args.path} is not in {args.folder} any more")
+                return 1
+            report_engine.write_file_atomically(args.output, read_report(located))
+    except (OSError, KeyError, ValueError) as e:
+        logging.error(f"{args.command} failed: {e}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,347 @@
+"""Generated reports saved as structured records, so any of them can be loaded back into the form or rendered again.
+
+Each report is appended to the segment of the month it was generated in,
+records/YYYY-MM.seg, as one frame:
+
+    length   size of the payload, 4 bytes little-endian
+    crc32    checksum of the payload, 4 bytes little-endian
+    payload  zlib-compressed UTF-8 JSON: {"v": FORMAT_VERSION, "created_at", "pdf_path", "report"}
+
+where "report" is the normalized record (see report_engine.normalize_record)
+with every page, blank or not. Records imported from the files of older
+reports (see legacy_import) also name those files in a "source" list. Segments are only ever appended to, so a
+record never moves: its locator, "YYYY-MM.seg:offset", is kept in the
+archive and reading the record back is one seek. Records are checked
+against REPORT_SCHEMA and PAGE_SCHEMA when written and when read.
+
+A frame cut short by a crash, or whose checksum does not match, ends the
+readable part of its segment. The GUI, the importer and the render service
+may append to a segment at the same time, so an append holds an exclusive
+lock on the segment while it cuts such a tail off, writes its frames and
+takes their offsets.
+
+Usage: python report_store.py list [YYYY-MM] | show LOCATOR | render LOCATOR [output.pdf]
+"""
+import sys
+import logging
+import os
+import json
+import struct
+import threading
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+# Folder holding the segments, relative to the working directory like izvestaji/
+RECORDS_FOLDER = "records"
+SEGMENT_EXTENSION = ".seg"
+
+# Bump when the payload changes; records of a newer version are refused
+FORMAT_VERSION = 1
+
+FRAME_HEADER = struct.Struct("<II")  # payload length, CRC-32 of the payload
+
+# Larger payloads are taken for a damaged length field
+MAX_PAYLOAD_BYTES = 16 * 1024 * 1024
+
+# Fields of a stored report and of each of its pages, with their types
+REPORT_SCHEMA = {
+    "full_name": str,
+    "birth_date": str,
+    "jmbg": str,
+    "pages": list,
+}
+PAGE_SCHEMA = {
+    "dg": str,
+    "diagnosis": str,
+    "date": str,
+}
+
+# Locks on Windows keep other processes from reading the bytes locked, so a segment is locked
+# by one byte past any offset it reaches
+WINDOWS_LOCK_OFFSET = 2 ** 31 - 1
+
+# End of each segment after the last append of this process, and the lock serializing its appends
+_segment_ends = {}
+_append_lock = threading.Lock()
+
+
+class RecordError(ValueError):
+    """A stored record is damaged, of an unknown version or does not match the schema."""
+
+
+def _check_fields(data, schema, what):
+    if not isinstance(data, dict):
+        raise RecordError(f"{what} must be an object")
+    if set(data) != set(schema):
+        raise RecordError(f"{what} must have exactly the fields {', '.join(schema)}")
+    for key, value_type in schema.items():
+        if not isinstance(data[key], value_type):
+            raise RecordError(f'{what} field "{key}" must be a {value_type.__name__}')
+
+@lru_cache(maxsize=4096)
+def _is_date(text):
+    # Reports share few dates, and parsing them is most of the cost of reading a record
+    try:
+        datetime.strptime(text, '%d-%m-%Y')
+    except ValueError:
+        return False
+    return True
+
+def _check_date(text, what):
+    if not _is_date(text):
+        raise RecordError(f"{what} must be a date as dd-mm-yyyy, not {text!r}")
+
+def validate_report(report):
+    """Check a report record against REPORT_SCHEMA and PAGE_SCHEMA. Returns it, raises RecordError."""
+    _check_fields(report, REPORT_SCHEMA, "Report")
+    if report["birth_date"]:
+        _check_date(report["birth_date"], "Birth date")
+    if not report["pages"]:
+        raise RecordError("Report needs at least one page")
+    for number, page in enumerate(report["pages"], start=1):
+        _check_fields(page, PAGE_SCHEMA, f"Page {number}")
+        _check_date(page["date"], f"Page {number} date")
+    return report
+
+def validate_stored(stored):
+    """Check a decoded payload: its version, metadata and report. Returns it, raises RecordError."""
+    if not isinstance(stored, dict):
+        raise RecordError("Record must be an object")
+    version = stored.get("v")
+    if version != FORMAT_VERSION:
+        raise RecordError(f"Unknown record version {version!r}")
+    if not isinstance(stored.get("created_at"), str):
+        raise RecordError('Record field "created_at" must be a string')
+    if not isinstance(stored.get("pdf_path"), (str, type(None))):
+        raise RecordError('Record field "pdf_path" must be a string or null')
+    source = stored.get("source", [])
+    if not isinstance(source, list) or not all(isinstance(path, str) for path in source):
+        raise RecordError('Record field "source" must be a list of paths')
+    validate_report(stored.get("report"))
+    return stored
+
+def encode_frame(stored):
+    payload = zlib.compress(json.dumps(stored, ensure_ascii=False, separators=(",", ":")).encode('utf-8'), 6)
+    return FRAME_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+def decode_payload(payload, checksum):
+    if zlib.crc32(payload) != checksum:
+        raise RecordError("Record checksum does not match")
+    try:
+        stored = json.loads(zlib.decompress(payload).decode('utf-8'))
+    except (zlib.error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise RecordError(f"Record is not valid JSON: {e}")
+    return validate_stored(stored)
+
+
+def segment_name(when):
+    """Name of the segment a report generated at the datetime when goes to."""
+    return f"{when:%Y-%m}{SEGMENT_EXTENSION}"
+
+def format_locator(name, offset):
+    return f"{name}:{offset}"
+
+def parse_locator(locator):
+    """(segment name, offset) of a locator. Raises RecordError."""
+    name, _, offset = str(locator).rpartition(":")
+    if not name.endswith(SEGMENT_EXTENSION) or os.path.basename(name) != name or not offset.isdigit():
+        raise RecordError(f"Not a record locator: {locator!r}")
+    return name, int(offset)
+
+def list_segments(folder=RECORDS_FOLDER):
+    """Names of the segments in folder, oldest month first."""
+    try:
+        return sorted(entry.name for entry in os.scandir(folder) if entry.name.endswith(SEGMENT_EXTENSION))
+    except FileNotFoundError:
+        return []
+
+def read_frame(file, offset, size):
+    """The stored record of the frame at offset, and the offset after it. Raises RecordError."""
+    file.seek(offset)
+    header = file.read(FRAME_HEADER.size)
+    if len(header) < FRAME_HEADER.size:
+        raise RecordError(f"No complete record at offset {offset}")
+    length, checksum = FRAME_HEADER.unpack(header)
+    end = offset + FRAME_HEADER.size + length
+    if length > MAX_PAYLOAD_BYTES or end > size:
+        raise RecordError(f"Record at offset {offset} is cut short")
+    return decode_payload(file.read(length), checksum), end
+
+def _frames(path, start=0):
+    """(offset, end, stored record) of each frame of a segment from start on, up to its first damaged one."""
+    with open(path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        offset = start
+        while offset < size:
+            try:
+                stored, end = read_frame(file, offset, size)
+            except RecordError as e:
+                logging.warning(f"{path}: records from offset {offset} on are unreadable: {e}")
+                return
+            yield offset, end, stored
+            offset = end
+
+def iter_segment(path, start=0):
+    """(offset, stored record) of each record of a segment from start on, up to its first damaged frame."""
+    for offset, _, stored in _frames(path, start):
+        yield offset, stored
+
+def iter_records(folder=RECORDS_FOLDER, after=None):
+    """(locator, stored record) of every record in folder, oldest first; only those after the locator after, if given."""
+    after_name, after_offset = parse_locator(after) if after else ("", 0)
+    for name in list_segments(folder):
+        if name < after_name:
+            continue
+        # Reading resumes at the record after, which is skipped
+        start = after_offset if name == after_name else 0
+        for offset, stored in iter_segment(os.path.join(folder, name), start):
+            if name == after_name and offset == after_offset:
+                continue
+            yield format_locator(name, offset), stored
+
+def read_record(locator, folder=RECORDS_FOLDER):
+    """The stored record at a locator. Raises RecordError, or OSError if its segment cannot be read."""
+    name, offset = parse_locator(locator)
+    with open(os.path.join(folder, name), 'rb') as file:
+        stored, _ = read_frame(file, offset, os.fstat(file.fileno()).st_size)
+    return stored
+
+def readable_end(path, start=0):
+    """Offset after the last intact frame of a segment, checking the frames from start on."""
+    end = start
+    for _, end, _ in _frames(path, start):
+        pass
+    return end
+
+@contextmanager
+def _locked(file):
+    """Hold an exclusive lock on an open segment, waiting for other processes appending to it."""
+    if sys.platform == "win32":
+        # Gives up with OSError after 10 seconds
+        file.seek(WINDOWS_LOCK_OFFSET)
+        msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            file.seek(WINDOWS_LOCK_OFFSET)
+            msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+def _cut_damaged_tail(file, path, start=0):
+    """Truncate a locked segment after its last intact frame, so a crash mid-append does not hide later records.
+
+    The frames before start are known to be intact. Returns the new size.
+    """
+    size = os.fstat(file.fileno()).st_size
+    end = readable_end(path, start)
+    if end < size:
+        logging.warning(f"{path}: dropping {size - end} bytes of a damaged record at the end")
+        file.truncate(end)
+    return end
+
+def stored_record(report, pdf_path=None, when=None, source=None):
+    """The record to store for a report generated at the datetime when. Raises RecordError."""
+    stored = {
+        "v": FORMAT_VERSION,
+        "created_at": (when or datetime.now()).isoformat(timespec='seconds'),
+        "pdf_path": pdf_path,
+        "report": {
+            "full_name": report["full_name"],
+            "birth_date": report["birth_date"],
+            "jmbg": report["jmbg"],
+            "pages": [{key: page[key] for key in PAGE_SCHEMA} for page in report["pages"]],
+        },
+    }
+    if source:
+        stored["source"] = list(source)
+    return validate_stored(stored)
+
+def append_records(records, folder=RECORDS_FOLDER):
+    """Append stored records (see stored_record) to the segments of their months. Returns their locators.
+
+    Each segment written to is synced once, after all of its frames. Raises OSError.
+    """
+    frames = {}
+    for index, stored in enumerate(records):
+        name = segment_name(datetime.fromisoformat(stored["created_at"]))
+        frames.setdefault(name, []).append((index, encode_frame(stored)))
+
+    locators = [None] * len(records)
+    os.makedirs(folder, exist_ok=True)
+    with _append_lock:
+        for name, segment_frames in frames.items():
+            path = os.path.join(folder, name)
+            data = b"".join(frame for _, frame in segment_frames)
+            with open(path, 'ab') as file, _locked(file):
+                offset = os.fstat(file.fileno()).st_size
+                known_end = _segment_ends.get(path)
+                if offset != known_end:
+                    # First append of this process, or another one appended since: check what it wrote
+                    offset = _cut_damaged_tail(file, path, known_end if known_end and known_end < offset else 0)
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+                _segment_ends[path] = offset + len(data)
+            for index, frame in segment_frames:
+                locators[index] = format_locator(name, offset)
+                offset += len(frame)
+    return locators
+
+def append_record(report, pdf_path=None, folder=RECORDS_FOLDER, when=None):
+    """Append a report record to the segment of its month. Returns its locator; raises RecordError or OSError."""
+    return append_records([stored_record(report, pdf_path, when)], folder)[0]
+
+def save_report(report, pdf_path=None, folder=RECORDS_FOLDER):
+    """Append a report record; failures are logged, never raised. Returns its locator, or None."""
+    try:
+        locator = append_record(report, pdf_path, folder)
+    except (OSError, RecordError) as e:
+        logging.error(f"Failed to save the report record: {e}")
+        return None
+    logging.info(f"Report record saved at {locator}")
+    return locator
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    argv = sys.argv[1:] if argv is None else argv
+    command = argv[0] if argv else "list"
+    try:
+        if command == "list":
+            month = argv[1] if len(argv) > 1 else ""
+            for locator, stored in iter_records():
+                if locator.startswith(month):
+                    report = stored["report"]
+                    print(f"{locator}\t{report['pages'][0]['date']}\t{report['jmbg']}\t{report['full_name']}")
+        elif command == "show" and len(argv) > 1:
+            print(json.dumps(read_record(argv[1]), ensure_ascii=False, indent=4))
+        elif command == "render" and len(argv) > 1:
+            import report_engine
+            report = read_record(argv[1])["report"]
+            output = argv[2] if len(argv) > 2 else f"{report_engine.file_stem(report['full_name'])}.pdf"
+            if not report_engine.register_fonts():
+                return 1
+            report_engine.render_report(report, output)
+        else:
+            print(__doc__.strip().splitlines()[-1])
+            return 2
+    except (OSError, ValueError) as e:
+        # RecordError, or a ConfigError when rendering
+        logging.error(f"{command} failed: {e}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,27 @@
+import sys
+import os
+
+
+def resource_path(relative_path):
+    """Get the absolute path to a resource, works for both development and PyInstaller."""
+    try:
+        # PyInstaller creates a temp folder and stores path in _MEIPASS
+        base_path = sys._MEIPASS
+    except Exception:
+        base_path = os.path.abspath(".")
+
+    return os.path.join(base_path, relative_path)
+
+def app_path(relative_path):
+    """Get the absolute path to a file the application writes for itself, next to its modules or executable.
+
+    Unlike resource_path, this does not depend on the working directory, and a
+    PyInstaller build writes next to its executable rather than into its
+    temporary folder, which is removed on exit.
+    """
+    if getattr(sys, 'frozen', False):
+        base_path = os.path.dirname(sys.executable)
+    else:
+        base_path = os.path.dirname(os.path.abspath(__file__))
+
+    return os.path.join(base_path, relative_path)
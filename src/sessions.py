@@ -0,0 +1,136 @@
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QMainWindow, QTabWidget, QVBoxLayout, QWidget
+
+# Page windows kept built: the current tab's and those of the tabs used just before it
+LIVE_SESSIONS = 2
+
+
+class Session(QWidget):
+    """One tab: a page window while the tab is in use, or else the state to build it again from.
+
+    A page window is suspended by its suspend() method, which returns that
+    state or None if it cannot be let go now, and built again by the
+    resume(state) class method of its class.
+    """
+
+    def __init__(self, page_window, parent=None):
+        super().__init__(parent)
+        self.box = QVBoxLayout(self)
+        self.box.setContentsMargins(0, 0, 0, 0)
+        self.page_window = None
+        self.window_class = type(page_window)
+        self.state = None
+        self.attach(page_window)
+
+    def attach(self, page_window):
+        page_window.setWindowFlags(Qt.Widget)
+        self.box.addWidget(page_window)
+        self.page_window = page_window
+
+    def suspend(self):
+        """Free the page window, keeping its state. Returns whether it was freed."""
+        if self.page_window is None:
+            return True
+        state = self.page_window.suspend()
+        if state is None:
+            return False
+        self.box.removeWidget(self.page_window)
+        self.page_window.deleteLater()
+        self.page_window = None
+        self.state = state
+        return True
+
+    def resume(self):
+        """Build the page window again if it was suspended. Returns it."""
+        if self.page_window is None:
+            self.attach(self.window_class.resume(self.state))
+            self.state = None
+        return self.page_window
+
+    def close_session(self):
+        """Close the page window, or the journal of a suspended one. Returns whether it closed."""
+        if self.page_window is None:
+            self.window_class.close_suspended(self.state)
+            return True
+        return self.page_window.close()
+
+
+class SessionWindow(QMainWindow):
+    """Tabs holding the reports being written, one page window per patient.
+
+    Only the current tab keeps its preview drawn. The page windows of all
+    but the last LIVE_SESSIONS tabs used are freed, their fields kept in
+    their draft journals, and built again when their tab is shown. Closing a
+    tab destroys its page window.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Izveštaji")
+        self.setMinimumSize(800, 600)
+
+        # Tabs by when they were last shown, the current one last
+        self.recent = []
+
+        self.tabs = QTabWidget(self)
+        self.tabs.setTabsClosable(True)
+        self.tabs.setMovable(True)
+        self.tabs.setDocumentMode(True)
+        self.tabs.tabCloseRequested.connect(self.close_session)
+        self.tabs.currentChanged.connect(self.on_current_changed)
+        self.setCentralWidget(self.tabs)
+
+    def add_session(self, page_window, title):
+        """Show page_window in a new tab and switch to it."""
+        index = self.tabs.addTab(Session(page_window), title or "Novi pacijent")
+        self.tabs.setCurrentIndex(index)
+        self.show()
+        self.raise_()
+        return index
+
+    def sessions(self):
+        return [self.tabs.widget(index) for index in range(self.tabs.count())]
+
+    def index_of(self, page_window):
+        """Index of the tab showing page_window, or -1."""
+        return next((index for index, session in enumerate(self.sessions()) if session.page_window is page_window), -1)
+
+    def close_session(self, index):
+        """Close the page window in tab index and free it."""
+        session = self.tabs.widget(index)
+        if session is None or not session.close_session():
+            return
+        if session in self.recent:
+            self.recent.remove(session)
+        self.tabs.removeTab(index)
+        session.deleteLater()
+        if self.tabs.count() == 0:
+            self.hide()
+
+    def on_current_changed(self, index):
+        current = self.tabs.widget(index)
+        if current is None:
+            return
+        current.resume()
+        if current in self.recent:
+            self.recent.remove(current)
+        self.recent.append(current)
+        for session in self.recent[:-LIVE_SESSIONS]:
+            if session.suspend():
+                self.recent.remove(session)
+        for session in self.sessions():
+            if session.page_window is not None:
+                session.page_window.set_active(session is current)
+
+    def closeEvent(self, event):
+        """Closing the window closes every session; their unfinished drafts stay in their journals."""
+        while self.tabs.count():
+            session = self.tabs.widget(0)
+            if not session.close_session():
+                event.ignore()
+                return
+            if session in self.recent:
+                self.recent.remove(session)
+            self.tabs.removeTab(0)
+            session.deleteLater()
+        super().closeEvent(event)
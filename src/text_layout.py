@@ -0,0 +1,128 @@
+"""Word wrapping driven by glyph advance tables, shared by the PDF renderer and the GUI.
+
+Widths come from the advance (hmtx) table of the TrueType faces registered
+with ReportLab, so proportional fonts wrap as exactly as monospaced ones.
+Lines are broken greedily at spaces and after hyphens and slashes, like the QTextEdit
+word wrap; a word wider than a whole line is split where it overflows.
+"""
+import functools
+import re
+import threading
+from array import array
+
+# Tabs are expanded to this many spaces, as the PDF has always done
+TAB_SIZE = 4
+
+# Codepoints below this (Latin, Greek, Cyrillic) are looked up in a flat array, the rest in a dict
+DENSE_CODEPOINTS = 0x0530
+_DENSE_LIMIT = chr(DENSE_CODEPOINTS)
+
+# Break opportunities: runs of spaces, and words ending at a space, a hyphen or slash before a letter, or the end
+_TOKEN = re.compile(r" +|[^ ]+?(?:[-/](?=[^\s\d/-])|(?= )|$)")
+
+# Rounding slack when comparing widths in points
+_EPSILON = 1e-6
+
+_tables = {}
+_lock = threading.Lock()
+
+
+class AdvanceTable:
+    """Glyph advances of one font in 1/1000 em, precomputed per codepoint."""
+
+    def __init__(self, char_widths, default_width):
+        self.default_width = default_width
+        self.dense = array('d', (char_widths.get(codepoint, default_width) for codepoint in range(DENSE_CODEPOINTS)))
+        self.sparse = {codepoint: width for codepoint, width in char_widths.items() if codepoint >= DENSE_CODEPOINTS}
+
+    def width(self, text):
+        """Width of text in 1/1000 em."""
+        if not text:
+            return 0.0
+        if max(text) < _DENSE_LIMIT:
+            return sum(map(self.dense.__getitem__, map(ord, text)))
+        dense, sparse, default_width = self.dense, self.sparse, self.default_width
+        return sum(dense[codepoint] if codepoint < DENSE_CODEPOINTS else sparse.get(codepoint, default_width)
+                   for codepoint in map(ord, text))
+
+
+def advance_table(font_name):
+    """The advance table of a PDF font face, loading the registered fonts on first use."""
+    table = _tables.get(font_name)
+    if table is None:
+        with _lock:
+            table = _tables.get(font_name)
+            if table is None:
+                import fonts
+                from reportlab.pdfbase import pdfmetrics
+                fonts.register_pdf_fonts()
+                face = pdfmetrics.getFont(font_name).face
+                table = AdvanceTable(face.charWidths, face.defaultWidth)
+                _tables[font_name] = table
+    return table
+
+def text_width(text, font_name, font_size):
+    """Width of text in points, as ReportLab's stringWidth measures it."""
+    return advance_table(font_name).width(text) * font_size / 1000
+
+def paragraphs(text):
+    """Split text into paragraphs at line breaks (including Qt's U+2028) and expand tabs."""
+    return text.replace('\u2028', '\n').expandtabs(TAB_SIZE).split('\n')
+
+@functools.lru_cache(maxsize=4096)
+def wrap_paragraph(paragraph, font_name, font_size, max_width):
+    """Lines of one paragraph (no line breaks, tabs expanded) that fit max_width points."""
+    table = advance_table(font_name)
+    max_units = max_width * 1000 / font_size + _EPSILON
+    lines = []
+
+    line = []  # tokens of the current line
+    line_units = 0.0  # their width, trailing spaces included
+    has_word = False
+    for token in _TOKEN.findall(paragraph):
+        units = table.width(token)
+        if token[0] == ' ':
+            line.append(token)
+            line_units += units
+            continue
+
+        if line_units + units <= max_units:
+            line.append(token)
+            line_units += units
+            has_word = True
+            continue
+
+        if has_word:
+            # Spaces at the break are dropped, as in the editor
+            lines.append("".join(line).rstrip(' '))
+            line, line_units, has_word = [], 0.0, False
+            if units <= max_units:
+                line, line_units, has_word = [token], units, True
+                continue
+
+        # The word does not fit on a line of its own: split it where it overflows
+        start = 0
+        for index, char in enumerate(token):
+            char_units = table.width(char)
+            if line_units + char_units > max_units and (index > start or line):
+                lines.append("".join(line) + token[start:index])
+                line, line_units, start = [], 0.0, index
+            line_units += char_units
+        line, has_word = [token[start:]], True
+
+    lines.append("".join(line))
+    return tuple(lines)
+
+@functools.lru_cache(maxsize=4096)
+def _splits_word(paragraph, font_name, font_size, max_width):
+    table = advance_table(font_name)
+    max_units = max_width * 1000 / font_size + _EPSILON
+    # Only a paragraph wider than a line can hold a word wider than a line
+    return table.width(paragraph) > max_units and any(
+        token[0] != ' ' and table.width(token) > max_units for token in _TOKEN.findall(paragraph))
+
+def splits_words(text, font_name, font_size, max_width):
+    """Whether wrapping text to max_width points has to split a word that is wider than a line."""
+    if not text.strip():
+        return False
+    return any(_splits_word(paragraph, font_name, font_size, max_width) for paragraph in paragraphs(text))
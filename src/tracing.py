@@ -0,0 +1,234 @@
+"""Timing spans for the slow paths, exported as Chrome trace-event files.
+
+Tracing is off unless DOCTORREPORT_TRACE is set (or main.py is started with
+--trace). While off, span() and @traced cost one flag check. While on, every
+span is buffered in memory and written to traces/trace-*.json, which opens
+in chrome://tracing or https://ui.perfetto.dev. A new file is started every
+MAX_EVENTS_PER_FILE spans and only the newest MAX_TRACE_FILES are kept. When
+the process exits, p50/p95 durations per span name are appended to
+traces/stats.log. Count, total and maximum are exact; the percentiles are
+taken from a uniform sample of at most MAX_SAMPLES_PER_SPAN durations per
+name, so a long session holds a bounded number of them.
+"""
+import atexit
+import contextlib
+import functools
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+from datetime import datetime
+
+TRACE_ENV = "DOCTORREPORT_TRACE"
+TRACE_DIR_ENV = "DOCTORREPORT_TRACE_DIR"
+
+# Rotation: spans per trace file and trace files kept on disk
+MAX_EVENTS_PER_FILE = 100000
+MAX_TRACE_FILES = 20
+
+# Durations kept per span name for its percentiles
+MAX_SAMPLES_PER_SPAN = 10000
+
+_enabled = False
+_lock = threading.Lock()
+_write_lock = threading.Lock()
+
+# Spans not yet written, and the statistics of this session's spans by name
+_events = []
+_durations = {}
+_thread_names = {}
+_session_start = datetime.now()
+_file_count = 0
+_sampling = random.Random()
+
+# Returned by span() while tracing is off
+_NO_SPAN = contextlib.nullcontext()
+
+
+def trace_dir():
+    """Folder the trace files and stats log are written to."""
+    return os.environ.get(TRACE_DIR_ENV) or os.path.join(os.getcwd(), 'traces')
+
+def enable():
+    """Start recording spans; they are written out when the process exits."""
+    global _enabled
+    if not _enabled:
+        _enabled = True
+        atexit.register(flush)
+
+def is_enabled():
+    return _enabled
+
+
+class _SpanStats:
+    """Count, total and maximum of the durations of one span name, and a uniform sample of them."""
+    __slots__ = ("count", "total_ms", "max_ms", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.samples = []
+
+    def add(self, duration_ms):
+        self.count += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        if len(self.samples) < MAX_SAMPLES_PER_SPAN:
+            self.samples.append(duration_ms)
+        else:
+            # Reservoir sampling: every duration so far is kept with the same probability
+            index = _sampling.randrange(self.count)
+            if index < MAX_SAMPLES_PER_SPAN:
+                self.samples[index] = duration_ms
+
+
+class _Span:
+    __slots__ = ("name", "args", "start_ns")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end_ns = time.perf_counter_ns()
+        _record(self.name, self.start_ns, end_ns, self.args, exc_type)
+        return False
+
+def span(name, **args):
+    """Context manager timing the enclosed block as a span called name; args are shown with it."""
+    if not _enabled:
+        return _NO_SPAN
+    return _Span(name, args)
+
+def traced(name):
+    """Decorator timing every call of a function as a span called name."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with _Span(name, None):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _record(name, start_ns, end_ns, args, exc_type):
+    thread = threading.current_thread()
+    event = {
+        "name": name,
+        "ph": "X",
+        "ts": start_ns / 1000,
+        "dur": (end_ns - start_ns) / 1000,
+        "pid": os.getpid(),
+        "tid": thread.ident,
+    }
+    if args or exc_type:
+        event["args"] = dict(args or {}, **({"error": exc_type.__name__} if exc_type else {}))
+
+    full = None
+    with _lock:
+        _events.append(event)
+        span_stats = _durations.get(name)
+        if span_stats is None:
+            span_stats = _durations[name] = _SpanStats()
+        span_stats.add((end_ns - start_ns) / 1e6)
+        _thread_names.setdefault(thread.ident, thread.name)
+        if len(_events) >= MAX_EVENTS_PER_FILE:
+            full = _take_events()
+    if full:
+        _write_trace(full)
+
+def _take_events():
+    """Swap out the buffered events; called with _lock held."""
+    global _events
+    events = _events
+    _events = []
+    return events
+
+def _write_trace(events):
+    """Write events as a Chrome trace file and drop the oldest trace files beyond MAX_TRACE_FILES."""
+    global _file_count
+    folder = trace_dir()
+    # Other threads add their names while this one writes
+    with _lock:
+        thread_names = dict(_thread_names)
+    with _write_lock:
+        _file_count += 1
+        file_name = os.path.join(folder, f"trace-{_session_start:%Y%m%d-%H%M%S}-{os.getpid()}-{_file_count}.json")
+
+        # Metadata events name the threads in the viewer
+        metadata = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": ident, "args": {"name": thread_name}}
+                    for ident, thread_name in thread_names.items()]
+        try:
+            os.makedirs(folder, exist_ok=True)
+            with open(file_name, 'w', encoding='utf-8') as file:
+                json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, file)
+
+            trace_files = sorted((entry for entry in os.scandir(folder)
+                                  if entry.name.startswith("trace-") and entry.name.endswith(".json")),
+                                 key=lambda entry: entry.stat().st_mtime)
+            for entry in trace_files[:-MAX_TRACE_FILES]:
+                os.remove(entry.path)
+        except OSError as e:
+            logging.error(f"Failed to write trace file: {e}")
+            return None
+    return file_name
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list, e.g. fraction=0.95 for p95."""
+    ordered = sorted(values)
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+def stats():
+    """Count, p50, p95, max and total milliseconds of every span name recorded this session."""
+    with _lock:
+        durations = {name: (span_stats.count, span_stats.total_ms, span_stats.max_ms, list(span_stats.samples))
+                     for name, span_stats in _durations.items()}
+    return {name: {
+        "count": count,
+        "p50_ms": percentile(samples, 0.5),
+        "p95_ms": percentile(samples, 0.95),
+        "max_ms": max_ms,
+        "total_ms": total_ms,
+    } for name, (count, total_ms, max_ms, samples) in durations.items()}
+
+def format_stats(session_stats):
+    lines = [f"{'span':32} {'count':>7} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10} {'total ms':>11}"]
+    for name, row in sorted(session_stats.items(), key=lambda item: -item[1]["total_ms"]):
+        lines.append(f"{name:32} {row['count']:7d} {row['p50_ms']:10.2f} {row['p95_ms']:10.2f}"
+                     f" {row['max_ms']:10.2f} {row['total_ms']:11.1f}")
+    return "\n".join(lines)
+
+def flush():
+    """Write the remaining spans and append this session's statistics to stats.log."""
+    with _lock:
+        events = _take_events()
+    if events:
+        file_name = _write_trace(events)
+        if file_name:
+            logging.info(f"Trace written to {file_name}")
+
+    session_stats = stats()
+    if not session_stats:
+        return
+    try:
+        os.makedirs(trace_dir(), exist_ok=True)
+        with open(os.path.join(trace_dir(), 'stats.log'), 'a', encoding='utf-8') as file:
+            file.write(f"Session {_session_start:%Y-%m-%d %H:%M:%S} (pid {os.getpid()})\n")
+            file.write(format_stats(session_stats) + "\n\n")
+    except OSError as e:
+        logging.error(f"Failed to write trace statistics: {e}")
+
+
+if os.environ.get(TRACE_ENV, "") not in ("", "0"):
+    enable()
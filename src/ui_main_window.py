@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+
+# Form implementation generated from reading ui file 'main_window.ui'
+#
+# Created by: PyQt5 UI code generator 5.15.11
+#
+# WARNING: Any manual changes made to this file will be lost when pyuic5 is
+# run again.  Do not edit this file unless you know what you are doing.
+
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+
+class Ui_MainWindow(object):
+    def setupUi(self, MainWindow):
+        MainWindow.setObjectName("MainWindow")
+        MainWindow.resize(800, 600)
+        font = QtGui.QFont()
+        font.setBold(True)
+        font.setWeight(75)
+        MainWindow.setFont(font)
+        MainWindow.setLayoutDirection(QtCore.Qt.LeftToRight)
+        self.centralwidget = QtWidgets.QWidget(MainWindow)
+        self.centralwidget.setObjectName("centralwidget")
+        self.startButton = QtWidgets.QPushButton(self.centralwidget)
+        self.startButton.setGeometry(QtCore.QRect(80, 510, 659, 48))
+        font = QtGui.QFont()
+        font.setPointSize(25)
+        font.setBold(True)
+        font.setWeight(75)
+        self.startButton.setFont(font)
+        self.startButton.setObjectName("startButton")
+        self.archiveButton = QtWidgets.QPushButton(self.centralwidget)
+        self.archiveButton.setGeometry(QtCore.QRect(20, 20, 240, 40))
+        font = QtGui.QFont()
+        font.setPointSize(14)
+        font.setBold(True)
+        font.setWeight(75)
+        self.archiveButton.setFont(font)
+        self.archiveButton.setObjectName("archiveButton")
+        self.exportButton = QtWidgets.QPushButton(self.centralwidget)
+        self.exportButton.setGeometry(QtCore.QRect(280, 20, 240, 40))
+        font = QtGui.QFont()
+        font.setPointSize(14)
+        font.setBold(True)
+        font.setWeight(75)
+        self.exportButton.setFont(font)
+        self.exportButton.setObjectName("exportButton")
+        self.layoutWidget = QtWidgets.QWidget(self.centralwidget)
+        self.layoutWidget.setGeometry(QtCore.QRect(20, 170, 611, 61))
+        font = QtGui.QFont()
+        font.setPointSize(25)
+        font.setBold(True)
+        font.setWeight(75)
+        self.layoutWidget.setFont(font)
+        self.layoutWidget.setObjectName("layoutWidget")
+        self.formLayout_2 = QtWidgets.QFormLayout(self.layoutWidget)
+        self.formLayout_2.setContentsMargins(0, 0, 0, 0)
+        self.formLayout_2.setObjectName("formLayout_2")
+        self.dateLabel = QtWidgets.QLabel(self.layoutWidget)
+        font = QtGui.QFont()
+        font.setPointSize(25)
+        font.setBold(True)
+        font.setWeight(75)
+        self.dateLabel.setFont(font)
+        self.dateLabel.setObjectName("dateLabel")
+        self.formLayout_2.setWidget(0, QtWidgets.QFormLayout.LabelRole, self.dateLabel)
+        self.dateEdit = QtWidgets.QDateEdit(self.layoutWidget)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.dateEdit.sizePolicy().hasHeightForWidth())
+        self.dateEdit.setSizePolicy(sizePolicy)
+        font = QtGui.QFont()
+        font.setPointSize(25)
+        font.setBold(True)
+        font.setWeight(75)
+        self.dateEdit.setFont(font)
+        self.dateEdit.setObjectName("dateEdit")
+        self.formLayout_2.setWidget(0, QtWidgets.QFormLayout.FieldRole, self.dateEdit)
+        self.layoutWidget_2 = QtWidgets.QWidget(self.centralwidget)
+        self.layoutWidget_2.setGeometry(QtCore.QRect(20, 260, 761, 73))
+        font = QtGui.QFont()
+        font.setPointSize(25)
+        font.setBold(True)
+        font.setWeight(75)
+        self.layoutWidget_2.setFont(font)
+        self.layoutWidget_2.setObjectName("layoutWidget_2")
+        self.formLayout_4 = QtWidgets.QFormLayout(self.layoutWidget_2)
+        self.formLayout_4.setContentsMargins(0, 0, 0, 0)
+        self.formLayout_4.setObjectName("formLayout_4")
+        self.jmbgLabel = QtWidgets.QLabel(self.layoutWidget_2)
+        font = QtGui.QFont()
+        font.setPointSize(25)
+        font.setBold(True)
+        font.setWeight(75)
+        self.jmbgLabel.setFont(font)
+        self.jmbgLabel.setObjectName("jmbgLabel")
+        self.formLayout_4.setWidget(0, QtWidgets.QFormLayout.LabelRole, self.jmbgLabel)
+        self.jmbgEdit = QtWidgets.QTextEdit(self.layoutWidget_2)
+        font = QtGui.QFont()
+        font.setPointSize(25)
+        font.setBold(True)
+        font.setWeight(75)
+        self.jmbgEdit.setFont(font)
+        self.jmbgEdit.setObjectName("jmbgEdit")
+        self.formLayout_4.setWidget(0, QtWidgets.QFormLayout.FieldRole, self.jmbgEdit)
+        self.layoutWidget_3 = QtWidgets.QWidget(self.centralwidget)
+        self.layoutWidget_3.setGeometry(QtCore.QRect(20, 350, 511, 73))
+        font = QtGui.QFont()
+        font.setPointSize(25)
+        font.setBold(True)
+        font.setWeight(75)
+        self.layoutWidget_3.setFont(font)
+        self.layoutWidget_3.setObjectName("layoutWidget_3")
+        self.formLayout_5 = QtWidgets.QFormLayout(self.layoutWidget_3)
+        self.formLayout_5.setContentsMargins(0, 0, 0, 0)
+        self.formLayout_5.setObjectName("formLayout_5")
+        self.pageCountLabel = QtWidgets.QLabel(self.layoutWidget_3)
+        font = QtGui.QFont()
+        font.setPointSize(25)
+        font.setBold(True)
+        font.setWeight(75)
+        self.pageCountLabel.setFont(font)
+        self.pageCountLabel.setObjectName("pageCountLabel")
+        self.formLayout_5.setWidget(0, QtWidgets.QFormLayout.LabelRole, self.pageCountLabel)
+        self.pageCountBox = QtWidgets.QSpinBox(self.layoutWidget_3)
+        self.pageCountBox.setEnabled(True)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Expanding)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.pageCountBox.sizePolicy().hasHeightForWidth())
+        self.pageCountBox.setSizePolicy(sizePolicy)
+        self.pageCountBox.setMinimum(1)
+        self.pageCountBox.setMaximum(20)
+        self.pageCountBox.setProperty("value", 1)
+        self.pageCountBox.setObjectName("pageCountBox")
+        self.formLayout_5.setWidget(0, QtWidgets.QFormLayout.FieldRole, self.pageCountBox)
+        self.layoutWidget1 = QtWidgets.QWidget(self.centralwidget)
+        self.layoutWidget1.setGeometry(QtCore.QRect(20, 80, 761, 73))
+        font = QtGui.QFont()
+        font.setPointSize(25)
+        font.setBold(True)
+        font.setWeight(75)
+        self.layoutWidget1.setFont(font)
+        self.layoutWidget1.setObjectName("layoutWidget1")
+        self.formLayout = QtWidgets.QFormLayout(self.layoutWidget1)
+        self.formLayout.setContentsMargins(0, 0, 0, 0)
+        self.formLayout.setObjectName("formLayout")
+        self.nameLabel = QtWidgets.QLabel(self.layoutWidget1)
+        font = QtGui.QFont()
+        font.setPointSize(25)
+        font.setBold(True)
+        font.setWeight(75)
+        self.nameLabel.setFont(font)
+        self.nameLabel.setObjectName("nameLabel")
+        self.formLayout.setWidget(0, QtWidgets.QFormLayout.LabelRole, self.nameLabel)
+        self.nameEdit = QtWidgets.QTextEdit(self.layoutWidget1)
+        font = QtGui.QFont()
+        font.setPointSize(25)
+        font.setBold(True)
+        font.setWeight(75)
+        self.nameEdit.setFont(font)
+        self.nameEdit.setObjectName("nameEdit")
+        self.formLayout.setWidget(0, QtWidgets.QFormLayout.FieldRole, self.nameEdit)
+        MainWindow.setCentralWidget(self.centralwidget)
+        self.statusbar = QtWidgets.QStatusBar(MainWindow)
+        self.statusbar.setObjectName("statusbar")
+        MainWindow.setStatusBar(self.statusbar)
+
+        self.retranslateUi(MainWindow)
+        QtCore.QMetaObject.connectSlotsByName(MainWindow)
+
+    def retranslateUi(self, MainWindow):
+        _translate = QtCore.QCoreApplication.translate
+        MainWindow.setWindowTitle(_translate("MainWindow", "MainWindow"))
+        self.startButton.setText(_translate("MainWindow", "DALJE"))
+        self.archiveButton.setText(_translate("MainWindow", "ARHIVA"))
+        self.exportButton.setText(_translate("MainWindow", "IZVOZ"))
+        self.dateLabel.setText(_translate("MainWindow", "Datum rodjenja: "))
+        self.dateEdit.setDisplayFormat(_translate("MainWindow", "dd-MMM-yyyy"))
+        self.jmbgLabel.setText(_translate("MainWindow", "JMBG:             "))
+        self.pageCountLabel.setText(_translate("MainWindow", "Broj stranica izvestaja:"))
+        self.nameLabel.setText(_translate("MainWindow", "Ime i prezime:"))
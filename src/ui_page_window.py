@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+# Form implementation generated from reading ui file 'page_window.ui'
+#
+# Created by: PyQt5 UI code generator 5.15.11
+#
+# WARNING: Any manual changes made to this file will be lost when pyuic5 is
+# run again.  Do not edit this file unless you know what you are doing.
+
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+
+class Ui_PageWindow(object):
+    def setupUi(self, PageWindow):
+        PageWindow.setObjectName("PageWindow")
+        PageWindow.resize(1200, 700)
+        self.centralwidget = QtWidgets.QWidget(PageWindow)
+        self.centralwidget.setObjectName("centralwidget")
+        self.verticalLayoutMain = QtWidgets.QVBoxLayout(self.centralwidget)
+        self.verticalLayoutMain.setObjectName("verticalLayoutMain")
+        self.scrollArea = QtWidgets.QScrollArea(self.centralwidget)
+        self.scrollArea.setWidgetResizable(True)
+        self.scrollArea.setMinimumSize(QtCore.QSize(800, 600))
+        self.scrollArea.setObjectName("scrollArea")
+        self.scrollAreaWidgetContents = QtWidgets.QWidget()
+        self.scrollAreaWidgetContents.setObjectName("scrollAreaWidgetContents")
+        self.scrollAreaLayout = QtWidgets.QVBoxLayout(self.scrollAreaWidgetContents)
+        self.scrollAreaLayout.setObjectName("scrollAreaLayout")
+        self.horizontalLayoutButtons = QtWidgets.QHBoxLayout()
+        self.horizontalLayoutButtons.setSpacing(10)
+        self.horizontalLayoutButtons.setObjectName("horizontalLayoutButtons")
+        self.pageButton1 = QtWidgets.QPushButton(self.scrollAreaWidgetContents)
+        self.pageButton1.setMinimumHeight(40)
+        self.pageButton1.setObjectName("pageButton1")
+        self.horizontalLayoutButtons.addWidget(self.pageButton1)
+        self.pageButton2 = QtWidgets.QPushButton(self.scrollAreaWidgetContents)
+        self.pageButton2.setMinimumHeight(40)
+        self.pageButton2.setObjectName("pageButton2")
+        self.horizontalLayoutButtons.addWidget(self.pageButton2)
+        self.scrollAreaLayout.addLayout(self.horizontalLayoutButtons)
+        self.stackedWidget = QtWidgets.QStackedWidget(self.scrollAreaWidgetContents)
+        self.stackedWidget.setObjectName("stackedWidget")
+        self.page1 = QtWidgets.QWidget()
+        self.page1.setObjectName("page1")
+        self.verticalLayoutPage1 = QtWidgets.QVBoxLayout(self.page1)
+        self.verticalLayoutPage1.setObjectName("verticalLayoutPage1")
+        self.textInputPage1 = QtWidgets.QTextEdit(self.page1)
+        font = QtGui.QFont()
+        font.setPointSize(13)
+        self.textInputPage1.setFont(font)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Preferred)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(2)
+        sizePolicy.setHeightForWidth(self.textInputPage1.sizePolicy().hasHeightForWidth())
+        self.textInputPage1.setSizePolicy(sizePolicy)
+        self.textInputPage1.setObjectName("textInputPage1")
+        self.verticalLayoutPage1.addWidget(self.textInputPage1)
+        self.diagnosisInputPage1 = QtWidgets.QTextEdit(self.page1)
+        font = QtGui.QFont()
+        font.setPointSize(13)
+        self.diagnosisInputPage1.setFont(font)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(5)
+        sizePolicy.setHeightForWidth(self.diagnosisInputPage1.sizePolicy().hasHeightForWidth())
+        self.diagnosisInputPage1.setSizePolicy(sizePolicy)
+        self.diagnosisInputPage1.setObjectName("diagnosisInputPage1")
+        self.verticalLayoutPage1.addWidget(self.diagnosisInputPage1)
+        self.horizontalLayoutBottomPage1 = QtWidgets.QHBoxLayout()
+        self.horizontalLayoutBottomPage1.setObjectName("horizontalLayoutBottomPage1")
+        self.dateEditPage1 = QtWidgets.QDateEdit(self.page1)
+        font = QtGui.QFont()
+        font.setPointSize(13)
+        self.dateEditPage1.setFont(font)
+        self.dateEditPage1.setCalendarPopup(True)
+        self.dateEditPage1.setObjectName("dateEditPage1")
+        self.horizontalLayoutBottomPage1.addWidget(self.dateEditPage1)
+        spacerItem = QtWidgets.QSpacerItem(QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Expanding)
+        self.horizontalLayoutBottomPage1.addItem(spacerItem)
+        self.log_button_page1 = QtWidgets.QPushButton(self.page1)
+        self.log_button_page1.setMinimumHeight(40)
+        self.log_button_page1.setObjectName("log_button_page1")
+        self.horizontalLayoutBottomPage1.addWidget(self.log_button_page1)
+        self.verticalLayoutPage1.addLayout(self.horizontalLayoutBottomPage1)
+        self.stackedWidget.addWidget(self.page1)
+        self.page2 = QtWidgets.QWidget()
+        self.page2.setObjectName("page2")
+        self.verticalLayoutPage2 = QtWidgets.QVBoxLayout(self.page2)
+        self.verticalLayoutPage2.setObjectName("verticalLayoutPage2")
+        self.textInputPage2 = QtWidgets.QTextEdit(self.page2)
+        font = QtGui.QFont()
+        font.setPointSize(13)
+        self.textInputPage2.setFont(font)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Preferred)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(2)
+        sizePolicy.setHeightForWidth(self.textInputPage2.sizePolicy().hasHeightForWidth())
+        self.textInputPage2.setSizePolicy(sizePolicy)
+        self.textInputPage2.setObjectName("textInputPage2")
+        self.verticalLayoutPage2.addWidget(self.textInputPage2)
+        self.diagnosisInputPage2 = QtWidgets.QTextEdit(self.page2)
+        font = QtGui.QFont()
+        font.setPointSize(13)
+        self.diagnosisInputPage2.setFont(font)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(5)
+        sizePolicy.setHeightForWidth(self.diagnosisInputPage2.sizePolicy().hasHeightForWidth())
+        self.diagnosisInputPage2.setSizePolicy(sizePolicy)
+        self.diagnosisInputPage2.setObjectName("diagnosisInputPage2")
+        self.verticalLayoutPage2.addWidget(self.diagnosisInputPage2)
+        self.horizontalLayoutBottomPage2 = QtWidgets.QHBoxLayout()
+        self.horizontalLayoutBottomPage2.setObjectName("horizontalLayoutBottomPage2")
+        self.dateEditPage2 = QtWidgets.QDateEdit(self.page2)
+        font = QtGui.QFont()
+        font.setPointSize(13)
+        self.dateEditPage2.setFont(font)
+        self.dateEditPage2.setCalendarPopup(True)
+        self.dateEditPage2.setObjectName("dateEditPage2")
+        self.horizontalLayoutBottomPage2.addWidget(self.dateEditPage2)
+        spacerItem1 = QtWidgets.QSpacerItem(QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Expanding)
+        self.horizontalLayoutBottomPage2.addItem(spacerItem1)
+        self.log_button_page2 = QtWidgets.QPushButton(self.page2)
+        self.log_button_page2.setMinimumHeight(40)
+        self.log_button_page2.setObjectName("log_button_page2")
+        self.horizontalLayoutBottomPage2.addWidget(self.log_button_page2)
+        self.verticalLayoutPage2.addLayout(self.horizontalLayoutBottomPage2)
+        self.stackedWidget.addWidget(self.page2)
+        self.scrollAreaLayout.addWidget(self.stackedWidget)
+        self.scrollArea.setWidget(self.scrollAreaWidgetContents)
+        self.verticalLayoutMain.addWidget(self.scrollArea)
+        PageWindow.setCentralWidget(self.centralwidget)
+        self.statusbar = QtWidgets.QStatusBar(PageWindow)
+        self.statusbar.setObjectName("statusbar")
+        PageWindow.setStatusBar(self.statusbar)
+
+        self.retranslateUi(PageWindow)
+        self.stackedWidget.setCurrentIndex(0)
+        QtCore.QMetaObject.connectSlotsByName(PageWindow)
+
+    def retranslateUi(self, PageWindow):
+        _translate = QtCore.QCoreApplication.translate
+        PageWindow.setWindowTitle(_translate("PageWindow", "Page Window"))
+        self.pageButton1.setText(_translate("PageWindow", "DG"))
+        self.pageButton1.setStyleSheet(_translate("PageWindow", "\n"
+"              QPushButton {\n"
+"                  background-color: #4CAF50;\n"
+"                  color: white;\n"
+"                  font-size: 18px;\n"
+"                  font-weight: bold;\n"
+"                  border: 2px solid #2E7D32;\n"
+"              }\n"
+"              QPushButton:disabled {\n"
+"                  background-color: #BDBDBD;\n"
+"                  color: #FFFFFF;\n"
+"              }\n"
+"              QPushButton:pressed {\n"
+"                  background-color: #388E3C;\n"
+"              }\n"
+"             "))
+        self.pageButton2.setText(_translate("PageWindow", "DG IDEM"))
+        self.pageButton2.setStyleSheet(_translate("PageWindow", "\n"
+"              QPushButton {\n"
+"                  background-color: #4CAF50;\n"
+"                  color: white;\n"
+"                  font-size: 18px;\n"
+"                  font-weight: bold;\n"
+"                  border: 2px solid #2E7D32;\n"
+"              }\n"
+"              QPushButton:disabled {\n"
+"                  background-color: #BDBDBD;\n"
+"                  color: #FFFFFF;\n"
+"              }\n"
+"              QPushButton:pressed {\n"
+"                  background-color: #388E3C;\n"
+"              }\n"
+"             "))
+        self.textInputPage1.setPlaceholderText(_translate("PageWindow", "DG DEO:VELIKIM SLOVIMA BEZ DG PREFIKSA"))
+        self.diagnosisInputPage1.setPlaceholderText(_translate("PageWindow", "Tekst na srpskom koji pises"))
+        self.dateEditPage1.setDisplayFormat(_translate("PageWindow", "dd-MMM-yyyy"))
+        self.log_button_page1.setText(_translate("PageWindow", "Napravi izveštaj"))
+        self.textInputPage2.setPlaceholderText(_translate("PageWindow", "DG DEO:VELIKIM SLOVIMA BEZ DG PREFIKSA"))
+        self.diagnosisInputPage2.setPlaceholderText(_translate("PageWindow", "Tekst na srpskom koji pises"))
+        self.dateEditPage2.setDisplayFormat(_translate("PageWindow", "dd-MMM-yyyy"))
+        self.log_button_page2.setText(_translate("PageWindow", "Napravi izveštaj"))
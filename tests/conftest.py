@@ -0,0 +1,50 @@
+"""Shared fixtures.
+
+The modules under test live in src/ and, like the app, find fonts and config.json in the working directory.
+"""
+import os
+import sys
+
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src")
+sys.path.insert(0, SRC_DIR)
+
+SAMPLE_PDF = os.path.join(SRC_DIR, os.pardir, "Patient_Patientich_20241021.pdf")
+
+
+def make_report(name="Petar Petrović", pages=1):
+    """A normalized report record of pages pages."""
+    return {
+        "full_name": name,
+        "birth_date": "01-02-1980",
+        "jmbg": "0102980710006",
+        "pages": [{
+            "dg": f"I10 Hypertensio arterialis\nDG line {number} of {name}",
+            "diagnosis": f"Page {number}: the patient reports headaches.\nBlood pressure 150/95 mmHg.",
+            "date": f"{number:02d}-03-2024",
+        } for number in range(1, pages + 1)],
+    }
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    """The QApplication of the test run, on the offscreen platform."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture(scope="session")
+def renderer(tmp_path_factory):
+    """A report renderer with the fonts registered and the config of src/."""
+    os.environ.setdefault("DOCTORREPORT_FONT_CACHE", str(tmp_path_factory.mktemp("fonts")))
+    previous = os.getcwd()
+    os.chdir(SRC_DIR)
+    try:
+        import report_engine
+        from config_service import get_config
+        assert report_engine.register_fonts()
+        return report_engine.ReportRenderer(get_config())
+    finally:
+        os.chdir(previous)
@@ -0,0 +1,27 @@
+import archive
+from conftest import make_report
+
+
+def test_search_after_closing_and_reopening(tmp_path, monkeypatch, qapp):
+    monkeypatch.setenv("DOCTORREPORT_ARCHIVE_DB", str(tmp_path / "arhiva.db"))
+    connection = archive.connect()
+    with connection:
+        archive.add_report(connection, make_report("Ana Anić"), "izvestaji/Ana_Anic_20240301.pdf")
+        archive.add_report(connection, make_report("Petar Petrović"), "izvestaji/Petar_Petrovic_20240301.pdf")
+    connection.close()
+    from archive_window import ArchiveWindow
+    window = ArchiveWindow()
+
+    window.show()
+    window.search_edit.setText("Anić")
+    window.run_search()
+    assert window.results_table.rowCount() == 1
+    window.close()
+
+    window.show()
+    window.search_edit.setText("Petrović")
+    window.run_search()
+    assert window.results_table.rowCount() == 1
+    assert window.results_table.item(0, 1).text() == "Petar Petrović"
+    assert window.status_label.text().startswith("Pronađeno: 1")
+    window.close()
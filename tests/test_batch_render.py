@@ -0,0 +1,22 @@
+import os
+
+import batch_render
+from conftest import SRC_DIR, make_report
+
+
+def test_a_batch_never_overwrites_a_report(tmp_path, monkeypatch, renderer):
+    # The workers find the fonts in the working directory, like the app
+    monkeypatch.chdir(SRC_DIR)
+    folder = tmp_path / "izvestaji"
+    month = folder / "2024" / "03"
+    month.mkdir(parents=True)
+    (month / "Ana_Anic_20240301.pdf").write_bytes(b"issued by the GUI")
+    records = [make_report("Ana Anic"), make_report("Ana Anic", 2), dict(make_report("Mila Milić"), output="mila.pdf")]
+    (folder / "mila.pdf").write_bytes(b"replaced on purpose")
+
+    assert batch_render.run_batch(records, str(folder), workers=1, config=renderer.config, use_cache=False) == 0
+
+    assert (month / "Ana_Anic_20240301.pdf").read_bytes() == b"issued by the GUI"
+    assert sorted(os.listdir(month)) == ["Ana_Anic_20240301.pdf", "Ana_Anic_20240301_2.pdf", "Ana_Anic_20240301_3.pdf"]
+    assert (month / "Ana_Anic_20240301_2.pdf").read_bytes().startswith(b"%PDF")
+    assert (folder / "mila.pdf").read_bytes().startswith(b"%PDF")
@@ -0,0 +1,59 @@
+import os
+import re
+import zipfile
+
+import export
+from conftest import make_report
+
+_CONTENTS = re.compile(rb"/Contents\s+(\d+)\s+\d+\s+R")
+
+
+def page_contents(data):
+    """The content stream object of each page of a PDF, in reading order."""
+    source = export.SourcePdf(data)
+    _, pages = source.page_tree()
+    return [source.body(int(_CONTENTS.search(source.head(page)).group(1))) for page in pages]
+
+def write_reports(folder, renderer, reports):
+    paths = []
+    for index, report in enumerate(reports):
+        path = os.path.join(folder, f"report_{index}.pdf")
+        with open(path, 'wb') as file:
+            file.write(renderer.render_bytes(report)[0])
+        paths.append(path)
+    return paths
+
+
+def test_merge_keeps_every_page_in_order(tmp_path, renderer):
+    paths = write_reports(tmp_path, renderer, [make_report("Ana Anić", 2), make_report("Petar Petrović", 1),
+                                               make_report("Mila Milić", 3)])
+    output = tmp_path / "merged.pdf"
+
+    assert export.merge_pdfs(paths, str(output)) == 3
+
+    expected = [contents for path in paths for contents in page_contents(open(path, 'rb').read())]
+    merged = output.read_bytes()
+    assert merged.startswith(b"%PDF-1.4")
+    assert page_contents(merged) == expected
+    assert not os.path.exists(f"{output}.part")
+
+def test_merge_leaves_out_unreadable_files(tmp_path, renderer):
+    paths = write_reports(tmp_path, renderer, [make_report(), make_report("Ana Anić", 2)])
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"%PDF-1.4\nnot a report\n")
+    output = tmp_path / "merged.pdf"
+
+    assert export.merge_pdfs([paths[0], str(broken), paths[1]], str(output)) == 2
+    assert len(page_contents(output.read_bytes())) == 3
+
+def test_zip_names_reports_relative_to_the_folder(tmp_path, renderer):
+    folder = tmp_path / "izvestaji"
+    (folder / "2024" / "03").mkdir(parents=True)
+    paths = write_reports(folder / "2024" / "03", renderer, [make_report(), make_report("Ana Anić")])
+    output = tmp_path / "reports.zip"
+
+    assert export.export_reports(paths, str(output), str(folder)) == 2
+
+    with zipfile.ZipFile(output) as bundle:
+        assert bundle.namelist() == ["2024/03/report_0.pdf", "2024/03/report_1.pdf"]
+        assert bundle.read("2024/03/report_1.pdf") == open(paths[1], 'rb').read()
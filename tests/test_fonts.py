@@ -0,0 +1,67 @@
+import marshal
+import os
+import pickle
+
+import fonts
+from conftest import SRC_DIR
+
+FONT_PATH = os.path.join(SRC_DIR, fonts.PDF_FONT_FACES['NotoSans'])
+
+
+class CreatesFile:
+    """Unpickling this creates a file: what a planted pickle could do."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __reduce__(self):
+        return open, (self.path, "w")
+
+
+def cache_files(folder):
+    return [name for name in os.listdir(folder) if not name.endswith(".tmp")]
+
+
+def test_cached_metrics_match_a_fresh_parse(tmp_path, monkeypatch):
+    monkeypatch.setenv("DOCTORREPORT_FONT_CACHE", str(tmp_path))
+    parsed = fonts.load_ttfont("NotoSans", FONT_PATH)
+    [cache_file] = cache_files(tmp_path)
+    assert cache_file.endswith(".marshal")
+
+    cached = fonts.load_ttfont("NotoSans", FONT_PATH)
+    assert cached.face is not parsed.face
+    for field in ("name", "familyName", "unitsPerEm", "charWidths", "charToGlyph", "hmetrics", "defaultWidth",
+                  "ascent", "descent", "bbox", "flags"):
+        assert getattr(cached.face, field) == getattr(parsed.face, field), field
+        assert type(getattr(cached.face, field)) is type(getattr(parsed.face, field)), field
+    text = "Pacijent šćđžč ŠĆĐŽČ, TA 130/85 mmHg"
+    assert cached.stringWidth(text, 11) == parsed.stringWidth(text, 11)
+    # The glyphs embedded in a PDF come from the cached tables
+    subset = sorted(set(map(ord, text)))
+    assert cached.face.makeSubset(subset) == parsed.face.makeSubset(subset)
+
+def test_a_planted_or_damaged_cache_is_never_run_and_is_replaced(tmp_path, monkeypatch):
+    monkeypatch.setenv("DOCTORREPORT_FONT_CACHE", str(tmp_path))
+    fonts.load_ttfont("NotoSans", FONT_PATH)
+    [cache_file] = cache_files(tmp_path)
+    marker = tmp_path / "planted"
+
+    with open(tmp_path / cache_file, "wb") as file:
+        pickle.dump({"name": CreatesFile(str(marker))}, file)
+    font = fonts.load_ttfont("NotoSans", FONT_PATH)
+    assert not marker.exists()
+    assert font.face.unitsPerEm == 1000
+
+    with open(tmp_path / cache_file, "wb") as file:
+        file.write(b"\x00" * 10)
+    font = fonts.load_ttfont("NotoSans", FONT_PATH)
+    assert font.stringWidth("M", 10) > 0
+    with open(tmp_path / cache_file, "rb") as file:
+        assert marshal.load(file)["unitsPerEm"] == 1000
+
+def test_the_cache_is_kept_next_to_the_application_whatever_the_working_directory(tmp_path, monkeypatch):
+    monkeypatch.delenv("DOCTORREPORT_FONT_CACHE", raising=False)
+    monkeypatch.chdir(tmp_path)
+
+    assert os.path.samefile(os.path.dirname(os.path.dirname(fonts.font_cache_dir())), SRC_DIR)
+    assert fonts.font_cache_dir().endswith(os.path.join(".cache", "fonts"))
@@ -0,0 +1,126 @@
+import os
+
+import pytest
+
+import icd10
+from conftest import SRC_DIR
+from icd10 import Icd10Index
+
+SOURCE = os.path.join(SRC_DIR, icd10.SOURCE_FILE)
+
+ENTRIES = [
+    ("J06.9", "Acute upper respiratory infection, unspecified"),
+    ("I10", "Essential (primary) hypertension"),
+    ("J06.0", "Acute laryngopharyngitis"),
+    ("A00.0", "Cholera due to Vibrio cholerae 01, biovar cholerae"),
+    ("J05.0", "Acute obstructive laryngitis [croup]"),
+    ("Z99.9", "Dependence on unspecified enabling machine and device"),
+    ("J20.9", "Acute bronchitis, unspecified"),
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = str(tmp_path / "icd10.idx")
+    assert icd10.build_index(ENTRIES, path) == len(ENTRIES)
+    index = Icd10Index(path)
+    yield index
+    index.close()
+
+def write_source(path, entries):
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("code,name\n")
+        file.writelines(f'{code},"{name}"\n' for code, name in entries)
+
+
+def test_codes_are_found_by_prefix_in_code_order(index):
+    assert index.lookup("J06") == [("J06.0", "Acute laryngopharyngitis"),
+                                   ("J06.9", "Acute upper respiratory infection, unspecified")]
+    assert index.lookup("j069") == [("J06.9", "Acute upper respiratory infection, unspecified")]
+    assert [code for code, _ in index.lookup("J0", limit=2)] == ["J05.0", "J06.0"]
+    # The first and last entries, and codes between or beyond them
+    assert index.lookup("A00") == [("A00.0", "Cholera due to Vibrio cholerae 01, biovar cholerae")]
+    assert [code for code, _ in index.lookup("Z9")] == ["Z99.9"]
+    assert index.lookup("J07") == []
+    assert index.lookup("Z999.") == []
+    assert index.lookup("B1") == []
+
+def test_names_are_found_by_their_trigrams_typos_included(index):
+    assert index.lookup("upper resp")[0][0] == "J06.9"
+    assert index.lookup("hypertensoin")[0][0] == "I10"
+    assert [code for code, _ in index.lookup("acute")][:1] == ["J06.0"]
+    assert index.lookup("bronchitis ")[0][0] == "J20.9"
+    assert index.lookup("xyzzy qwerty") == []
+    assert index.lookup("a") == []
+
+def test_every_name_of_the_bundled_list_finds_its_code(tmp_path):
+    entries = icd10.read_source(SOURCE)
+    path = str(tmp_path / "icd10.idx")
+    icd10.build_index(entries, path)
+    index = Icd10Index(path)
+    try:
+        assert len(index) == len(dict(entries))
+        for code, name in dict(entries).items():
+            assert index.lookup(code, limit=1) == [(code, name)]
+            assert (code, name) in index.lookup(name), name
+    finally:
+        index.close()
+
+def test_a_file_that_is_no_index_is_refused(tmp_path):
+    path = tmp_path / "icd10.idx"
+    path.write_bytes(b"code,name\n")
+    with pytest.raises(ValueError):
+        Icd10Index(str(path))
+
+
+def test_the_index_is_stale_when_its_source_changes_in_any_way(tmp_path):
+    source = str(tmp_path / "icd10.csv")
+    index_path = str(tmp_path / "icd10.idx")
+    write_source(source, ENTRIES)
+    assert icd10.index_is_stale(source, index_path)
+
+    icd10.build_index(icd10.read_source(source), index_path, icd10.source_stamp(source))
+    assert not icd10.index_is_stale(source, index_path)
+
+    # Replaced by a list dated before the index was built
+    stamp = os.stat(source)
+    write_source(source, ENTRIES[:-1])
+    os.utime(source, ns=(stamp.st_atime_ns, stamp.st_mtime_ns - 10**9))
+    assert icd10.index_is_stale(source, index_path)
+
+    # Edited within the same moment, to a list of the same size
+    icd10.build_index(icd10.read_source(source), index_path, icd10.source_stamp(source))
+    stamp = os.stat(source)
+    write_source(source, [("I11", name) if code == "I10" else (code, name) for code, name in ENTRIES[:-1]])
+    os.utime(source, ns=(stamp.st_atime_ns, stamp.st_mtime_ns))
+    assert os.path.getsize(source) == stamp.st_size
+    assert not icd10.index_is_stale(source, index_path)
+    os.utime(source, ns=(stamp.st_atime_ns, stamp.st_mtime_ns + 1))
+    assert icd10.index_is_stale(source, index_path)
+
+    # Without its source an index is kept; an index of an older format is not
+    os.remove(source)
+    assert not icd10.index_is_stale(source, index_path)
+    with open(index_path, "r+b") as file:
+        file.write(b"ICD10IX1")
+    assert icd10.index_is_stale(source, index_path)
+
+def test_the_shared_index_is_built_on_first_use_and_rebuilt_after_an_edit(tmp_path, monkeypatch):
+    (tmp_path / "data").mkdir()
+    monkeypatch.setattr(icd10, "resource_path", lambda relative: str(tmp_path / relative))
+    monkeypatch.setattr(icd10, "_index", None)
+    monkeypatch.setattr(icd10, "_index_failed", False)
+    source = str(tmp_path / icd10.SOURCE_FILE)
+    write_source(source, ENTRIES)
+
+    index = icd10.shared_index()
+    assert os.path.exists(tmp_path / icd10.INDEX_FILE)
+    assert index is icd10.shared_index()
+    assert index.lookup("I10") == [("I10", "Essential (primary) hypertension")]
+    assert sorted(os.listdir(tmp_path / "data")) == ["icd10.csv", "icd10.idx"]
+
+    write_source(source, ENTRIES + [("I11.9", "Hypertensive heart disease without heart failure")])
+    index.close()
+    monkeypatch.setattr(icd10, "_index", None)
+    assert icd10.shared_index().lookup("I11") == [("I11.9", "Hypertensive heart disease without heart failure")]
+    icd10.shared_index().close()
@@ -0,0 +1,85 @@
+import os
+import shutil
+
+import archive
+import legacy_import
+import report_store
+from conftest import SAMPLE_PDF, make_report
+
+
+def write_sidecar(path, report):
+    """A sidecar as older versions wrote it."""
+    with open(path, 'w', encoding='utf-8') as file:
+        for number, page in enumerate(report["pages"], start=1):
+            file.write(f"Page {number} - DG:\n{page['dg'] or 'IDEM'}\n\n")
+            file.write(f"Page {number} - Diagnosis Content:\n{page['diagnosis']}\n\n")
+
+
+def test_reads_the_sample_pdf_of_an_older_version():
+    with open(SAMPLE_PDF, 'rb') as file:
+        record = legacy_import.parse_report_pdf(file.read())
+
+    assert (record["full_name"], record["birth_date"], record["jmbg"]) == (
+        "Patient Patientich", "01-01-2000", "1234567891011")
+    assert [page["date"] for page in record["pages"]] == ["21-10-2024", "01-01-2000"]
+    assert record["pages"][0]["dg"] == ("Degenerative Disc Disease\nLumbar Region with Spinal Stenosis and "
+                                        "Radiculopathy\nCausing Chronic Lower Back Pain")
+    assert record["pages"][0]["diagnosis"].startswith("The patient presents with a history of chronic lower back pain")
+    assert record["pages"][1]["dg"] == ""
+
+def test_reads_back_a_rendered_report(renderer):
+    report = make_report("Ana Anić", 2)
+    report["pages"][1]["dg"] = ""
+
+    assert legacy_import.parse_report_pdf(renderer.render_bytes(report)[0]) == report
+
+def test_a_diagnosis_line_reading_dg_does_not_start_a_page(renderer):
+    report = make_report()
+    report["pages"][0]["diagnosis"] = "Prethodni nalaz\nDG:\nbez promena"
+
+    assert legacy_import.parse_report_pdf(renderer.render_bytes(report)[0]) == report
+
+def test_parse_sidecar():
+    text = ("Page 1 - DG:\nI10\nJ06.9\n\nPage 1 - Diagnosis Content:\nPrvi red\n\nDrugi red\n\n"
+            "Page 2 - DG:\nIDEM\n\nPage 2 - Diagnosis Content:\nKontrola\n\n")
+
+    assert legacy_import.parse_sidecar(text) == {
+        1: {"dg": "I10\nJ06.9", "diagnosis": "Prvi red\n\nDrugi red"},
+        2: {"dg": "", "diagnosis": "Kontrola"},
+    }
+
+def test_import_pairs_sidecars_with_their_pdfs(tmp_path, monkeypatch, renderer):
+    monkeypatch.setenv("DOCTORREPORT_ARCHIVE_DB", str(tmp_path / "arhiva.db"))
+    txt_folder, pdf_folder, records_folder = (tmp_path / name for name in ("txt", "izvestaji", "records"))
+    txt_folder.mkdir()
+    pdf_folder.mkdir()
+    shutil.copy(SAMPLE_PDF, pdf_folder)
+
+    # The sidecar holds the diagnosis as typed, with a line too long to print unwrapped
+    typed = make_report("Ana Anić", 2)
+    typed["pages"][0]["diagnosis"] = "Bol u grudima " * 20
+    (pdf_folder / "Ana_Anic_20240302.pdf").write_bytes(renderer.render_bytes(typed)[0])
+    write_sidecar(txt_folder / "Ana_Anic_20240302_101500.txt", typed)
+    # A sidecar whose PDF is gone gives the name as in its file name
+    write_sidecar(txt_folder / "Mila_Milic_20240305_090000.txt", make_report("Mila Milić"))
+
+    imported, files, failures = legacy_import.run_import(str(txt_folder), str(pdf_folder), str(records_folder),
+                                                         1, 2, str(tmp_path / "fraze.idx"))
+
+    assert (imported, files, failures) == (3, 4, 0)
+    records = {stored["report"]["full_name"]: stored for _, stored in report_store.iter_records(str(records_folder))}
+    assert set(records) == {"Patient Patientich", "Ana Anić", "Mila Milic"}
+    assert records["Ana Anić"]["report"] == typed
+    assert records["Ana Anić"]["created_at"] == "2024-03-02T10:15:00"
+    assert len(records["Ana Anić"]["source"]) == 2
+    assert records["Mila Milic"]["report"]["jmbg"] == ""
+    assert [page["date"] for page in records["Mila Milic"]["report"]["pages"]] == ["05-03-2024"]
+    assert len(records["Patient Patientich"]["report"]["pages"]) == 2
+
+    connection = archive.connect()
+    try:
+        assert connection.execute("SELECT COUNT(*) FROM reports").fetchone()[0] == 3
+    finally:
+        connection.close()
+    assert legacy_import.run_import(str(txt_folder), str(pdf_folder), str(records_folder),
+                                    1, 2, str(tmp_path / "fraze.idx")) == (0, 0, 0)
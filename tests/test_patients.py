@@ -0,0 +1,66 @@
+from datetime import date
+
+import pytest
+
+from patients import PatientIndex, jmbg_birth_date, jmbg_check_digit, validate_jmbg
+
+
+@pytest.mark.parametrize("jmbg, check_digit", [
+    ("0101006500006", 6),
+    # A weighted sum divisible by 11 and one leaving 1 both give 0
+    ("1503985780000", 0),
+    ("1503985710070", 0),
+    ("3101900710013", 3),
+])
+def test_check_digit(jmbg, check_digit):
+    assert jmbg_check_digit(jmbg) == check_digit
+    assert validate_jmbg(jmbg) is None
+
+@pytest.mark.parametrize("jmbg, birth_date", [
+    ("0101006500006", date(2006, 1, 1)),
+    ("1503985780000", date(1985, 3, 15)),
+    ("2902000715000", date(2000, 2, 29)),
+    ("2902001715000", None),
+    ("3204985", None),
+    ("01019", None),
+])
+def test_birth_date(jmbg, birth_date):
+    assert jmbg_birth_date(jmbg) == birth_date
+
+@pytest.mark.parametrize("jmbg, problem", [
+    ("150398578000", "13 cifara"),
+    ("15039857800a0", "13 cifara"),
+    ("3202985780000", "datum rođenja"),
+    ("1503985780001", "Kontrolna cifra"),
+])
+def test_invalid_jmbg(jmbg, problem):
+    assert problem in validate_jmbg(jmbg)
+
+def test_birth_date_must_match_the_jmbg():
+    assert validate_jmbg("1503985780000", date(1985, 3, 15)) is None
+    assert validate_jmbg("1503985780000", date(1985, 3, 16)) == (
+        "JMBG odgovara datumu rođenja 15.03.1985., a upisan je 16.03.1985.")
+
+
+def test_search_by_prefix():
+    index = PatientIndex({
+        "1503985780000": ("Ana Anić", "15-03-1985"),
+        "1503985710070": ("Mila Milić", "15-03-1985"),
+        "0101006500006": ("Petar Petrović", "01-01-2006"),
+    })
+    index.add("1503985750018", "Jovan Jović", "15-03-1985")
+
+    assert index.search("150") == []
+    assert index.search("1503") == ["1503985710070", "1503985750018", "1503985780000"]
+    assert index.search("1503", limit=2) == ["1503985710070", "1503985750018"]
+    assert index.search("1503985780000") == []
+    assert index.get("1503985750018") == ("Jovan Jović", "15-03-1985")
+
+def test_add_updates_a_known_patient():
+    index = PatientIndex()
+    index.add("0101006500006", "Petar Petrovic", "01-01-2006")
+    index.add("0101006500006", "Petar Petrović", "01-01-2006")
+
+    assert len(index) == 1
+    assert index.get("0101006500006") == ("Petar Petrović", "01-01-2006")
+    assert index.search("0101") == ["0101006500006"]
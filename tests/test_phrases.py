@@ -0,0 +1,72 @@
+import random
+
+import phrases
+from phrases import PhraseIndex
+
+
+def brute_force(index, text, limit=phrases.MAX_SUGGESTIONS):
+    """What complete() should return, ranking every phrase."""
+    prefix = phrases.phrase_key(text) + (" " if text[-1:].isspace() else "")
+    keys = sorted((key for key in index.entries if key.startswith(prefix) and key != prefix), key=index.rank)
+    return [index.entries[key][0] for key in keys[:limit]]
+
+def random_phrases(count):
+    random.seed(1)
+    words = ["bol", "bolovi", "u", "grudima", "kašalj", "suv", "glavobolja", "pritisak", "povišen", "temperatura"]
+    return {" ".join(random.choices(words, k=random.randint(2, 6))): random.randint(1, 50) for _ in range(count)}
+
+
+def test_ranks_by_count_then_length_then_text():
+    index = PhraseIndex()
+    index.add({"Bol u grudima": 3, "Bol u leđima": 5, "Bolovi": 3, "Bol u grlu": 3, "Temperatura": 9})
+
+    assert index.complete("bol") == ["Bol u leđima", "Bolovi", "Bol u grlu", "Bol u grudima"]
+    assert index.complete("bol ") == ["Bol u leđima", "Bol u grlu", "Bol u grudima"]
+
+def test_matches_without_diacritics_and_leaves_out_the_typed_phrase():
+    index = PhraseIndex()
+    index.add({"Kašalj suv": 2, "Kašalj": 4})
+
+    assert index.complete("kasa") == ["Kašalj", "Kašalj suv"]
+    assert index.complete("KAŠALJ") == ["Kašalj suv"]
+
+def test_short_prefixes_get_nothing():
+    index = PhraseIndex()
+    index.add({"Bol u grudima": 3})
+
+    assert index.complete("b") == []
+    assert index.complete(" ") == []
+
+def test_precomputed_ranking_matches_a_full_scan_as_counts_grow():
+    index = PhraseIndex()
+    index.add(random_phrases(3000))
+    assert index.top
+
+    prefixes = ["bo", "bol", "bol ", "bol u ", "ka", "kaš", "gl", "pritisak ", "te"]
+    for text in prefixes:
+        assert index.complete(text) == brute_force(index, text)
+
+    # Phrases written again, and new ones, move up in the precomputed lists as well
+    index.add({"bol u grudima": 500, "kašalj suv noću": 300, "temperatura": 1})
+    for text in prefixes:
+        assert index.complete(text) == brute_force(index, text)
+    assert index.complete("bo")[0] == "bol u grudima"
+
+def test_snapshot_round_trip(tmp_path):
+    index = PhraseIndex(watermark=7, last_record="2024-03.seg:120")
+    index.add(random_phrases(500))
+    index.add({"Kašalj suv noću": 2})
+    path = tmp_path / "fraze.idx"
+    index.save(str(path))
+
+    loaded = PhraseIndex.load(str(path))
+
+    assert loaded.entries == index.entries
+    assert (loaded.watermark, loaded.last_record) == (7, "2024-03.seg:120")
+    assert loaded.complete("bol") == index.complete("bol")
+    assert loaded.complete("kasalj suv n") == ["Kašalj suv noću"]
+
+def test_split_phrases_keeps_sentences_of_useful_length():
+    text = "Bol u grudima. Kašalj!  Ok.\n" + "x" * (phrases.MAX_PHRASE_LENGTH + 1) + "\nPritisak   povišen"
+
+    assert list(phrases.split_phrases(text)) == ["Bol u grudima.", "Kašalj!", "Pritisak povišen"]
@@ -0,0 +1,89 @@
+import copy
+import os
+
+import render_cache
+from conftest import SRC_DIR, make_report
+from render_cache import RenderCache
+
+
+def test_the_same_record_renders_to_the_same_bytes(renderer):
+    first, sheets = renderer.render_bytes(make_report("Ana Anić", 2))
+    second, _ = renderer.render_bytes(make_report("Ana Anić", 2))
+
+    assert first == second
+    assert sheets == 2
+    assert render_cache.page_count(first) == 2
+    assert renderer.render_bytes(make_report("Ana Anić", 1))[0] != first
+
+def test_key_changes_with_the_config_fonts_and_format(tmp_path, renderer, monkeypatch):
+    cache = RenderCache(str(tmp_path))
+    record = make_report()
+    key = cache.key(record, renderer.config)
+    assert cache.key(make_report(), copy.deepcopy(renderer.config)) == key
+
+    config = copy.deepcopy(renderer.config)
+    first_field = next(iter(config))
+    config[first_field] = config[first_field] + ["Nova linija"]
+    assert cache.key(record, config) != key
+    assert cache.key(make_report("Mila Milić"), renderer.config) != key
+
+    # A font file replaced by another version
+    stamps = render_cache.font_stamps()
+    name = next(iter(stamps))
+    stamps[name] = [stamps[name][0] + 1, stamps[name][1]]
+    monkeypatch.setattr(render_cache, "font_stamps", lambda: stamps)
+    assert RenderCache(str(tmp_path)).key(record, renderer.config) != key
+
+    monkeypatch.undo()
+    monkeypatch.setattr(render_cache, "RENDER_FORMAT_VERSION", render_cache.RENDER_FORMAT_VERSION + 1)
+    assert RenderCache(str(tmp_path)).key(record, renderer.config) != key
+
+def test_a_repeat_render_is_a_hit(tmp_path, renderer):
+    cache = RenderCache(str(tmp_path))
+    data, sheets = cache.render_bytes(renderer, make_report("Ana Anić", 2))
+
+    assert cache.render_bytes(renderer, make_report("Ana Anić", 2)) == (data, sheets)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert os.listdir(tmp_path) == [f"{cache.key(make_report('Ana Anić', 2), renderer.config)}.pdf"]
+
+def test_an_entry_cut_short_is_rendered_again(tmp_path, renderer):
+    cache = RenderCache(str(tmp_path))
+    record = make_report()
+    data, _ = cache.render_bytes(renderer, record)
+    path = cache.path(cache.key(record, renderer.config))
+    # Cut after the page tree, so the page count is still there to read
+    with open(path, 'r+b') as file:
+        file.truncate(data.index(b"xref") - 10)
+    assert render_cache.page_count(open(path, 'rb').read()) == 1
+
+    assert cache.get(cache.key(record, renderer.config)) is None
+    assert not os.path.exists(path)
+    assert cache.render_bytes(renderer, record)[0] == data
+    assert open(path, 'rb').read() == data
+
+def test_least_recently_used_entries_are_evicted(tmp_path, renderer):
+    records = [make_report(f"Pacijent {index}") for index in range(6)]
+    size = len(renderer.render_bytes(records[0])[0])
+    cache = RenderCache(str(tmp_path), max_bytes=int(size * 4.5))
+    keys = [cache.key(record, renderer.config) for record in records]
+    for index, record in enumerate(records[:4]):
+        cache.render_bytes(renderer, record)
+        os.utime(cache.path(keys[index]), ns=(index * 10**9, index * 10**9))
+    # Reading the oldest makes it the most recently used
+    assert cache.get(keys[0]) is not None
+
+    # Five entries are over the limit: the oldest go until the rest fit under LOW_WATER of it
+    cache.render_bytes(renderer, records[4])
+    kept = {name[:-4] for name in os.listdir(tmp_path)}
+    assert kept == {keys[0], keys[3], keys[4]}
+    assert cache.size == sum(os.path.getsize(cache.path(key)) for key in kept)
+    assert cache.size <= cache.max_bytes * render_cache.LOW_WATER
+
+    cache.render_bytes(renderer, records[5])
+    assert len(os.listdir(tmp_path)) == 4
+
+def test_the_default_folder_does_not_depend_on_the_working_directory(tmp_path, monkeypatch):
+    monkeypatch.delenv("DOCTORREPORT_RENDER_CACHE", raising=False)
+    monkeypatch.chdir(tmp_path)
+
+    assert os.path.samefile(os.path.dirname(os.path.dirname(render_cache.render_cache_dir())), SRC_DIR)
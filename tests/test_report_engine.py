@@ -0,0 +1,123 @@
+import io
+import re
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+import render_cache
+import report_engine
+from conftest import make_report
+from report_engine import BOTTOM_MARGIN, PageFlow
+
+# Page objects of a PDF, not the page tree
+_PAGE_OBJECT = re.compile(rb"/Type /Page\b(?!s)")
+
+
+class RecordingCanvas(canvas.Canvas):
+    """A canvas that remembers the page, position and text of every string drawn on it."""
+
+    def __init__(self):
+        super().__init__(io.BytesIO(), pagesize=A4, invariant=1)
+        self.strings = []
+
+    def drawString(self, x, y, text, *args, **kwargs):
+        self.strings.append((self.getPageNumber(), x, y, text))
+        return super().drawString(x, y, text, *args, **kwargs)
+
+
+class FixedTop:
+    """A renderer whose page top leaves the write position at top."""
+
+    def __init__(self, top):
+        self.top = top
+
+    def draw_page_top(self, pdf_canvas, record):
+        return self.top
+
+
+def test_line_breaks_the_page_once_the_bottom_margin_is_passed():
+    flow = PageFlow(FixedTop(BOTTOM_MARGIN + 30), RecordingCanvas(), make_report())
+    flow.start_page()
+    flow.set_font("Helvetica", 10)
+
+    # A line may start exactly at the margin; the one after it goes to the next page
+    assert [flow.line(15) for _ in range(3)] == [BOTTOM_MARGIN + 30, BOTTOM_MARGIN + 15, BOTTOM_MARGIN]
+    assert flow.page_count == 1
+    assert flow.line(15) == BOTTOM_MARGIN + 30
+    assert flow.page_count == 2
+    assert flow.pdf_canvas.getPageNumber() == 2
+    # showPage() resets the canvas state; the content font is set again
+    assert flow.pdf_canvas._fontname == "Helvetica"
+
+def test_skip_never_breaks_the_page_but_the_next_line_does():
+    flow = PageFlow(FixedTop(BOTTOM_MARGIN + 10), RecordingCanvas(), make_report())
+    flow.start_page()
+
+    flow.skip(100)
+    assert flow.page_count == 1
+    assert flow.y_position == BOTTOM_MARGIN - 90
+    assert flow.line(15) == BOTTOM_MARGIN + 10
+    assert flow.page_count == 2
+
+def test_reserve_keeps_a_block_that_fits_and_moves_one_that_does_not():
+    flow = PageFlow(FixedTop(BOTTOM_MARGIN + 50), RecordingCanvas(), make_report())
+    flow.start_page()
+
+    flow.reserve(50)
+    assert flow.page_count == 1
+    flow.skip(20)
+    flow.reserve(31)
+    assert flow.page_count == 2
+    assert flow.y_position == BOTTOM_MARGIN + 50
+
+
+def test_a_dg_table_spills_over_onto_the_next_sheet(renderer):
+    pdf_canvas = RecordingCanvas()
+    record = make_report()
+    flow = PageFlow(renderer, pdf_canvas, record)
+    flow.start_page()
+    page_top = flow.y_position
+    dg_lines = [f"I10.{number} Hypertensio arterialis" for number in range(80)]
+
+    renderer.draw_dg_table(flow, "\n".join(dg_lines))
+
+    assert flow.page_count == 2
+    drawn = [(page, y, text) for page, x, y, text in pdf_canvas.strings if text in dg_lines]
+    assert [text for _, _, text in drawn] == dg_lines
+    assert all(y >= BOTTOM_MARGIN for _, y, _ in drawn)
+    assert [text for page, x, y, text in pdf_canvas.strings if text == "DG:"] == ["DG:"]
+
+    # The second sheet opens with the header again, and the table goes on right below it
+    first_on_second = next(index for index, (page, _, _) in enumerate(drawn) if page == 2)
+    assert drawn[first_on_second][1] == page_top
+    assert drawn[first_on_second - 1][1] - 15 < BOTTOM_MARGIN
+    assert any(page == 2 and text.endswith(record["full_name"]) for page, x, y, text in pdf_canvas.strings)
+
+def test_render_bytes_counts_every_sheet_it_finishes(renderer):
+    long_diagnosis = "\n".join(f"Red {number}: pacijent je stabilno." for number in range(100))
+    record = make_report(pages=2)
+    record["pages"][1]["diagnosis"] = long_diagnosis
+    record["pages"][1]["dg"] = "\n".join(f"I10.{number}" for number in range(60))
+
+    data, sheets = renderer.render_bytes(record)
+    assert sheets > 3
+    assert len(_PAGE_OBJECT.findall(data)) == sheets
+    assert render_cache.page_count(data) == sheets
+
+    data, sheets = renderer.render_bytes(make_report(pages=3))
+    assert sheets == 3
+    assert len(_PAGE_OBJECT.findall(data)) == 3
+
+def test_the_footer_is_kept_whole(renderer):
+    footer_lines = renderer.static_layout()["footer"]
+    footer_height = 20 + 15 * (len(footer_lines) - 1)
+    pdf_canvas = RecordingCanvas()
+    flow = PageFlow(renderer, pdf_canvas, make_report())
+    flow.start_page()
+    flow.skip(flow.y_position - BOTTOM_MARGIN - footer_height + 1)
+
+    renderer.draw_footer(flow, "01-03-2024")
+
+    assert flow.page_count == 2
+    date_line = f"{report_engine.format_date('01-03-2024')} Beograd"
+    assert [page for page, x, y, text in pdf_canvas.strings if text == date_line] == [2]
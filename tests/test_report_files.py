@@ -0,0 +1,117 @@
+import os
+import time
+import zipfile
+from datetime import date
+
+import report_files
+
+TODAY = date(2025, 12, 5)
+
+
+def write_reports(folder, names):
+    """Write a small file for each report name directly in folder, as older versions did. Returns their data."""
+    os.makedirs(folder, exist_ok=True)
+    written = {}
+    for name in names:
+        data = b"%PDF-1.4 " + name.encode() * 40
+        with open(os.path.join(folder, name), 'wb') as file:
+            file.write(data)
+        written[name] = data
+    return written
+
+def names_of(paths):
+    return [os.path.basename(path) for path in paths]
+
+
+def test_compaction_packs_the_months_before_the_hot_ones(tmp_path):
+    folder = str(tmp_path / "izvestaji")
+    written = write_reports(folder, [f"{patient}_2025{month:02d}{day:02d}.pdf" for month in range(1, 13)
+                                     for day in (3, 17) for patient in ("Ana_Anic", "Petar_Petrovic")])
+
+    assert report_files.compact(folder, 3, TODAY) == (48, 36)
+
+    assert sorted(os.listdir(os.path.join(folder, "2025"))) == ["10", "11", "12"] + [
+        f"2025-{month:02d}{extension}" for month in range(1, 10) for extension in (".idx", ".zip")]
+    assert sorted(os.listdir(os.path.join(folder, "2025", "11"))) == [
+        "Ana_Anic_20251103.pdf", "Ana_Anic_20251117.pdf", "Petar_Petrovic_20251103.pdf", "Petar_Petrovic_20251117.pdf"]
+    with zipfile.ZipFile(os.path.join(folder, "2025", "2025-02.zip")) as bundle:
+        assert bundle.testzip() is None
+        assert sorted(bundle.namelist()) == sorted(name for name in written if name[-8:-6] == "02")
+
+    paths = report_files.find_reports(folder)
+    assert names_of(paths) == sorted(written, key=lambda name: (report_files.report_date(name), name.casefold()))
+    for path in paths:
+        assert report_files.read_report(path) == written[os.path.basename(path)]
+
+def test_lookup_by_patient_and_day_and_by_an_old_path(tmp_path, monkeypatch):
+    # Reports opened from bundles are extracted under the working directory
+    monkeypatch.chdir(tmp_path)
+    folder = str(tmp_path / "izvestaji")
+    written = write_reports(folder, ["Ana_Anic_20250603.pdf", "Ana_Anic_20250603_2.pdf", "Ana_Anicic_20250603.pdf",
+                                     "Petar_Petrovic_20250603.pdf", "Ana_Anic_20251120.pdf"])
+    report_files.compact(folder, 3, TODAY)
+
+    found = report_files.find_reports(folder, date(2025, 6, 3), date(2025, 6, 3), "Ana Anic")
+    assert names_of(found) == ["Ana_Anic_20250603.pdf", "Ana_Anic_20250603_2.pdf"]
+    assert all(report_files.split_bundled(path) for path in found)
+    assert names_of(report_files.find_reports(folder, date(2025, 11, 1), None, "Ana Anic")) == ["Ana_Anic_20251120.pdf"]
+
+    # Paths saved before the reports were moved and packed still lead to them
+    for name in ("Ana_Anic_20250603_2.pdf", "Ana_Anic_20251120.pdf"):
+        located = report_files.locate(os.path.join(folder, name))
+        assert report_files.read_report(located) == written[name]
+    assert report_files.locate(os.path.join(folder, "Ana_Anic_20250604.pdf")) is None
+
+    view = report_files.viewable_path(os.path.join(folder, "Petar_Petrovic_20250603.pdf"))
+    with open(view, 'rb') as file:
+        assert file.read() == written["Petar_Petrovic_20250603.pdf"]
+
+def test_a_late_report_joins_its_bundle_and_a_clashing_one_stays_a_file(tmp_path):
+    folder = str(tmp_path / "izvestaji")
+    written = write_reports(folder, ["Ana_Anic_20250103.pdf", "Petar_Petrovic_20250103.pdf"])
+    report_files.compact(folder, 3, TODAY)
+    write_reports(folder, ["Late_20250105.pdf"])
+    (tmp_path / "izvestaji" / "2025" / "01").mkdir()
+    (tmp_path / "izvestaji" / "2025" / "01" / "Ana_Anic_20250103.pdf").write_bytes(b"written again")
+
+    assert report_files.compact(folder, 3, TODAY) == (1, 1)
+
+    assert os.listdir(os.path.join(folder, "2025", "01")) == ["Ana_Anic_20250103.pdf"]
+    bundle = os.path.join(folder, "2025", "2025-01.zip")
+    assert report_files.read_report(os.path.join(bundle, "Ana_Anic_20250103.pdf")) == written["Ana_Anic_20250103.pdf"]
+    assert report_files.read_report(os.path.join(bundle, "Late_20250105.pdf")).startswith(b"%PDF")
+    found = report_files.find_reports(folder, date(2025, 1, 3), date(2025, 1, 3), "Ana Anic")
+    assert len(found) == 1 and report_files.read_report(found[0]) == b"written again"
+
+def test_a_compaction_cut_short_is_finished(tmp_path):
+    folder = str(tmp_path / "izvestaji")
+    write_reports(folder, ["Ana_Anic_20250103.pdf", "Petar_Petrovic_20250103.pdf"])
+    report_files.move_loose_reports(folder)
+    # The bundle was written, but the process stopped before removing the files
+    directory = os.path.join(folder, "2025", "01")
+    with zipfile.ZipFile(report_files.bundle_path(folder, 2025, 1), 'w') as bundle:
+        bundle.write(os.path.join(directory, "Ana_Anic_20250103.pdf"), "Ana_Anic_20250103.pdf")
+
+    assert report_files.compact(folder, 3, TODAY) == (0, 2)
+    assert not os.path.exists(directory)
+    assert len(report_files.find_reports(folder)) == 2
+
+def test_one_process_compacts_at_a_time(tmp_path):
+    folder = str(tmp_path / "izvestaji")
+    write_reports(folder, ["Ana_Anic_20250103.pdf"])
+    lock = os.path.join(folder, report_files.LOCK_FILE)
+
+    with report_files._compaction_lock(folder) as locked:
+        assert locked
+        assert report_files.compact(folder, 3, TODAY) == (0, 0)
+        # A long compaction keeps its lock fresh
+        old = time.time() - report_files.STALE_LOCK_SECONDS - 1
+        os.utime(lock, (old, old))
+        report_files._refresh_compaction_lock(folder)
+        assert report_files.compact(folder, 3, TODAY) == (0, 0)
+
+    # A lock left by a crash is taken over
+    open(lock, 'w').close()
+    os.utime(lock, (old, old))
+    assert report_files.compact(folder, 3, TODAY) == (1, 1)
+    assert not os.path.exists(lock)
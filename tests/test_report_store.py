@@ -0,0 +1,90 @@
+import multiprocessing
+import os
+from datetime import datetime
+
+import pytest
+
+import report_store
+from conftest import make_report
+from report_store import RecordError
+
+WHEN = datetime(2024, 3, 5, 10, 30)
+
+
+def stored(name="Petar Petrović", pages=1, when=WHEN):
+    return report_store.stored_record(make_report(name, pages), "izvestaji/report.pdf", when)
+
+def append_names(folder, names, queue):
+    """Append a record for each name, then put (locator, name) of each on queue."""
+    queue.put([(report_store.append_record(make_report(name), folder=folder, when=WHEN), name) for name in names])
+
+
+def test_frame_round_trip(tmp_path):
+    records = [stored("Ana Anić", 2), stored("Mila Milić"), stored("Jovan Jović", when=datetime(2024, 4, 1))]
+
+    locators = report_store.append_records(records, str(tmp_path))
+
+    assert [locator.split(":")[0] for locator in locators] == ["2024-03.seg", "2024-03.seg", "2024-04.seg"]
+    assert [report_store.read_record(locator, str(tmp_path)) for locator in locators] == records
+    assert list(report_store.iter_records(str(tmp_path))) == list(zip(locators, records))
+    assert [locator for locator, _ in report_store.iter_records(str(tmp_path), after=locators[0])] == locators[1:]
+
+def test_records_are_checked_when_written():
+    report = make_report()
+    report["pages"][0]["date"] = "2024-03-05"
+    with pytest.raises(RecordError, match="date"):
+        report_store.stored_record(report)
+    with pytest.raises(RecordError, match="at least one page"):
+        report_store.stored_record(dict(make_report(), pages=[]))
+
+def test_damaged_frame_ends_the_readable_part(tmp_path):
+    locators = report_store.append_records([stored("Ana Anić"), stored("Mila Milić"), stored("Jovan Jović")],
+                                           str(tmp_path))
+    path = tmp_path / "2024-03.seg"
+    data = bytearray(path.read_bytes())
+    _, offset = report_store.parse_locator(locators[1])
+    data[offset + report_store.FRAME_HEADER.size + 5] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+    with pytest.raises(RecordError, match="checksum"):
+        report_store.read_record(locators[1], str(tmp_path))
+    assert [locator for locator, _ in report_store.iter_records(str(tmp_path))] == locators[:1]
+    assert report_store.readable_end(str(path)) == offset
+
+@pytest.mark.parametrize("fresh_process", [False, True])
+def test_append_cuts_a_tail_left_by_a_crash(tmp_path, monkeypatch, fresh_process):
+    first = report_store.append_record(make_report("Ana Anić"), folder=str(tmp_path), when=WHEN)
+    path = tmp_path / "2024-03.seg"
+    intact = path.stat().st_size
+    # Another process died halfway through writing a frame
+    with open(path, 'ab') as file:
+        file.write(report_store.encode_frame(stored("Mila Milić"))[:20])
+    if fresh_process:
+        monkeypatch.setattr(report_store, "_segment_ends", {})
+
+    second = report_store.append_record(make_report("Jovan Jović"), folder=str(tmp_path), when=WHEN)
+
+    assert report_store.parse_locator(second) == ("2024-03.seg", intact)
+    assert [record["report"]["full_name"] for _, record in report_store.iter_records(str(tmp_path))] == [
+        "Ana Anić", "Jovan Jović"]
+    assert report_store.read_record(first, str(tmp_path))["report"]["full_name"] == "Ana Anić"
+
+def test_appends_from_several_processes_keep_their_locators(tmp_path):
+    folder = str(tmp_path)
+    report_store.append_record(make_report("Ana Anić"), folder=folder, when=WHEN)
+    queue = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=append_names,
+                                         args=(folder, [f"P{number} {index}" for index in range(50)], queue))
+                 for number in range(4)]
+    for process in processes:
+        process.start()
+    written = [pair for _ in processes for pair in queue.get(timeout=60)]
+    for process in processes:
+        process.join()
+
+    assert len({locator for locator, _ in written}) == 200
+    for locator, name in written:
+        assert report_store.read_record(locator, folder)["report"]["full_name"] == name
+    assert sum(1 for _ in report_store.iter_records(folder)) == 201
+    assert report_store.readable_end(os.path.join(folder, "2024-03.seg")) == os.path.getsize(
+        os.path.join(folder, "2024-03.seg"))
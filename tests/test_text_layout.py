@@ -0,0 +1,107 @@
+import os
+import shutil
+
+import pytest
+
+from conftest import SRC_DIR
+import report_engine
+import text_layout
+from text_layout import wrap_paragraph
+
+FONT = report_engine.MONOSPACE_FONT
+SIZE = report_engine.DIAGNOSIS_FONT_SIZE
+
+
+@pytest.fixture
+def width(renderer):
+    """The printed width of the diagnosis text, with the fonts registered."""
+    return report_engine.diagnosis_text_width()
+
+def fitting_chars(char, font, size, max_width):
+    """How many copies of char fit on a line of max_width points."""
+    count = 0
+    while text_layout.text_width(char * (count + 1), font, size) <= max_width:
+        count += 1
+    return count
+
+
+def test_a_word_wider_than_a_line_is_split_where_it_overflows(width):
+    chars = fitting_chars("M", FONT, SIZE, width)
+    word = "M" * (2 * chars + 3)
+
+    assert wrap_paragraph(word, FONT, SIZE, width) == ("M" * chars, "M" * chars, "MMM")
+    assert wrap_paragraph("kratko " + word, FONT, SIZE, width) == ("kratko", "M" * chars, "M" * chars, "MMM")
+    assert text_layout.splits_words(word, FONT, SIZE, width)
+
+def test_long_lines_of_short_words_break_at_spaces_and_hyphens(width):
+    paragraph = " ".join(["pritisak"] * 40) + " srčano-plućni"
+    lines = wrap_paragraph(paragraph, FONT, SIZE, width)
+
+    assert len(lines) > 1
+    assert all(text_layout.text_width(line, FONT, SIZE) <= width for line in lines)
+    assert " ".join(lines).replace("- ", "-") == paragraph
+    assert not text_layout.splits_words(paragraph, FONT, SIZE, width)
+
+def test_a_line_that_fills_the_width_exactly_stays_whole(width):
+    chars = fitting_chars("a", FONT, SIZE, width)
+    exact = "a" * (chars - 5) + " bbbb"
+    assert text_layout.text_width(exact, FONT, SIZE) <= width
+
+    assert wrap_paragraph(exact + " cc", FONT, SIZE, width) == (exact, "cc")
+    assert wrap_paragraph("a" + exact, FONT, SIZE, width) == ("a" * (chars - 4), "bbbb")
+
+def test_tabs_are_expanded_before_wrapping(width):
+    assert text_layout.paragraphs("DG:\tI10\nab\tc") == ["DG: I10", "ab  c"]
+    assert text_layout.paragraphs("prvi drugi") == ["prvi", "drugi"]
+
+    chars = fitting_chars("a", FONT, SIZE, width)
+    tabbed, = text_layout.paragraphs("\t" + "a" * (chars - 4) + " b")
+    assert wrap_paragraph(tabbed, FONT, SIZE, width) == ("    " + "a" * (chars - 4), "b")
+
+def test_empty_paragraphs_are_kept_as_empty_lines(width):
+    assert text_layout.paragraphs("prvi\n\n\ndrugi") == ["prvi", "", "", "drugi"]
+    assert wrap_paragraph("", FONT, SIZE, width) == ("",)
+    assert not text_layout.splits_words("", FONT, SIZE, width)
+    assert not text_layout.splits_words("\n \n", FONT, SIZE, width)
+
+def test_dg_width_holds_the_configured_number_of_characters(renderer):
+    dg_font = f"{FONT}-Bold"
+    chars = report_engine.MAX_CHARS_PER_LINE_DG_TABLE
+    line = "I" + "m" * (chars - 1)
+
+    assert report_engine.dg_text_width() == pytest.approx(text_layout.text_width("M" * chars, dg_font, report_engine.DG_FONT_SIZE))
+    assert wrap_paragraph(line, dg_font, report_engine.DG_FONT_SIZE, report_engine.dg_text_width()) == (line,)
+    assert wrap_paragraph(line + "m", dg_font, report_engine.DG_FONT_SIZE, report_engine.dg_text_width()) == (line, "m")
+
+
+@pytest.fixture
+def page_window(qapp, renderer, tmp_path, monkeypatch):
+    """A one-page report window, working in a scratch folder that holds the fonts and config."""
+    os.symlink(os.path.join(SRC_DIR, "fonts"), tmp_path / "fonts")
+    shutil.copy(os.path.join(SRC_DIR, "config.json"), tmp_path)
+    monkeypatch.chdir(tmp_path)
+    import main
+    window = main.PageWindow(1, "Test Pacijent", "01-02-1980", "0102980710006")
+    yield window
+    window.deleteLater()
+
+def editor_lines(text_edit, text):
+    """The lines text_edit breaks text into, without the spaces at the breaks."""
+    text_edit.setPlainText(text)
+    block = text_edit.document().firstBlock()
+    layout = block.layout()
+    lines = [layout.lineAt(index) for index in range(layout.lineCount())]
+    return tuple(block.text()[line.textStart():line.textStart() + line.textLength()].rstrip(" ") for line in lines)
+
+def test_the_editor_breaks_lines_where_the_pdf_does(page_window):
+    cases = [
+        (page_window.diagnosis_inputs[0], page_window.text_font, SIZE, report_engine.diagnosis_text_width()),
+        (page_window.text_inputs[0], f"{page_window.text_font}-Bold", report_engine.DG_FONT_SIZE,
+         report_engine.dg_text_width()),
+    ]
+    for text_edit, font, size, max_width in cases:
+        chars = fitting_chars("a", font, size, max_width)
+        for paragraph in ["a" * chars, "a" * (chars + 1), "bb " + "a" * chars,
+                          "a" * (chars - 5) + " bbbb cc", "a" * (chars - 4) + " bbbb cc",
+                          " ".join(["Pritisak 150/95 mmHg,"] * 12), " ".join(["srčano-plućni"] * 10)]:
+            assert editor_lines(text_edit, paragraph) == wrap_paragraph(paragraph, font, size, max_width), paragraph
@@ -0,0 +1,63 @@
+import json
+import os
+import threading
+
+import pytest
+
+import tracing
+
+
+@pytest.fixture
+def trace_session(tmp_path, monkeypatch):
+    """Tracing switched on for one test, writing to tmp_path, with nothing recorded yet."""
+    monkeypatch.setenv(tracing.TRACE_DIR_ENV, str(tmp_path))
+    monkeypatch.setattr(tracing, "_enabled", True)
+    monkeypatch.setattr(tracing, "_events", [])
+    monkeypatch.setattr(tracing, "_durations", {})
+    monkeypatch.setattr(tracing, "_thread_names", {})
+    return tmp_path
+
+
+def test_statistics_stay_exact_while_the_samples_are_capped(trace_session, monkeypatch):
+    monkeypatch.setattr(tracing, "MAX_SAMPLES_PER_SPAN", 100)
+    for duration in range(1, 1001):
+        tracing._record("render", 0, duration * 1_000_000, None, None)
+
+    row = tracing.stats()["render"]
+    assert row["count"] == 1000
+    assert row["total_ms"] == sum(range(1, 1001))
+    assert row["max_ms"] == 1000
+    assert len(tracing._durations["render"].samples) == 100
+    # A uniform sample of 1..1000 has its median near 500
+    assert 300 < row["p50_ms"] < 700
+    assert row["p50_ms"] <= row["p95_ms"] <= row["max_ms"]
+
+def test_percentiles_are_exact_below_the_cap(trace_session):
+    for duration in (5, 1, 4, 2, 3):
+        tracing._record("save", 0, duration * 1_000_000, None, None)
+
+    assert tracing.stats()["save"] == {"count": 5, "p50_ms": 3, "p95_ms": 5, "max_ms": 5, "total_ms": 15}
+
+def test_traces_are_written_while_other_threads_record(trace_session, monkeypatch):
+    monkeypatch.setattr(tracing, "MAX_EVENTS_PER_FILE", 50)
+    monkeypatch.setattr(tracing, "MAX_TRACE_FILES", 1000)
+    threads = [threading.Thread(target=lambda: [tracing._record("work", 0, 1000, None, None) for _ in range(500)],
+                                name=f"worker-{number}") for number in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    tracing.flush()
+
+    thread_names = set()
+    event_count = 0
+    for file_name in os.listdir(trace_session):
+        if file_name.startswith("trace-"):
+            with open(trace_session / file_name, encoding="utf-8") as file:
+                events = json.load(file)["traceEvents"]
+            thread_names.update(event["args"]["name"] for event in events if event["ph"] == "M")
+            event_count += sum(event["ph"] == "X" for event in events)
+    assert tracing.stats()["work"]["count"] == 4000
+    assert event_count == 4000
+    assert thread_names == {f"worker-{number}" for number in range(8)}
+    assert "stats.log" in os.listdir(trace_session)